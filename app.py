@@ -2,13 +2,26 @@
 アカウント発行依頼チャットボット - Streamlit UI
 """
 
+import hmac
 import os
+import uuid
+from typing import Iterator, Optional, Tuple
+
 import streamlit as st
 from dotenv import load_dotenv
 
-from src.langchain_setup import ChatbotManager
-from src.api_clients import execute_account_request
-from src.prompts import GREETING_MESSAGE, ERROR_MESSAGES, get_completion_message
+from src.langchain_setup import ChatbotManager, InvalidRequestError
+from src.access_index import get_access_index
+from src.batch import parse_batch_csv
+from src.chat_history import ChatHistory
+from src.job_queue import STATUS_DEFERRED, STATUS_FAILED, STATUS_SUCCEEDED, get_job_queue
+from src.metrics import registry, start_exporters
+from src.models import ChatSession
+from src.prompts import (
+    GREETING_MESSAGE, ERROR_MESSAGES, BATCH_LOADED_MESSAGE, COMPLETE_RESPONSE,
+    get_completion_message, get_batch_completion_message, get_job_accepted_message
+)
+from src.session_store import get_session_store
 
 # 環境変数の読み込み
 load_dotenv()
@@ -16,11 +29,16 @@ load_dotenv()
 
 def initialize_session_state():
     """セッション状態を初期化"""
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    if "history" not in st.session_state:
+        st.session_state.history = ChatHistory()
+
+    # 表示するメッセージ数（「以前の履歴を表示」で増やす）
+    if "history_limit" not in st.session_state:
+        st.session_state.history_limit = st.session_state.history.window
 
     if "chatbot_manager" not in st.session_state:
         st.session_state.chatbot_manager = ChatbotManager()
+        st.session_state.chatbot_manager.access_index = get_access_index()
 
     if "conversation_active" not in st.session_state:
         st.session_state.conversation_active = True
@@ -28,13 +46,49 @@ def initialize_session_state():
     if "api_executing" not in st.session_state:
         st.session_state.api_executing = False
 
+    if "pending_jobs" not in st.session_state:
+        st.session_state.pending_jobs = []
+
+    if "session_id" not in st.session_state:
+        restore_session()
+
+
+def restore_session():
+    """
+    URL のセッションIDでセッションストアから会話を復元
+
+    セッションIDは ?session= に保持するため、サーバーの再起動後や別のレプリカでも同じ会話を続けられる。
+    """
+    session_id = st.query_params.get("session") or uuid.uuid4().hex
+    st.session_state.session_id = session_id
+    st.query_params["session"] = session_id
+
+    session = get_session_store().load(session_id)
+    if session is None:
+        return
+    st.session_state.history = ChatHistory.from_session(session)
+    st.session_state.chatbot_manager.state = session.state
+    st.session_state.pending_jobs = session.pending_jobs
+
+
+def save_session():
+    """現在の会話をセッションストアに保存"""
+    session = ChatSession(
+        state=st.session_state.chatbot_manager.state,
+        pending_jobs=st.session_state.pending_jobs
+    )
+    st.session_state.history.save_to(session)
+    get_session_store().save(st.session_state.session_id, session)
+
 
 def reset_conversation():
     """会話をリセット"""
-    st.session_state.messages = []
+    st.session_state.history.clear()
+    st.session_state.history_limit = st.session_state.history.window
     st.session_state.chatbot_manager.reset_conversation()
     st.session_state.conversation_active = True
     st.session_state.api_executing = False
+    save_session()
 
 
 def display_sidebar():
@@ -55,6 +109,17 @@ def display_sidebar():
         5. 自動でアカウントを発行
         """)
 
+        st.header("一括依頼")
+        uploaded_file = st.file_uploader(
+            "CSV（email, tool, permission 列）",
+            type="csv",
+            help="複数人・複数ツールの依頼をまとめて読み込みます。背景はチャットで共通のものを入力します。"
+        )
+        # ファイルは再実行のたびに渡されるため、新しいファイルのみ読み込む
+        if uploaded_file is not None and uploaded_file.file_id != st.session_state.get("batch_file_id"):
+            st.session_state.batch_file_id = uploaded_file.file_id
+            load_batch_csv(uploaded_file.getvalue().decode("utf-8-sig"))
+
         st.divider()
 
         if st.button("会話をリセット", type="secondary", use_container_width=True):
@@ -65,91 +130,193 @@ def display_sidebar():
         st.caption("v1.0.0 - Powered by Gemini & LangChain")
 
 
-def generate_bot_response(user_input: str) -> str:
+def load_batch_csv(text: str):
+    """
+    CSVの一括依頼を読み込み、結果をチャットに表示
+
+    Args:
+        text: CSVの内容
+    """
+    rows, errors = parse_batch_csv(text)
+
+    messages = errors[:]
+    if rows:
+        result = st.session_state.chatbot_manager.load_batch_rows(rows)
+        messages.append(BATCH_LOADED_MESSAGE.format(count=len(rows)))
+        messages.append(result['next_question'])
+
+    st.session_state.history.append("assistant", "\n\n".join(messages))
+    save_session()
+
+
+def stream_bot_response(user_input: str) -> Iterator[str]:
     """
-    ボットの応答を生成
+    ボットの応答を生成し、断片ごとに返す
 
     Args:
         user_input: ユーザーの入力
 
-    Returns:
-        ボットの応答
+    Yields:
+        ボットの応答の断片
     """
-    manager = st.session_state.chatbot_manager
+    yield from st.session_state.chatbot_manager.stream_response(user_input)
+
 
-    # ユーザー入力を処理
-    result = manager.process_user_input(user_input)
-
-    # エラーがある場合
-    if result['status'] == 'error':
-        error_messages = []
-        for field, error in result['errors'].items():
-            error_messages.append(error)
-        return "\n\n".join(error_messages)
-
-    # 情報が全て揃った場合
-    if result['status'] == 'complete':
-        return "情報が全て揃いました。アカウント発行を実行します..."
-
-    # 次の質問を返す
-    if 'next_question' in result:
-        # 抽出された情報を確認
-        extracted = result.get('extracted', {})
-        confirmation = ""
-
-        if 'email' in extracted:
-            confirmation += f"メールアドレス: {extracted['email']} を確認しました。\n\n"
-        if 'tool' in extracted:
-            tool_name = "Trello" if extracted['tool'] == 'trello' else "Google Drive"
-            confirmation += f"ツール: {tool_name} を確認しました。\n\n"
-        if 'permission' in extracted:
-            permission_names = {
-                'reader': '閲覧のみ',
-                'commenter': 'コメント可',
-                'writer': '編集可'
-            }
-            confirmation += f"権限: {permission_names.get(extracted['permission'], extracted['permission'])} を確認しました。\n\n"
-
-        return confirmation + result['next_question']
-
-    return "申し訳ございません。処理中にエラーが発生しました。"
-
-
-def execute_api_call():
-    """API呼び出しを実行"""
+def enqueue_api_call() -> Tuple[str, Optional[str]]:
+    """
+    揃った依頼をジョブキューに登録
+
+    Returns:
+        (受付メッセージ, チャット履歴に残す依頼の要約。登録に失敗した場合は None)
+    """
     manager = st.session_state.chatbot_manager
-    state = manager.state
 
     try:
-        # API実行
-        result = execute_account_request(
-            email=state.email,
-            tool=state.tool,
-            background=state.background,
-            permission=state.permission
-        )
+        job_ids = manager.enqueue_request(get_job_queue())
+    except InvalidRequestError as e:
+        # 無効な項目は会話状態から消してあるため、尋ね直して会話を続ける
+        return str(e), None
+    except Exception as e:
+        return ERROR_MESSAGES['api_error'].format(error_details=str(e)), None
 
-        if result['success']:
-            # 成功メッセージ
-            completion_msg = get_completion_message(
-                tool=state.tool,
-                email=state.email,
-                background=state.background,
-                permission=state.permission
-            )
-            return completion_msg
-        else:
-            # エラーメッセージ
-            error_msg = ERROR_MESSAGES['api_error'].format(
-                error_details=result.get('error', '不明なエラー')
+    st.session_state.pending_jobs.append(job_ids)
+    summary = manager.summarize_request(job_ids)
+    reply = get_job_accepted_message(job_ids, manager.unavailable_tools())
+    # 依頼内容はジョブに保存済みのため、次の依頼を受け付けられるよう状態をリセット
+    manager.reset_conversation()
+    return reply, summary
+
+
+def build_job_result_message(jobs: list) -> str:
+    """
+    完了したジョブの結果メッセージを生成
+
+    Args:
+        jobs: 同じ依頼で登録されたジョブの状態
+
+    Returns:
+        結果メッセージ
+    """
+    if len(jobs) == 1:
+        job = jobs[0]
+        request = job['request']
+        if job['status'] == STATUS_SUCCEEDED:
+            return get_completion_message(
+                tool=request.tool,
+                email=request.email,
+                background=request.background,
+                permission=request.permission
             )
-            return error_msg
+        return ERROR_MESSAGES['api_error'].format(error_details=job['error'] or '不明なエラー')
+
+    results = []
+    for job in jobs:
+        request = job['request']
+        results.append({
+            "success": job['status'] == STATUS_SUCCEEDED,
+            "email": request.email,
+            "tool": request.tool,
+            "permission": request.permission,
+            "error": job['error']
+        })
+    return get_batch_completion_message(results, jobs[0]['request'].background)
+
+
+@st.fragment(run_every=2)
+def display_pending_jobs():
+    """実行中のジョブの状態を定期的に確認して表示"""
+    if not st.session_state.pending_jobs:
+        return
+
+    queue = get_job_queue()
+    finished = False
+    for job_ids in list(st.session_state.pending_jobs):
+        jobs = [job for job in (queue.get(job_id) for job_id in job_ids) if job is not None]
+        done = sum(1 for job in jobs if job['status'] in (STATUS_SUCCEEDED, STATUS_FAILED))
+        if done < len(jobs):
+            deferred = sum(1 for job in jobs if job['status'] == STATUS_DEFERRED)
+            if deferred:
+                st.caption(f"アカウント発行中... ({done}/{len(jobs)}、{deferred}件は復旧待ち)")
+            else:
+                st.caption(f"アカウント発行中... ({done}/{len(jobs)})")
+            continue
+
+        st.session_state.pending_jobs.remove(job_ids)
+        st.session_state.history.append("assistant", build_job_result_message(jobs))
+        finished = True
+
+    if finished:
+        save_session()
+        st.rerun()
+
+
+def display_history(history: ChatHistory):
+    """
+    チャット履歴の直近 history_limit 件を表示
 
-    except Exception as e:
-        error_msg = ERROR_MESSAGES['api_error'].format(
-            error_details=str(e)
-        )
-        return error_msg
+    Args:
+        history: チャット履歴
+    """
+    summaries, messages, has_more = history.visible(st.session_state.history_limit)
+
+    if has_more and st.button("以前の履歴を表示"):
+        st.session_state.history_limit += history.window
+        st.rerun()
+
+    if summaries:
+        with st.chat_message("assistant"):
+            st.markdown("**以前の依頼**\n\n" + "\n".join(f"- {summary}" for summary in summaries))
+
+    for message in messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+
+def is_admin_request() -> bool:
+    """
+    管理者向けのページを表示するかチェック
+
+    ADMIN_TOKEN を設定し、?admin= にその値を指定した場合のみ表示する（未設定の場合は表示しない）。
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    value = st.query_params.get("admin")
+    return bool(token) and value is not None and hmac.compare_digest(value.encode("utf-8"), token.encode("utf-8"))
+
+
+def display_admin_page():
+    """管理者向けのメトリクス画面を表示（?admin=<ADMIN_TOKEN> でのみ表示）"""
+    from src.grant_cache import get_grant_cache
+
+    st.title("メトリクス")
+
+    st.subheader("処理段階ごとのレイテンシ")
+    summary = registry.summary()
+    if summary:
+        st.dataframe(summary, use_container_width=True)
+    else:
+        st.caption("まだ計測結果がありません。")
+
+    st.subheader("件数（API エラー・スロット抽出・LLM エラー）")
+    counters = [
+        {"name": name, **dict(labels), "count": count}
+        for (name, labels), count in sorted(registry.counters.items())
+    ]
+    if counters:
+        st.dataframe(counters, use_container_width=True)
+    else:
+        st.caption("まだ記録がありません。")
+
+    st.subheader("スロット抽出")
+    rules_turns = registry.counter("extraction_turns_total", path="rules")
+    llm_turns = registry.counter("extraction_turns_total", path="llm")
+    turns = rules_turns + llm_turns
+    st.json({"turns": turns, "fast_path_ratio": rules_turns / turns if turns else 0.0})
+
+    st.subheader("付与済みキャッシュ")
+    st.json(get_grant_cache().stats())
+
+    with st.expander("Prometheus 形式"):
+        st.code(registry.render_prometheus(), language="text")
 
 
 def main():
@@ -161,6 +328,14 @@ def main():
         layout="wide"
     )
 
+    # メトリクスのエクスポーター（METRICS_PORT / METRICS_FILE 設定時のみ）
+    start_exporters()
+
+    # 管理者向けの非表示ページ
+    if is_admin_request():
+        display_admin_page()
+        return
+
     # セッション状態の初期化
     initialize_session_state()
 
@@ -171,48 +346,40 @@ def main():
     st.title("🤖 アカウント発行依頼チャットボット")
     st.caption("TrelloとGoogle Driveのアカウント発行を自動化します")
 
+    history = st.session_state.history
+
     # 初回の挨拶メッセージを表示
-    if len(st.session_state.messages) == 0:
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": GREETING_MESSAGE
-        })
+    if len(history) == 0:
+        history.append("assistant", GREETING_MESSAGE)
 
-    # チャット履歴を表示
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    # チャット履歴を表示（再実行のたびに描画するため、直近の history_limit 件に限る）
+    display_history(history)
 
     # ユーザー入力
     if prompt := st.chat_input("メッセージを入力してください..."):
         # ユーザーメッセージを追加
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        history.append("user", prompt)
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # ボット応答を生成
+        # ボット応答を生成（届いた部分から表示）
         with st.chat_message("assistant"):
-            with st.spinner("考え中..."):
-                response = generate_bot_response(prompt)
-
-                # 情報が全て揃った場合、API実行
-                if response == "情報が全て揃いました。アカウント発行を実行します...":
-                    st.markdown(response)
-
-                    # API実行
-                    with st.spinner("アカウント発行中..."):
-                        api_response = execute_api_call()
-                        response = api_response
+            response = st.write_stream(stream_bot_response(prompt))
+            summary = st.session_state.chatbot_manager.last_request_summary()
 
+            # 情報が全て揃った場合、ジョブとして登録
+            if response == COMPLETE_RESPONSE:
+                response, summary = enqueue_api_call()
                 st.markdown(response)
 
-        # ボットメッセージを追加
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        # ボットメッセージを追加し、完了した依頼は区切りを記録
+        history.append("assistant", response)
+        if summary is not None:
+            history.close_request(summary)
+        save_session()
 
-        # API実行後、会話をリセット（次の依頼を受け付ける準備）
-        if "アカウント発行が完了しました" in response:
-            # 状態をリセット（メッセージ履歴は保持）
-            st.session_state.chatbot_manager.reset_conversation()
+    # 実行中のジョブの状態を表示
+    display_pending_jobs()
 
 
 if __name__ == "__main__":
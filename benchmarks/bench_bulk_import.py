@@ -0,0 +1,147 @@
+"""
+依頼ファイルの一括取り込みのベンチマーク
+
+代替サーバーに対して `python -m src.bulk_import` を子プロセスで実行し、次を確認する。
+
+- 行数を10倍にしても、子プロセスの最大メモリ使用量（RSS）がほぼ変わらないこと
+- 取り込みのスループット（行/秒）
+- 途中で強制終了（既定は SIGKILL）した取り込みを再開すると、結果ファイルが入力の全行を1行ずつ、入力の順に含むこと
+  （チェックポイント以降に発行済みで再実行された行の件数も表示する）
+
+実行方法:
+    python -m benchmarks.bench_bulk_import
+    python -m benchmarks.bench_bulk_import --rows 10000 --workers 16 --latency-ms 20 --signal int
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.stub_servers import StubAPIServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_requests(path: str, rows: int, invalid_ratio: float, seed: int):
+    """Trello の依頼ファイル（JSON Lines）を作成（invalid_ratio の割合でメールアドレスが正しくない行を含む）"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(rows):
+            email = f"user{i}.example.com" if rng.random() < invalid_ratio else f"user{i}@example.com"
+            f.write(json.dumps({"email": email, "tool": "trello", "background": "新メンバーのオンボーディング"}) + "\n")
+
+
+def start_import(args, input_path: str, output_path: str) -> subprocess.Popen:
+    """取り込みを子プロセスで開始"""
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.bulk_import", input_path, "--output", output_path,
+         "--workers", str(args.workers), "--checkpoint-every", str(args.checkpoint_every)],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+
+
+def wait_import(process: subprocess.Popen, block: bool = True):
+    """子プロセスの終了を待ち、(終了コード, 最大RSS(MB), 出力) を返す（block=False で実行中なら None）"""
+    pid, status, usage = os.wait4(process.pid, 0 if block else os.WNOHANG)
+    if pid == 0:
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # Linux の ru_maxrss は KB 単位
+    return process.returncode, usage.ru_maxrss / 1024, process.stdout.read()
+
+
+def read_lines(path: str) -> List[int]:
+    """結果ファイルの行番号の一覧"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["line"] for line in f]
+
+
+def read_checkpoint_line(path: str) -> int:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["line"]
+    except (OSError, ValueError):
+        return 0
+
+
+def run_full(args, server: StubAPIServer, directory: str, rows: int):
+    """中断せずに取り込み、スループットと最大メモリ使用量を計測"""
+    input_path = os.path.join(directory, f"full-{rows}.jsonl")
+    output_path = f"{input_path}.results.jsonl"
+    write_requests(input_path, rows, args.invalid_ratio, args.seed)
+    writes_before = server.counts["trello"]
+
+    start = time.perf_counter()
+    code, max_rss, _ = wait_import(start_import(args, input_path, output_path))
+    elapsed = time.perf_counter() - start
+    print(f"full {rows:>7} rows  exit={code} elapsed={elapsed:7.2f}s throughput={rows / elapsed:8.1f} rows/s "
+          f"max_rss={max_rss:6.1f}MB writes={server.counts['trello'] - writes_before}")
+
+
+def run_interrupted(args, server: StubAPIServer, directory: str):
+    """取り込みを途中で止めてから再開し、結果ファイルを検証"""
+    input_path = os.path.join(directory, "interrupted.jsonl")
+    output_path = f"{input_path}.results.jsonl"
+    checkpoint_path = f"{output_path}.checkpoint"
+    write_requests(input_path, args.rows, args.invalid_ratio, args.seed)
+    writes_before = server.counts["trello"]
+
+    process = start_import(args, input_path, output_path)
+    finished = None
+    while finished is None and read_checkpoint_line(checkpoint_path) < args.rows * args.interrupt_at:
+        time.sleep(0.02)
+        finished = wait_import(process, block=False)
+    if finished is None:
+        process.send_signal(signal.SIGKILL if args.signal == "kill" else signal.SIGINT)
+        finished = wait_import(process)
+    code = finished[0]
+    stopped_at = read_checkpoint_line(checkpoint_path)
+
+    code_resumed, _, output = wait_import(start_import(args, input_path, output_path))
+    lines = read_lines(output_path)
+    writes = server.counts["trello"] - writes_before
+    expected_writes = sum(1 for line in open(input_path, encoding="utf-8") if "@" in line)
+    print(f"interrupted ({args.signal}) exit={code} checkpoint_line={stopped_at}; resumed exit={code_resumed}")
+    print(f"  results={len(lines)} unique={len(set(lines))} in_order={lines == sorted(lines)} "
+          f"complete={lines == list(range(1, args.rows + 1))}")
+    print(f"  writes={writes} re-executed={writes - expected_writes}")
+    print("  " + output.strip().replace("\n", "\n  "))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依頼ファイルの一括取り込みのベンチマーク")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="代替サーバーの応答遅延")
+    parser.add_argument("--invalid-ratio", type=float, default=0.01)
+    parser.add_argument("--interrupt-at", type=float, default=0.5, help="この割合まで進んだところで止める")
+    parser.add_argument("--signal", choices=["kill", "int"], default="kill")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubAPIServer(latency_ms=args.latency_ms)
+    server.start()
+    with tempfile.TemporaryDirectory() as directory:
+        server.configure_environment(directory)
+        os.environ.update({
+            "TARGETS_FILE": os.path.join(directory, "targets.json"),
+            "RATE_LIMIT_ENABLED": "0",
+            "AUDIT_ENABLED": "0",
+            "METRICS_ENABLED": "0",
+        })
+        run_full(args, server, directory, args.rows // 10)
+        run_full(args, server, directory, args.rows)
+        run_interrupted(args, server, directory)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
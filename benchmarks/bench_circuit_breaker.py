@@ -0,0 +1,138 @@
+"""
+サーキットブレーカーのベンチマーク
+
+Trello の代替サーバーに障害（全件 503、または応答しない）を注入した状態でジョブキューに依頼を登録し、
+サーキットブレーカーなしの場合とありの場合で次を比較する。
+
+- 障害中に上流へ送った呼び出しの件数
+- 全ジョブの最初の試行が終わる（失敗または保留になる）までの時間
+- 障害の復旧後、全ジョブが成功するまでの時間と、試行回数の上限で失敗したまま残ったジョブの件数
+
+実行方法:
+    python -m benchmarks.bench_circuit_breaker
+    python -m benchmarks.bench_circuit_breaker --fault hang --jobs 100 --outage 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.stub_servers import StubAPIServer
+
+
+def count_statuses(queue) -> dict:
+    """状態ごとのジョブ件数"""
+    return dict(queue._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def count_untried(queue) -> int:
+    """最初の試行が終わっていないジョブの件数"""
+    from src.job_queue import STATUS_QUEUED, STATUS_RUNNING
+
+    return queue._connect().execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = ? OR (status = ? AND attempts = 0)",
+        (STATUS_RUNNING, STATUS_QUEUED)
+    ).fetchone()[0]
+
+
+def wait_until(predicate, timeout: float) -> float:
+    """predicate が真になるまで待ち、待った秒数を返す（タイムアウトした場合も返す）"""
+    start = time.perf_counter()
+    while not predicate() and time.perf_counter() - start < timeout:
+        time.sleep(0.05)
+    return time.perf_counter() - start
+
+
+def run(label: str, args, breaker_enabled: bool) -> dict:
+    """障害の注入から復旧後に全ジョブが終わるまでを計測"""
+    from src.api_clients import reset_clients
+    from src.circuit_breaker import reset_circuit_breakers
+    from src.job_queue import STATUS_FAILED, STATUS_SUCCEEDED, JobQueue, JobWorker
+    from src.models import AccountRequest
+
+    os.environ["CIRCUIT_BREAKER_ENABLED"] = "1" if breaker_enabled else "0"
+    reset_circuit_breakers()
+    reset_clients()
+
+    server = StubAPIServer()
+    os.environ["TRELLO_API_BASE_URL"] = server.start()
+    if args.fault == "hang":
+        server.latency = args.hang_seconds
+    else:
+        server.error_rate = 1.0
+
+    with tempfile.TemporaryDirectory() as directory:
+        queue = JobQueue(os.path.join(directory, "jobs.db"), max_attempts=args.max_attempts)
+        start = time.perf_counter()
+        for i in range(args.jobs):
+            queue.enqueue(AccountRequest(
+                email=f"{label.replace(' ', '-')}-{i}@example.com", tool="trello", background="benchmark"
+            ))
+        workers = [JobWorker(queue, batch_size=args.batch_size, poll_interval=0.05) for _ in range(args.workers)]
+        for worker in workers:
+            worker.start()
+
+        # 全ジョブの最初の試行が終わる（再試行待ち・失敗・保留になる）まで
+        first_pass = wait_until(lambda: count_untried(queue) == 0, args.outage)
+        time.sleep(max(0.0, args.outage - (time.perf_counter() - start)))
+        outage_calls = server.counts["requests"]
+
+        # 障害の復旧
+        server.latency = 0.0
+        server.error_rate = 0.0
+        recovery = wait_until(
+            lambda: count_statuses(queue).get(STATUS_SUCCEEDED, 0) + count_statuses(queue).get(STATUS_FAILED, 0)
+            >= args.jobs,
+            args.timeout
+        )
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join()
+        statuses = count_statuses(queue)
+    server.shutdown()
+
+    print(f"{label:<12} outage_calls={outage_calls:5d} first_pass={first_pass:6.2f}s "
+          f"recovered_in={recovery:6.2f}s succeeded={statuses.get(STATUS_SUCCEEDED, 0):4d} "
+          f"failed={statuses.get(STATUS_FAILED, 0):4d} "
+          f"unfinished={args.jobs - statuses.get(STATUS_SUCCEEDED, 0) - statuses.get(STATUS_FAILED, 0):4d}")
+    return {"outage_calls": outage_calls, "statuses": statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="サーキットブレーカーのベンチマーク")
+    parser.add_argument("--fault", choices=["error", "hang"], default="error",
+                        help="注入する障害（error: 全件 503、hang: 応答しない）")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--outage", type=float, default=8.0, help="障害を続ける秒数")
+    parser.add_argument("--hang-seconds", type=float, default=5.0, help="hang の場合に応答を止める秒数")
+    parser.add_argument("--read-timeout", type=float, default=0.5)
+    parser.add_argument("--recovery-seconds", type=float, default=1.0)
+    parser.add_argument("--failure-threshold", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="復旧後に全ジョブの完了を待つ最大秒数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.update({
+            "TRELLO_API_KEY": "bench",
+            "TRELLO_API_TOKEN": "bench",
+            "TRELLO_BOARD_ID": "bench-board",
+            "TARGETS_FILE": os.path.join(directory, "targets.json"),
+            # 障害をクライアントのリトライで隠さず、1回の呼び出しを1件として数える
+            "HTTP_MAX_RETRIES": "0",
+            "HTTP_READ_TIMEOUT": str(args.read_timeout),
+            "RATE_LIMIT_ENABLED": "0",
+            "AUDIT_ENABLED": "0",
+            "CIRCUIT_FAILURE_THRESHOLD": str(args.failure_threshold),
+            "CIRCUIT_RECOVERY_SECONDS": str(args.recovery_seconds),
+        })
+        run("no breaker", args, breaker_enabled=False)
+        run("breaker", args, breaker_enabled=True)
+
+
+if __name__ == "__main__":
+    main()
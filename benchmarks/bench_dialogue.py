@@ -0,0 +1,101 @@
+"""
+対話の状態機械のベンチマーク
+
+台本による対話（1メッセージでの依頼・メールアドレスとツールだけの依頼・1項目ずつの依頼・
+メールアドレスやツールの訂正）で、最初の発話の後は尋ねられたスロットに答えるユーザーをシミュレートし、
+依頼が揃うまでの平均ターン数を計測する。
+比較として、1ターンに1項目ずつ尋ねる場合（台本に記載）のターン数も表示する。
+
+実行方法:
+    python -m benchmarks.bench_dialogue
+    python -m benchmarks.bench_dialogue --dialogues 2000 --languages ja
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.conversations import Dialogue, generate_dialogues
+
+# 依頼が揃わない対話を打ち切るターン数
+MAX_TURNS = 12
+
+
+def run_dialogue(dialogue: Dialogue) -> Dict[str, object]:
+    """
+    1件の対話を依頼が揃うまで進める
+
+    Returns:
+        ターン数・揃ったか・依頼内容が台本どおりか
+    """
+    from src.dialogue import next_slot
+    from src.langchain_setup import ChatbotManager
+
+    manager = ChatbotManager()
+    pending = list(dialogue.opening)
+    turns = 0
+    status = None
+    while turns < MAX_TURNS:
+        message = pending.pop(0) if pending else dialogue.answer(next_slot(manager.state))
+        status = manager.process_user_input(message)['status']
+        turns += 1
+        if status == 'complete' and not pending:
+            break
+
+    state = manager.state
+    accurate = (
+        state.email == dialogue.email
+        and state.tool == dialogue.tool
+        and state.permission == dialogue.permission
+    )
+    return {"turns": turns, "complete": status == 'complete', "accurate": accurate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="対話の状態機械のベンチマーク")
+    parser.add_argument("--dialogues", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--languages", nargs="+", default=["ja", "en"])
+    args = parser.parse_args()
+
+    # LLM を使わず、ルールによる抽出だけで計測する
+    os.environ["GEMINI_API_KEY"] = ""
+    os.environ["PREFETCH_ENABLED"] = "0"
+
+    dialogues = generate_dialogues(args.dialogues, args.seed, args.languages)
+    by_scenario: Dict[str, List[Dict[str, object]]] = defaultdict(list)
+    baseline: Dict[str, List[int]] = defaultdict(list)
+    start = time.perf_counter()
+    for dialogue in dialogues:
+        name = f"{dialogue.language}.{dialogue.scenario}"
+        by_scenario[name].append(run_dialogue(dialogue))
+        baseline[name].append(dialogue.slot_by_slot_turns)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'scenario':<22}{'count':>7}{'turns':>8}{'slot-by-slot':>14}{'complete':>10}{'accurate':>10}")
+    for name in sorted(by_scenario):
+        outcomes = by_scenario[name]
+        print(f"{name:<22}{len(outcomes):>7}"
+              f"{sum(o['turns'] for o in outcomes) / len(outcomes):>8.2f}"
+              f"{sum(baseline[name]) / len(baseline[name]):>14.2f}"
+              f"{sum(o['complete'] for o in outcomes) / len(outcomes):>10.1%}"
+              f"{sum(o['accurate'] for o in outcomes) / len(outcomes):>10.1%}")
+
+    outcomes = [outcome for values in by_scenario.values() for outcome in values]
+    mean_turns = sum(o['turns'] for o in outcomes) / len(outcomes)
+    mean_baseline = sum(sum(values) for values in baseline.values()) / len(outcomes)
+    completion = sum(o['complete'] for o in outcomes) / len(outcomes)
+    accuracy = sum(o['accurate'] for o in outcomes) / len(outcomes)
+    print(f"\nmean turns to completion: {mean_turns:.2f} (slot-by-slot: {mean_baseline:.2f}) "
+          f"completion={completion:.1%} accuracy={accuracy:.1%} "
+          f"turns/sec={sum(o['turns'] for o in outcomes) / elapsed:.0f}")
+
+    if completion < 1.0 or accuracy < 1.0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
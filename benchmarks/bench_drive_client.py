@@ -0,0 +1,62 @@
+"""
+Google Drive クライアント取得のベンチマーク
+
+付与ごとにクライアントを生成する従来の方式と、共有クライアントを使う方式で
+permissions().create リクエストを組み立てるまでのレイテンシを比較する。
+ネットワークには接続しない（使い捨ての鍵でサービスアカウントJSONを生成）。
+
+実行方法:
+    python -m benchmarks.bench_drive_client
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stub_servers import write_service_account
+from src.api_clients import GoogleDriveAPIClient, get_drive_client, reset_clients
+
+ITERATIONS = 50
+
+
+def build_request(client: GoogleDriveAPIClient):
+    """付与リクエストを組み立てる（実行はしない）"""
+    return client.service.permissions().create(
+        fileId=client.file_id,
+        body={"type": "user", "role": "reader", "emailAddress": "user@example.com"},
+        sendNotificationEmail=True,
+        fields="id"
+    )
+
+
+def measure(acquire) -> list:
+    """クライアント取得〜リクエスト組み立てまでの時間（ms）を計測"""
+    samples = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        build_request(acquire())
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label: str, samples: list):
+    """結果を表示"""
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<24} mean={statistics.mean(samples):8.3f}ms "
+          f"p50={statistics.median(samples):8.3f}ms p99={p99:8.3f}ms")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["GOOGLE_SERVICE_ACCOUNT_JSON"] = write_service_account(tmp, "https://oauth2.googleapis.com/token")
+        os.environ.setdefault("GOOGLE_DRIVE_FILE_ID", "bench-file-id")
+        reset_clients()
+
+        report("per-grant client", measure(GoogleDriveAPIClient))
+        report("shared client", measure(get_drive_client))
+
+
+if __name__ == "__main__":
+    main()
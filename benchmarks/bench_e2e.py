@@ -0,0 +1,263 @@
+"""
+エンドツーエンドのベンチマーク
+
+合成会話（日本語・英語、正常系・訂正・不正なメールアドレス）で ChatbotManager.process_user_input を実行し、
+揃った依頼を execute_account_request で Trello / Google Drive の代替サーバーに対して発行する。
+ターン数/秒、発行数/秒、レイテンシのパーセンタイル、1セッションあたりのメモリを計測し、
+結果を比較可能な JSON として保存する。
+
+実行方法:
+    python -m benchmarks.bench_e2e --output results/e2e.json
+    python -m benchmarks.bench_e2e --latency-ms 50 --error-rate 0.05 --compare results/e2e.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from benchmarks.conversations import Conversation, generate_conversations
+from benchmarks.stub_servers import StubAPIServer
+
+SCHEMA_VERSION = 1
+
+# 値が大きいほど良い指標（それ以外は小さいほど良い）
+HIGHER_IS_BETTER = {
+    "conversation.turns_per_sec",
+    "conversation.completion_rate",
+    "conversation.accuracy",
+    "provisioning.grants_per_sec",
+    "provisioning.success_rate",
+}
+
+
+def percentiles(samples: List[float], prefix: str) -> Dict[str, float]:
+    """p50/p95/p99 と平均（ミリ秒）を指標名つきで返す"""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))]
+    return {
+        f"{prefix}.p50": round(pick(0.5), 4),
+        f"{prefix}.p95": round(pick(0.95), 4),
+        f"{prefix}.p99": round(pick(0.99), 4),
+        f"{prefix}.mean": round(sum(samples) / len(samples), 4),
+    }
+
+
+def run_conversation(conversation: Conversation, samples: List[float]):
+    """
+    1件の会話を最後まで進める
+
+    Returns:
+        (ChatbotManager, 最後の処理結果の状態)
+    """
+    from src.langchain_setup import ChatbotManager
+
+    manager = ChatbotManager()
+    status = None
+    for turn in conversation.turns:
+        start = time.perf_counter()
+        status = manager.process_user_input(turn)['status']
+        samples.append((time.perf_counter() - start) * 1000)
+    return manager, status
+
+
+def is_accurate(manager, conversation: Conversation) -> bool:
+    """会話の結果が期待される依頼内容と一致するかチェック"""
+    state = manager.state
+    return (
+        state.email == conversation.email
+        and state.tool == conversation.tool
+        and (conversation.tool != "google_drive" or state.permission == conversation.permission)
+    )
+
+
+def bench_conversations(conversations: List[Conversation]) -> Tuple[Dict[str, float], list, Counter]:
+    """
+    全ての会話を実行
+
+    Returns:
+        (指標, 揃った依頼, シナリオごとの完了数)
+    """
+    samples: List[float] = []
+    completed = []
+    accurate = 0
+    by_scenario = Counter()
+
+    # 初回のインポート・パターン構築を計測から除く
+    run_conversation(conversations[0], [])
+
+    start = time.perf_counter()
+    for conversation in conversations:
+        manager, status = run_conversation(conversation, samples)
+        if status == 'complete':
+            completed.extend(manager.state.to_account_requests())
+            by_scenario[f"{conversation.language}.{conversation.scenario}"] += 1
+            accurate += is_accurate(manager, conversation)
+    elapsed = time.perf_counter() - start
+
+    metrics = {
+        "conversation.count": len(conversations),
+        "conversation.turns": len(samples),
+        "conversation.turns_per_sec": round(len(samples) / elapsed, 2),
+        "conversation.completion_rate": round(sum(by_scenario.values()) / len(conversations), 4),
+        "conversation.accuracy": round(accurate / len(conversations), 4),
+        **percentiles(samples, "conversation.turn_latency_ms"),
+    }
+    return metrics, completed, by_scenario
+
+
+def bench_memory(conversations: List[Conversation]) -> Dict[str, float]:
+    """会話を終えたセッション（会話状態 + 履歴）を保持したときの1セッションあたりのメモリ"""
+    from src.models import ChatMessage, ChatSession
+    from src.session_codec import encode_session
+
+    samples: List[float] = []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for conversation in conversations:
+        manager, _ = run_conversation(conversation, samples)
+        messages = []
+        for turn in conversation.turns:
+            messages.append(ChatMessage(role="user", content=turn))
+            messages.append(ChatMessage(role="assistant", content=turn))
+        sessions.append(ChatSession(state=manager.state, messages=messages))
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    serialized = sum(len(encode_session(session)) for session in sessions)
+    return {
+        "memory.bytes_per_session": round(used / len(sessions)),
+        "memory.serialized_bytes_per_session": round(serialized / len(sessions)),
+    }
+
+
+def bench_provisioning(account_requests: list, workers: int) -> Dict[str, float]:
+    """揃った依頼を代替サーバーに対して発行"""
+    from src.api_clients import execute_account_request
+
+    def provision(request):
+        start = time.perf_counter()
+        result = execute_account_request(request.email, request.tool, request.background, request.permission)
+        return (time.perf_counter() - start) * 1000, result["success"]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(provision, account_requests))
+    elapsed = time.perf_counter() - start
+
+    succeeded = sum(1 for _, success in outcomes if success)
+    return {
+        "provisioning.requests": len(outcomes),
+        "provisioning.grants_per_sec": round(succeeded / elapsed, 2) if elapsed else 0.0,
+        "provisioning.success_rate": round(succeeded / len(outcomes), 4) if outcomes else 0.0,
+        **percentiles([latency for latency, _ in outcomes], "provisioning.latency_ms"),
+    }
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """
+    基準の結果と比較して表示
+
+    Returns:
+        threshold（割合）を超えて悪化した指標
+    """
+    regressions = []
+    print(f"\n{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(current):
+        if name not in baseline or not isinstance(current[name], (int, float)):
+            continue
+        before, after = baseline[name], current[name]
+        change = (after - before) / before if before else 0.0
+        worse = -change if name in HIGHER_IS_BETTER else change
+        marker = ""
+        if worse > threshold and not name.endswith((".count", ".turns", ".requests")):
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(f"{name:<44}{before:>12}{after:>12}{change:>+9.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="エンドツーエンドのベンチマーク")
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--memory-sample", type=int, default=200, help="メモリを計測する会話の件数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--languages", nargs="+", default=["ja", "en"])
+    parser.add_argument("--workers", type=int, default=8, help="発行を並行実行するスレッド数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="代替サーバーの応答遅延")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="代替サーバーがエラーを返す割合")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--output", help="結果を保存する JSON ファイル")
+    parser.add_argument("--compare", help="比較する基準の JSON ファイル")
+    parser.add_argument("--threshold", type=float, default=0.10, help="悪化とみなす変化の割合")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = StubAPIServer(
+            latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate, error_status=args.error_status
+        )
+        server.start()
+        server.configure_environment(workdir)
+        # LLM は使わず、ルールによる抽出のみを計測する
+        os.environ["GEMINI_API_KEY"] = ""
+        # 代替サーバーには上限がないため、発行のスループットをレート制限で抑えない
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+        conversations = generate_conversations(args.conversations, args.seed, args.languages)
+        metrics, account_requests, by_scenario = bench_conversations(conversations)
+        metrics.update(bench_memory(conversations[:args.memory_sample]))
+        metrics.update(bench_provisioning(account_requests, args.workers))
+        server.shutdown()
+
+    result = {
+        "schema_version": SCHEMA_VERSION,
+        "benchmark": "e2e",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": config,
+        "metrics": metrics,
+        "completed_by_scenario": dict(sorted(by_scenario.items())),
+        "stub_requests": server.counts,
+    }
+
+    for name, value in metrics.items():
+        print(f"{name:<44}{value:>12}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nsaved: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("schema_version") != SCHEMA_VERSION:
+            sys.exit(f"比較できない結果です: schema_version={baseline.get('schema_version')}")
+        regressions = compare(metrics, baseline["metrics"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+スロット抽出のマイクロベンチマーク
+
+従来の連鎖した部分文字列チェック + 正規表現による抽出と、
+Aho-Corasick オートマトンによる1パス抽出を、日本語・英語のメッセージで比較する。
+
+実行方法:
+    python -m benchmarks.bench_extractor
+"""
+
+import re
+import timeit
+
+from src.extractor import DEFAULT_KEYWORDS, SlotExtractor, default_extractor
+
+CORPUS = [
+    "yamada.taro@example.co.jp",
+    "Trelloをお願いします",
+    "グーグルドライブの閲覧権限でお願いします",
+    "ＧＯＯＧＬＥ ＤＲＩＶＥ で編集できるようにしてください",
+    "コメント権限で大丈夫です",
+    "新しく参加したメンバーなので、プロジェクトのタスク管理に使います",
+    "Please add suzuki@example.com to Trello",
+    "I need writer access on Google Drive for the quarterly report",
+    "reader only, thanks",
+    "sato@example.com と tanaka@example.com にTrelloとドライブを",
+    "案件Aのレビューのため、ドキュメントを閲覧できるようにしたいです",
+    "ｺﾒﾝﾄできるようにしてほしい",
+]
+
+LEGACY_EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+
+
+def legacy_extract(user_input: str) -> dict:
+    """従来の抽出処理（全スロットが未入力の状態を想定）"""
+    extracted = {}
+    emails = re.findall(LEGACY_EMAIL_PATTERN, user_input)
+    if emails:
+        extracted['email'] = emails[0]
+
+    user_lower = user_input.lower()
+    if 'trello' in user_lower or 'トレロ' in user_input:
+        extracted['tool'] = 'trello'
+    elif 'google drive' in user_lower or 'googledrive' in user_lower or \
+         'グーグルドライブ' in user_input or 'ドライブ' in user_input:
+        extracted['tool'] = 'google_drive'
+
+    user_lower = user_input.lower()
+    if 'reader' in user_lower or '閲覧' in user_input or 'リーダー' in user_input:
+        extracted['permission'] = 'reader'
+    elif 'commenter' in user_lower or 'コメント' in user_input or 'コメンター' in user_input:
+        extracted['permission'] = 'commenter'
+    elif 'writer' in user_lower or '編集' in user_input or 'ライター' in user_input:
+        extracted['permission'] = 'writer'
+    return extracted
+
+
+def compiled_extract(user_input: str) -> dict:
+    """オートマトンによる抽出処理"""
+    result = default_extractor.extract(user_input)
+    return {
+        'email': result.values('email'),
+        'tool': result.values('tool'),
+        'permission': result.best('permission'),
+    }
+
+
+def scaled_keywords(extra: int) -> dict:
+    """ツールの別名を extra 件追加したキーワード表（対象ボードやフォルダが増えた場合を想定）"""
+    keywords = {slot: {value: list(words) for value, words in values.items()} for slot, values in DEFAULT_KEYWORDS.items()}
+    for i in range(extra):
+        keywords["tool"][f"target_{i}"] = [(f"board-{i:03d}", 1.0), (f"共有フォルダ{i:03d}", 1.0)]
+    return keywords
+
+
+def chained_extract(lowered: str, flat: list) -> list:
+    """全キーワードを順に部分文字列チェックする抽出処理"""
+    return [(slot, value) for keyword, slot, value in flat if keyword in lowered]
+
+
+def measure(extract, number: int = 2000) -> float:
+    """1メッセージあたりの処理時間（マイクロ秒）"""
+    seconds = min(timeit.repeat(lambda: [extract(text) for text in CORPUS], number=number, repeat=5))
+    return seconds / (number * len(CORPUS)) * 1e6
+
+
+def main():
+    for label, extract in [("legacy", legacy_extract), ("compiled", compiled_extract)]:
+        print(f"{label:<10} {measure(extract):7.2f}us/message")
+
+    # キーワード数を増やした場合: 部分文字列チェックの連鎖はキーワード数に比例して遅くなる
+    print()
+    for extra in (50, 200):
+        keywords = scaled_keywords(extra)
+        flat = [
+            (keyword.lower(), slot, value)
+            for slot, values in keywords.items()
+            for value, words in values.items()
+            for keyword, _ in words
+        ]
+        extractor = SlotExtractor(keywords)
+        chained = measure(lambda text: chained_extract(text.lower(), flat), 200)
+        compiled = measure(extractor.extract, 200)
+        print(f"{len(flat):4d} keywords  chained={chained:7.2f}us/message  compiled={compiled:7.2f}us/message")
+
+    print()
+    for text in CORPUS:
+        print(f"{text[:36]:<38} legacy={legacy_extract(text)}  compiled={compiled_extract(text)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+発行の先読みのベンチマーク
+
+代替サーバーに対して「メールアドレス → ツール（→ 権限）→ 考える時間 → 背景」の会話を進め、
+背景を答えてから発行が終わるまで（最後のターンの処理 + execute_account_request）の時間を、
+先読みなしの場合とありの場合で比較する。
+
+- cold: 会話ごとに共有クライアントを破棄する（付与先の初回利用・トークン期限切れ後に相当）
+
+実行方法:
+    python -m benchmarks.bench_prefetch
+    python -m benchmarks.bench_prefetch --tool google_drive --latency-ms 50
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.stub_servers import StubAPIServer
+
+TOOL_TURNS = {
+    "trello": ["Trello"],
+    "google_drive": ["Google Drive", "reader"],
+}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def run(label: str, args, server: StubAPIServer, prefetch: bool, cold: bool) -> Dict[str, float]:
+    """会話を順に進め、背景を答えてから発行が終わるまでを計測"""
+    from src.api_clients import execute_account_request, reset_clients
+    from src.langchain_setup import ChatbotManager
+    from src.prefetch import reset_prefetcher
+
+    os.environ["PREFETCH_ENABLED"] = "1" if prefetch else "0"
+    reset_prefetcher()
+    reset_clients()
+
+    latencies: List[float] = []
+    writes_before = server.counts["trello"] + server.counts["drive"]
+    for i in range(args.conversations):
+        email = f"{label.replace(' ', '-')}-{i}@example.com"
+        if cold:
+            reset_clients()
+
+        manager = ChatbotManager()
+        for turn in [email, *TOOL_TURNS[args.tool]]:
+            manager.process_user_input(turn)
+        # 背景を考えて入力する時間
+        time.sleep(args.think_ms / 1000)
+
+        start = time.perf_counter()
+        result = manager.process_user_input("新しいプロジェクトに参加するため")
+        if result['status'] == 'complete':
+            request = manager.state.to_account_requests()[0]
+            execute_account_request(request.email, request.tool, request.background, request.permission)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    writes = server.counts["trello"] + server.counts["drive"] - writes_before
+    metrics = {
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "mean_ms": sum(latencies) / len(latencies),
+        "writes": writes,
+    }
+    print(f"{label:<22} final_step p50={metrics['p50_ms']:7.2f}ms p95={metrics['p95_ms']:7.2f}ms "
+          f"mean={metrics['mean_ms']:7.2f}ms writes={writes:4d}/{args.conversations}")
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="発行の先読みのベンチマーク")
+    parser.add_argument("--tool", choices=sorted(TOOL_TURNS), default="google_drive")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--think-ms", type=float, default=300.0, help="背景を入力するまでの時間")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="代替サーバーの応答遅延")
+    args = parser.parse_args()
+
+    server = StubAPIServer(latency_ms=args.latency_ms)
+    server.start()
+    with tempfile.TemporaryDirectory() as directory:
+        server.configure_environment(directory)
+        os.environ.update({
+            "TARGETS_FILE": os.path.join(directory, "targets.json"),
+            "RATE_LIMIT_ENABLED": "0",
+            "AUDIT_ENABLED": "0",
+        })
+        for cold in (True, False):
+            mode = "cold" if cold else "warm"
+            run(f"{mode} no prefetch", args, server, prefetch=False, cold=cold)
+            run(f"{mode} prefetch", args, server, prefetch=True, cold=cold)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
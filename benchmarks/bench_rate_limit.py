@@ -0,0 +1,111 @@
+"""
+レート制限のベンチマーク
+
+トークンごとの上限を設定した Trello の代替サーバーに対して、複数のワーカープロセス・スレッドから
+同時に招待を送り、レート制限なしの場合と、プロセス間で共有するレート制限を使う場合の
+429 の件数・失敗件数・スループットを比較する。
+レート制限を使う場合は、上限ちょうどの負荷でも 429 が 0 件になることを確認する。
+
+実行方法:
+    python -m benchmarks.bench_rate_limit
+    python -m benchmarks.bench_rate_limit --processes 8 --threads 8 --rate-limit 100 --rate-window-ms 1000
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_servers import StubAPIServer
+
+
+def worker(environment: dict, threads: int, requests_per_thread: int, results):
+    """1つのワーカープロセスで threads 本のスレッドから招待を送る"""
+    os.environ.update(environment)
+    from src.api_clients import TrelloAPIClient
+
+    client = TrelloAPIClient()
+
+    def invite(thread: int) -> int:
+        failures = 0
+        for i in range(requests_per_thread):
+            try:
+                client.add_member_to_board(f"user-{os.getpid()}-{thread}-{i}@example.com")
+            except Exception:
+                failures += 1
+        return failures
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results.put(sum(executor.map(invite, range(threads))))
+
+
+def run(label: str, args, environment: dict) -> dict:
+    """代替サーバーを起動し、全ワーカープロセスの招待が終わるまでを計測"""
+    server = StubAPIServer(rate_limit=args.rate_limit, rate_window_ms=args.rate_window_ms)
+    base_url = server.start()
+    environment = {
+        "TRELLO_API_BASE_URL": base_url,
+        "TRELLO_API_KEY": "bench",
+        "TRELLO_API_TOKEN": "bench",
+        "TRELLO_BOARD_ID": "bench-board",
+        # 429 をクライアントのリトライで隠さず、失敗として数える
+        "HTTP_MAX_RETRIES": "0",
+        **environment,
+    }
+
+    # 各プロセスで共有セッションやコネクションを作り直すため spawn で起動する
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(environment, args.threads, args.requests, results))
+        for _ in range(args.processes)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    failures = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    total = args.processes * args.threads * args.requests
+    print(f"{label:<14} requests={total:5d} granted={server.counts['trello']:5d} "
+          f"429s={server.counts['rate_limited']:5d} failures={failures:5d} "
+          f"elapsed={elapsed:6.2f}s throughput={server.counts['trello'] / elapsed:7.1f}/s")
+    return {"rate_limited": server.counts["rate_limited"], "failures": failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レート制限のベンチマーク")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20, help="スレッドあたりの招待数")
+    parser.add_argument("--rate-limit", type=int, default=100, help="代替サーバーのウィンドウあたりの上限")
+    parser.add_argument("--rate-window-ms", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    # 任意のウィンドウ内の回数（最大量 + 補充量 × ウィンドウ）が上限の 9 割に収まるバケット
+    window = args.rate_window_ms / 1000
+    burst = max(1.0, args.rate_limit * 0.1)
+    rate = (args.rate_limit * 0.9 - burst) / window
+
+    run("no limiter", args, {"RATE_LIMIT_ENABLED": "0"})
+    with tempfile.TemporaryDirectory() as directory:
+        shared = run("shared limiter", args, {
+            "RATE_LIMIT_ENABLED": "1",
+            "RATE_LIMIT_DB": os.path.join(directory, "ratelimit.db"),
+            "RATE_LIMIT_TRELLO": f"{rate}/{burst}",
+        })
+
+    if shared["rate_limited"] or shared["failures"]:
+        print("NG: レート制限を使っても 429 または失敗が発生しました。")
+        sys.exit(1)
+    print("OK: 上限の負荷で 429 は 0 件でした。")
+
+
+if __name__ == "__main__":
+    main()
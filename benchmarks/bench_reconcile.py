@@ -0,0 +1,140 @@
+"""
+あるべきアクセス権への突き合わせのベンチマーク
+
+代替サーバーの付与先に --principals 人のアクセス権を用意し、そのうち --churn の割合を削除・追加
+（Google Drive は同じ割合の権限を変更）したあるべきアクセス権のファイルを作って、次を比較する。
+
+- per-principal: ファイルの全員に execute_account_request を1件ずつ呼ぶ（削除・引き下げはできない）
+- reconcile: 現在のアクセス権を一括で取得し、差分だけを書き込む（src.reconcile）
+
+上流への HTTP リクエスト数と所要時間を表示し、書き込み後にもう一度 dry-run して差分が 0 件になることを確認する。
+
+実行方法:
+    python -m benchmarks.bench_reconcile
+    python -m benchmarks.bench_reconcile --tool google_drive --principals 5000 --churn 0.02 --latency-ms 30
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_servers import StubAPIServer
+
+ROLES = ["reader", "commenter", "writer"]
+
+
+def make_state(args, rng: random.Random):
+    """(現在のアクセス権, あるべきアクセス権) をメールアドレス → 権限で作成"""
+    current = {
+        f"user{i}@example.com": "member" if args.tool == "trello" else rng.choice(ROLES)
+        for i in range(args.principals)
+    }
+    churn = int(args.principals * args.churn)
+    emails = list(current)
+    rng.shuffle(emails)
+    desired = dict(current)
+    for email in emails[:churn]:
+        del desired[email]
+    for i in range(churn):
+        desired[f"new{i}@example.com"] = "member" if args.tool == "trello" else rng.choice(ROLES)
+    if args.tool == "google_drive":
+        for email in emails[churn:churn * 2]:
+            desired[email] = ROLES[(ROLES.index(desired[email]) + 1) % len(ROLES)]
+    return current, desired
+
+
+def write_desired(path: str, tool: str, desired: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        for email, role in desired.items():
+            row = {"email": email, "tool": tool}
+            if tool == "google_drive":
+                row["permission"] = role
+            f.write(json.dumps(row) + "\n")
+
+
+def run_per_principal(args, server: StubAPIServer, desired: dict) -> float:
+    """ファイルの全員に1件ずつ発行"""
+    from src.api_clients import execute_account_request, reset_clients
+    from src.grant_cache import get_grant_cache
+
+    reset_clients()
+    get_grant_cache()._entries.clear()
+    requests_before = server.counts["requests"]
+    start = time.perf_counter()
+
+    def grant(item):
+        email, role = item
+        return execute_account_request(email, args.tool, "benchmark", role if args.tool == "google_drive" else None)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(grant, desired.items()))
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if not result["success"])
+    print(f"{'per-principal':<16} requests={server.counts['requests'] - requests_before:6d} "
+          f"elapsed={elapsed:7.2f}s failed={failed} (削除・引き下げは反映されない)")
+    return elapsed
+
+
+def run_reconcile(label: str, args, server: StubAPIServer, path: str, apply: bool):
+    """ファイルと突き合わせ、差分を書き込む（apply=False の場合は dry-run）"""
+    from src.api_clients import reset_clients
+    from src.reconcile import ACTION_ADD, ACTION_REMOVE, ACTION_UPDATE, load_desired_state, reconcile
+
+    reset_clients()
+    requests_before = server.counts["requests"]
+    start = time.perf_counter()
+    plans, errors = load_desired_state(path)
+    assert not errors, errors
+    results = reconcile(plans, apply=apply, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    for plan in results:
+        if plan.error:
+            print(f"{label:<16} error: {plan.error}")
+            continue
+        failed = sum(1 for result in plan.results if not result["success"])
+        print(f"{label:<16} requests={server.counts['requests'] - requests_before:6d} elapsed={elapsed:7.2f}s "
+              f"fetch={plan.fetch_seconds:5.2f}s +{plan.count(ACTION_ADD)} ~{plan.count(ACTION_UPDATE)} "
+              f"-{plan.count(ACTION_REMOVE)} ={plan.unchanged} failed={failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="あるべきアクセス権への突き合わせのベンチマーク")
+    parser.add_argument("--tool", choices=["trello", "google_drive"], default="trello")
+    parser.add_argument("--principals", type=int, default=5000)
+    parser.add_argument("--churn", type=float, default=0.02, help="削除・追加（・権限の変更）する割合")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="代替サーバーの応答遅延")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    current, desired = make_state(args, rng)
+    server = StubAPIServer(latency_ms=args.latency_ms)
+    server.track_grants = True
+    server.start()
+    with tempfile.TemporaryDirectory() as directory:
+        server.configure_environment(directory)
+        os.environ.update({
+            "TARGETS_FILE": os.path.join(directory, "targets.json"),
+            "RATE_LIMIT_ENABLED": "0",
+            "AUDIT_ENABLED": "0",
+        })
+        path = os.path.join(directory, "desired.jsonl")
+        write_desired(path, args.tool, desired)
+
+        server.existing = dict(current)
+        run_per_principal(args, server, desired)
+
+        server.existing = dict(current)
+        run_reconcile("reconcile", args, server, path, apply=True)
+        run_reconcile("dry-run after", args, server, path, apply=False)
+        print(f"converged={server.existing == desired}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+セッションストアのベンチマーク
+
+典型的な会話（4往復 + ジョブ登録）と一括依頼（CSV 50行）のセッションについて、
+pydantic の JSON とバイナリ形式の1セッションあたりのバイト数・変換時間を比較し、
+各バックエンド（メモリ・SQLite・Redis の代替サーバー）の読み書きレイテンシを計測する。
+
+実行方法:
+    python -m benchmarks.bench_session_store
+"""
+
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.stub_redis import StubRedisServer
+from src.models import BatchRow, ChatMessage, ChatSession, ConversationState
+from src.session_codec import decode_session, encode_session
+from src.session_store import MemorySessionStore, RedisSessionStore, SQLiteSessionStore
+
+ITERATIONS = 2000
+
+
+def percentile(samples: list, q: float) -> float:
+    """パーセンタイルを計算"""
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def conversation_session() -> ChatSession:
+    """4往復の会話を終えてジョブを登録したセッション"""
+    turns = [
+        ("yamada@example.com のアカウントをお願いします", "メールアドレス: yamada@example.com を確認しました。\n\nどのツールが必要ですか？"),
+        ("Google Drive", "ツール: Google Drive を確認しました。\n\nどの権限が必要ですか？"),
+        ("閲覧のみで大丈夫です", "権限: 閲覧者 を確認しました。\n\nこのツールが必要な理由や背景を教えてください。"),
+        ("来月からのプロジェクトで資料を参照するため", "情報が全て揃いました。アカウント発行を実行します..."),
+    ]
+    messages = []
+    for user, assistant in turns:
+        messages.append(ChatMessage(role="user", content=user))
+        messages.append(ChatMessage(role="assistant", content=assistant))
+    return ChatSession(
+        state=ConversationState(email="yamada@example.com", tool="google_drive", permission="reader"),
+        messages=messages,
+        pending_jobs=[[uuid.uuid4().hex]]
+    )
+
+
+def batch_session() -> ChatSession:
+    """CSV から50行を読み込んだ一括依頼のセッション"""
+    rows = [
+        BatchRow(email=f"user{i}@example.com", tool="google_drive" if i % 2 else "trello", permission="writer" if i % 3 == 0 else None)
+        for i in range(50)
+    ]
+    return ChatSession(
+        state=ConversationState(email=rows[0].email, tool=rows[0].tool, permission="reader", batch_rows=rows),
+        messages=[ChatMessage(role="assistant", content="CSVから50件の依頼を読み込みました。")]
+    )
+
+
+def time_us(func, iterations: int = ITERATIONS) -> float:
+    """1回あたりの平均実行時間（マイクロ秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def bench_codec(label: str, session: ChatSession):
+    """JSON とバイナリのサイズ・変換時間を比較"""
+    json_data = session.model_dump_json()
+    binary = encode_session(session)
+    assert decode_session(binary) == session
+
+    print(f"{label}:")
+    print(f"  json   bytes={len(json_data.encode('utf-8')):6d} "
+          f"encode={time_us(session.model_dump_json):7.2f}us "
+          f"decode={time_us(lambda: ChatSession.model_validate_json(json_data)):7.2f}us")
+    print(f"  binary bytes={len(binary):6d} "
+          f"encode={time_us(lambda: encode_session(session)):7.2f}us "
+          f"decode={time_us(lambda: decode_session(binary)):7.2f}us")
+
+
+def bench_store(label: str, store, session: ChatSession):
+    """保存・読み込みのレイテンシを計測"""
+    writes = []
+    reads = []
+    for i in range(ITERATIONS):
+        session_id = f"bench-{i % 100}"
+        start = time.perf_counter()
+        store.save(session_id, session)
+        writes.append((time.perf_counter() - start) * 1_000_000)
+        start = time.perf_counter()
+        store.load(session_id)
+        reads.append((time.perf_counter() - start) * 1_000_000)
+    print(f"  {label:<7} write p50={percentile(writes, 0.5):8.1f}us p99={percentile(writes, 0.99):8.1f}us  "
+          f"read p50={percentile(reads, 0.5):8.1f}us p99={percentile(reads, 0.99):8.1f}us")
+
+
+def main():
+    conversation = conversation_session()
+    bench_codec("conversation (4 turns)", conversation)
+    bench_codec("batch (50 rows)", batch_session())
+
+    redis_url = StubRedisServer().start()
+    with tempfile.TemporaryDirectory() as workdir:
+        print("store latency (conversation):")
+        bench_store("memory", MemorySessionStore(), conversation)
+        bench_store("sqlite", SQLiteSessionStore(os.path.join(workdir, "sessions.db")), conversation)
+        bench_store("redis", RedisSessionStore(redis_url), conversation)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Trello クライアントの HTTP セッションベンチマーク
+
+ローカルの代替 HTTP サーバーに対して、リクエストごとに requests.put を呼ぶ
+従来の方式と、共有セッションを使う方式の接続再利用率とレイテンシを比較する。
+
+実行方法:
+    python -m benchmarks.bench_trello_session
+"""
+
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ITERATIONS = 500
+
+
+class StubTrelloHandler(BaseHTTPRequestHandler):
+    """ボードメンバー追加 API の代替ハンドラ"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_PUT(self):
+        body = b'{"id": "board", "members": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(samples: list, q: float) -> float:
+    """パーセンタイルを計算"""
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def run(label: str, put):
+    """ITERATIONS 回の招待を実行して結果を表示"""
+    StubTrelloHandler.connections = 0
+    samples = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        put()
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<16} connections={StubTrelloHandler.connections:4d} "
+          f"p50={percentile(samples, 0.5):7.3f}ms p99={percentile(samples, 0.99):7.3f}ms "
+          f"mean={statistics.mean(samples):7.3f}ms")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTrelloHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    os.environ["TRELLO_API_BASE_URL"] = base_url
+    os.environ.setdefault("TRELLO_API_KEY", "bench")
+    os.environ.setdefault("TRELLO_API_TOKEN", "bench")
+    os.environ.setdefault("TRELLO_BOARD_ID", "bench-board")
+
+    from src.api_clients import TrelloAPIClient
+
+    url = f"{base_url}/1/boards/bench-board/members"
+    run("requests.put", lambda: requests.put(url, params={"email": "user@example.com"}, timeout=30))
+
+    client = TrelloAPIClient()
+    run("pooled session", lambda: client.add_member_to_board("user@example.com"))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+アカウント発行依頼の一括バリデーションのベンチマーク
+
+オンボーディングの名簿に近い行（少数のドメイン、数%の不正な行）を作り、次を比較する。
+
+- per-object: 1行ずつ AccountRequest(...) を生成
+- bulk (cold): src.validation.validate_account_requests（メールアドレス・ドメインのメモ化を空にした状態）
+- bulk (warm): 同じ行をもう一度（同じ名簿の再取り込みに相当）
+- bulk columns: 列名 → 値のリストで渡した場合（warm）
+
+あわせて、検証を通った行のモデルと行ごとのエラーメッセージが per-object と一致することを確認する。
+
+実行方法:
+    python -m benchmarks.bench_validation
+    python -m benchmarks.bench_validation --rows 10000 100000 --domains 20
+"""
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from src.models import AccountRequest
+from src.validation import FIELDS, normalize_domain, normalize_email, validate_account_requests
+
+# 不正な行・EmailStr の正規化が効く行（一部の値を差し替える）
+SPECIAL_VALUES = [
+    ("email", "not-an-email"),
+    ("email", "user@"),
+    ("email", "user@localhost"),
+    ("email", "a..b@example.com"),
+    ("email", "Yamada Taro <yamada@Example.COM>"),
+    ("email", "やまだ@例え.jp"),
+    ("email", "UPPER@EXAMPLE.COM"),
+    ("email", 12345),
+    ("tool", "slack"),
+    ("permission", "owner"),
+    ("permission", None),
+    ("background", "   "),
+    ("background", "x" * 256),
+    ("background", None),
+    ("target", 1),
+]
+
+
+def generate_rows(count: int, domains: int, invalid_ratio: float, seed: int) -> List[Dict[str, Any]]:
+    """名簿の行を作成"""
+    rng = random.Random(seed)
+    names = [f"corp{i}.example.com" for i in range(domains)]
+    rows = []
+    for i in range(count):
+        tool = rng.choice(["trello", "google_drive"])
+        row = {
+            "email": f"user.{i}@{rng.choice(names)}",
+            "tool": tool,
+            "permission": rng.choice(["reader", "commenter", "writer"]) if tool == "google_drive" else None,
+            "background": "新メンバーのオンボーディング",
+            "target": None,
+        }
+        if rng.random() < invalid_ratio:
+            field, value = rng.choice(SPECIAL_VALUES)
+            row[field] = value
+        rows.append(row)
+    return rows
+
+
+def validate_per_object(rows: List[Dict[str, Any]]) -> Tuple[Dict[int, AccountRequest], Dict[int, str]]:
+    """1行ずつ AccountRequest を生成"""
+    requests: Dict[int, AccountRequest] = {}
+    errors: Dict[int, str] = {}
+    for index, row in enumerate(rows):
+        try:
+            requests[index] = AccountRequest(**row)
+        except ValidationError as e:
+            invalid = {error["loc"][0] for error in e.errors()}
+            errors[index] = f"{', '.join(field for field in FIELDS if field in invalid)} の値が正しくありません。"
+    return requests, errors
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(count: int, args):
+    rows = generate_rows(count, args.domains, args.invalid_ratio, args.seed)
+    (expected, expected_errors), per_object = timed(validate_per_object, rows)
+    print(f"{count:>7} rows  per-object   {per_object:7.3f}s  {per_object / count * 1e6:7.2f}us/row  "
+          f"valid={len(expected)} invalid={len(expected_errors)}")
+
+    normalize_email.cache_clear()
+    normalize_domain.cache_clear()
+    for label in ("bulk (cold)", "bulk (warm)", "bulk columns"):
+        data = {field: [row[field] for row in rows] for field in FIELDS} if label == "bulk columns" else rows
+        result, elapsed = timed(validate_account_requests, data)
+        actual = dict(zip(result.indexes, result.requests))
+        same = (
+            actual.keys() == expected.keys()
+            and all(actual[index].model_dump() == expected[index].model_dump() for index in expected)
+            and result.errors == expected_errors
+        )
+        print(f"{count:>7} rows  {label:<12} {elapsed:7.3f}s  {elapsed / count * 1e6:7.2f}us/row  "
+              f"speedup={per_object / elapsed:6.1f}x  same_as_per_object={same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="アカウント発行依頼の一括バリデーションのベンチマーク")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--domains", type=int, default=20, help="メールアドレスのドメインの種類")
+    parser.add_argument("--invalid-ratio", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for count in args.rows:
+        run(count, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+起動時のインポート時間の予算チェック
+
+app.py が読み込む src 以下のモジュールを `python -X importtime` でインポートし、
+合計時間が予算内であること、重い依存（LLM・Google API クライアント）が
+初回利用まで読み込まれないことを確認する。また、セッション生成の時間も計測する。
+予算を超えた場合は終了コード 1 を返すため、CI のチェックとして使える。
+
+実行方法:
+    python -m benchmarks.check_import_time
+"""
+
+import os
+import re
+import subprocess
+import sys
+import timeit
+
+# app.py が起動時にインポートする src 以下のモジュール
+APP_MODULES = [
+    "src.langchain_setup",
+    "src.access_index",
+    "src.batch",
+    "src.job_queue",
+    "src.prompts",
+]
+
+# 起動時に読み込まれてはならない重い依存
+DEFERRED_MODULES = [
+    "langchain",
+    "langchain_core",
+    "langchain_google_genai",
+    "googleapiclient",
+    "google_auth_httplib2",
+]
+
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "500"))
+SESSION_BUDGET_US = float(os.getenv("SESSION_BUDGET_US", "200"))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_imports() -> tuple:
+    """
+    新しいインタプリタでモジュールをインポートし、計測結果を取得
+
+    Returns:
+        (合計時間ミリ秒, 読み込まれたモジュール名の集合, 累積時間の大きい順のトップレベルモジュール)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(APP_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+
+    total_us = 0
+    modules = set()
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        total_us += int(self_us)
+        modules.add(name)
+        if len(indent) == 1:
+            top_level.append((int(cumulative_us), name))
+    return total_us / 1000, modules, sorted(top_level, reverse=True)
+
+
+def measure_session_creation() -> float:
+    """ChatbotManager の生成時間（マイクロ秒）を計測"""
+    from src.langchain_setup import ChatbotManager
+
+    number = 10000
+    seconds = min(timeit.repeat(ChatbotManager, number=number, repeat=5))
+    return seconds / number * 1e6
+
+
+def main() -> int:
+    total_ms, modules, top_level = measure_imports()
+    print(f"import time: {total_ms:.1f}ms (budget {IMPORT_TIME_BUDGET_MS:.0f}ms)")
+    for cumulative_us, name in top_level[:8]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+    session_us = measure_session_creation()
+    print(f"session creation: {session_us:.1f}us (budget {SESSION_BUDGET_US:.0f}us)")
+
+    failures = []
+    if total_ms > IMPORT_TIME_BUDGET_MS:
+        failures.append(f"インポート時間が予算を超えています: {total_ms:.1f}ms")
+    loaded = sorted(name for name in DEFERRED_MODULES if name in modules)
+    if loaded:
+        failures.append(f"起動時に重い依存が読み込まれています: {', '.join(loaded)}")
+    if session_us > SESSION_BUDGET_US:
+        failures.append(f"セッション生成が予算を超えています: {session_us:.1f}us")
+
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
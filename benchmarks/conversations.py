@@ -0,0 +1,215 @@
+"""
+ベンチマーク用の合成会話
+
+日本語・英語で、正常系（Trello / Google Drive）・メールアドレスの訂正・不正なメールアドレスの
+シナリオを生成する。各会話には、最後まで進めたときに期待される依頼内容を持たせる。
+
+対話のベンチマーク用に、最初の発話だけを決めた台本（1メッセージでの依頼・訂正など）と、
+尋ねられたスロットに答えるユーザーの回答も定義する。
+"""
+
+import random
+from typing import List, NamedTuple, Optional, Sequence
+
+# シナリオごとの発話（{email} は正しいメールアドレス、{wrong_email} は訂正前のメールアドレス）
+SCENARIOS = {
+    "ja": {
+        "happy_trello": (
+            "trello", None,
+            ["{email} のアカウントを発行してください", "Trello", "新しいプロジェクトのタスク管理に参加するため"],
+        ),
+        "happy_drive": (
+            "google_drive", "reader",
+            ["{email}", "Google Drive", "閲覧のみで大丈夫です", "来月からのプロジェクトで資料を参照するため"],
+        ),
+        "one_shot": (
+            "google_drive", "writer",
+            ["{email} に Google Drive の編集権限をお願いします", "議事録を共同で編集するため"],
+        ),
+        "correction": (
+            "trello", None,
+            ["{wrong_email} のアカウントをお願いします", "すみません、メールアドレスは {email} に訂正します",
+             "トレロ", "開発チームのボードに参加するため"],
+        ),
+        "invalid_email": (
+            "google_drive", "commenter",
+            ["yamada@example", "{email}", "グーグルドライブ", "コメント", "レビューに参加するため"],
+        ),
+    },
+    "en": {
+        "happy_trello": (
+            "trello", None,
+            ["Hi, please create an account for {email}", "Trello", "Joining the project board for Q3 planning"],
+        ),
+        "happy_drive": (
+            "google_drive", "reader",
+            ["{email}", "Google Drive", "viewer is fine", "Needs to review the spec documents"],
+        ),
+        "one_shot": (
+            "google_drive", "writer",
+            ["Please give {email} editor access on Google Drive", "Co-editing the meeting notes"],
+        ),
+        "correction": (
+            "trello", None,
+            ["Account for {wrong_email} please", "Sorry, the email should be {email}",
+             "trello", "Onboarding to the dev team board"],
+        ),
+        "invalid_email": (
+            "google_drive", "commenter",
+            ["john.doe@example", "{email}", "google drive", "commenter", "Joining the design review"],
+        ),
+    },
+}
+
+
+class Conversation(NamedTuple):
+    """合成会話1件分"""
+
+    language: str
+    scenario: str
+    turns: List[str]
+    email: str
+    tool: str
+    permission: Optional[str]
+
+
+def generate_conversations(count: int, seed: int = 0, languages: Sequence[str] = ("ja", "en"),
+                           scenarios: Optional[Sequence[str]] = None) -> List[Conversation]:
+    """
+    合成会話を生成
+
+    Args:
+        count: 生成する件数
+        seed: 乱数のシード（同じ値なら同じ会話を生成する）
+        languages: 使用する言語
+        scenarios: 使用するシナリオ（省略時は全て）
+
+    Returns:
+        合成会話
+    """
+    rng = random.Random(seed)
+    choices = [
+        (language, scenario)
+        for language in languages
+        for scenario in (scenarios or SCENARIOS[language].keys())
+    ]
+
+    conversations = []
+    for index in range(count):
+        language, scenario = rng.choice(choices)
+        tool, permission, turns = SCENARIOS[language][scenario]
+        email = f"user{index}.{rng.getrandbits(32):08x}@example.com"
+        wrong_email = f"typo{index}@example.com"
+        conversations.append(Conversation(
+            language=language,
+            scenario=scenario,
+            turns=[turn.format(email=email, wrong_email=wrong_email) for turn in turns],
+            email=email,
+            tool=tool,
+            permission=permission
+        ))
+    return conversations
+
+
+# 対話のベンチマーク用の台本: シナリオ → (ツール, 権限, 最初の発話, 1ターンに1項目ずつ尋ねる場合のターン数)
+# 最初の発話の後は、シミュレートしたユーザーが尋ねられたスロットに DIALOGUE_ANSWERS で答える
+DIALOGUE_SCENARIOS = {
+    "ja": {
+        "one_message": (
+            "google_drive", "reader", ["{email} にDriveの閲覧権限を、案件Aのレビューのため"], 4,
+        ),
+        "email_and_tool": ("trello", None, ["{email} に Trello をお願いします"], 3),
+        "stepwise": ("google_drive", "commenter", ["アカウントを発行してください"], 5),
+        "email_correction": (
+            "trello", None, ["{wrong_email} に Trello を、開発ボードに参加するため", "メールは {email} に訂正"], 4,
+        ),
+        "tool_correction": (
+            "google_drive", "reader", ["{email} に Trello をお願いします", "Trelloじゃなくて Google Drive の閲覧で"], 5,
+        ),
+    },
+    "en": {
+        "one_message": (
+            "google_drive", "writer",
+            ["Please give {email} editor access on Google Drive for co-editing the meeting notes"], 4,
+        ),
+        "email_and_tool": ("trello", None, ["Trello account for {email} please"], 3),
+        "stepwise": ("google_drive", "commenter", ["I need an account"], 5),
+        "email_correction": (
+            "trello", None, ["Trello for {wrong_email}, to join the dev board", "Sorry, the email should be {email}"], 4,
+        ),
+        "tool_correction": (
+            "google_drive", "reader", ["{email} needs Trello", "Actually Google Drive instead of Trello, viewer"], 5,
+        ),
+    },
+}
+
+# 尋ねられたスロットへの回答
+DIALOGUE_ANSWERS = {
+    "ja": {
+        "email": "{email}",
+        "tool": {"trello": "Trello", "google_drive": "Google Drive"},
+        "permission": {"reader": "閲覧", "commenter": "コメント", "writer": "編集"},
+        "background": "新しいプロジェクトに参加するため",
+    },
+    "en": {
+        "email": "{email}",
+        "tool": {"trello": "Trello", "google_drive": "Google Drive"},
+        "permission": {"reader": "reader", "commenter": "commenter", "writer": "writer"},
+        "background": "Joining the new project",
+    },
+}
+
+
+class Dialogue(NamedTuple):
+    """台本による対話1件分"""
+
+    language: str
+    scenario: str
+    opening: List[str]
+    email: str
+    tool: str
+    permission: Optional[str]
+    # 1ターンに1項目ずつ尋ねる場合のターン数
+    slot_by_slot_turns: int
+
+    def answer(self, slot: str) -> str:
+        """尋ねられたスロットへのユーザーの回答"""
+        answer = DIALOGUE_ANSWERS[self.language][slot]
+        if slot == "tool":
+            return answer[self.tool]
+        if slot == "permission":
+            return answer[self.permission]
+        return answer.format(email=self.email)
+
+
+def generate_dialogues(count: int, seed: int = 0, languages: Sequence[str] = ("ja", "en")) -> List[Dialogue]:
+    """
+    台本による対話を生成
+
+    Args:
+        count: 生成する件数
+        seed: 乱数のシード（同じ値なら同じ対話を生成する）
+        languages: 使用する言語
+
+    Returns:
+        対話
+    """
+    rng = random.Random(seed)
+    choices = [(language, scenario) for language in languages for scenario in DIALOGUE_SCENARIOS[language]]
+
+    dialogues = []
+    for index in range(count):
+        language, scenario = rng.choice(choices)
+        tool, permission, opening, slot_by_slot_turns = DIALOGUE_SCENARIOS[language][scenario]
+        email = f"user{index}.{rng.getrandbits(32):08x}@example.com"
+        wrong_email = f"typo{index}@example.com"
+        dialogues.append(Dialogue(
+            language=language,
+            scenario=scenario,
+            opening=[turn.format(email=email, wrong_email=wrong_email) for turn in opening],
+            email=email,
+            tool=tool,
+            permission=permission,
+            slot_by_slot_turns=slot_by_slot_turns
+        ))
+    return dialogues
@@ -0,0 +1,133 @@
+"""
+HTTP/JSON API の負荷テスト
+
+ワーカープロセス数を変えて uvicorn で src.api_server を起動し、
+多数のセッションが並行して依頼の会話（メールアドレス → ツール → 権限 → 背景）を進めたときの
+スループットとレイテンシを比較する。セッションは SQLite のセッションストアで全ワーカーに共有する。
+
+実行方法:
+    python -m benchmarks.load_test_api
+    python -m benchmarks.load_test_api --workers 1 2 4 8 --sessions 400 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+# 1セッション分の会話（最後の発話で全ての情報が揃う）
+CONVERSATION = [
+    "{email} のアカウントをお願いします",
+    "Google Drive",
+    "閲覧のみで大丈夫です",
+    "来月からのプロジェクトで資料を参照するため",
+]
+
+
+def percentile(samples: list, q: float) -> float:
+    """パーセンタイルを計算"""
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def free_port() -> int:
+    """空いているポート番号を取得"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, workdir: str) -> subprocess.Popen:
+    """uvicorn を起動し、ヘルスチェックが通るまで待つ"""
+    env = {
+        **os.environ,
+        "SESSION_STORE_BACKEND": "sqlite",
+        "SESSION_STORE_DB": os.path.join(workdir, f"sessions-{workers}.db"),
+        "JOB_QUEUE_DB": os.path.join(workdir, f"jobs-{workers}.db"),
+        "JOB_WORKERS": "0",
+        # 会話はルールによる抽出だけで進むため、LLM は使わない
+        "GEMINI_API_KEY": "",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api_server:app",
+         "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API サーバーが起動しませんでした。")
+
+
+async def run_conversation(client: httpx.AsyncClient, samples: list):
+    """1セッション分の会話を実行"""
+    session_id = uuid.uuid4().hex
+    email = f"user-{session_id[:8]}@example.com"
+    for text in CONVERSATION:
+        start = time.perf_counter()
+        response = await client.post(f"/sessions/{session_id}/messages", json={"message": text.format(email=email)})
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    if not response.json()["ready"]:
+        raise RuntimeError(f"会話が完了しませんでした: {response.json()}")
+
+
+async def run_load(port: int, sessions: int, concurrency: int) -> tuple:
+    """sessions 件の会話を concurrency 並列で実行し、(経過秒数, レイテンシ) を返す"""
+    samples = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def bounded():
+            async with semaphore:
+                await run_conversation(client, samples)
+
+        # ウォームアップ（各ワーカーのインポート・初回接続）
+        await asyncio.gather(*(bounded() for _ in range(concurrency)))
+        samples.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded() for _ in range(sessions)))
+        return time.perf_counter() - start, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"CPU={os.cpu_count()} sessions={args.sessions} concurrency={args.concurrency} "
+          f"requests={args.sessions * len(CONVERSATION)}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for workers in args.workers:
+            port = free_port()
+            process = start_server(workers, port, workdir)
+            try:
+                elapsed, samples = asyncio.run(run_load(port, args.sessions, args.concurrency))
+            finally:
+                process.terminate()
+                process.wait()
+            print(f"workers={workers:2d} throughput={len(samples) / elapsed:8.1f} req/s "
+                  f"p50={percentile(samples, 0.5):7.2f}ms p99={percentile(samples, 0.99):7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
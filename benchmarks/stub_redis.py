@@ -0,0 +1,107 @@
+"""
+Redis の代替サーバー
+
+RedisSessionStore が使うコマンド（GET / SET [EX|PX] [NX] / DEL / PING / AUTH / SELECT）だけを
+RESP で実装したインメモリのサーバー。Redis を用意せずにセッションストアを試すために使う。
+
+実行方法:
+    python -m benchmarks.stub_redis --port 6379
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class StubRedisHandler(socketserver.StreamRequestHandler):
+    """1接続分のコマンドを処理"""
+
+    disable_nagle_algorithm = True
+
+    def read_command(self):
+        """RESP の配列（コマンドと引数）を読み込む"""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # インラインコマンド（redis-cli の PING など）
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        data = self.server.data
+        lock = self.server.lock
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+
+            if name == b"GET":
+                with lock:
+                    entry = data.get(args[1])
+                    if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                        del data[args[1]]
+                        entry = None
+                reply = b"$-1\r\n" if entry is None else b"$%d\r\n%s\r\n" % (len(entry[1]), entry[1])
+            elif name == b"SET":
+                expires_at = None
+                options = [arg.upper() for arg in args[3:]]
+                for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+                    if unit in options:
+                        expires_at = time.monotonic() + int(args[3 + options.index(unit) + 1]) * scale
+                with lock:
+                    entry = data.get(args[1])
+                    alive = entry is not None and (entry[0] is None or entry[0] > time.monotonic())
+                    if b"NX" in options and alive:
+                        reply = b"$-1\r\n"
+                    else:
+                        data[args[1]] = (expires_at, args[2])
+                        reply = b"+OK\r\n"
+            elif name == b"DEL":
+                with lock:
+                    removed = sum(1 for key in args[1:] if data.pop(key, None) is not None)
+                reply = b":%d\r\n" % removed
+            elif name in (b"PING", b"AUTH", b"SELECT"):
+                reply = b"+PONG\r\n" if name == b"PING" else b"+OK\r\n"
+            else:
+                reply = b"-ERR unknown command '%s'\r\n" % name
+            self.wfile.write(reply)
+
+
+class StubRedisServer(socketserver.ThreadingTCPServer):
+    """Redis の代替サーバー"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, StubRedisHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def start(self) -> str:
+        """バックグラウンドで起動し、接続先の URL を返す"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redis の代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = StubRedisServer((args.host, args.port))
+    print(f"listening on redis://{args.host}:{args.port}/0")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
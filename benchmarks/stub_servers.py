@@ -0,0 +1,366 @@
+"""
+Trello / Google Drive の代替サーバー
+
+ベンチマーク用に、アカウント発行で呼び出す API（Trello のボードメンバー一覧・追加・削除、
+Google Drive の権限一覧・追加・バッチ（追加・変更・削除）、サービスアカウントのトークン発行）をローカルで応答する。
+応答までの遅延とエラーの発生率を設定できる。track_grants を有効にすると、書き込みを既存のアクセス権に反映する。
+レート制限を設定すると、認証情報ごとに一定時間あたりの回数を超えた呼び出しに、Trello は 429
+（x-rate-limit-* ヘッダー付き）、Google Drive は 403 userRateLimitExceeded を返す。
+
+実行方法（単体で起動する場合）:
+    python -m benchmarks.stub_servers --port 8080 --latency-ms 50 --error-rate 0.05
+    python -m benchmarks.stub_servers --port 8080 --rate-limit 100 --rate-window-ms 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+TRELLO_BOARD_PATH = re.compile(r"^/1/boards/([^/]+)$")
+TRELLO_MEMBERS_PATH = re.compile(r"^/1/boards/([^/]+)/members$")
+TRELLO_MEMBER_PATH = re.compile(r"^/1/boards/([^/]+)/members/([^/]+)$")
+TRELLO_MEMBERSHIPS_PATH = re.compile(r"^/1/boards/([^/]+)/memberships$")
+# ボードの管理者で、API トークンの所有者のメンバーID
+TRELLO_ADMIN_ID = "admin-member"
+DRIVE_FILE_PATH = re.compile(r"^/drive/v3/files/([^/]+)$")
+DRIVE_PERMISSIONS_PATH = re.compile(r"^/drive/v3/files/([^/]+)/permissions$")
+DRIVE_BATCH_PATH = "/batch/drive/v3"
+# バッチの各パートに埋め込まれたリクエスト行（権限の追加・変更・削除）
+DRIVE_BATCH_REQUEST = re.compile(rb"^(POST|PATCH|DELETE) /drive/v3/files/[^/]+/permissions(?:/([^/?\s]+))?", re.M)
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """Trello / Google Drive API の代替ハンドラ"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        """JSON の応答を送信"""
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read_body(self) -> bytes:
+        """リクエストボディを読み込む"""
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def simulate(self) -> bool:
+        """
+        設定された遅延を入れ、エラーを注入する
+
+        Returns:
+            エラーを返した場合は True
+        """
+        server = self.server
+        server.count("requests")
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+        if server.error_rate and random.random() < server.error_rate:
+            server.count("errors")
+            self.send_json(server.error_status, {"error": "injected"}, {"Retry-After": "0"})
+            return True
+        return False
+
+    def rate_limit_headers(self, remaining: int) -> dict:
+        """Trello のレート制限ヘッダー"""
+        server = self.server
+        return {
+            "x-rate-limit-api-token-interval-ms": str(int(server.rate_window * 1000)),
+            "x-rate-limit-api-token-max": str(server.rate_limit),
+            "x-rate-limit-api-token-remaining": str(remaining),
+        }
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        board_or_file = TRELLO_BOARD_PATH.match(path) or DRIVE_FILE_PATH.match(path)
+        if board_or_file:
+            if self.simulate():
+                return
+            self.server.count("probes")
+            self.send_json(200, {"id": board_or_file.group(1)})
+            return
+        if TRELLO_MEMBERS_PATH.match(path):
+            if self.simulate():
+                return
+            self.server.count("reads")
+            self.send_json(200, [
+                {"id": self.server.principal_id(email), "username": email.split("@")[0], "email": email}
+                for email in list(self.server.existing)
+            ])
+            return
+        if TRELLO_MEMBERSHIPS_PATH.match(path):
+            if self.simulate():
+                return
+            self.server.count("reads")
+            self.send_json(200, [{"idMember": TRELLO_ADMIN_ID, "memberType": "admin"}] + [
+                {"idMember": self.server.principal_id(email), "memberType": "normal"}
+                for email in list(self.server.existing)
+            ])
+            return
+        if path == "/1/members/me":
+            self.send_json(200, {"id": TRELLO_ADMIN_ID})
+            return
+        if DRIVE_PERMISSIONS_PATH.match(path):
+            if self.simulate():
+                return
+            self.server.count("reads")
+            self.send_json(200, {"permissions": [
+                {"id": self.server.principal_id(email), "type": "user", "emailAddress": email, "role": role}
+                for email, role in list(self.server.existing.items())
+            ]})
+            return
+        self.send_json(404, {"error": "not found"})
+
+    def do_PUT(self):
+        self.read_body()
+        path, _, query = self.path.partition("?")
+        match = TRELLO_MEMBERS_PATH.match(path)
+        if match is None:
+            self.send_json(404, {"error": "not found"})
+            return
+        if self.simulate():
+            return
+        headers = {}
+        if self.server.rate_limit:
+            token = parse_qs(query).get("token", [""])[0]
+            remaining = self.server.take(f"trello:{token}")
+            if remaining is None:
+                self.server.count("rate_limited")
+                self.send_json(429, {"error": "API_TOKEN_LIMIT_EXCEEDED"}, self.rate_limit_headers(0))
+                return
+            headers = self.rate_limit_headers(remaining)
+        self.server.count("trello")
+        email = parse_qs(query).get("email", [""])[0]
+        if self.server.track_grants:
+            self.server.existing.setdefault(email, "member")
+        self.send_json(200, {"id": match.group(1), "members": [{"id": self.server.principal_id(email)}]}, headers)
+
+    def do_DELETE(self):
+        path = self.path.split("?", 1)[0]
+        match = TRELLO_MEMBER_PATH.match(path)
+        if match is None:
+            self.send_json(404, {"error": "not found"})
+            return
+        if self.simulate():
+            return
+        self.server.count("trello")
+        email = self.server.principals.get(match.group(2))
+        if self.server.track_grants and email is not None:
+            self.server.existing.pop(email, None)
+        self.send_json(200, {"id": match.group(1)})
+
+    def do_POST(self):
+        body = self.read_body()
+        path = self.path.split("?", 1)[0]
+
+        if path == "/token":
+            self.send_json(200, {"access_token": "stub-token", "expires_in": 3600, "token_type": "Bearer"})
+            return
+
+        if DRIVE_PERMISSIONS_PATH.match(path):
+            if self.simulate():
+                return
+            if self.server.rate_limit and self.server.take(f"drive:{self.headers.get('Authorization')}") is None:
+                self.server.count("rate_limited")
+                self.send_json(403, {"error": {"code": 403, "errors": [{"reason": "userRateLimitExceeded"}]}})
+                return
+            self.server.count("drive")
+            request = json.loads(body or b"{}")
+            if self.server.track_grants:
+                self.server.existing[request.get("emailAddress")] = request.get("role")
+            self.send_json(200, {"id": f"perm-{random.getrandbits(48):012x}", "role": request.get("role")})
+            return
+
+        if path == DRIVE_BATCH_PATH:
+            if self.simulate():
+                return
+            self.send_batch(body)
+            return
+
+        self.send_json(404, {"error": "not found"})
+
+    def send_batch(self, body: bytes):
+        """Google Drive のバッチリクエスト（multipart/mixed）に、各パートの権限の追加・変更・削除の結果を返す"""
+        boundary = self.headers.get_content_type() and self.headers.get_param("boundary")
+        parts = []
+        for part in body.split(b"--" + boundary.encode())[1:]:
+            if part.startswith(b"--"):
+                break
+            # 各パートは「パートのヘッダー、埋め込まれた HTTP リクエスト（ヘッダーと JSON ボディ）」の順
+            content_id = re.search(rb"Content-ID: <([^>]+)>", part).group(1).decode()
+            request_body = re.search(rb"\{.*\}", part, re.S)
+            request = json.loads(request_body.group(0)) if request_body else {}
+            line = DRIVE_BATCH_REQUEST.search(part)
+            method = line.group(1).decode() if line else "POST"
+            email = request.get("emailAddress")
+            if line and line.group(2):
+                email = self.server.principals.get(line.group(2).decode())
+            self.server.count("drive")
+            if self.server.track_grants and email is not None:
+                if method == "DELETE":
+                    self.server.existing.pop(email, None)
+                else:
+                    self.server.existing[email] = request.get("role")
+            if method == "DELETE":
+                response = "HTTP/1.1 204 No Content\r\n\r\n"
+            else:
+                data = json.dumps({"id": self.server.principal_id(email or str(random.getrandbits(48))),
+                                   "role": request.get("role")})
+                response = f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{data}"
+            parts.append(
+                f"--batch_stub\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"{response}\r\n"
+            )
+        payload = ("".join(parts) + "--batch_stub--\r\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/mixed; boundary=batch_stub")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubAPIServer(ThreadingHTTPServer):
+    """Trello / Google Drive API の代替サーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, rate_limit: int = 0,
+                 rate_window_ms: float = 10000.0):
+        super().__init__(address, StubAPIHandler)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # 認証情報ごとに rate_window 秒の固定ウィンドウあたり rate_limit 回まで受け付ける（0 は無制限）
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window_ms / 1000
+        self._windows = {}
+        # 既にアクセス権を持つユーザー（メールアドレス → 権限）。メンバー・権限一覧で返す
+        self.existing = {}
+        # True の場合、書き込み（追加・変更・削除）を existing に反映する
+        self.track_grants = False
+        # メンバーID・権限ID → メールアドレス
+        self.principals = {}
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "reads": 0, "probes": 0, "trello": 0, "drive": 0, "errors": 0, "rate_limited": 0}
+
+    def count(self, name: str):
+        """受け付けたリクエストを数える"""
+        with self._lock:
+            self.counts[name] += 1
+
+    def principal_id(self, email: str) -> str:
+        """メールアドレスごとに一定のメンバーID・権限IDを返す"""
+        principal_id = f"id-{zlib.crc32(email.encode('utf-8')):08x}"
+        self.principals[principal_id] = email
+        return principal_id
+
+    def take(self, credential: str) -> Optional[int]:
+        """
+        認証情報の現在のウィンドウの回数を1つ消費
+
+        Returns:
+            ウィンドウの残り回数、上限を超えた場合は None
+        """
+        window = int(time.time() / self.rate_window)
+        with self._lock:
+            current, used = self._windows.get(credential, (window, 0))
+            if current != window:
+                used = 0
+            if used >= self.rate_limit:
+                return None
+            self._windows[credential] = (window, used + 1)
+            return self.rate_limit - used - 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """バックグラウンドで起動し、接続先の URL を返す"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def configure_environment(self, directory: str):
+        """
+        アプリの API クライアントがこのサーバーに接続するよう環境変数を設定
+
+        Args:
+            directory: ダミーのサービスアカウント JSON を作成するディレクトリ
+        """
+        os.environ["TRELLO_API_BASE_URL"] = self.base_url
+        os.environ["TRELLO_API_KEY"] = "stub"
+        os.environ["TRELLO_API_TOKEN"] = "stub"
+        os.environ["TRELLO_BOARD_ID"] = "stub-board"
+        os.environ["GOOGLE_DRIVE_API_BASE_URL"] = self.base_url
+        os.environ["GOOGLE_DRIVE_FILE_ID"] = "stub-file"
+        os.environ["GOOGLE_SERVICE_ACCOUNT_JSON"] = write_service_account(directory, f"{self.base_url}/token")
+
+
+def write_service_account(directory: str, token_uri: str) -> str:
+    """トークンの発行先を token_uri にしたダミーのサービスアカウント JSON を作成"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    path = os.path.join(directory, "service-account.json")
+    with open(path, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "stub",
+            "private_key_id": "stub",
+            "private_key": pem,
+            "client_email": "stub@stub.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": token_uri,
+        }, f)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trello / Google Drive の代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--rate-window-ms", type=float, default=10000.0)
+    args = parser.parse_args()
+
+    server = StubAPIServer(
+        (args.host, args.port), args.latency_ms, args.jitter_ms, args.error_rate, args.error_status,
+        args.rate_limit, args.rate_window_ms
+    )
+    print(f"listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
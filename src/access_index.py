@@ -0,0 +1,281 @@
+"""
+アクセス権インデックス
+Trelloボードのメンバーと Google Drive ファイルの権限をローカルに保持し、
+既にアクセス権を持つユーザーへの無駄な書き込みAPI呼び出しを防ぐ
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+from src.api_clients import TrelloAPIClient, GoogleDriveAPIClient, get_drive_client, get_trello_client
+from src.grant_cache import ROLE_RANK
+from src.metrics import count
+
+logger = logging.getLogger(__name__)
+
+
+class AccessIndex:
+    """メールアドレスから現在のアクセス権を O(1) で引けるインデックス"""
+
+    def __init__(self, trello_client: Optional[TrelloAPIClient] = None,
+                 drive_client: Optional[GoogleDriveAPIClient] = None):
+        self.trello_client = trello_client
+        self.drive_client = drive_client
+        self._lock = threading.Lock()
+        # Trello: メンバーID → ユーザー名、メールアドレス → メンバーID
+        self._trello_members: Dict[str, str] = {}
+        self._trello_emails: Dict[str, str] = {}
+        self._trello_since: Optional[str] = None
+        # Google Drive: メールアドレス → 権限
+        self._drive_roles: Dict[str, str] = {}
+        self._drive_page_token: Optional[str] = None
+        # 全件読み込みを済ませたツール
+        self._loaded_tools: Set[str] = set()
+
+    @property
+    def loaded(self) -> bool:
+        """クライアントのある全てのツールの全件読み込みが済んだか"""
+        return all(tool in self._loaded_tools for tool, _ in self._steps())
+
+    def load(self):
+        """全件読み込み（起動時）"""
+        if self.trello_client is not None:
+            self._load_trello()
+        if self.drive_client is not None:
+            self._load_drive_from_start()
+
+    def _steps(self):
+        """クライアントのあるツールと、その差分更新の手順"""
+        if self.trello_client is not None:
+            yield "trello", self._refresh_trello
+        if self.drive_client is not None:
+            yield "google_drive", self._refresh_drive
+
+    def _load_trello(self):
+        # 差分更新の起点には最新のアクションの日時だけが必要なため、履歴全体は取得しない
+        actions = self.trello_client.get_membership_actions(limit=1)
+        members = self.trello_client.get_board_members()
+        with self._lock:
+            self._trello_members = {member["id"]: member.get("username", "") for member in members}
+            for member in members:
+                if member.get("email"):
+                    self._trello_emails[member["email"].lower()] = member["id"]
+            if actions:
+                self._trello_since = actions[-1]["date"]
+        self._loaded_tools.add("trello")
+
+    def _load_drive_from_start(self):
+        # 読み込み中の変更を取りこぼさないよう、先にページトークンを取得する
+        self._drive_page_token = self.drive_client.get_start_page_token()
+        self._load_drive()
+        self._loaded_tools.add("google_drive")
+
+    def _load_drive(self):
+        permissions = self.drive_client.list_permissions()
+        roles = {
+            permission["emailAddress"].lower(): permission["role"]
+            for permission in permissions
+            if permission.get("type") == "user" and permission.get("emailAddress")
+        }
+        with self._lock:
+            self._drive_roles = roles
+
+    def refresh(self):
+        """
+        前回の同期以降の差分のみ反映（全件読み込みが済んでいないツールは全件読み込み）
+
+        Raises:
+            Exception: いずれかのツールの更新に失敗した場合（他のツールの更新は済ませてから送出する）
+        """
+        errors = self.refresh_tools()
+        if errors:
+            raise next(iter(errors.values()))
+
+    def refresh_tools(self) -> Dict[str, Exception]:
+        """
+        ツールごとに独立して差分を反映（あるツールの失敗で他のツールの更新を止めない）
+
+        Returns:
+            更新に失敗したツール名 → エラー
+        """
+        errors = {}
+        for tool, step in self._steps():
+            try:
+                step()
+            except Exception as e:
+                errors[tool] = e
+        return errors
+
+    def _refresh_trello(self):
+        if "trello" not in self._loaded_tools:
+            self._load_trello()
+            return
+        actions = self.trello_client.get_membership_actions(since=self._trello_since)
+        with self._lock:
+            for action in actions:
+                self._apply_trello_action(action)
+            if actions:
+                self._trello_since = actions[-1]["date"]
+
+    def _refresh_drive(self):
+        if "google_drive" not in self._loaded_tools:
+            self._load_drive_from_start()
+            return
+        changed, page_token = self.drive_client.file_changed_since(self._drive_page_token)
+        # Drive の変更履歴は権限の差分を持たないため、対象ファイルが変わった時だけ読み直す
+        if changed:
+            self._load_drive()
+        # 読み直しに失敗した場合は同じページトークンから再度確認するよう、成功した後に進める
+        self._drive_page_token = page_token
+
+    def _apply_trello_action(self, action: Dict[str, Any]):
+        """Trello のアクションを1件反映（ロック取得済みで呼び出す）"""
+        data = action.get("data", {})
+        member = action.get("member") or {}
+        member_id = member.get("id") or data.get("idMemberAdded") or data.get("idMember")
+        if not member_id:
+            return
+        if action["type"] == "removeMemberFromBoard":
+            self._trello_members.pop(member_id, None)
+        else:
+            self._trello_members[member_id] = member.get("username", "")
+
+    def lookup(self, email: str, tool: str) -> Optional[str]:
+        """
+        現在のアクセス権を取得
+
+        Args:
+            email: メールアドレス
+            tool: ツール名 (trello または google_drive)
+
+        Returns:
+            権限（Trello は "member"）、アクセス権がない・不明な場合は None
+        """
+        email = email.lower()
+        with self._lock:
+            if tool == "trello":
+                member_id = self._trello_emails.get(email)
+                return "member" if member_id in self._trello_members else None
+            if tool == "google_drive":
+                return self._drive_roles.get(email)
+        return None
+
+    def record_trello_member(self, email: str, members: List[Dict[str, Any]]):
+        """
+        メンバー追加APIの応答から、メールアドレスとメンバーIDの対応を記録
+
+        Trello のメンバー一覧はメールアドレスを返さないため、追加前に無かったIDを
+        追加したメールアドレスのメンバーとして扱う。
+
+        Args:
+            email: 追加したメールアドレス
+            members: 応答に含まれるボードのメンバー一覧
+        """
+        with self._lock:
+            new_ids = [member["id"] for member in members if member["id"] not in self._trello_members]
+            for member in members:
+                self._trello_members[member["id"]] = member.get("username", "")
+            if len(new_ids) == 1:
+                self._trello_emails[email.lower()] = new_ids[0]
+
+    def record_drive_permission(self, email: str, role: str):
+        """付与した Google Drive の権限を記録"""
+        with self._lock:
+            current = self._drive_roles.get(email.lower())
+            if current is None or ROLE_RANK.get(role, 0) > ROLE_RANK.get(current, 0):
+                self._drive_roles[email.lower()] = role
+
+    def forget(self, email: str, tool: str):
+        """
+        削除したアクセス権を反映
+
+        Args:
+            email: メールアドレス
+            tool: ツール名 (trello または google_drive)
+        """
+        with self._lock:
+            if tool == "trello":
+                self._trello_members.pop(self._trello_emails.pop(email.lower(), None), None)
+            else:
+                self._drive_roles.pop(email.lower(), None)
+
+    def stats(self) -> Dict[str, int]:
+        """インデックスの件数を取得"""
+        with self._lock:
+            return {
+                "trello_members": len(self._trello_members),
+                "trello_emails": len(self._trello_emails),
+                "drive_permissions": len(self._drive_roles),
+            }
+
+
+class AccessIndexRefresher(threading.Thread):
+    """インデックスを一定間隔で差分更新するスレッド"""
+
+    def __init__(self, index: AccessIndex, interval: float, attach_clients: bool = False):
+        super().__init__(daemon=True)
+        self.index = index
+        self.interval = interval
+        # True の場合、スレッド内でクライアントを生成する（生成コストを呼び出し元に負わせない）
+        self.attach_clients = attach_clients
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """更新を停止"""
+        self._stop_event.set()
+
+    def run(self):
+        if self.attach_clients:
+            self.index.trello_client = _try_client(get_trello_client)
+            self.index.drive_client = _try_client(get_drive_client)
+
+        while True:
+            # 一時的なエラーは次回の更新で回復させる（失敗したツールだけ記録し、他のツールは更新を続ける）
+            for tool, error in self.index.refresh_tools().items():
+                logger.error("アクセス権インデックスの %s の更新に失敗しました", tool, exc_info=error)
+                count("access_index_refresh_errors_total", tool=tool)
+            if self._stop_event.wait(self.interval):
+                return
+
+
+_index_lock = threading.Lock()
+_access_index: Optional[AccessIndex] = None
+
+
+def get_access_index() -> AccessIndex:
+    """
+    プロセス全体で共有するアクセス権インデックスを取得
+
+    初回呼び出し時に空のインデックスを作り、クライアントの生成・読み込み・
+    定期的な差分更新はバックグラウンドで行う（読み込み完了までは常に None を返す）。
+
+    Returns:
+        共有の AccessIndex
+    """
+    global _access_index
+    if _access_index is None:
+        with _index_lock:
+            if _access_index is None:
+                index = AccessIndex()
+                AccessIndexRefresher(
+                    index,
+                    float(os.getenv("ACCESS_INDEX_REFRESH_SECONDS", "300")),
+                    attach_clients=True
+                ).start()
+                _access_index = index
+    return _access_index
+
+
+def current_access_index() -> Optional[AccessIndex]:
+    """作成済みの場合のみ共有インデックスを返す"""
+    return _access_index
+
+
+def _try_client(factory):
+    """環境変数が未設定のツールはインデックス対象から外す"""
+    try:
+        return factory()
+    except Exception:
+        return None
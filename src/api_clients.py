@@ -4,24 +4,93 @@ Trello API と Google Drive API の呼び出しを管理
 """
 
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import requests
-from typing import Dict, Any
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+
+from src.audit_log import audited, record_outcome
+from src.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from src.grant_cache import get_grant_cache, role_covers
+from src.http_session import get_session, get_timeouts
+from src.metrics import count_api_error, timer
+from src.models import AccountRequest, ProvisioningTarget
+from src.rate_limit import get_rate_limiter, is_drive_rate_limit
+from src.targets import get_target_registry, reset_target_registry
+
+# googleapiclient と google-auth は読み込みが重いため、Google Drive クライアントの生成時にインポートする
+if TYPE_CHECKING:
+    import google_auth_httplib2
+
+# トークン期限切れ前に更新を行う余裕時間
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# Google Drive のバッチリクエスト1回あたりの上限
+DRIVE_BATCH_SIZE = 100
 
 
 class TrelloAPIClient:
     """Trello API クライアント"""
 
-    def __init__(self):
+    def __init__(self, board_id: Optional[str] = None):
         self.api_key = os.getenv("TRELLO_API_KEY")
         self.api_token = os.getenv("TRELLO_API_TOKEN")
-        self.board_id = os.getenv("TRELLO_BOARD_ID")
+        self.board_id = board_id or os.getenv("TRELLO_BOARD_ID")
+        self.base_url = os.getenv("TRELLO_API_BASE_URL", "https://api.trello.com")
 
         if not all([self.api_key, self.api_token, self.board_id]):
             raise ValueError("Trello API の環境変数が設定されていません。")
 
+        # コネクションプールを共有するセッション
+        self.session = get_session()
+
+    def _send(self, method: str, url: str, params: Dict[str, Any]) -> requests.Response:
+        """
+        サーキットブレーカーを通してリクエストを送信
+
+        Raises:
+            CircuitOpenError: Trello が応答せず、呼び出しを一時停止している場合
+        """
+        breaker = get_circuit_breaker("trello")
+        if breaker is None:
+            return self.session.request(method, url, params=params, timeout=get_timeouts())
+
+        breaker.before_call()
+        try:
+            response = self.session.request(method, url, params=params, timeout=get_timeouts())
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            raise
+        breaker.record_status(response.status_code)
+        return response
+
+    def _request(self, method: str, url: str, params: Dict[str, Any]) -> requests.Response:
+        """
+        レート制限の空きを待ってリクエストを送信
+
+        429 の場合は応答ヘッダーの待機時間を全プロセスのバケットに反映し、空きを待って再送する
+        （RATE_LIMIT_MAX_WAIT 秒を超えた場合は最後の応答を返す）。
+        """
+        limiter = get_rate_limiter()
+        if limiter is None:
+            return self._send(method, url, params)
+
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            # ブレーカーが開いている間はバケットのトークンを消費しない
+            breaker = get_circuit_breaker("trello")
+            if breaker is not None and breaker.is_open():
+                breaker.before_call()
+            limiter.acquire("trello", self.api_key)
+            response = self._send(method, url, params)
+            delay = limiter.observe_response("trello", self.api_key, response.status_code, response.headers, attempt)
+            if delay is None or time.monotonic() - start + delay > limiter.max_wait:
+                return response
+            attempt += 1
+
     def add_member_to_board(self, email: str) -> Dict[str, Any]:
         """
         ボードにメンバーを追加
@@ -35,7 +104,7 @@ class TrelloAPIClient:
         Raises:
             Exception: API呼び出しエラー
         """
-        url = f"https://api.trello.com/1/boards/{self.board_id}/members"
+        url = f"{self.base_url}/1/boards/{self.board_id}/members"
 
         params = {
             "email": email,
@@ -45,25 +114,123 @@ class TrelloAPIClient:
         }
 
         try:
-            response = requests.put(url, params=params, timeout=30)
+            with timer("trello_add_member"):
+                response = self._request("PUT", url, params)
             response.raise_for_status()
             return {"success": True, "data": response.json()}
         except requests.exceptions.RequestException as e:
             error_message = str(e)
             if hasattr(e, 'response') and e.response is not None:
+                count_api_error("trello", e.response.status_code)
                 try:
                     error_detail = e.response.json()
                     error_message = f"{error_message}\n詳細: {error_detail}"
                 except:
                     error_message = f"{error_message}\nステータスコード: {e.response.status_code}"
+            else:
+                count_api_error("trello", "network")
             raise Exception(f"Trello APIエラー: {error_message}")
 
+    def remove_member_from_board(self, member_id: str) -> Dict[str, Any]:
+        """
+        ボードからメンバーを削除
+
+        Args:
+            member_id: 削除するメンバーのID
+
+        Returns:
+            APIレスポンス
+
+        Raises:
+            Exception: API呼び出しエラー
+        """
+        url = f"{self.base_url}/1/boards/{self.board_id}/members/{member_id}"
+        try:
+            with timer("trello_remove_member"):
+                response = self._request("DELETE", url, {"key": self.api_key, "token": self.api_token})
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except requests.exceptions.RequestException as e:
+            status = e.response.status_code if getattr(e, "response", None) is not None else "network"
+            count_api_error("trello", status)
+            raise Exception(f"Trello APIエラー: {str(e)}")
+
+    def _get(self, path: str, params: Dict[str, Any] = None) -> Any:
+        """Trello API に GET リクエストを送信"""
+        params = dict(params or {}, key=self.api_key, token=self.api_token)
+        try:
+            response = self._request("GET", f"{self.base_url}/1{path}", params)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Trello APIエラー: {str(e)}")
+
+    def check_board(self) -> Dict[str, Any]:
+        """ボードに到達できるか確認（ID だけを取得する軽いリクエスト）"""
+        return self._get(f"/boards/{self.board_id}", {"fields": "id"})
+
+    def get_board_members(self) -> List[Dict[str, Any]]:
+        """
+        ボードの現在のメンバー一覧を取得
+
+        Returns:
+            メンバー（id, username, email）のリスト。email は API が返す場合のみ含まれる
+        """
+        return self._get(f"/boards/{self.board_id}/members", {"fields": "id,username,email"})
+
+    def get_board_admin_ids(self) -> List[str]:
+        """
+        ボードの管理者と、API トークンの所有者のメンバーIDを取得
+
+        Returns:
+            メンバーIDのリスト
+        """
+        memberships = self._get(f"/boards/{self.board_id}/memberships", {"fields": "idMember,memberType"})
+        own = self._get("/members/me", {"fields": "id"})
+        return [
+            membership["idMember"] for membership in memberships if membership.get("memberType") == "admin"
+        ] + [own["id"]]
+
+    def get_membership_actions(self, since: str = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        ボードのメンバー追加・削除のアクションを古い順に取得
+
+        Args:
+            since: この日時（ISO 8601）より後のアクションのみ取得
+            limit: 新しいものからこの件数だけ取得（省略時は全件をページングして取得）
+
+        Returns:
+            アクションのリスト
+        """
+        params = {
+            "filter": "addMemberToBoard,removeMemberFromBoard,makeNormalMemberOfBoard",
+            "fields": "type,date,data",
+            "member": "true",
+            "member_fields": "id,username",
+            "limit": min(limit, 1000) if limit else 1000
+        }
+        actions = []
+        before = None
+        while True:
+            page_params = dict(params)
+            if since:
+                page_params["since"] = since
+            if before:
+                page_params["before"] = before
+            page = self._get(f"/boards/{self.board_id}/actions", page_params)
+            actions.extend(page)
+            if len(page) < params["limit"] or (limit and len(actions) >= limit):
+                break
+            before = page[-1]["id"]
+        # API は新しい順に返すため、適用しやすいよう古い順に並べ替える
+        return list(reversed(actions))
+
 
 class GoogleDriveAPIClient:
     """Google Drive API クライアント"""
 
-    def __init__(self):
-        self.file_id = os.getenv("GOOGLE_DRIVE_FILE_ID")
+    def __init__(self, file_id: Optional[str] = None):
+        self.file_id = file_id or os.getenv("GOOGLE_DRIVE_FILE_ID")
         self.service_account_file = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
 
         if not all([self.file_id, self.service_account_file]):
@@ -72,12 +239,108 @@ class GoogleDriveAPIClient:
         if not os.path.exists(self.service_account_file):
             raise ValueError(f"サービスアカウントファイルが見つかりません: {self.service_account_file}")
 
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
         # サービスアカウント認証
         self.credentials = service_account.Credentials.from_service_account_file(
             self.service_account_file,
             scopes=['https://www.googleapis.com/auth/drive']
         )
-        self.service = build('drive', 'v3', credentials=self.credentials)
+        # 接続先の差し替え（ベンチマークの代替サーバーなど）。非同期クライアントと同じ環境変数を使う
+        self.base_url = os.getenv("GOOGLE_DRIVE_API_BASE_URL")
+        client_options = {"api_endpoint": f"{self.base_url.rstrip('/')}/drive/v3/"} if self.base_url else None
+        # 同梱のディスカバリードキュメントを使用し、起動時のネットワークI/Oを避ける
+        self.service = build(
+            'drive', 'v3',
+            credentials=self.credentials,
+            static_discovery=True,
+            cache_discovery=False,
+            client_options=client_options
+        )
+        self._refresh_lock = threading.Lock()
+        # httplib2.Http はスレッドセーフではないため、スレッドごとに保持する
+        self._local = threading.local()
+        # レート制限のバケットはサービスアカウントごとに共有する
+        self.credential_id = self.credentials.service_account_email
+
+    def _token_is_fresh(self) -> bool:
+        """トークンが有効期限まで十分な余裕を持っているかチェック"""
+        if not self.credentials.valid or self.credentials.expiry is None:
+            return False
+        # google-auth の expiry は naive な UTC 時刻
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return self.credentials.expiry - now > TOKEN_REFRESH_MARGIN
+
+    def ensure_fresh_token(self):
+        """期限切れ前にアクセストークンを更新"""
+        if self._token_is_fresh():
+            return
+        from google.auth.transport.requests import Request as GoogleAuthRequest
+
+        with self._refresh_lock:
+            # 他スレッドが更新済みの場合は何もしない
+            if not self._token_is_fresh():
+                self.credentials.refresh(GoogleAuthRequest())
+
+    def _get_http(self) -> "google_auth_httplib2.AuthorizedHttp":
+        """現在のスレッド用の認証済みHTTPを取得"""
+        import google_auth_httplib2
+        import httplib2
+
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    def _execute(self, request, cost: int = 1) -> Dict[str, Any]:
+        """
+        レート制限の空きを待ってリクエストを実行
+
+        レート制限（429、または 403 rateLimitExceeded）の場合は全プロセスのバケットを止め、
+        空きを待って再実行する（RATE_LIMIT_MAX_WAIT 秒を超えた場合はそのエラーを送出）。
+
+        Args:
+            request: googleapiclient の HttpRequest または BatchHttpRequest
+            cost: 消費するトークン数（バッチの場合は含まれるリクエスト数）
+
+        Returns:
+            応答
+        """
+        from googleapiclient.errors import HttpError
+
+        limiter = get_rate_limiter()
+        breaker = get_circuit_breaker("google_drive")
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before_call()
+            if limiter is not None:
+                limiter.acquire("google_drive", self.credential_id, cost)
+            try:
+                response = request.execute(http=self._get_http())
+            except HttpError as e:
+                if breaker is not None:
+                    breaker.record_status(e.resp.status)
+                if limiter is None or not is_drive_rate_limit(e.resp.status, e.content):
+                    raise
+                delay = limiter.observe_response(
+                    "google_drive", self.credential_id, e.resp.status, e.resp, attempt, limited=True
+                )
+                if time.monotonic() - start + delay > limiter.max_wait:
+                    raise
+                attempt += 1
+                continue
+            except Exception:
+                # 接続エラー・タイムアウト
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            if breaker is not None:
+                breaker.record_success()
+            return response
 
     def add_permission(self, email: str, role: str) -> Dict[str, Any]:
         """
@@ -93,6 +356,8 @@ class GoogleDriveAPIClient:
         Raises:
             Exception: API呼び出しエラー
         """
+        from googleapiclient.errors import HttpError
+
         permission = {
             'type': 'user',
             'role': role,
@@ -100,25 +365,425 @@ class GoogleDriveAPIClient:
         }
 
         try:
-            result = self.service.permissions().create(
-                fileId=self.file_id,
-                body=permission,
-                sendNotificationEmail=True,
-                fields='id'
-            ).execute()
+            self.ensure_fresh_token()
+            with timer("drive_permission_create"):
+                result = self._execute(self.service.permissions().create(
+                    fileId=self.file_id,
+                    body=permission,
+                    sendNotificationEmail=True,
+                    fields='id'
+                ))
             return {"success": True, "data": result}
         except HttpError as e:
+            count_api_error("google_drive", e.resp.status)
             error_message = f"Google Drive APIエラー: {str(e)}"
             if e.resp.status == 404:
                 error_message += "\nファイルが見つかりません。GOOGLE_DRIVE_FILE_IDを確認してください。"
             elif e.resp.status == 403:
                 error_message += "\n権限がありません。サービスアカウントの権限を確認してください。"
             raise Exception(error_message)
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise Exception(f"Google Drive APIエラー: {str(e)}")
 
+    def check_file(self) -> Dict[str, Any]:
+        """ファイルに到達できるか確認（ID だけを取得する軽いリクエスト）"""
+        from googleapiclient.errors import HttpError
+
+        try:
+            self.ensure_fresh_token()
+            return self._execute(self.service.files().get(
+                fileId=self.file_id,
+                fields='id',
+                supportsAllDrives=True
+            ))
+        except HttpError as e:
+            raise Exception(f"Google Drive APIエラー: {str(e)}")
+
+    def list_permissions(self) -> List[Dict[str, Any]]:
+        """
+        ファイルの権限一覧をページングしながら全件取得
+
+        Returns:
+            権限（id, type, emailAddress, role）のリスト
+        """
+        from googleapiclient.errors import HttpError
+
+        permissions = []
+        page_token = None
+        try:
+            self.ensure_fresh_token()
+            while True:
+                response = self._execute(self.service.permissions().list(
+                    fileId=self.file_id,
+                    fields='nextPageToken, permissions(id, type, emailAddress, role)',
+                    pageSize=100,
+                    pageToken=page_token,
+                    supportsAllDrives=True
+                ))
+                permissions.extend(response.get('permissions', []))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    return permissions
+        except HttpError as e:
+            raise Exception(f"Google Drive APIエラー: {str(e)}")
+
+    def get_start_page_token(self) -> str:
+        """変更履歴の取得を開始するページトークンを取得"""
+        self.ensure_fresh_token()
+        response = self._execute(self.service.changes().getStartPageToken(
+            supportsAllDrives=True
+        ))
+        return response['startPageToken']
+
+    def file_changed_since(self, page_token: str) -> Tuple[bool, str]:
+        """
+        ページトークン以降に対象ファイルが変更されたかチェック
+
+        Args:
+            page_token: 前回取得したページトークン
+
+        Returns:
+            (対象ファイルが変更されたか, 次回用のページトークン)
+        """
+        changed = False
+        self.ensure_fresh_token()
+        while True:
+            response = self._execute(self.service.changes().list(
+                pageToken=page_token,
+                fields='nextPageToken, newStartPageToken, changes(fileId)',
+                pageSize=1000,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True
+            ))
+            changed = changed or any(
+                change.get('fileId') == self.file_id for change in response.get('changes', [])
+            )
+            if 'newStartPageToken' in response:
+                return changed, response['newStartPageToken']
+            page_token = response['nextPageToken']
+
+    def _execute_batch(self, batch_requests: List[Any], timer_name: str) -> List[Dict[str, Any]]:
+        """
+        複数のリクエストを1回のバッチリクエストで実行
+
+        Args:
+            batch_requests: googleapiclient の HttpRequest のリスト（最大 DRIVE_BATCH_SIZE 件）
+            timer_name: レイテンシを記録するメトリクス名
+
+        Returns:
+            batch_requests と同じ順序の行ごとの結果
+        """
+        results: List[Dict[str, Any]] = [None] * len(batch_requests)
+
+        def callback(request_id: str, response: Dict[str, Any], exception: Exception):
+            index = int(request_id)
+            if exception is None:
+                results[index] = {"success": True, "data": response}
+            else:
+                count_api_error("google_drive", getattr(getattr(exception, "resp", None), "status", "network"))
+                results[index] = {"success": False, "error": f"Google Drive APIエラー: {str(exception)}"}
+
+        if self.base_url:
+            from googleapiclient.http import BatchHttpRequest
+            batch = BatchHttpRequest(callback=callback, batch_uri=f"{self.base_url.rstrip('/')}/batch/drive/v3")
+        else:
+            batch = self.service.new_batch_http_request(callback=callback)
+        for index, request in enumerate(batch_requests):
+            batch.add(request, request_id=str(index))
+
+        try:
+            self.ensure_fresh_token()
+            with timer(timer_name):
+                self._execute(batch, cost=len(batch_requests))
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            error_message = f"Google Drive APIエラー: {str(e)}"
+            return [result or {"success": False, "error": error_message} for result in results]
+        return results
+
+    def add_permissions_batch(self, entries: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        複数の権限をバッチリクエストでまとめて追加
+
+        Args:
+            entries: (メールアドレス, 権限の種類) のリスト（最大 DRIVE_BATCH_SIZE 件）
+
+        Returns:
+            entries と同じ順序の行ごとの結果
+        """
+        return self._execute_batch([
+            self.service.permissions().create(
+                fileId=self.file_id,
+                body={'type': 'user', 'role': role, 'emailAddress': email},
+                sendNotificationEmail=True,
+                fields='id'
+            )
+            for email, role in entries
+        ], "drive_permission_batch")
+
+    def update_permissions_batch(self, entries: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        複数の権限の種類をバッチリクエストでまとめて変更
+
+        Args:
+            entries: (権限ID, 変更後の権限の種類) のリスト（最大 DRIVE_BATCH_SIZE 件）
+
+        Returns:
+            entries と同じ順序の行ごとの結果
+        """
+        return self._execute_batch([
+            self.service.permissions().update(
+                fileId=self.file_id,
+                permissionId=permission_id,
+                body={'role': role},
+                fields='id',
+                supportsAllDrives=True
+            )
+            for permission_id, role in entries
+        ], "drive_permission_batch")
+
+    def remove_permissions_batch(self, permission_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        複数の権限をバッチリクエストでまとめて削除
+
+        Args:
+            permission_ids: 権限IDのリスト（最大 DRIVE_BATCH_SIZE 件）
+
+        Returns:
+            permission_ids と同じ順序の行ごとの結果
+        """
+        return self._execute_batch([
+            self.service.permissions().delete(
+                fileId=self.file_id,
+                permissionId=permission_id,
+                supportsAllDrives=True
+            )
+            for permission_id in permission_ids
+        ], "drive_permission_batch")
+
+
+def get_target_id(tool: str, target: Optional[str] = None) -> str:
+    """
+    依頼の付与先（ボードIDまたはファイルID）を取得
 
-def execute_account_request(email: str, tool: str, background: str, permission: str = None) -> Dict[str, Any]:
+    Args:
+        tool: ツール名 (trello または google_drive)
+        target: 付与先の別名（省略時はツールの既定の付与先）
+
+    Returns:
+        付与先のID（既定の付与先が未設定の場合は空文字。発行時に resolve_request_target がエラーにする）
+
+    Raises:
+        ValueError: 付与先の別名が未登録、またはツールが一致しない場合（メッセージに別名を含む）
+    """
+    registry = get_target_registry()
+    if target is None and registry.default_for(tool) is None:
+        return ""
+    return registry.resolve(tool, target).id
+
+
+_client_lock = threading.Lock()
+# 付与先のID → 共有クライアント（付与先ごとに1つ）
+_trello_clients: Dict[str, TrelloAPIClient] = {}
+_drive_clients: Dict[str, GoogleDriveAPIClient] = {}
+
+
+def get_trello_client(board_id: Optional[str] = None) -> TrelloAPIClient:
+    """
+    プロセス全体で共有する Trello API クライアントを取得
+
+    Args:
+        board_id: ボードID（省略時は既定の付与先）
+
+    Returns:
+        ボードごとの共有の TrelloAPIClient
+    """
+    board_id = board_id or get_target_id("trello")
+    client = _trello_clients.get(board_id)
+    if client is None:
+        with _client_lock:
+            client = _trello_clients.get(board_id)
+            if client is None:
+                client = _trello_clients[board_id] = TrelloAPIClient(board_id)
+    return client
+
+
+def get_drive_client(file_id: Optional[str] = None) -> GoogleDriveAPIClient:
+    """
+    プロセス全体で共有する Google Drive API クライアントを取得
+
+    ファイルごとに初回呼び出し時のみ認証情報の読み込みとサービスの構築を行い、
+    以降は全てのセッションで同じクライアントを返す。
+
+    Args:
+        file_id: ファイルID（省略時は既定の付与先）
+
+    Returns:
+        ファイルごとの共有の GoogleDriveAPIClient
+    """
+    file_id = file_id or get_target_id("google_drive")
+    client = _drive_clients.get(file_id)
+    if client is None:
+        with _client_lock:
+            client = _drive_clients.get(file_id)
+            if client is None:
+                client = _drive_clients[file_id] = GoogleDriveAPIClient(file_id)
+    return client
+
+
+def reset_clients():
+    """共有クライアントと付与先レジストリを破棄（環境変数・設定ファイルの変更時やテスト用）"""
+    with _client_lock:
+        _trello_clients.clear()
+        _drive_clients.clear()
+    reset_target_registry()
+
+
+def find_cached_grant(email: str, tool: str, background: str, permission: str = None,
+                      target: str = None) -> Optional[Dict[str, Any]]:
+    """
+    付与済みキャッシュまたはアクセス権インデックスで足りる依頼かチェック
+
+    付与済みの権限が依頼された権限以上であれば、API を呼ばずに成功結果を返す。
+    依頼された権限の方が強い場合は None を返し、権限の引き上げだけを行わせる。
+
+    Args:
+        email: メールアドレス
+        tool: ツール名
+        background: 背景
+        permission: 権限 (Google Driveの場合のみ)
+        target: 付与先の別名（省略時はツールの既定の付与先）
+
+    Returns:
+        キャッシュから作った実行結果、API 呼び出しが必要な場合は None
+    """
+    from src.access_index import current_access_index
+
+    requested_role = permission if tool == "google_drive" else "member"
+    granted_role = get_grant_cache().lookup(email, tool, get_target_id(tool, target))
+    if granted_role is None or not role_covers(granted_role, requested_role):
+        # アクセス権インデックスは既定の付与先のみを保持する
+        index = current_access_index() if get_target_registry().is_default(tool, target) else None
+        granted_role = index.lookup(email, tool) if index is not None else None
+        if granted_role is None or not role_covers(granted_role, requested_role):
+            return None
+
+    result = {
+        "success": True,
+        "tool": tool,
+        "email": email,
+        "background": background,
+        "result": {"success": True, "cached": True, "granted_role": granted_role}
+    }
+    if tool == "google_drive":
+        result["permission"] = permission
+    if target is not None:
+        result["target"] = target
+    return result
+
+
+def record_grant(email: str, tool: str, permission: str = None, response_data: Dict[str, Any] = None,
+                 target: str = None):
+    """
+    成功した付与を付与済みキャッシュとアクセス権インデックスに記録
+
+    Args:
+        email: メールアドレス
+        tool: ツール名
+        permission: 権限 (Google Driveの場合のみ)
+        response_data: APIの応答（Trello の場合はボードのメンバー一覧を含む）
+        target: 付与先の別名（省略時はツールの既定の付与先）
+    """
+    from src.access_index import current_access_index
+
+    role = permission if tool == "google_drive" else "member"
+    get_grant_cache().record(email, tool, get_target_id(tool, target), role)
+
+    index = current_access_index() if get_target_registry().is_default(tool, target) else None
+    if index is None:
+        return
+    if tool == "trello":
+        index.record_trello_member(email, (response_data or {}).get("members", []))
+    else:
+        index.record_drive_permission(email, role)
+
+
+def forget_grant(email: str, tool: str, target: str = None):
+    """
+    削除したアクセス権を付与済みキャッシュとアクセス権インデックスから取り除く
+
+    権限を引き下げた場合は、この後に record_grant で引き下げた権限を記録する。
+
+    Args:
+        email: メールアドレス
+        tool: ツール名
+        target: 付与先の別名（省略時はツールの既定の付与先）
+    """
+    from src.access_index import current_access_index
+
+    get_grant_cache().forget(email, tool, get_target_id(tool, target))
+    index = current_access_index() if get_target_registry().is_default(tool, target) else None
+    if index is not None:
+        index.forget(email, tool)
+
+
+def resolve_request_target(tool: str, permission: Optional[str], target: Optional[str]) -> ProvisioningTarget:
+    """
+    依頼の付与先を決定し、付与先で許可された権限かチェック
+
+    Args:
+        tool: ツール名
+        permission: 権限 (Google Driveの場合のみ)
+        target: 付与先の別名（省略時はツールの既定の付与先）
+
+    Returns:
+        付与先
+
+    Raises:
+        ValueError: 付与先が登録されていない、または付与先で許可されていない権限の場合
+    """
+    if tool not in ("trello", "google_drive"):
+        raise ValueError(f"未対応のツール: {tool}")
+    spec = get_target_registry().resolve(tool, target)
+    if tool == "google_drive":
+        if not permission:
+            raise ValueError("Google Driveの場合は権限を指定してください。")
+        if permission not in spec.roles:
+            raise ValueError(f"{spec.name} では {permission} 権限を付与できません（{', '.join(spec.roles)} のみ）。")
+    return spec
+
+
+def failure_result(error: Exception, tool: str = None) -> Dict[str, Any]:
+    """
+    失敗した依頼の実行結果を作成
+
+    ブレーカーが開いていて呼び出さなかった場合と、この失敗でブレーカーが開いた場合は deferred を付け、
+    ジョブキューで復旧後に再実行させる（上流の障害を依頼の試行回数に数えない）。
+
+    Args:
+        error: 発生したエラー
+        tool: 依頼のツール名
+
+    Returns:
+        実行結果
+    """
+    result = {"success": False, "error": str(error)}
+    breaker = get_circuit_breaker(tool) if tool else None
+    if isinstance(error, CircuitOpenError):
+        result["deferred"] = True
+        result["retry_at"] = error.retry_at
+    elif breaker is not None and not isinstance(error, ValueError) and breaker.is_open():
+        result["deferred"] = True
+        result["retry_at"] = breaker.retry_at
+    return result
+
+
+@audited
+def execute_account_request(email: str, tool: str, background: str, permission: str = None,
+                            target: str = None) -> Dict[str, Any]:
     """
     アカウント発行リクエストを実行
 
@@ -127,6 +792,7 @@ def execute_account_request(email: str, tool: str, background: str, permission:
         tool: ツール名 (trello または google_drive)
         background: 背景
         permission: 権限 (Google Driveの場合のみ)
+        target: 付与先の別名（省略時はツールの既定の付与先）
 
     Returns:
         実行結果
@@ -135,22 +801,29 @@ def execute_account_request(email: str, tool: str, background: str, permission:
         Exception: API実行エラー
     """
     try:
+        spec = resolve_request_target(tool, permission, target)
+
+        cached = find_cached_grant(email, tool, background, permission, target)
+        if cached is not None:
+            return cached
+
         if tool == "trello":
-            client = TrelloAPIClient()
+            client = get_trello_client(spec.id)
             result = client.add_member_to_board(email)
-            return {
+            record_grant(email, tool, response_data=result["data"], target=target)
+            response = {
                 "success": True,
                 "tool": "trello",
                 "email": email,
                 "background": background,
                 "result": result
             }
-        elif tool == "google_drive":
-            if not permission:
-                raise ValueError("Google Driveの場合は権限を指定してください。")
-            client = GoogleDriveAPIClient()
+        else:
+            client = get_drive_client(spec.id)
+            # 既存の権限より強い権限の作成は、Drive 側で権限の引き上げとして扱われる
             result = client.add_permission(email, permission)
-            return {
+            record_grant(email, tool, permission, target=target)
+            response = {
                 "success": True,
                 "tool": "google_drive",
                 "email": email,
@@ -158,10 +831,106 @@ def execute_account_request(email: str, tool: str, background: str, permission:
                 "background": background,
                 "result": result
             }
-        else:
-            raise ValueError(f"未対応のツール: {tool}")
+        if target is not None:
+            response["target"] = target
+        return response
     except Exception as e:
-        return {
-            "success": False,
-            "error": str(e)
-        }
+        return failure_result(e, tool)
+
+
+def execute_batch_account_requests(account_requests: List[AccountRequest], max_workers: int = None) -> List[Dict[str, Any]]:
+    """
+    複数のアカウント発行リクエストを並行して実行
+
+    Trello は共有セッション上で1件ずつ、Google Drive は付与先のファイルごとに DRIVE_BATCH_SIZE 件ずつの
+    バッチリクエストとして、上限付きのワーカープールで実行する。
+
+    Args:
+        account_requests: アカウント発行依頼のリスト
+        max_workers: 同時実行数の上限（省略時は BATCH_MAX_WORKERS 環境変数）
+
+    Returns:
+        account_requests と同じ順序の行ごとの実行結果
+    """
+    if max_workers is None:
+        max_workers = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+
+    results: List[Dict[str, Any]] = [None] * len(account_requests)
+    # ファイルID → そのファイルへの依頼の位置
+    drive_indexes: Dict[str, List[int]] = {}
+    for i, request in enumerate(account_requests):
+        if request.tool != "google_drive":
+            continue
+        start = time.perf_counter()
+        try:
+            spec = resolve_request_target(request.tool, request.permission, request.target)
+            results[i] = find_cached_grant(
+                request.email, request.tool, request.background, request.permission, request.target
+            )
+        except ValueError as e:
+            results[i] = {"success": False, "error": str(e)}
+        if results[i] is None:
+            drive_indexes.setdefault(spec.id, []).append(i)
+        else:
+            record_outcome(
+                request.email, request.tool, request.background, request.permission,
+                results[i], time.perf_counter() - start, request.target
+            )
+    other_indexes = [i for i, request in enumerate(account_requests) if request.tool != "google_drive"]
+
+    def run_single(index: int):
+        request = account_requests[index]
+        results[index] = execute_account_request(
+            email=request.email,
+            tool=request.tool,
+            background=request.background,
+            permission=request.permission,
+            target=request.target
+        )
+
+    def run_drive_chunk(file_id: str, indexes: List[int]):
+        start = time.perf_counter()
+        try:
+            client = get_drive_client(file_id)
+            chunk_results = client.add_permissions_batch(
+                [(account_requests[i].email, account_requests[i].permission) for i in indexes]
+            )
+        except Exception as e:
+            chunk_results = [failure_result(e, "google_drive")] * len(indexes)
+
+        for index, result in zip(indexes, chunk_results):
+            request = account_requests[index]
+            if result["success"]:
+                record_grant(request.email, request.tool, request.permission, target=request.target)
+                results[index] = {
+                    "success": True,
+                    "tool": "google_drive",
+                    "email": request.email,
+                    "permission": request.permission,
+                    "background": request.background,
+                    "result": result
+                }
+            else:
+                results[index] = dict(result)
+            # バッチ内の各行は、バッチ全体の完了を待つため、バッチの所要時間を記録する
+            record_outcome(
+                request.email, request.tool, request.background, request.permission,
+                results[index], time.perf_counter() - start, request.target
+            )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_single, i) for i in other_indexes]
+        for file_id, indexes in drive_indexes.items():
+            for start in range(0, len(indexes), DRIVE_BATCH_SIZE):
+                futures.append(executor.submit(run_drive_chunk, file_id, indexes[start:start + DRIVE_BATCH_SIZE]))
+        for future in futures:
+            future.result()
+
+    # 失敗行にも依頼内容を残して、行ごとに報告できるようにする
+    for request, result in zip(account_requests, results):
+        result.setdefault("email", request.email)
+        result.setdefault("tool", request.tool)
+        result.setdefault("permission", request.permission)
+        if request.target is not None:
+            result.setdefault("target", request.target)
+    return results
@@ -0,0 +1,254 @@
+"""
+HTTP/JSON API（ASGI）
+Streamlit を使わずに ChatbotManager を呼び出すためのステートレスなエントリーポイント
+
+会話状態はリクエストごとにセッションストアから読み込み・保存するため、
+ロードバランサーの背後で複数のワーカープロセスを起動しても、どのプロセスでも同じセッションを扱える。
+同じセッションへの同時のリクエストは、セッションストアのロックで1つずつ処理する。
+セッションストアは全プロセスで共有する sqlite（既定）または redis を使う（memory はワーカー1つの開発用）。
+
+    uvicorn src.api_server:app --workers 4
+    SESSION_STORE_BACKEND=redis uvicorn src.api_server:app --workers 4
+"""
+
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from src.access_index import get_access_index
+from src.chat_history import ChatHistory
+from src.job_queue import get_job_queue
+from src.langchain_setup import ChatbotManager, InvalidRequestError
+from src.metrics import registry
+from src.models import ChatSession
+from src.prompts import ERROR_MESSAGES, get_job_accepted_message
+from src.session_store import MemorySessionStore, SessionLockTimeout, get_session_store
+
+# 環境変数の読み込み
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 同じセッションの別のリクエストが終わらなかった場合の応答
+SESSION_BUSY_MESSAGE = "同じセッションの別のメッセージを処理中です。しばらくしてから再度送信してください。"
+# 依頼を登録できなかった場合の応答（内部のエラーの詳細はログにのみ残す）
+PROVISION_FAILED_MESSAGE = ERROR_MESSAGES['api_error'].format(error_details="依頼を登録できませんでした。")
+
+
+def error_response(status_code: int, message: str) -> JSONResponse:
+    """エラー応答を生成"""
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def check_session_store():
+    """
+    複数のワーカープロセスで memory のセッションストアを使う設定を拒否
+
+    ワーカー数は uvicorn・gunicorn が既定値として読む WEB_CONCURRENCY で判定する。
+
+    Raises:
+        RuntimeError: WEB_CONCURRENCY が2以上で、セッションストアが memory の場合
+    """
+    workers = int(os.getenv("WEB_CONCURRENCY") or "1")
+    if workers > 1 and isinstance(get_session_store(), MemorySessionStore):
+        raise RuntimeError(
+            "memory のセッションストアはワーカープロセスごとに別になるため、複数のワーカーでは使えません。"
+            "SESSION_STORE_BACKEND=sqlite または redis を指定してください。"
+        )
+
+
+def load_manager(session: ChatSession) -> ChatbotManager:
+    """保存されたセッションの会話状態で ChatbotManager を生成"""
+    manager = ChatbotManager()
+    manager.state = session.state
+    manager.access_index = get_access_index()
+    return manager
+
+
+def session_response(session_id: str, session: ChatSession, **extra) -> dict:
+    """セッションの状態を応答用の辞書に変換"""
+    return {
+        "session_id": session_id,
+        "ready": session.state.is_complete(),
+        "state": session.state.model_dump(mode="json"),
+        **extra
+    }
+
+
+def handle_message(session_id: str, message: str) -> dict:
+    """
+    ユーザーの入力でセッションを1ターン進める
+
+    Args:
+        session_id: セッションID
+        message: ユーザーの入力
+
+    Returns:
+        ボットの返答を含むセッションの状態
+    """
+    store = get_session_store()
+    with store.lock(session_id):
+        session = store.load(session_id) or ChatSession()
+        manager = load_manager(session)
+
+        reply = "".join(manager.stream_response(message))
+
+        history = ChatHistory.from_session(session)
+        history.append("user", message)
+        history.append("assistant", reply)
+        summary = manager.last_request_summary()
+        if summary is not None:
+            history.close_request(summary)
+        history.save_to(session)
+        session.state = manager.state
+        store.save(session_id, session)
+    return session_response(session_id, session, reply=reply)
+
+
+def handle_provision(session_id: str) -> JSONResponse:
+    """
+    情報が揃った依頼をジョブキューに登録する
+
+    Args:
+        session_id: セッションID
+
+    Returns:
+        登録したジョブIDを含む応答
+    """
+    store = get_session_store()
+    try:
+        with store.lock(session_id):
+            return provision_locked(store, session_id)
+    except SessionLockTimeout:
+        return error_response(409, SESSION_BUSY_MESSAGE)
+
+
+def provision_locked(store, session_id: str) -> JSONResponse:
+    """handle_provision の本体（セッションのロックを取得して呼ぶ）"""
+    session = store.load(session_id)
+    if session is None:
+        return error_response(404, "セッションが見つかりません。")
+    if not session.state.is_complete():
+        return error_response(409, "依頼に必要な情報が揃っていません。")
+
+    manager = load_manager(session)
+    try:
+        job_ids = manager.enqueue_request(get_job_queue())
+    except InvalidRequestError as e:
+        # 無効な項目を消した会話状態を保存し、尋ね直す返答を返す（会話はそのまま続けられる）
+        history = ChatHistory.from_session(session)
+        history.append("assistant", str(e))
+        history.save_to(session)
+        session.state = manager.state
+        store.save(session_id, session)
+        return JSONResponse(session_response(session_id, session, reply=str(e)), status_code=422)
+    except Exception:
+        logger.exception("セッション %s の依頼をジョブキューに登録できませんでした", session_id)
+        return error_response(502, PROVISION_FAILED_MESSAGE)
+
+    summary = manager.summarize_request(job_ids)
+    reply = get_job_accepted_message(job_ids, manager.unavailable_tools())
+    # 依頼内容はジョブに保存済みのため、次の依頼を受け付けられるよう状態をリセット
+    manager.reset_conversation()
+
+    history = ChatHistory.from_session(session)
+    history.append("assistant", reply)
+    history.close_request(summary)
+    history.save_to(session)
+    session.state = manager.state
+    session.pending_jobs.append(job_ids)
+    store.save(session_id, session)
+
+    return JSONResponse(session_response(session_id, session, reply=reply, job_ids=job_ids), status_code=202)
+
+
+async def post_message(request: Request) -> JSONResponse:
+    """
+    POST /sessions/{session_id}/messages
+
+    リクエスト: {"message": "ユーザーの入力"}
+    応答: ボットの返答と、全ての情報が揃ったか（ready）
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return error_response(400, "リクエストボディは JSON で指定してください。")
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        return error_response(400, "message を指定してください。")
+
+    # 抽出・LLM・セッションストアの読み書きはブロッキングのため、スレッドプールで実行する
+    try:
+        result = await run_in_threadpool(handle_message, request.path_params["session_id"], message)
+    except SessionLockTimeout:
+        return error_response(409, SESSION_BUSY_MESSAGE)
+    return JSONResponse(result)
+
+
+async def post_provision(request: Request) -> JSONResponse:
+    """
+    POST /sessions/{session_id}/provision
+
+    ジョブの結果は GET /jobs/{job_id} で確認する。
+    """
+    return await run_in_threadpool(handle_provision, request.path_params["session_id"])
+
+
+def get_session(request: Request) -> JSONResponse:
+    """GET /sessions/{session_id}: 会話状態と履歴を取得"""
+    session_id = request.path_params["session_id"]
+    session = get_session_store().load(session_id)
+    if session is None:
+        return error_response(404, "セッションが見つかりません。")
+    return JSONResponse(session_response(
+        session_id,
+        session,
+        messages=[message.model_dump() for message in session.messages],
+        summaries=ChatHistory.from_session(session).compacted_summaries(),
+        pending_jobs=session.pending_jobs
+    ))
+
+
+def get_job(request: Request) -> JSONResponse:
+    """GET /jobs/{job_id}: ジョブの状態を取得"""
+    job = get_job_queue().get(request.path_params["job_id"])
+    if job is None:
+        return error_response(404, "ジョブが見つかりません。")
+    return JSONResponse({**job, "request": job["request"].model_dump(mode="json")})
+
+
+def get_metrics(request: Request) -> PlainTextResponse:
+    """GET /metrics: Prometheus 形式のメトリクス"""
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def healthz(request: Request) -> JSONResponse:
+    """GET /healthz: ロードバランサーのヘルスチェック"""
+    return JSONResponse({"status": "ok"})
+
+
+routes = [
+    Route("/sessions/{session_id}/messages", post_message, methods=["POST"]),
+    Route("/sessions/{session_id}/provision", post_provision, methods=["POST"]),
+    Route("/sessions/{session_id}", get_session, methods=["GET"]),
+    Route("/jobs/{job_id}", get_job, methods=["GET"]),
+    Route("/metrics", get_metrics, methods=["GET"]),
+    Route("/healthz", healthz, methods=["GET"]),
+]
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """起動時にセッションストアの設定を確認"""
+    check_session_store()
+    yield
+
+
+app = Starlette(routes=routes, lifespan=lifespan)
@@ -0,0 +1,357 @@
+"""
+非同期 API クライアント
+共有の非同期HTTPクライアント上で Trello API と Google Drive API を呼び出す
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from src.audit_log import audited
+from src.api_clients import (
+    GoogleDriveAPIClient, failure_result, find_cached_grant, get_drive_client, record_grant,
+    resolve_request_target
+)
+from src.circuit_breaker import get_circuit_breaker
+from src.http_session import get_retry_settings, get_retry_status_codes, get_timeouts, parse_rate_limit_delay
+from src.metrics import count_api_error, timer
+from src.models import AccountRequest
+from src.rate_limit import get_rate_limiter, is_drive_rate_limit
+
+# イベントループごとの共有クライアント（httpx.AsyncClient はループをまたいで使えない）
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    実行中のイベントループで共有する非同期HTTPクライアントを取得
+
+    Returns:
+        共有の httpx.AsyncClient
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+        connect_timeout, read_timeout = get_timeouts()
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    """実行中のイベントループの共有クライアントを閉じる"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def request_with_retry(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    429/5xx をバックオフ付きでリトライしながらリクエストを送信
+
+    Args:
+        method: HTTPメソッド
+        url: リクエストURL
+        **kwargs: httpx に渡す引数
+
+    Returns:
+        最後に受け取ったレスポンス
+    """
+    max_retries, backoff_factor = get_retry_settings()
+    retry_status_codes = get_retry_status_codes()
+    client = get_async_http_client()
+
+    for attempt in range(max_retries + 1):
+        response = await client.request(method, url, **kwargs)
+        if response.status_code not in retry_status_codes or attempt == max_retries:
+            return response
+        delay = parse_rate_limit_delay(response.status_code, response.headers)
+        if delay is None:
+            delay = backoff_factor * (2 ** attempt)
+        await asyncio.sleep(delay)
+    return response
+
+
+async def request_guarded(api: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    サーキットブレーカーを通して request_with_retry でリクエストを送信
+
+    Raises:
+        CircuitOpenError: 上流 API が応答せず、呼び出しを一時停止している場合
+    """
+    breaker = get_circuit_breaker(api)
+    if breaker is None:
+        return await request_with_retry(method, url, **kwargs)
+
+    breaker.before_call()
+    try:
+        response = await request_with_retry(method, url, **kwargs)
+    except httpx.TransportError:
+        breaker.record_failure()
+        raise
+    breaker.record_status(response.status_code)
+    return response
+
+
+async def request_rate_limited(api: str, credential: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    レート制限の空きを待ってから request_with_retry でリクエストを送信
+
+    レート制限を受けた場合は応答ヘッダーの待機時間を全プロセスのバケットに反映し、空きを待って再送する
+    （RATE_LIMIT_MAX_WAIT 秒を超えた場合は最後の応答を返す）。
+
+    Args:
+        api: API 名 (trello または google_drive)
+        credential: 認証情報の識別子
+        method: HTTPメソッド
+        url: リクエストURL
+        **kwargs: httpx に渡す引数
+
+    Returns:
+        最後に受け取ったレスポンス
+    """
+    limiter = get_rate_limiter()
+    if limiter is None:
+        return await request_guarded(api, method, url, **kwargs)
+
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        # ブレーカーが開いている間はバケットのトークンを消費しない
+        breaker = get_circuit_breaker(api)
+        if breaker is not None and breaker.is_open():
+            breaker.before_call()
+        await limiter.acquire_async(api, credential)
+        response = await request_guarded(api, method, url, **kwargs)
+        limited = is_drive_rate_limit(response.status_code, response.content) if api == "google_drive" else None
+        delay = await asyncio.to_thread(
+            limiter.observe_response, api, credential, response.status_code, response.headers, attempt, limited
+        )
+        if delay is None or time.monotonic() - start + delay > limiter.max_wait:
+            return response
+        attempt += 1
+
+
+class AsyncTrelloAPIClient:
+    """非同期 Trello API クライアント"""
+
+    def __init__(self, board_id: Optional[str] = None):
+        self.api_key = os.getenv("TRELLO_API_KEY")
+        self.api_token = os.getenv("TRELLO_API_TOKEN")
+        self.board_id = board_id or os.getenv("TRELLO_BOARD_ID")
+        self.base_url = os.getenv("TRELLO_API_BASE_URL", "https://api.trello.com")
+
+        if not all([self.api_key, self.api_token, self.board_id]):
+            raise ValueError("Trello API の環境変数が設定されていません。")
+
+    async def add_member_to_board(self, email: str) -> Dict[str, Any]:
+        """
+        ボードにメンバーを追加
+
+        Args:
+            email: 追加するメンバーのメールアドレス
+
+        Returns:
+            APIレスポンス
+
+        Raises:
+            Exception: API呼び出しエラー
+        """
+        url = f"{self.base_url}/1/boards/{self.board_id}/members"
+
+        params = {
+            "email": email,
+            "type": "normal",
+            "key": self.api_key,
+            "token": self.api_token
+        }
+
+        try:
+            with timer("trello_add_member"):
+                response = await request_rate_limited("trello", self.api_key, "PUT", url, params=params)
+            response.raise_for_status()
+            return {"success": True, "data": response.json()}
+        except httpx.HTTPStatusError as e:
+            count_api_error("trello", e.response.status_code)
+            try:
+                error_message = f"{str(e)}\n詳細: {e.response.json()}"
+            except ValueError:
+                error_message = f"{str(e)}\nステータスコード: {e.response.status_code}"
+            raise Exception(f"Trello APIエラー: {error_message}")
+        except httpx.HTTPError as e:
+            count_api_error("trello", "network")
+            raise Exception(f"Trello APIエラー: {str(e)}")
+
+
+class AsyncGoogleDriveAPIClient:
+    """非同期 Google Drive API クライアント"""
+
+    def __init__(self, drive_client: GoogleDriveAPIClient):
+        # 認証情報は同じファイルの同期クライアントと共有する
+        self.drive_client = drive_client
+        self.file_id = self.drive_client.file_id
+        self.base_url = os.getenv("GOOGLE_DRIVE_API_BASE_URL", "https://www.googleapis.com")
+
+    @classmethod
+    async def create(cls, file_id: Optional[str] = None) -> "AsyncGoogleDriveAPIClient":
+        """
+        ファイルのクライアントを生成
+
+        初回の同期クライアントの生成（サービスアカウントの読み込み・ディスカバリ文書の構築）は
+        ブロッキングのため、イベントループを止めないようスレッドで実行する。
+
+        Args:
+            file_id: ファイルID（省略時は GOOGLE_DRIVE_FILE_ID）
+        """
+        return cls(await asyncio.to_thread(get_drive_client, file_id))
+
+    async def add_permission(self, email: str, role: str) -> Dict[str, Any]:
+        """
+        ファイルに権限を追加
+
+        Args:
+            email: 権限を付与するユーザーのメールアドレス
+            role: 権限の種類 (reader, commenter, writer)
+
+        Returns:
+            APIレスポンス
+
+        Raises:
+            Exception: API呼び出しエラー
+        """
+        url = f"{self.base_url}/drive/v3/files/{self.file_id}/permissions"
+
+        try:
+            # トークン更新は同期処理のためスレッドで実行
+            await asyncio.to_thread(self.drive_client.ensure_fresh_token)
+            with timer("drive_permission_create"):
+                response = await request_rate_limited(
+                    "google_drive",
+                    self.drive_client.credential_id,
+                    "POST",
+                    url,
+                    params={"sendNotificationEmail": "true", "fields": "id"},
+                    json={"type": "user", "role": role, "emailAddress": email},
+                    headers={"Authorization": f"Bearer {self.drive_client.credentials.token}"}
+                )
+        except httpx.HTTPError as e:
+            count_api_error("google_drive", "network")
+            raise Exception(f"Google Drive APIエラー: {str(e)}")
+
+        if response.is_error:
+            count_api_error("google_drive", response.status_code)
+            error_message = f"Google Drive APIエラー: {response.status_code} {response.text}"
+            if response.status_code == 404:
+                error_message += "\nファイルが見つかりません。GOOGLE_DRIVE_FILE_IDを確認してください。"
+            elif response.status_code == 403:
+                error_message += "\n権限がありません。サービスアカウントの権限を確認してください。"
+            raise Exception(error_message)
+        return {"success": True, "data": response.json()}
+
+
+@audited
+async def execute_account_request_async(email: str, tool: str, background: str, permission: str = None,
+                                        target: str = None) -> Dict[str, Any]:
+    """
+    アカウント発行リクエストを非同期で実行
+
+    Args:
+        email: メールアドレス
+        tool: ツール名 (trello または google_drive)
+        background: 背景
+        permission: 権限 (Google Driveの場合のみ)
+        target: 付与先の別名（省略時はツールの既定の付与先）
+
+    Returns:
+        実行結果（execute_account_request と同じ形式）
+    """
+    try:
+        spec = resolve_request_target(tool, permission, target)
+
+        # 付与済みキャッシュは SQLite に永続化している場合があるため、参照・記録はスレッドで行う
+        cached = await asyncio.to_thread(find_cached_grant, email, tool, background, permission, target)
+        if cached is not None:
+            return cached
+
+        if tool == "trello":
+            result = await AsyncTrelloAPIClient(spec.id).add_member_to_board(email)
+            await asyncio.to_thread(record_grant, email, tool, response_data=result["data"], target=target)
+            response = {
+                "success": True,
+                "tool": "trello",
+                "email": email,
+                "background": background,
+                "result": result
+            }
+        else:
+            client = await AsyncGoogleDriveAPIClient.create(spec.id)
+            result = await client.add_permission(email, permission)
+            await asyncio.to_thread(record_grant, email, tool, permission, target=target)
+            response = {
+                "success": True,
+                "tool": "google_drive",
+                "email": email,
+                "permission": permission,
+                "background": background,
+                "result": result
+            }
+        if target is not None:
+            response["target"] = target
+        return response
+    except Exception as e:
+        return failure_result(e, tool)
+
+
+class ProvisioningScheduler:
+    """
+    ツールごとの同時実行数を制限しながらアカウント発行を並行実行するスケジューラ
+
+    1つのイベントループ内で共有し、複数セッションからの依頼をまとめて捌く。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = limits or {
+            "trello": int(os.getenv("ASYNC_TRELLO_CONCURRENCY", "5")),
+            "google_drive": int(os.getenv("ASYNC_DRIVE_CONCURRENCY", "10")),
+        }
+        self._semaphores = {tool: asyncio.Semaphore(limit) for tool, limit in self.limits.items()}
+
+    async def submit(self, request: AccountRequest) -> Dict[str, Any]:
+        """
+        1件の依頼を実行（ツールの同時実行数の上限に達している場合は待機）
+
+        Args:
+            request: アカウント発行依頼
+
+        Returns:
+            実行結果
+        """
+        semaphore = self._semaphores.get(request.tool)
+        if semaphore is None:
+            return await execute_account_request_async(
+                request.email, request.tool, request.background, request.permission, request.target
+            )
+        async with semaphore:
+            return await execute_account_request_async(
+                request.email, request.tool, request.background, request.permission, request.target
+            )
+
+    async def run(self, requests: List[AccountRequest]) -> List[Dict[str, Any]]:
+        """
+        複数の依頼を並行実行
+
+        Args:
+            requests: アカウント発行依頼のリスト
+
+        Returns:
+            requests と同じ順序の実行結果
+        """
+        return await asyncio.gather(*(self.submit(request) for request in requests))
@@ -0,0 +1,492 @@
+"""
+監査ログ
+アカウント発行の結果（誰に・なぜ・いつ・どの権限を付与したか）を追記専用のログに記録
+
+記録はメモリ上に貯めてバックグラウンドのスレッドがまとめて書き込むため、発行処理を待たせない。
+ログは JSON Lines のファイルに追記し、一定のサイズでファイルを切り替える。
+検索用に SQLite（WALモード）のインデックスへ（メールアドレス, ツール, 権限, 時刻 → ファイル, 位置）を記録し、
+検索時はインデックスで絞り込んだ行だけをファイルから読み込む。
+書き込みに失敗した記録はバッファに戻して間隔を空けながら再試行し、バッファが上限に達した間の記録は破棄して件数を数える。
+"""
+
+import asyncio
+import atexit
+import functools
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.metrics import count
+
+logger = logging.getLogger(__name__)
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ts REAL NOT NULL,
+    email TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    permission TEXT,
+    success INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_email ON entries (email, ts);
+CREATE INDEX IF NOT EXISTS entries_tool ON entries (tool, permission, ts);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts);
+"""
+
+INDEX_FILE = "index.db"
+
+# 書き込みに失敗し続けた場合の再試行の最大間隔（秒）
+MAX_RETRY_INTERVAL = 30.0
+
+
+class AuditLog:
+    """追記専用・サイズで切り替える監査ログ"""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        flush_interval: float = 0.2,
+        fsync_interval: float = 1.0,
+        batch_size: int = 256,
+        max_buffer: int = 100000
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # バッファを書き込む間隔と、ディスクへの同期（fsync）の間隔（秒）
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        # この件数が貯まったら間隔を待たずに書き込む
+        self.batch_size = batch_size
+        # 書き込めない間にバッファに貯める最大件数（超えた記録は破棄して dropped に数える）
+        self.max_buffer = max_buffer
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # ログファイルとインデックスへの書き込みは1スレッドずつ
+        self._write_lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._wake = threading.Event()
+        self._stopped = False
+        self._file = None
+        self._file_name: Optional[str] = None
+        self._file_size = 0
+        self._sequence = 0
+        self._last_fsync = time.monotonic()
+        # 連続して書き込みに失敗した回数と、失敗・破棄の累計
+        self._failures = 0
+        self._in_flight = 0
+        self.write_errors = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self._index = _open_index(directory, check_same_thread=False)
+        self._local = threading.local()
+
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """検索用の、現在のスレッドのインデックスへのコネクションを取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _open_index(self.directory)
+            self._local.conn = conn
+        return conn
+
+    def record(self, entry: Dict[str, Any]):
+        """
+        記録をバッファに追加（書き込みはバックグラウンドで行う）
+
+        Args:
+            entry: 記録（ts, email, tool, permission, success を含む）
+        """
+        with self._lock:
+            # 書き込み中の記録も、失敗した場合はバッファに戻るため上限に含める
+            if len(self._buffer) + self._in_flight >= self.max_buffer:
+                self.dropped += 1
+                dropped = self.dropped
+            else:
+                self._buffer.append(entry)
+                dropped = 0
+            # 書き込みに失敗している間は、再試行の間隔を待つ
+            full = len(self._buffer) >= self.batch_size and not self._failures
+        if dropped:
+            count("audit_dropped_total")
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.error("監査ログのバッファが上限（%d 件）に達したため、記録を破棄しました（累計 %d 件）",
+                             self.max_buffer, dropped)
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        """バッファを定期的に書き込む（失敗した場合は間隔を倍にしながら再試行し、スレッドは止めない）"""
+        while not self._stopped:
+            interval = self.flush_interval
+            if self._failures:
+                interval = min(self.flush_interval * 2 ** self._failures, MAX_RETRY_INTERVAL)
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                with self._write_lock:
+                    self._flush()
+            except Exception as e:
+                self._report_failure(e)
+            else:
+                self._failures = 0
+
+    def _report_failure(self, error: Exception):
+        """書き込みの失敗を記録してログに出力"""
+        self._failures += 1
+        self.write_errors += 1
+        self.last_error = str(error)
+        count("audit_write_errors_total")
+        logger.error("監査ログを書き込めませんでした（連続 %d 回目、%d 件は再試行します）",
+                     self._failures, len(self._buffer), exc_info=error)
+
+    def stats(self) -> Dict[str, Any]:
+        """書き込み待ちの件数と、書き込みの失敗・破棄の累計を取得"""
+        with self._lock:
+            buffered = len(self._buffer) + self._in_flight
+        return {
+            "buffered": buffered,
+            "write_errors": self.write_errors,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+        }
+
+    def _open_next_file(self):
+        """新しいログファイルを開く"""
+        if self._file is not None:
+            # 同期に失敗しても、再試行は新しいファイルに書き込む
+            file, self._file = self._file, None
+            try:
+                os.fsync(file.fileno())
+            finally:
+                file.close()
+        self._sequence += 1
+        # 複数プロセスが同じディレクトリに書き込めるよう、ファイル名にプロセスIDを含める
+        self._file_name = f"audit-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:04d}.jsonl"
+        self._file = open(os.path.join(self.directory, self._file_name), "ab")
+        self._file_size = self._file.tell()
+
+    def _flush(self, sync: bool = False):
+        """
+        バッファの記録をまとめてログとインデックスに書き込む（_write_lock を取得して呼ぶ）
+
+        ログに書き込めなかった記録はバッファの先頭に戻して例外を送出する（次回の書き込みで再試行）。
+        """
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+            self._in_flight = len(entries)
+
+        lines = []
+        for entry in entries:
+            try:
+                line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+                row = (entry["ts"], entry["email"].lower(), entry["tool"], entry.get("permission"),
+                       int(bool(entry["success"])))
+            except (TypeError, ValueError, KeyError, AttributeError):
+                # 再試行しても書き込めない記録は破棄する
+                logger.exception("監査ログに書き込めない記録を破棄しました")
+                with self._lock:
+                    self.dropped += 1
+                count("audit_dropped_total")
+                continue
+            lines.append((entry, line, row))
+
+        written = 0
+        try:
+            chunks: List[bytes] = []
+            rows: List[tuple] = []
+            for _, line, row in lines:
+                if self._file is None or (self._file_size > 0 and self._file_size + len(line) > self.max_bytes):
+                    if chunks:
+                        self._write(chunks, rows)
+                        written += len(chunks)
+                        chunks, rows = [], []
+                    self._open_next_file()
+                rows.append(row + (self._file_name, self._file_size, len(line)))
+                chunks.append(line)
+                self._file_size += len(line)
+            if chunks:
+                self._write(chunks, rows)
+                written += len(chunks)
+
+            if self._file is not None and (sync or time.monotonic() - self._last_fsync >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                self._last_fsync = time.monotonic()
+        except BaseException:
+            with self._lock:
+                self._buffer[:0] = [entry for entry, _, _ in lines[written:]]
+            raise
+        finally:
+            with self._lock:
+                self._in_flight = 0
+
+    def _write(self, chunks: List[bytes], rows: List[tuple]):
+        """ログに追記し、同じ記録をインデックスに登録"""
+        try:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+        except OSError:
+            # 途中まで書き込んだ可能性があるため、再試行は新しいファイルに書き込む
+            file, self._file = self._file, None
+            try:
+                file.close()
+            except OSError:
+                pass
+            raise
+        try:
+            with self._index:
+                self._index.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            # ログには書き込み済みのため再試行しない（インデックスは rebuild_index で作り直せる）
+            self.write_errors += 1
+            self.last_error = str(e)
+            count("audit_write_errors_total")
+            logger.error("監査ログのインデックスに %d 件を登録できませんでした（rebuild_index で作り直せます）",
+                         len(rows), exc_info=e)
+
+    def flush(self):
+        """バッファの記録を書き込み、ディスクに同期する"""
+        with self._write_lock:
+            self._flush(sync=True)
+
+    def close(self):
+        """残りの記録を書き込んで停止"""
+        self._stopped = True
+        self._wake.set()
+        self._writer.join(timeout=10)
+        with self._write_lock:
+            try:
+                self._flush(sync=True)
+            except Exception as e:
+                self._report_failure(e)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def query(
+        self,
+        email: Optional[str] = None,
+        tool: Optional[str] = None,
+        permission: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        success: Optional[bool] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        インデックスで絞り込んだ記録を取得（新しい順）
+
+        Args:
+            email: メールアドレス
+            tool: ツール名
+            permission: 権限
+            since: この時刻（UNIX時間）以降
+            until: この時刻（UNIX時間）より前
+            success: 成功・失敗のみ
+            limit: 最大件数
+
+        Returns:
+            記録のリスト
+        """
+        return list(iter_records(self.directory, self._connect(), email, tool, permission, since, until, success, limit))
+
+
+def _open_index(directory: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """インデックスを開く"""
+    conn = sqlite3.connect(os.path.join(directory, INDEX_FILE), timeout=30, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(INDEX_SCHEMA)
+    return conn
+
+
+def iter_records(
+    directory: str,
+    conn: sqlite3.Connection,
+    email: Optional[str] = None,
+    tool: Optional[str] = None,
+    permission: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    success: Optional[bool] = None,
+    limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    インデックスで絞り込み、該当する行だけをログファイルから読み込む
+
+    Yields:
+        記録（新しい順）
+    """
+    conditions = []
+    params: List[Any] = []
+    for column, value in (("email", email.lower() if email else None), ("tool", tool), ("permission", permission)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        conditions.append("ts >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("ts < ?")
+        params.append(until)
+    if success is not None:
+        conditions.append("success = ?")
+        params.append(int(success))
+
+    sql = "SELECT file, offset, length FROM entries"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY ts DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    files: Dict[str, Any] = {}
+    try:
+        for file_name, offset, length in conn.execute(sql, params):
+            f = files.get(file_name)
+            if f is None:
+                f = files[file_name] = open(os.path.join(directory, file_name), "rb")
+            f.seek(offset)
+            yield json.loads(f.read(length))
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def rebuild_index(directory: str) -> int:
+    """
+    ログファイルからインデックスを作り直す（インデックスを失った場合など）
+
+    Args:
+        directory: 監査ログのディレクトリ
+
+    Returns:
+        登録した記録の件数
+    """
+    conn = _open_index(directory)
+    count = 0
+    with conn:
+        conn.execute("DELETE FROM entries")
+        for path in sorted(glob.glob(os.path.join(directory, "audit-*.jsonl"))):
+            offset = 0
+            rows = []
+            with open(path, "rb") as f:
+                for line in f:
+                    if line.endswith(b"\n"):
+                        entry = json.loads(line)
+                        rows.append((
+                            entry["ts"], entry["email"].lower(), entry["tool"], entry.get("permission"),
+                            int(bool(entry["success"])), os.path.basename(path), offset, len(line)
+                        ))
+                    offset += len(line)
+            conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            count += len(rows)
+    conn.close()
+    return count
+
+
+_audit_lock = threading.Lock()
+_audit_log: Optional[AuditLog] = None
+
+
+def get_audit_log() -> Optional[AuditLog]:
+    """
+    プロセス全体で共有する監査ログを取得（初回に書き込みスレッドを起動）
+
+    Returns:
+        共有の AuditLog、AUDIT_ENABLED=0 の場合は None
+    """
+    global _audit_log
+    if os.getenv("AUDIT_ENABLED", "1") == "0":
+        return None
+    if _audit_log is None:
+        with _audit_lock:
+            if _audit_log is None:
+                audit_log = AuditLog(
+                    os.getenv("AUDIT_LOG_DIR", "audit"),
+                    max_bytes=int(os.getenv("AUDIT_MAX_BYTES", str(64 * 1024 * 1024))),
+                    fsync_interval=float(os.getenv("AUDIT_FSYNC_INTERVAL", "1.0")),
+                    max_buffer=int(os.getenv("AUDIT_MAX_BUFFER", "100000"))
+                )
+                atexit.register(audit_log.close)
+                _audit_log = audit_log
+    return _audit_log
+
+
+def record_outcome(email: str, tool: str, background: str, permission: Optional[str],
+                   result: Dict[str, Any], seconds: float, target: Optional[str] = None,
+                   action: Optional[str] = None):
+    """
+    アカウント発行の結果を監査ログに記録
+
+    Args:
+        email: メールアドレス
+        tool: ツール名
+        background: 背景
+        permission: 権限（Google Driveのみ）
+        result: execute_account_request の実行結果
+        seconds: 実行にかかった秒数
+        target: 付与先の別名（省略時はツールの既定の付与先）
+        action: 付与以外の操作の場合に記録する操作名（src.reconcile の update / remove）
+    """
+    audit_log = get_audit_log()
+    if audit_log is None:
+        return
+    from src.api_clients import get_target_id
+
+    try:
+        target_id = get_target_id(tool, target)
+    except ValueError:
+        # 未登録の付与先への依頼（失敗した結果）も、別名のまま記録する
+        target_id = target or ""
+    record = {
+        "ts": time.time(),
+        "email": email,
+        "tool": tool,
+        "target": target_id,
+        "permission": permission if tool == "google_drive" else None,
+        "background": background,
+        "success": bool(result.get("success")),
+        "cached": bool((result.get("result") or {}).get("cached")),
+        "error": result.get("error"),
+        "latency_ms": round(seconds * 1000, 3),
+    }
+    if action is not None:
+        record["action"] = action
+    audit_log.record(record)
+
+
+def audited(func):
+    """
+    execute_account_request(email, tool, background, permission, target) と同じ引数の関数の結果を監査ログに記録
+
+    コルーチン関数にも使える。
+    """
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(email: str, tool: str, background: str, permission: str = None, target: str = None):
+            start = time.perf_counter()
+            result = await func(email, tool, background, permission, target)
+            record_outcome(email, tool, background, permission, result, time.perf_counter() - start, target)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(email: str, tool: str, background: str, permission: str = None, target: str = None):
+        start = time.perf_counter()
+        result = func(email, tool, background, permission, target)
+        record_outcome(email, tool, background, permission, result, time.perf_counter() - start, target)
+        return result
+    return wrapper
@@ -0,0 +1,82 @@
+"""
+監査ログの検索ツール
+
+インデックスで絞り込んだ記録だけをログファイルから読み込むため、ログ全体を走査しない。
+
+実行方法:
+    python -m src.audit_query --email yamada@example.com
+    python -m src.audit_query --tool google_drive --permission writer --this-month
+    python -m src.audit_query --since 2026-10-01 --until 2026-11-01 --failed --format jsonl
+    python -m src.audit_query --rebuild-index
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from src.audit_log import _open_index, iter_records, rebuild_index
+
+
+def parse_date(value: Optional[str]) -> Optional[float]:
+    """YYYY-MM-DD または ISO 8601 の日時（ローカル時刻）を UNIX 時間に変換"""
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+def format_record(record: dict) -> str:
+    """記録を1行の表示に整形"""
+    when = datetime.fromtimestamp(record["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+    status = "OK " if record["success"] else "NG "
+    if record.get("cached"):
+        status = "HIT"
+    elif record.get("action") == "remove":
+        status = "DEL" if record["success"] else "NG "
+    role = record.get("permission") or "-"
+    line = f"{when} {status} {record['email']:<32} {record['tool']:<12} {role:<9} {record['latency_ms']:>9.1f}ms  {record['background']}"
+    if record.get("error"):
+        line += f"  [{record['error']}]"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="監査ログの検索")
+    parser.add_argument("--dir", default=os.getenv("AUDIT_LOG_DIR", "audit"), help="監査ログのディレクトリ")
+    parser.add_argument("--email")
+    parser.add_argument("--tool", choices=["trello", "google_drive"])
+    parser.add_argument("--permission", choices=["reader", "commenter", "writer"])
+    parser.add_argument("--since", help="この日時以降（YYYY-MM-DD）")
+    parser.add_argument("--until", help="この日時より前（YYYY-MM-DD）")
+    parser.add_argument("--this-month", action="store_true", help="今月の記録のみ")
+    status = parser.add_mutually_exclusive_group()
+    status.add_argument("--succeeded", action="store_true", help="成功した記録のみ")
+    status.add_argument("--failed", action="store_true", help="失敗した記録のみ")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--format", choices=["table", "jsonl"], default="table")
+    parser.add_argument("--rebuild-index", action="store_true", help="ログファイルからインデックスを作り直す")
+    args = parser.parse_args()
+
+    if args.rebuild_index:
+        print(f"{rebuild_index(args.dir)} records indexed")
+        return
+
+    since = parse_date(args.since)
+    if args.this_month:
+        since = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp()
+    success = True if args.succeeded else False if args.failed else None
+
+    conn = _open_index(args.dir)
+    count = 0
+    for record in iter_records(
+        args.dir, conn, args.email, args.tool, args.permission, since, parse_date(args.until), success, args.limit
+    ):
+        print(json.dumps(record, ensure_ascii=False) if args.format == "jsonl" else format_record(record))
+        count += 1
+    if args.format == "table":
+        print(f"{count} records")
+
+
+if __name__ == "__main__":
+    main()
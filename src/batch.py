@@ -0,0 +1,96 @@
+"""
+一括依頼の読み込み
+CSVから一括依頼の行を読み込む
+"""
+
+import csv
+import io
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.models import BatchRow
+from src.targets import get_target_registry
+
+# CSVのツール表記 → 内部のツール名
+TOOL_ALIASES = {
+    "trello": "trello",
+    "トレロ": "trello",
+    "google_drive": "google_drive",
+    "google drive": "google_drive",
+    "googledrive": "google_drive",
+    "drive": "google_drive",
+    "グーグルドライブ": "google_drive",
+    "ドライブ": "google_drive",
+}
+
+# ヘッダーより列の多い行のエラー（csv.DictReader は余分な値を None の列に入れる）
+EXTRA_COLUMNS_ERROR = "列の数がヘッダーより多くなっています。"
+
+
+def resolve_tool(value: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    ツールの表記をツール名と付与先の別名に変換
+
+    ツール名のほか、付与先の別名・表示名・キーワード（src.targets を参照）を指定できる。
+
+    Args:
+        value: ツールの表記
+
+    Returns:
+        (ツール名, 付与先の別名（ツールの既定の付与先の場合は None）)、該当するツールがない場合は None
+    """
+    target = get_target_registry().lookup(value)
+    if target is not None:
+        # 環境変数から作った既定の付与先は、別名を持たせずツールの既定として扱う
+        return target.tool, None if target.from_env else target.alias
+    tool = TOOL_ALIASES.get(value.strip().lower())
+    return (tool, None) if tool is not None else None
+
+
+def parse_batch_csv(text: str) -> Tuple[List[BatchRow], List[str]]:
+    """
+    CSVテキストを一括依頼の行に変換
+
+    ヘッダーに email, tool 列（任意で permission 列）が必要。
+    tool 列にはツール名のほか、付与先の別名・表示名・キーワード（src.targets を参照）を指定できる。
+
+    Args:
+        text: CSVの内容
+
+    Returns:
+        (読み込めた行, 行ごとのエラーメッセージ)
+    """
+    rows: List[BatchRow] = []
+    errors: List[str] = []
+
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    if not reader.fieldnames or not {"email", "tool"} <= {name.strip().lower() for name in reader.fieldnames}:
+        return [], ["CSVには email 列と tool 列が必要です。"]
+
+    for line_number, record in enumerate(reader, start=2):
+        if None in record:
+            errors.append(f"{line_number}行目: {EXTRA_COLUMNS_ERROR}")
+            continue
+        record = {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+        if not any(record.values()):
+            continue
+
+        resolved = resolve_tool(record.get("tool", ""))
+        if resolved is None:
+            errors.append(f"{line_number}行目: TrelloまたはGoogle Driveのいずれかを指定してください。")
+            continue
+        tool, target = resolved
+
+        try:
+            rows.append(BatchRow(
+                email=record["email"],
+                tool=tool,
+                permission=record.get("permission", "").lower() or None,
+                target=target
+            ))
+        except ValidationError as e:
+            fields = ", ".join(str(error["loc"][0]) for error in e.errors())
+            errors.append(f"{line_number}行目: {fields} の値が正しくありません。")
+
+    return rows, errors
@@ -0,0 +1,403 @@
+"""
+依頼ファイルの一括取り込み
+JSON Lines / CSV の依頼ファイルを1行ずつ検証して発行し、行ごとの結果を JSON Lines で書き出す
+
+ファイル全体を読み込まず、読み込み → 検証 → 発行 → 結果の書き込みをジェネレーターで流すため
+（検証は VALIDATION_CHUNK_SIZE 行ずつまとめて行う）、ファイルの大きさによらずメモリ使用量は一定。発行は最大 workers 件を同時に実行し、結果は入力の順に書き出す。
+checkpoint_every 行ごとに、結果を書き出し済みの最後の行番号と結果ファイルの大きさをチェックポイントに記録する。
+中断した取り込みを再度実行すると、結果ファイルをチェックポイントの時点に戻し、その次の行から再開する
+（チェックポイント以降に発行済みの行は再実行されるが、付与済みキャッシュで書き込みは省かれる）。
+
+実行方法:
+    python -m src.bulk_import requests.jsonl
+    python -m src.bulk_import onboarding.csv --background "4月入社のメンバー" --workers 16
+    python -m src.bulk_import onboarding.csv --restart
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from src.api_clients import execute_account_request
+from src.batch import EXTRA_COLUMNS_ERROR, resolve_tool
+from src.models import AccountRequest
+from src.validation import validate_account_requests
+
+# まとめて検証する行数（一括バリデーションの単位。この行数だけ先に読み込む）
+VALIDATION_CHUNK_SIZE = 1000
+
+# 集計する失敗理由の種類の上限（超えた分は「その他」にまとめ、メモリ使用量を一定に保つ）
+MAX_ERROR_KINDS = 20
+OTHER_ERRORS = "その他"
+
+# 行番号, 依頼（検証に失敗した場合は None）, 検証エラー, 読み込んだ行
+Row = Tuple[int, Optional[AccountRequest], Optional[str], Dict[str, Any]]
+
+
+def detect_format(path: str) -> str:
+    """拡張子から依頼ファイルの形式（jsonl または csv）を判定"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def iter_records(file, file_format: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    依頼ファイルの行を1行ずつ読み込む
+
+    Args:
+        file: 依頼ファイル（テキストモード）
+        file_format: jsonl または csv
+
+    Yields:
+        (行番号, 列名 → 値)。JSON として読めない行・ヘッダーより列の多い CSV の行は {"_error": メッセージ}
+
+    Raises:
+        ValueError: CSV に email 列と tool 列がない場合
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        if not reader.fieldnames or not {"email", "tool"} <= {name.strip().lower() for name in reader.fieldnames}:
+            raise ValueError("CSVには email 列と tool 列が必要です。")
+        for record in reader:
+            if None in record:
+                yield reader.line_num, {"_error": EXTRA_COLUMNS_ERROR}
+                continue
+            yield reader.line_num, {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+        return
+
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else {"_error": "JSON のオブジェクトとして読めません。"}
+
+
+def parse_requests(records: List[Tuple[int, Dict[str, Any]]], default_background: Optional[str] = None) -> Iterator[Row]:
+    """
+    読み込んだ行をまとめてアカウント発行依頼に変換（src.validation の一括バリデーション）
+
+    tool には一括依頼CSVと同じく付与先の別名・表示名・キーワードも指定できる（target 列が優先）。
+
+    Args:
+        records: (行番号, 列名 → 値) のリスト
+        default_background: background 列が空の行に使う背景
+
+    Yields:
+        (行番号, 依頼, 検証エラー, 読み込んだ行)（records の順）
+    """
+    errors: Dict[int, str] = {}
+    rows: List[Dict[str, Any]] = []
+    positions: List[int] = []
+    tools: Dict[str, Optional[Tuple[str, Optional[str]]]] = {}
+    for position, (_, record) in enumerate(records):
+        if "_error" in record:
+            errors[position] = record["_error"]
+            continue
+        tool = str(record.get("tool") or "")
+        if tool not in tools:
+            tools[tool] = resolve_tool(tool)
+        if tools[tool] is None:
+            errors[position] = "TrelloまたはGoogle Driveのいずれかを指定してください。"
+            continue
+        positions.append(position)
+        rows.append({
+            "email": str(record.get("email") or "").strip(),
+            "tool": tools[tool][0],
+            "permission": str(record.get("permission") or "").strip().lower() or None,
+            "background": str(record.get("background") or "").strip() or default_background or "",
+            "target": str(record.get("target") or "").strip() or tools[tool][1],
+        })
+
+    result = validate_account_requests(rows)
+    requests = dict(zip((positions[index] for index in result.indexes), result.requests))
+    errors.update((positions[index], error) for index, error in result.errors.items())
+    for position, (line_number, record) in enumerate(records):
+        yield line_number, requests.get(position), errors.get(position), record
+
+
+def iter_rows(file, file_format: str, default_background: Optional[str] = None,
+              start_after: int = 0) -> Iterator[Row]:
+    """
+    依頼ファイルの行を VALIDATION_CHUNK_SIZE 行ずつまとめて検証しながら1行ずつ取り出す
+
+    Args:
+        file: 依頼ファイル（テキストモード）
+        file_format: jsonl または csv
+        default_background: background 列が空の行に使う背景
+        start_after: この行番号までの行を飛ばす（再開時）
+
+    Yields:
+        (行番号, 依頼, 検証エラー, 読み込んだ行)
+    """
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    for line_number, record in iter_records(file, file_format):
+        if line_number <= start_after or not any(value not in (None, "") for value in record.values()):
+            continue
+        chunk.append((line_number, record))
+        if len(chunk) >= VALIDATION_CHUNK_SIZE:
+            yield from parse_requests(chunk, default_background)
+            chunk = []
+    yield from parse_requests(chunk, default_background)
+
+
+def execute_row(row: Row, defer_retries: int = 3) -> Dict[str, Any]:
+    """
+    1行分の依頼を発行し、結果の1行を作成
+
+    上流の障害で保留（deferred）になった場合は、ブレーカーが呼び出しを再開する時刻まで待って
+    defer_retries 回まで再実行する。
+
+    Args:
+        row: 行番号, 依頼, 検証エラー, 読み込んだ行
+        defer_retries: 保留になった場合の再実行回数
+
+    Returns:
+        結果の1行（依頼の項目と成否。結果ファイルの失敗行は、そのまま依頼ファイルとして再投入できる）
+    """
+    line_number, request, error, record = row
+    if request is None:
+        return {
+            "line": line_number,
+            **{key: record.get(key) for key in ("email", "tool", "permission", "background", "target") if record.get(key)},
+            "success": False,
+            "invalid": True,
+            "error": error,
+        }
+
+    for attempt in range(defer_retries + 1):
+        result = execute_account_request(
+            email=request.email,
+            tool=request.tool,
+            background=request.background,
+            permission=request.permission,
+            target=request.target
+        )
+        if not result.get("deferred") or attempt == defer_retries:
+            break
+        time.sleep(max(0.0, result["retry_at"] - time.time()))
+
+    output = {"line": line_number, **request.model_dump(exclude_none=True), "success": result["success"]}
+    if (result.get("result") or {}).get("cached"):
+        output["cached"] = True
+    if not result["success"]:
+        output["error"] = result.get("error")
+        if result.get("deferred"):
+            output["deferred"] = True
+    return output
+
+
+def execute_rows(rows: Iterator[Row], workers: int, defer_retries: int = 3) -> Iterator[Dict[str, Any]]:
+    """
+    依頼を最大 workers 件ずつ同時に発行し、結果を入力の順に取り出す
+
+    実行中・結果待ちの行は workers の2倍までに限り、それ以上は先の行の結果を取り出すまで読み込まない。
+
+    Args:
+        rows: iter_rows の行
+        workers: 同時実行数の上限
+        defer_retries: 保留になった場合の再実行回数
+
+    Yields:
+        結果の1行
+    """
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-import")
+    pending = deque()
+    try:
+        for row in rows:
+            pending.append(executor.submit(execute_row, row, defer_retries))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # 中断された場合は、まだ始まっていない行を実行しない
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def new_checkpoint(input_path: str) -> Dict[str, Any]:
+    """取り込みの最初のチェックポイントを作成"""
+    return {
+        "input": os.path.abspath(input_path),
+        "line": 0,
+        "output_bytes": 0,
+        "rows": 0,
+        "succeeded": 0,
+        "failed": 0,
+        "invalid": 0,
+        "deferred": 0,
+        "cached": 0,
+        "elapsed": 0.0,
+        "errors": {},
+    }
+
+
+def load_checkpoint(path: str, input_path: str) -> Optional[Dict[str, Any]]:
+    """
+    チェックポイントを読み込む
+
+    Args:
+        path: チェックポイントのパス
+        input_path: 依頼ファイルのパス
+
+    Returns:
+        チェックポイント、ファイルがない場合は None
+
+    Raises:
+        ValueError: 別の依頼ファイルのチェックポイントの場合
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint["input"] != os.path.abspath(input_path):
+        raise ValueError(f"{path} は {checkpoint['input']} のチェックポイントです（最初からやり直す場合は --restart）。")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """チェックポイントを書き込む（一時ファイルから置き換え、途中で止まっても壊れない）"""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def tally(checkpoint: Dict[str, Any], result: Dict[str, Any]):
+    """結果の1行をチェックポイントの件数に加える"""
+    checkpoint["line"] = result["line"]
+    checkpoint["rows"] += 1
+    if result["success"]:
+        checkpoint["succeeded"] += 1
+        checkpoint["cached"] += 1 if result.get("cached") else 0
+        return
+    checkpoint["failed"] += 1
+    checkpoint["invalid"] += 1 if result.get("invalid") else 0
+    checkpoint["deferred"] += 1 if result.get("deferred") else 0
+    errors = checkpoint["errors"]
+    error = result.get("error") or ""
+    if error not in errors and len(errors) >= MAX_ERROR_KINDS:
+        error = OTHER_ERRORS
+    errors[error] = errors.get(error, 0) + 1
+
+
+def run_import(input_path: str, output_path: str, checkpoint_path: str, file_format: Optional[str] = None,
+               background: Optional[str] = None, workers: int = 8, checkpoint_every: int = 100,
+               defer_retries: int = 3, restart: bool = False) -> Dict[str, Any]:
+    """
+    依頼ファイルを取り込む（チェックポイントがあれば続きから再開）
+
+    Args:
+        input_path: 依頼ファイルのパス
+        output_path: 結果ファイル（JSON Lines）のパス
+        checkpoint_path: チェックポイントのパス
+        file_format: jsonl または csv（省略時は拡張子から判定）
+        background: background 列が空の行に使う背景
+        workers: 同時実行数の上限
+        checkpoint_every: チェックポイントを書き込む間隔（行数）
+        defer_retries: 上流の障害で保留になった場合の再実行回数
+        restart: チェックポイントを無視して最初から取り込む
+
+    Returns:
+        最後のチェックポイント（再開前を含む件数と、今回の実行の started_line・run_rows・run_elapsed）
+
+    Raises:
+        ValueError: 依頼ファイルの形式が正しくない、または別の依頼ファイルのチェックポイントがある場合
+    """
+    checkpoint = None if restart else load_checkpoint(checkpoint_path, input_path)
+    if checkpoint is None:
+        checkpoint = new_checkpoint(input_path)
+        with open(output_path, "w", encoding="utf-8"):
+            pass
+    elif os.path.exists(output_path):
+        # チェックポイント後に書き出した結果は、再開後にもう一度書き出される
+        os.truncate(output_path, checkpoint["output_bytes"])
+    started_line = checkpoint["line"]
+    started_rows = checkpoint["rows"]
+    start = time.perf_counter()
+    elapsed_before = checkpoint["elapsed"]
+
+    def save(output):
+        output.flush()
+        os.fsync(output.fileno())
+        checkpoint["output_bytes"] = output.tell()
+        checkpoint["elapsed"] = elapsed_before + time.perf_counter() - start
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    with open(input_path, encoding="utf-8-sig", newline="") as source, \
+            open(output_path, "a", encoding="utf-8") as output:
+        rows = iter_rows(source, file_format or detect_format(input_path), background, started_line)
+        try:
+            for result in execute_rows(rows, workers, defer_retries):
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                tally(checkpoint, result)
+                if checkpoint["rows"] % checkpoint_every == 0:
+                    save(output)
+        finally:
+            save(output)
+
+    checkpoint["started_line"] = started_line
+    checkpoint["run_rows"] = checkpoint["rows"] - started_rows
+    checkpoint["run_elapsed"] = time.perf_counter() - start
+    return checkpoint
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """取り込みの集計を表示用に整形"""
+    run_elapsed = summary.get("run_elapsed", 0.0)
+    throughput = summary.get("run_rows", 0) / run_elapsed if run_elapsed else 0.0
+    lines = []
+    if summary.get("started_line"):
+        lines.append(f"resumed after line {summary['started_line']}")
+    lines.append(
+        f"rows={summary['rows']} succeeded={summary['succeeded']} (cached={summary['cached']}) "
+        f"failed={summary['failed']} (invalid={summary['invalid']} deferred={summary['deferred']})"
+    )
+    lines.append(
+        f"this run: {summary.get('run_rows', 0)} rows in {run_elapsed:.2f}s ({throughput:.1f} rows/s), "
+        f"total elapsed {summary['elapsed']:.2f}s"
+    )
+    for error, count in sorted(summary["errors"].items(), key=lambda item: -item[1]):
+        lines.append(f"{count:>8}  {error}")
+    return "\n".join(lines)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="依頼ファイル（JSON Lines / CSV）の一括取り込み")
+    parser.add_argument("input", help="依頼ファイル（email, tool 列。任意で permission, background, target 列）")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="依頼ファイルの形式（省略時は拡張子から判定）")
+    parser.add_argument("--output", help="結果ファイル（既定値: <input>.results.jsonl）")
+    parser.add_argument("--checkpoint", help="チェックポイント（既定値: <output>.checkpoint）")
+    parser.add_argument("--background", help="background 列が空の行に使う背景")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_MAX_WORKERS", "8")), help="同時実行数の上限")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="チェックポイントを書き込む間隔（行数）")
+    parser.add_argument("--defer-retries", type=int, default=3, help="上流の障害で保留になった行の再実行回数")
+    parser.add_argument("--restart", action="store_true", help="チェックポイントを無視して最初から取り込む")
+    args = parser.parse_args()
+
+    output_path = args.output or f"{args.input}.results.jsonl"
+    try:
+        summary = run_import(
+            args.input, output_path, args.checkpoint or f"{output_path}.checkpoint", args.format, args.background,
+            args.workers, args.checkpoint_every, args.defer_retries, args.restart
+        )
+    except ValueError as e:
+        parser.exit(2, f"{e}\n")
+    except KeyboardInterrupt:
+        parser.exit(130, "中断しました。同じコマンドで続きから再開できます。\n")
+    print(format_summary(summary))
+    print(f"results: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
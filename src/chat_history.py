@@ -0,0 +1,143 @@
+"""
+チャット履歴
+表示する範囲を直近のメッセージに限り、完了した依頼は1行の要約にまとめて保持する
+"""
+
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.models import ChatMessage, ChatSession
+
+
+def _size(text: str) -> int:
+    """保持に必要なバイト数の目安（UTF-8 のバイト数）"""
+    return len(text.encode("utf-8"))
+
+
+class ChatHistory:
+    """
+    直近のメッセージと完了した依頼の要約からなるチャット履歴
+
+    依頼が完了するたびに close_request で区切りを記録し、ある依頼より後のメッセージだけで window 件に
+    達したら、その依頼のメッセージを要約に置き換える。合計が max_bytes を超えた場合は古い要約から破棄する。
+    """
+
+    def __init__(
+        self,
+        messages: Optional[List[Dict[str, str]]] = None,
+        summaries: Optional[List[str]] = None,
+        closed_ends: Optional[List[int]] = None,
+        window: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ):
+        # 未要約のメッセージ（{"role": ..., "content": ...}）
+        self.messages: List[Dict[str, str]] = list(messages or [])
+        # 完了した依頼の要約（古い順）。末尾の len(closed_ends) 件はまだメッセージが残っている
+        self.summaries: List[str] = list(summaries or [])
+        # メッセージが残っている完了済みの依頼ごとの、messages 上の終了位置
+        self.closed_ends: List[int] = list(closed_ends or [])
+        self.window = window or int(os.getenv("HISTORY_WINDOW", "20"))
+        self.max_bytes = max_bytes or int(os.getenv("HISTORY_MAX_BYTES", "65536"))
+        self.size = (
+            sum(_size(message["content"]) for message in self.messages)
+            + sum(_size(summary) for summary in self.summaries)
+        )
+
+    @classmethod
+    def from_session(cls, session: ChatSession, **kwargs) -> "ChatHistory":
+        """保存されたセッションから履歴を復元"""
+        return cls(
+            messages=[{"role": message.role, "content": message.content} for message in session.messages],
+            summaries=session.summaries,
+            closed_ends=session.closed_ends,
+            **kwargs
+        )
+
+    def save_to(self, session: ChatSession):
+        """履歴をセッションに書き込む"""
+        session.messages = [ChatMessage.model_construct(**message) for message in self.messages]
+        session.summaries = list(self.summaries)
+        session.closed_ends = list(self.closed_ends)
+
+    def __len__(self) -> int:
+        return len(self.messages) + len(self.compacted_summaries())
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self.messages)
+
+    def append(self, role: str, content: str):
+        """
+        メッセージを追加
+
+        Args:
+            role: "user" または "assistant"
+            content: メッセージ
+        """
+        self.messages.append({"role": role, "content": content})
+        self.size += _size(content)
+        self._enforce_limits()
+
+    def close_request(self, summary: str):
+        """
+        依頼の区切りを記録（ここまでのメッセージは、古くなったら summary にまとめられる）
+
+        Args:
+            summary: 依頼の要約
+        """
+        if self.closed_ends and self.closed_ends[-1] == len(self.messages):
+            return
+        self.summaries.append(summary)
+        self.size += _size(summary)
+        self.closed_ends.append(len(self.messages))
+        self._enforce_limits()
+
+    def clear(self):
+        """履歴を全て削除"""
+        self.messages.clear()
+        self.summaries.clear()
+        self.closed_ends.clear()
+        self.size = 0
+
+    def compacted_summaries(self) -> List[str]:
+        """メッセージが要約に置き換えられた依頼の要約"""
+        return self.summaries[:len(self.summaries) - len(self.closed_ends)]
+
+    def visible(self, limit: int) -> Tuple[List[str], List[Dict[str, str]], bool]:
+        """
+        表示する範囲を取得（新しいものから limit 件）
+
+        Args:
+            limit: 表示する件数（メッセージと要約の合計）
+
+        Returns:
+            (表示する要約, 表示するメッセージ, さらに前があるか)
+        """
+        messages = self.messages[-limit:]
+        compacted = self.compacted_summaries()
+        remaining = limit - len(messages)
+        summaries = compacted[-remaining:] if remaining > 0 else []
+        has_more = len(self.messages) > limit or len(summaries) < len(compacted)
+        return summaries, messages, has_more
+
+    def _compact_oldest(self):
+        """最も古い完了済みの依頼のメッセージを要約に置き換える"""
+        end = self.closed_ends.pop(0)
+        self.size -= sum(_size(message["content"]) for message in self.messages[:end])
+        del self.messages[:end]
+        self.closed_ends = [closed_end - end for closed_end in self.closed_ends]
+
+    def _enforce_limits(self):
+        """表示範囲とメモリの上限を適用"""
+        # 表示範囲（直近 window 件）に入らなくなった依頼のみ要約にする
+        while self.closed_ends and len(self.messages) - self.closed_ends[0] >= self.window:
+            self._compact_oldest()
+
+        while self.size > self.max_bytes:
+            if len(self.summaries) > len(self.closed_ends):
+                self.size -= _size(self.summaries.pop(0))
+            elif self.closed_ends:
+                self._compact_oldest()
+            elif len(self.messages) > 1:
+                self.size -= _size(self.messages.pop(0)["content"])
+            else:
+                break
@@ -0,0 +1,154 @@
+"""
+サーキットブレーカー
+Trello / Google Drive の障害時に、タイムアウトを待たずに呼び出しを打ち切る
+
+連続して failure_threshold 回失敗（接続エラー・タイムアウト・5xx）すると開き（open）、
+recovery_seconds 秒の間は呼び出しをすぐに CircuitOpenError で失敗させる。
+その後は半開（half_open）になって1件だけ試し、成功すれば閉じ（closed）、失敗すれば再び開く。
+開いている間の依頼はジョブキューで保留（deferred）にし、復旧後に自動で再実行する。
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from src.metrics import count_api_error
+
+# ブレーカーの状態
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """ブレーカーが開いているため呼び出さなかった場合のエラー"""
+
+    def __init__(self, name: str, retry_at: float):
+        super().__init__(f"{name} が応答しないため、呼び出しを一時停止しています。")
+        self.name = name
+        # 次に呼び出しを試せる時刻（time.time()）
+        self.retry_at = retry_at
+
+
+class CircuitBreaker:
+    """1つの上流 API のサーキットブレーカー"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_started_at = 0.0
+
+    def before_call(self):
+        """
+        呼び出しの前に、呼び出してよいかチェック
+
+        Raises:
+            CircuitOpenError: 開いている、または半開で別の呼び出しが試行中の場合
+        """
+        now = time.time()
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return
+            if self.state == STATE_OPEN:
+                if now < self.opened_at + self.recovery_seconds:
+                    raise CircuitOpenError(self.name, self.opened_at + self.recovery_seconds)
+                self.state = STATE_HALF_OPEN
+            # 半開では1件ずつ試す（試行が結果を返さないまま recovery_seconds 経った場合は次の試行を許す）
+            if self._probe_started_at and now < self._probe_started_at + self.recovery_seconds:
+                raise CircuitOpenError(self.name, now + min(5.0, self.recovery_seconds))
+            self._probe_started_at = now
+
+    def record_success(self):
+        """呼び出しの成功を記録（半開なら閉じる）"""
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self._probe_started_at = 0.0
+
+    def record_failure(self):
+        """上流の障害による失敗を記録（連続失敗が閾値に達するか、半開での失敗なら開く）"""
+        with self._lock:
+            self.failures += 1
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != STATE_OPEN:
+                    count_api_error(self.name, "circuit_open")
+                self.state = STATE_OPEN
+                self.opened_at = time.time()
+                self._probe_started_at = 0.0
+
+    def record_status(self, status: int):
+        """応答のステータスコードを記録（5xx は失敗、それ以外は上流が応答しているため成功とみなす）"""
+        if status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    @property
+    def retry_at(self) -> float:
+        """開いている場合に、次に呼び出しを試せる時刻（time.time()）"""
+        with self._lock:
+            return self.opened_at + self.recovery_seconds
+
+    def is_open(self) -> bool:
+        """呼び出しを止めている（開いている）か"""
+        with self._lock:
+            return self.state == STATE_OPEN and time.time() < self.opened_at + self.recovery_seconds
+
+    def snapshot(self) -> Dict[str, object]:
+        """状態と連続失敗回数を取得"""
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+_breaker_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> Optional[CircuitBreaker]:
+    """
+    プロセス全体で共有する上流 API ごとのブレーカーを取得
+
+    Args:
+        name: 上流 API 名 (trello または google_drive)
+
+    Returns:
+        共有の CircuitBreaker、CIRCUIT_BREAKER_ENABLED=0 の場合は None
+    """
+    if os.getenv("CIRCUIT_BREAKER_ENABLED", "1") == "0":
+        return None
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breaker_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+                    recovery_seconds=float(os.getenv("CIRCUIT_RECOVERY_SECONDS", "30"))
+                )
+    return breaker
+
+
+def open_circuits(names: List[str]) -> List[str]:
+    """
+    names のうち、ブレーカーが開いている上流 API を取得
+
+    Args:
+        names: 上流 API 名
+
+    Returns:
+        呼び出しを止めている上流 API 名（names の順）
+    """
+    return [name for name in dict.fromkeys(names) if name in _breakers and _breakers[name].is_open()]
+
+
+def reset_circuit_breakers():
+    """全てのブレーカーを破棄（設定変更時やテスト用）"""
+    with _breaker_lock:
+        _breakers.clear()
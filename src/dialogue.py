@@ -0,0 +1,409 @@
+"""
+対話の状態機械
+会話状態のスロット（メールアドレス・ツール・権限・背景）を宣言的な表で定義する
+
+1つのメッセージから読み取れる全てのスロットを1回で埋め、「メールは bar@x.com に訂正」のような
+明示的な訂正では埋まっているスロットも上書きし、まだ足りないスロットだけを表の順に尋ねる。
+スロットの追加や質問の順序の変更は SLOTS を編集するだけで済む。
+"""
+
+import re
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional
+
+from pydantic import ValidationError
+
+from src.extractor import ExtractionResult, SlotCandidate
+from src.models import ConversationState
+from src.prompts import ERROR_MESSAGES, QUESTIONS, get_permission_question, get_tool_question
+from src.validation import normalize_email
+
+if TYPE_CHECKING:
+    from src.langchain_setup import ChatbotManager
+
+# 埋まっているスロットの上書きを求める表現
+CORRECTION_PATTERN = re.compile(
+    r"訂正|修正|間違|まちが|じゃなく|ではなく|でなく|変更|やっぱり|"
+    r"\bshould be\b|\binstead\b|\bcorrect|\bchange|\bactually\b|\btypo\b",
+    re.IGNORECASE
+)
+
+# 直後・直前にあると、その候補を否定する表現（「Trello じゃなくて Drive」「not Trello」）
+NEGATION_AFTER = re.compile(r"\s*[はを]?\s*(?:じゃなく|ではなく|でなく|じゃない|ではない)")
+NEGATION_BEFORE = re.compile(r"(?:\bnot|\binstead of)\s*$", re.IGNORECASE)
+
+# 目的を表す表現（この表現を含む節を背景とみなす）
+PURPOSE_PATTERN = re.compile(
+    r"ため|為|ので|目的|予定|"
+    r"\bbecause\b|\bsince\b|\bso that\b|\bin order to\b|\bfor\s+[\w-]+ing\b|"
+    r"\bto\s+(?:join|review|edit|work|help|access|manage|collaborate|share|check|use)\b",
+    re.IGNORECASE
+)
+
+# 背景を訂正する場合の見出し（「背景は〜に訂正」）と、末尾の訂正の言い回し
+BACKGROUND_LABEL = re.compile(
+    r"(?:背景|理由|目的|\breason\b|\bpurpose\b|\bbackground\b)\s*(?:は|:|：|\bis\b|\bshould be\b)?\s*",
+    re.IGNORECASE
+)
+TRAILING_CORRECTION = re.compile(r"\s*(?:に|へ)?(?:訂正|修正|変更)(?:します|して(?:ください)?|お願いします)?\s*$")
+
+# 節の区切り（メールアドレス内の "." では区切らない）
+CLAUSE_SEPARATOR = re.compile(r"[、,。!?！？\n]+|\.(?=\s|$)")
+
+# 背景の先頭に残る助詞や依頼の言い回し
+LEADING_FILLER = re.compile(
+    r"^(?:\s|[にのをでへとはが]|権限|アクセス|アカウント|\baccess\b|\bpermissions?\b|\baccount\b|\bplease\b)+",
+    re.IGNORECASE
+)
+
+# 背景の上限文字数
+MAX_BACKGROUND_LENGTH = 255
+
+# 依頼のモデル（AccountRequest）の項目 → その値を埋めるスロット
+REQUEST_FIELD_SLOTS = {
+    'email': 'email',
+    'tool': 'tool',
+    'target': 'tool',
+    'permission': 'permission',
+    'background': 'background',
+}
+
+
+class Turn(NamedTuple):
+    """1つのメッセージの抽出に使う情報"""
+
+    text: str
+    # 否定された候補を除いた抽出結果
+    result: ExtractionResult
+    # 埋まっているスロットの上書きを求めているか
+    correcting: bool
+    # このメッセージの前に尋ねていたスロット
+    asked: Optional[str]
+
+
+class Slot(NamedTuple):
+    """状態機械の1つのスロット"""
+
+    name: str
+    # このスロットが必要か
+    needed: Callable[[ConversationState], bool]
+    # このスロットが埋まっているか
+    filled: Callable[[ConversationState], bool]
+    # スロットを尋ねる質問
+    question: Callable[["ChatbotManager"], str]
+    # メッセージから読み取った値（extract_information の形式）。読み取れない場合は空の辞書
+    extract: Callable[["ChatbotManager", Turn], Dict[str, Any]]
+    # 読み取った値を会話状態に設定し、エラーがあればそのメッセージを返す
+    apply: Callable[["ChatbotManager", Dict[str, Any]], Optional[str]]
+    # 他のスロットが変わった後も値が有効か（無効なら消して尋ね直す）
+    valid: Callable[["ChatbotManager"], bool]
+    # 値を消す
+    clear: Callable[[ConversationState], None]
+
+
+def is_negated(text: str, candidate: SlotCandidate) -> bool:
+    """候補が否定されているか（「Trello じゃなくて」「not Trello」）"""
+    return bool(
+        NEGATION_AFTER.match(text, candidate.end)
+        or NEGATION_BEFORE.search(text[max(0, candidate.start - 12):candidate.start])
+    )
+
+
+def make_turn(manager: "ChatbotManager", text: str) -> Turn:
+    """メッセージを抽出器で読み取り、1ターン分の抽出に使う情報を作る"""
+    result = manager.extractor.extract(text)
+    candidates = [candidate for candidate in result.candidates if not is_negated(result.text, candidate)]
+    if len(candidates) != len(result.candidates):
+        result = ExtractionResult(result.text, candidates)
+    return Turn(text, result, bool(CORRECTION_PATTERN.search(result.text)), next_slot(manager.state))
+
+
+def extract_purpose(result: ExtractionResult) -> Optional[str]:
+    """
+    メッセージから目的を表す節を背景として抜き出す
+
+    節の中で目的の表現より前にあるメールアドレス・ツール・付与先の後ろから取り出す。
+
+    Args:
+        result: 抽出結果
+
+    Returns:
+        背景、目的を表す節がない場合は None
+    """
+    text = result.text
+    pieces = []
+    start = 0
+    for separator in [*CLAUSE_SEPARATOR.finditer(text), None]:
+        end = separator.start() if separator is not None else len(text)
+        match = PURPOSE_PATTERN.search(text, start, end)
+        if match is not None:
+            cut = max(
+                (candidate.end for candidate in result.candidates
+                 if candidate.slot in ("email", "tool", "target")
+                 and start <= candidate.start and candidate.end <= match.start()),
+                default=start
+            )
+            piece = LEADING_FILLER.sub("", text[cut:end]).strip()
+            if piece:
+                pieces.append(piece)
+        if separator is not None:
+            start = separator.end()
+    return "、".join(pieces) or None
+
+
+def _extract_email(manager: "ChatbotManager", turn: Turn) -> Dict[str, Any]:
+    emails = turn.result.values('email')
+    if not emails or (manager.state.email and not turn.correcting):
+        return {}
+    extracted = {'email': emails[0]}
+    # 複数のメールアドレスは一括依頼として扱う
+    if len(emails) > 1:
+        extracted['additional_emails'] = emails[1:]
+    return extracted
+
+
+def _apply_email(manager: "ChatbotManager", extracted: Dict[str, Any]) -> Optional[str]:
+    # 依頼のモデル（EmailStr）と同じ規則で検証・正規化する
+    emails = [normalize_email(email) for email in [extracted['email'], *extracted.get('additional_emails', [])]]
+    if None in emails:
+        return ERROR_MESSAGES['invalid_email']
+    manager.state.email = emails[0]
+    # 訂正した場合も、以前のメッセージの2件目以降のメールアドレスは引き継がない
+    manager.state.additional_emails = emails[1:]
+    return None
+
+
+def _clear_email(state: ConversationState):
+    state.email = None
+    state.additional_emails = []
+
+
+def _extract_tool(manager: "ChatbotManager", turn: Turn) -> Dict[str, Any]:
+    # 付与先のキーワードからはツールも決まる
+    selections = manager.extract_selections(turn.result)
+    if not selections or (manager.state.tool and not turn.correcting):
+        return {}
+    extracted: Dict[str, Any] = {'tool': selections[0][0]}
+    if selections[0][1] is not None:
+        extracted['target'] = selections[0][1]
+    if len(selections) > 1:
+        extracted['additional_tools'] = [tool for tool, _ in selections[1:]]
+        extracted['additional_targets'] = [target for _, target in selections[1:]]
+    return extracted
+
+
+def _apply_tool(manager: "ChatbotManager", extracted: Dict[str, Any]) -> Optional[str]:
+    state = manager.state
+    state.tool = extracted['tool']
+    state.target = extracted.get('target')
+    state.additional_tools = extracted.get('additional_tools', [])
+    state.additional_targets = extracted.get('additional_targets', [None] * len(state.additional_tools))
+    return None
+
+
+def _clear_tool(state: ConversationState):
+    state.tool = None
+    state.target = None
+    state.additional_tools = []
+    state.additional_targets = []
+
+
+def _extract_permission(manager: "ChatbotManager", turn: Turn) -> Dict[str, Any]:
+    state = manager.state
+    # 同じメッセージでツールを読み取った場合は、そのツールで権限が必要か判断する
+    tools = {state.tool, *state.additional_tools}
+    selections = manager.extract_selections(turn.result)
+    if selections and (not state.tool or turn.correcting):
+        tools = {tool for tool, _ in selections}
+    if 'google_drive' not in tools and not state.needs_permission():
+        return {}
+    if state.permission and not turn.correcting:
+        return {}
+    permission = turn.result.best('permission')
+    return {'permission': permission} if permission else {}
+
+
+def _apply_permission(manager: "ChatbotManager", extracted: Dict[str, Any]) -> Optional[str]:
+    # 付与先で許可された権限のみ
+    roles = manager.allowed_roles()
+    if manager.state.needs_permission() and extracted['permission'] not in roles:
+        return f"この付与先で選択できる権限は {', '.join(roles)} です。"
+    manager.state.permission = extracted['permission']
+    return None
+
+
+def _permission_valid(manager: "ChatbotManager") -> bool:
+    # ツール・付与先の訂正で不要になった、または選べなくなった権限は尋ね直す
+    state = manager.state
+    return state.needs_permission() and state.permission in manager.allowed_roles()
+
+
+def _corrects_filled_slot(manager: "ChatbotManager", turn: Turn) -> bool:
+    """訂正の表現があり、埋まっているスロット（背景以外）の値を含むメッセージか"""
+    if not turn.correcting:
+        return False
+    filled = set(filled_slots(manager.state))
+    return any(
+        ('tool' if candidate.slot == 'target' else candidate.slot) in filled for candidate in turn.result.candidates
+    )
+
+
+def _extract_background(manager: "ChatbotManager", turn: Turn) -> Dict[str, Any]:
+    state = manager.state
+    # 「背景は〜に訂正」
+    label = BACKGROUND_LABEL.search(turn.result.text) if turn.correcting else None
+    if label is not None:
+        background = TRAILING_CORRECTION.sub("", turn.result.text[label.end():]).strip()
+        return {'background': background[:MAX_BACKGROUND_LENGTH]} if background else {}
+    if state.background:
+        return {}
+    if turn.asked == 'background' and not _corrects_filled_slot(manager, turn):
+        # 背景を尋ねている場合は、ユーザー入力全体を背景として扱う（255文字まで）。
+        # 「バグ修正の対応です」のように訂正の言葉を含む回答も、他のスロットの値がなければ背景とみなす
+        background = turn.text.strip()[:MAX_BACKGROUND_LENGTH]
+        return {'background': background} if background else {}
+    background = extract_purpose(turn.result)
+    return {'background': background[:MAX_BACKGROUND_LENGTH]} if background else {}
+
+
+def _apply_background(manager: "ChatbotManager", extracted: Dict[str, Any]) -> Optional[str]:
+    background = extracted['background']
+    if len(background) > MAX_BACKGROUND_LENGTH:
+        return f'背景は{MAX_BACKGROUND_LENGTH}文字以内で入力してください。現在の文字数: {len(background)}文字'
+    if len(background.strip()) == 0:
+        return '背景を入力してください。'
+    manager.state.background = background
+    return None
+
+
+def _always(*_) -> bool:
+    return True
+
+
+# 尋ねる順に並べたスロットの表
+SLOTS: List[Slot] = [
+    Slot(
+        name='email',
+        needed=_always,
+        filled=lambda state: bool(state.email),
+        question=lambda manager: QUESTIONS['email'],
+        extract=_extract_email,
+        apply=_apply_email,
+        valid=_always,
+        clear=_clear_email,
+    ),
+    Slot(
+        name='tool',
+        needed=_always,
+        filled=lambda state: bool(state.tool),
+        question=lambda manager: get_tool_question([target.name for target in manager.targets.targets]),
+        extract=_extract_tool,
+        apply=_apply_tool,
+        valid=_always,
+        clear=_clear_tool,
+    ),
+    Slot(
+        name='permission',
+        needed=ConversationState.needs_permission,
+        filled=lambda state: bool(state.permission),
+        question=lambda manager: get_permission_question(manager.allowed_roles()),
+        extract=_extract_permission,
+        apply=_apply_permission,
+        valid=_permission_valid,
+        clear=lambda state: setattr(state, 'permission', None),
+    ),
+    Slot(
+        name='background',
+        needed=_always,
+        filled=lambda state: bool(state.background),
+        question=lambda manager: QUESTIONS['background'],
+        extract=_extract_background,
+        apply=_apply_background,
+        valid=_always,
+        clear=lambda state: setattr(state, 'background', None),
+    ),
+]
+
+
+def filled_slots(state: ConversationState) -> List[str]:
+    """埋まっているスロット名"""
+    return [slot.name for slot in SLOTS if slot.filled(state)]
+
+
+def next_slot(state: ConversationState) -> Optional[str]:
+    """次に尋ねるスロット（必要で、まだ埋まっていない最初のスロット）、全て揃っている場合は None"""
+    for slot in SLOTS:
+        if slot.needed(state) and not slot.filled(state):
+            return slot.name
+    return None
+
+
+def extract_turn(manager: "ChatbotManager", turn: Turn) -> Dict[str, Any]:
+    """
+    make_turn で読み取ったメッセージから全てのスロットの値を抽出
+
+    Returns:
+        抽出された情報（訂正の場合は埋まっているスロットの値も含む）
+    """
+    extracted: Dict[str, Any] = {}
+    for slot in SLOTS:
+        extracted.update(slot.extract(manager, turn))
+    return extracted
+
+
+def apply_slots(manager: "ChatbotManager", extracted: Dict[str, Any]) -> Dict[str, str]:
+    """
+    抽出された値を表の順に会話状態に設定
+
+    設定後、他のスロットの変更で無効になった値（Trello に訂正した場合の権限など）は消して尋ね直す。
+
+    Args:
+        manager: 会話状態を持つ ChatbotManager
+        extracted: 抽出された情報
+
+    Returns:
+        スロット名 → バリデーションエラー
+    """
+    errors = {}
+    changed = False
+    for slot in SLOTS:
+        if slot.name not in extracted:
+            continue
+        error = slot.apply(manager, extracted)
+        if error is not None:
+            errors[slot.name] = error
+        else:
+            changed = True
+
+    if changed:
+        for slot in SLOTS:
+            if slot.filled(manager.state) and not slot.valid(manager):
+                slot.clear(manager.state)
+    return errors
+
+
+def next_question(manager: "ChatbotManager") -> Optional[str]:
+    """次に尋ねる質問、全て揃っている場合は None"""
+    name = next_slot(manager.state)
+    if name is None:
+        return None
+    return next(slot for slot in SLOTS if slot.name == name).question(manager)
+
+
+def clear_invalid_slots(manager: "ChatbotManager", error: ValidationError) -> List[str]:
+    """
+    依頼のモデルの検証で無効だった項目のスロットを消す（次のターンで尋ね直す）
+
+    Args:
+        manager: 会話状態を持つ ChatbotManager
+        error: AccountRequest の検証エラー
+
+    Returns:
+        消したスロット名（表の順）
+    """
+    names = {REQUEST_FIELD_SLOTS.get(str(detail['loc'][0])) for detail in error.errors() if detail['loc']}
+    cleared = []
+    for slot in SLOTS:
+        if slot.name in names and slot.filled(manager.state):
+            slot.clear(manager.state)
+            cleared.append(slot.name)
+    return cleared
@@ -0,0 +1,219 @@
+"""
+スロット抽出
+ツール・権限のキーワードとメールアドレスを1回の走査でまとめて抽出
+"""
+
+import copy
+import re
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# スロット → 値 → (キーワード, スコア) のリスト
+# 新しいツールや言い回しはここに追加するだけで抽出対象になる
+DEFAULT_KEYWORDS: Dict[str, Dict[str, List[Tuple[str, float]]]] = {
+    "tool": {
+        "trello": [("trello", 1.0), ("トレロ", 1.0)],
+        "google_drive": [
+            ("google drive", 1.0),
+            ("googledrive", 1.0),
+            ("グーグルドライブ", 1.0),
+            ("gdrive", 0.9),
+            ("ドライブ", 0.8),
+            ("drive", 0.6),
+        ],
+    },
+    "permission": {
+        "reader": [("reader", 1.0), ("閲覧", 1.0), ("リーダー", 0.9), ("viewer", 0.8), ("見るだけ", 0.7)],
+        "commenter": [("commenter", 1.0), ("コメント", 0.9), ("コメンター", 1.0)],
+        "writer": [("writer", 1.0), ("編集", 1.0), ("ライター", 0.9), ("editor", 0.8)],
+    },
+}
+
+# 小文字化したテキストに対して使う。日本語に隣接していても一致するよう、末尾は \b ではなく
+# メールアドレスに使える文字で境界を判定する（先頭は左から走査するため境界の判定が不要）
+EMAIL_PATTERN = r'[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}(?![a-z0-9-])'
+
+# 英数字で始まる・終わるキーワードの前後に英数字が続く場合は一致させない（"data-driven" の "drive" など）。
+# \b は日本語も単語の文字として扱い「trelloに」に一致しなくなるため、英数字だけで境界を判定する
+WORD_BEFORE = r'(?<![a-z0-9])'
+WORD_AFTER = r'(?![a-z0-9])'
+
+
+class SlotCandidate(NamedTuple):
+    """抽出されたスロットの候補（位置は正規化後のテキスト上の位置）"""
+
+    slot: str
+    value: str
+    start: int
+    end: int
+    score: float
+
+
+def normalize_text(text: str) -> str:
+    """
+    全角・半角の揺れを正規化（NFKC）
+
+    Args:
+        text: 入力テキスト
+
+    Returns:
+        正規化したテキスト
+    """
+    if unicodedata.is_normalized("NFKC", text):
+        return text
+    return unicodedata.normalize("NFKC", text)
+
+
+class ExtractionResult:
+    """1つのメッセージから抽出した全候補"""
+
+    def __init__(self, text: str, candidates: List[SlotCandidate]):
+        self.text = text
+        self.candidates = candidates
+        self._by_slot: Dict[str, List[SlotCandidate]] = {}
+        for candidate in candidates:
+            self._by_slot.setdefault(candidate.slot, []).append(candidate)
+
+    def of(self, slot: str) -> List[SlotCandidate]:
+        """スロットの候補を出現順に取得"""
+        return self._by_slot.get(slot, [])
+
+    def values(self, slot: str) -> List[str]:
+        """スロットの値を出現順・重複なしで取得"""
+        return list(dict.fromkeys(candidate.value for candidate in self.of(slot)))
+
+    def best(self, slot: str) -> Optional[str]:
+        """スコアが最も高い値を取得（同点の場合は先に出現したもの）"""
+        candidates = self.of(slot)
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            return candidates[0].value
+        return max(candidates, key=lambda candidate: (candidate.score, -candidate.start)).value
+
+
+def build_trie_pattern(keywords) -> str:
+    """
+    キーワードのトライ木を正規表現に変換
+
+    共通の接頭辞をまとめた分岐（例: g(?:drive|oogle(?: drive|drive))）にすることで、
+    各位置で試す分岐が次の1文字の種類数に限られ、キーワードが増えても走査の速さがほぼ変わらない。
+    途中で終わるキーワードは貪欲な省略可能グループにするため、同じ位置では最長一致になる。
+
+    Args:
+        keywords: キーワードの一覧
+
+    Returns:
+        正規表現パターン
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def is_word_char(char: str) -> bool:
+    """境界を判定する英数字か"""
+    return char.isascii() and char.isalnum()
+
+
+def build_keyword_pattern(keywords) -> str:
+    """
+    キーワードの抽出パターンを構築
+
+    前後の境界の要否（英数字で始まる・終わるか）ごとにトライ木を分け、英数字の側だけに境界を付ける。
+
+    Args:
+        keywords: 正規化・小文字化したキーワードの一覧
+
+    Returns:
+        正規表現パターン
+    """
+    groups: Dict[Tuple[bool, bool], List[str]] = {}
+    for keyword in keywords:
+        groups.setdefault((is_word_char(keyword[0]), is_word_char(keyword[-1])), []).append(keyword)
+    branches = []
+    for (before, after), group in sorted(groups.items(), reverse=True):
+        branches.append(
+            (WORD_BEFORE if before else "") + f"(?:{build_trie_pattern(group)})" + (WORD_AFTER if after else "")
+        )
+    return "|".join(branches)
+
+
+class SlotExtractor:
+    """
+    プリコンパイル済みの1つのパターンによるスロット抽出器
+
+    メールアドレスと全キーワードのトライ木を1つのパターンにまとめ、正規表現エンジン（C実装）で
+    テキストを1回だけ走査する（Aho-Corasick と同様にキーワード数に依存しない走査）。
+    同じ位置では最長一致になるため、「グーグルドライブ」の中の「ドライブ」や
+    メールアドレス内の「reader」は別の候補にならない。
+    """
+
+    def __init__(self, keywords: Dict[str, Dict[str, List[Tuple[str, float]]]] = None):
+        self.keywords = copy.deepcopy(keywords if keywords is not None else DEFAULT_KEYWORDS)
+        self._build()
+
+    def add_keyword(self, slot: str, value: str, keyword: str, score: float = 1.0):
+        """
+        キーワードを追加してパターンを再構築
+
+        Args:
+            slot: スロット名（tool, permission など）
+            value: スロットの値
+            keyword: 一致させる言い回し
+            score: 一致した場合のスコア
+        """
+        self.keywords.setdefault(slot, {}).setdefault(value, []).append((keyword, score))
+        self._build()
+
+    def _build(self):
+        """キーワード表と抽出パターンを構築"""
+        table: Dict[str, Tuple[str, str, float]] = {}
+        for slot, values in self.keywords.items():
+            for value, keywords in values.items():
+                for keyword, score in keywords:
+                    table[normalize_text(keyword).lower()] = (slot, value, score)
+
+        self._table = table
+        self._pattern = re.compile(f"(?P<email>{EMAIL_PATTERN})|(?P<keyword>{build_keyword_pattern(table)})")
+
+    def extract(self, text: str) -> ExtractionResult:
+        """
+        テキストから全スロットの候補を抽出
+
+        Args:
+            text: ユーザーの入力テキスト
+
+        Returns:
+            抽出結果（候補は出現順）
+        """
+        normalized = normalize_text(text)
+        lowered = normalized.lower()
+        # 小文字化で文字数が変わる場合（ごく一部の文字）は位置がずれるため、小文字の値を使う
+        original = normalized if len(lowered) == len(normalized) else lowered
+        table = self._table
+        candidates = []
+        for match in self._pattern.finditer(lowered):
+            start, end = match.span()
+            if match.lastgroup == "email":
+                candidates.append(SlotCandidate("email", original[start:end], start, end, 1.0))
+            else:
+                slot, value, score = table[match.group()]
+                candidates.append(SlotCandidate(slot, value, start, end, score))
+        return ExtractionResult(original, candidates)
+
+
+# プロセス全体で共有する既定の抽出器
+default_extractor = SlotExtractor()
@@ -0,0 +1,196 @@
+"""
+付与済みキャッシュ
+最近成功した付与を記憶し、同じ依頼の重複したAPI呼び出しを防ぐ
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# 権限の強さ（大きいほど強い）。Trello はメンバー追加のみのため "member" とする
+ROLE_RANK = {
+    "member": 0,
+    "reader": 1,
+    "commenter": 2,
+    "writer": 3,
+    "fileOrganizer": 4,
+    "organizer": 5,
+    "owner": 6,
+}
+
+
+def role_covers(granted_role: str, requested_role: str) -> bool:
+    """
+    付与済みの権限が依頼された権限以上かチェック
+
+    Args:
+        granted_role: 付与済みの権限
+        requested_role: 依頼された権限
+
+    Returns:
+        付与済みの権限で足りる場合は True
+    """
+    return ROLE_RANK.get(granted_role, -1) >= ROLE_RANK.get(requested_role, len(ROLE_RANK))
+
+
+class GrantCache:
+    """
+    TTLとLRU方式の上限を持つ付与済みキャッシュ（任意でSQLiteに永続化）
+
+    キーは (メールアドレス, ツール名, 付与先のID) で、付与した権限は値として持つ。
+    権限はキーに含めず、参照側が role_covers で依頼された権限と比較する
+    （同じ相手への権限の引き上げ・引き下げは記録の上書きになる）。
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 86400.0, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.db_path:
+            self._connect().execute(
+                "CREATE TABLE IF NOT EXISTS grants ("
+                " email TEXT NOT NULL, tool TEXT NOT NULL, target TEXT NOT NULL,"
+                " role TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " PRIMARY KEY (email, tool, target))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """現在のスレッド用のコネクションを取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(email: str, tool: str, target: str) -> Tuple[str, str, str]:
+        return email.lower(), tool, target
+
+    def _store(self, key: Tuple[str, str, str], role: str, expires_at: float):
+        """メモリ上のキャッシュに保存（ロック取得済みで呼び出す）"""
+        self._entries[key] = (role, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, email: str, tool: str, target: str) -> Optional[str]:
+        """
+        付与済みの権限を取得
+
+        Args:
+            email: メールアドレス
+            tool: ツール名
+            target: 付与先のID
+
+        Returns:
+            付与済みの権限、キャッシュにない場合は None
+        """
+        key = self._key(email, tool, target)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+
+        if self.db_path:
+            row = self._connect().execute(
+                "SELECT role, expires_at FROM grants WHERE email = ? AND tool = ? AND target = ? AND expires_at > ?",
+                (*key, now)
+            ).fetchone()
+            if row is not None:
+                with self._lock:
+                    self._store(key, row[0], row[1])
+                    self.hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def record(self, email: str, tool: str, target: str, role: str):
+        """
+        成功した付与を記録
+
+        Args:
+            email: メールアドレス
+            tool: ツール名
+            target: 付与先のID
+            role: 付与した権限
+        """
+        key = self._key(email, tool, target)
+        expires_at = time.time() + self.ttl_seconds
+
+        with self._lock:
+            self._store(key, role, expires_at)
+
+        if self.db_path:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO grants (email, tool, target, role, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (*key, role, expires_at)
+            )
+
+    def forget(self, email: str, tool: str, target: str):
+        """
+        付与の記録を削除（アクセス権の削除・権限の引き下げ時）
+
+        Args:
+            email: メールアドレス
+            tool: ツール名
+            target: 付与先のID
+        """
+        key = self._key(email, tool, target)
+        with self._lock:
+            self._entries.pop(key, None)
+
+        if self.db_path:
+            self._connect().execute("DELETE FROM grants WHERE email = ? AND tool = ? AND target = ?", key)
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・追い出し数を取得"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+_cache_lock = threading.Lock()
+_grant_cache: Optional[GrantCache] = None
+
+
+def get_grant_cache() -> GrantCache:
+    """
+    プロセス全体で共有する付与済みキャッシュを取得
+
+    Returns:
+        共有の GrantCache
+    """
+    global _grant_cache
+    if _grant_cache is None:
+        with _cache_lock:
+            if _grant_cache is None:
+                _grant_cache = GrantCache(
+                    max_entries=int(os.getenv("GRANT_CACHE_MAX_ENTRIES", "10000")),
+                    ttl_seconds=float(os.getenv("GRANT_CACHE_TTL", "86400")),
+                    db_path=os.getenv("GRANT_CACHE_DB") or None
+                )
+    return _grant_cache
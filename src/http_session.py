@@ -0,0 +1,157 @@
+"""
+HTTP セッション管理
+コネクションプールとリトライを備えた共有 requests.Session を提供
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# リトライ対象のステータスコード
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def get_retry_status_codes() -> Tuple[int, ...]:
+    """
+    自動リトライの対象にするステータスコードを取得
+
+    レート制限（src.rate_limit）が有効な場合、429 は全プロセスで待機を調整するレート制限側で
+    再送するため、ここでのリトライ対象から外す。
+
+    Returns:
+        ステータスコード
+    """
+    if os.getenv("RATE_LIMIT_ENABLED", "1") == "0":
+        return RETRY_STATUS_CODES
+    return tuple(status for status in RETRY_STATUS_CODES if status != 429)
+
+
+def parse_rate_limit_delay(status: int, headers: Mapping[str, str]) -> Optional[float]:
+    """
+    レスポンスヘッダーからリトライまでの待機秒数を取得
+
+    Retry-After を優先し、それがない 429 応答では Trello の
+    x-rate-limit-api-token-interval-ms を待機時間として使う。
+
+    Args:
+        status: ステータスコード
+        headers: レスポンスヘッダー
+
+    Returns:
+        待機秒数、またはヘッダーから判断できない場合は None
+    """
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+
+    if status != 429:
+        return None
+    interval_ms = headers.get("x-rate-limit-api-token-interval-ms")
+    try:
+        return int(interval_ms) / 1000 if interval_ms else None
+    except ValueError:
+        return None
+
+
+def get_retry_settings() -> Tuple[int, float]:
+    """
+    リトライ回数とバックオフ係数を取得
+
+    Returns:
+        (最大リトライ回数, バックオフ係数)
+    """
+    max_retries = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    backoff_factor = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+    return max_retries, backoff_factor
+
+
+class TrelloRetry(Retry):
+    """Trello のレート制限ヘッダーを考慮するリトライ設定"""
+
+    def get_retry_after(self, response) -> Optional[float]:
+        """リトライまでの待機秒数を取得"""
+        return parse_rate_limit_delay(response.status, response.headers)
+
+
+def get_timeouts() -> Tuple[float, float]:
+    """
+    接続タイムアウトと読み取りタイムアウトを取得
+
+    Returns:
+        (接続タイムアウト秒, 読み取りタイムアウト秒)
+    """
+    connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+    read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+    return connect_timeout, read_timeout
+
+
+def create_session() -> requests.Session:
+    """
+    プール・キープアライブ・リトライを設定したセッションを生成
+
+    Returns:
+        設定済みの requests.Session
+    """
+    pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    max_retries, backoff_factor = get_retry_settings()
+
+    retry = TrelloRetry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=get_retry_status_codes(),
+        allowed_methods=None,  # PUT を含む全メソッドをリトライ対象にする
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.headers["Connection"] = "keep-alive"
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+
+
+def get_session() -> requests.Session:
+    """
+    プロセス全体で共有するセッションを取得
+
+    Returns:
+        共有の requests.Session
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session():
+    """共有セッションを閉じる（設定変更時やテスト用）"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
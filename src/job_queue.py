@@ -0,0 +1,406 @@
+"""
+ジョブキュー
+SQLiteに永続化したキューでアカウント発行をバックグラウンド実行
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from src.api_clients import execute_batch_account_requests, get_target_id
+from src.models import AccountRequest
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+# 上流 API の障害（サーキットブレーカーが開いている）で保留し、復旧後に再実行する
+STATUS_DEFERRED = "deferred"
+# 同じ冪等キーの依頼をまとめる、まだ実行が終わっていないジョブの状態
+STATUS_PENDING = (STATUS_QUEUED, STATUS_DEFERRED)
+
+# ジョブの実行方式
+# threads: execute_batch_account_requests（スレッドプール。Google Drive はバッチリクエストにまとめる）
+# async: src.async_api_clients の ProvisioningScheduler（イベントループ上でツールごとの同時実行数を制限）
+ENGINE_THREADS = "threads"
+ENGINE_ASYNC = "async"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_dequeue ON jobs (status, available_at, created_at);
+"""
+
+
+def make_idempotency_key(request: AccountRequest) -> str:
+    """
+    冪等キー（メールアドレス + ツール + 付与先のID）を生成
+
+    Args:
+        request: アカウント発行依頼
+
+    Returns:
+        冪等キー
+    """
+    return f"{request.email.lower()}:{request.tool}:{get_target_id(request.tool, request.target)}"
+
+
+class JobQueue:
+    """SQLiteに永続化したアカウント発行ジョブのキュー"""
+
+    def __init__(self, db_path: str, max_attempts: int = 3, lease_seconds: float = 300.0):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        # 実行中のまま更新されないジョブを再実行するまでの秒数
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """現在のスレッド用のコネクションを取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, request: AccountRequest) -> str:
+        """
+        ジョブを登録
+
+        同じ冪等キーのジョブがまだ実行前（待機中・保留中）の場合は二重に登録せず、
+        そのジョブの依頼を新しい依頼（権限など）で置き換えてジョブIDを返す。
+        実行中のジョブは依頼が同じ場合だけまとめる。実行が終わったジョブ（成功・失敗）はまとめず、
+        新しいジョブを登録する（権限の変更や、突き合わせで削除した後の再付与を取りこぼさないため）。
+
+        Args:
+            request: アカウント発行依頼
+
+        Returns:
+            ジョブID
+        """
+        conn = self._connect()
+        key = make_idempotency_key(request)
+        payload = request.model_dump_json()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, status, payload FROM jobs WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+            if row is not None and row["status"] in STATUS_PENDING:
+                job_id = row["id"]
+                if row["payload"] != payload:
+                    conn.execute(
+                        "UPDATE jobs SET payload = ?, updated_at = ? WHERE id = ?", (payload, now, job_id)
+                    )
+            elif row is not None and row["status"] == STATUS_RUNNING and row["payload"] == payload:
+                job_id = row["id"]
+            else:
+                if row is not None:
+                    # 以前のジョブは冪等キーを外して履歴として残す（ジョブIDでの状態の取得は引き続きできる）
+                    conn.execute(
+                        "UPDATE jobs SET idempotency_key = ? WHERE id = ?", (f"{key}#{row['id']}", row["id"])
+                    )
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, idempotency_key, payload, status, available_at, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, key, payload, STATUS_QUEUED, now, now, now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def dequeue_batch(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        実行可能なジョブをまとめて取得し、実行中にする
+
+        Args:
+            limit: 取得する最大件数
+
+        Returns:
+            ジョブ（id, request, attempts）のリスト
+        """
+        conn = self._connect()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM jobs"
+                " WHERE (status IN (?, ?) AND available_at <= ?) OR (status = ? AND updated_at <= ?)"
+                " ORDER BY created_at LIMIT ?",
+                (STATUS_QUEUED, STATUS_DEFERRED, now, STATUS_RUNNING, now - self.lease_seconds, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(STATUS_RUNNING, now, row["id"]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        jobs = []
+        for row in rows:
+            try:
+                request = AccountRequest.model_validate_json(row["payload"])
+            except ValueError as e:
+                # 読めない依頼は再実行しても成功しないため、その場で失敗にする
+                self.fail(row["id"], f"依頼を読み込めませんでした: {e}", self.max_attempts)
+                continue
+            jobs.append({"id": row["id"], "request": request, "attempts": row["attempts"] + 1})
+        return jobs
+
+    def touch(self, job_ids: List[str]):
+        """
+        実行中のジョブの更新時刻を進め、リースを延長する
+
+        レート制限やバックオフで長くかかっているジョブが、リース切れで別のワーカーに再実行されないようにする。
+        """
+        now = time.time()
+        self._connect().executemany(
+            "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?",
+            [(now, job_id, STATUS_RUNNING) for job_id in job_ids]
+        )
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        """ジョブを成功として記録"""
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE id = ?",
+            (STATUS_SUCCEEDED, json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str, attempts: int):
+        """
+        ジョブの失敗を記録
+
+        試行回数が上限未満の場合はバックオフ後に再実行されるようキューに戻す。
+        """
+        now = time.time()
+        if attempts < self.max_attempts:
+            status, available_at = STATUS_QUEUED, now + 2 ** attempts
+        else:
+            status, available_at = STATUS_FAILED, now
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, available_at = ?, updated_at = ? WHERE id = ?",
+            (status, error, available_at, now, job_id)
+        )
+
+    def defer(self, job_id: str, error: str, retry_at: float):
+        """
+        上流 API の障害で実行しなかったジョブを保留
+
+        試行回数には数えず、retry_at（ブレーカーが次の呼び出しを許す時刻）以降に再実行する。
+        """
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), error = ?, available_at = ?,"
+            " updated_at = ? WHERE id = ?",
+            (STATUS_DEFERRED, error, retry_at, time.time(), job_id)
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ジョブの状態を取得
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            ジョブの状態、存在しない場合は None
+        """
+        row = self._connect().execute(
+            "SELECT id, payload, status, attempts, result, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "request": AccountRequest.model_validate_json(row["payload"]),
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"]
+        }
+
+
+class JobWorker(threading.Thread):
+    """キューからジョブをまとめて取り出して実行するワーカースレッド"""
+
+    def __init__(self, queue: JobQueue, batch_size: int = 20, poll_interval: float = 0.5,
+                 heartbeat_interval: Optional[float] = None, engine: str = ENGINE_THREADS):
+        super().__init__(daemon=True)
+        if engine not in (ENGINE_THREADS, ENGINE_ASYNC):
+            raise ValueError(f"ジョブの実行方式は {ENGINE_THREADS} または {ENGINE_ASYNC} を指定してください。")
+        self.queue = queue
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        # 実行中のジョブのリースを延長する間隔（既定はリースの1/3）
+        self.heartbeat_interval = heartbeat_interval or queue.lease_seconds / 3
+        self.engine = engine
+        self._stop_event = threading.Event()
+        # async の場合にワーカーが使い続けるイベントループとスケジューラ（初回の実行時に生成）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scheduler = None
+
+    def stop(self):
+        """ワーカーを停止"""
+        self._stop_event.set()
+
+    def execute(self, requests: List[AccountRequest]) -> List[Dict[str, Any]]:
+        """
+        依頼をまとめて実行
+
+        async の場合は、ワーカーのイベントループ上のスケジューラで並行実行する
+        （共有の非同期HTTPクライアントの接続は、ループを使い続けることでバッチをまたいで再利用される）。
+
+        Args:
+            requests: アカウント発行依頼のリスト
+
+        Returns:
+            requests と同じ順序の実行結果
+        """
+        if self.engine == ENGINE_THREADS:
+            return execute_batch_account_requests(requests)
+
+        # httpx などの読み込みは async を使う場合まで遅らせる
+        from src.async_api_clients import ProvisioningScheduler
+
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._scheduler = ProvisioningScheduler()
+        return self._loop.run_until_complete(self._scheduler.run(requests))
+
+    def close(self):
+        """async の場合のイベントループと共有の非同期HTTPクライアントを閉じる"""
+        if self._loop is None:
+            return
+        from src.async_api_clients import close_async_http_client
+
+        self._loop.run_until_complete(close_async_http_client())
+        self._loop.close()
+        self._loop = None
+        self._scheduler = None
+
+    def _heartbeat(self, job_ids: List[str], done: threading.Event):
+        """done が設定されるまで、実行中のジョブのリースを定期的に延長する"""
+        while not done.wait(self.heartbeat_interval):
+            try:
+                self.queue.touch(job_ids)
+            except sqlite3.Error:
+                logger.exception("ジョブのリースを延長できませんでした")
+
+    def run_once(self) -> int:
+        """
+        1バッチ分のジョブを実行
+
+        実行中はリースを延長し続け、1件の結果の記録に失敗しても残りのジョブの記録は続ける。
+
+        Returns:
+            実行したジョブの件数
+        """
+        jobs = self.queue.dequeue_batch(self.batch_size)
+        if not jobs:
+            return 0
+
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=([job["id"] for job in jobs], done), daemon=True
+        )
+        heartbeat.start()
+        try:
+            try:
+                results = self.execute([job["request"] for job in jobs])
+            except Exception as e:
+                logger.exception("ジョブの実行中にエラーが発生しました")
+                results = [{"success": False, "error": str(e)}] * len(jobs)
+        finally:
+            done.set()
+            heartbeat.join()
+
+        for job, result in zip(jobs, results):
+            try:
+                if result["success"]:
+                    self.queue.complete(job["id"], result)
+                elif result.get("deferred"):
+                    self.queue.defer(job["id"], result.get("error", "不明なエラー"), result["retry_at"])
+                else:
+                    self.queue.fail(job["id"], result.get("error", "不明なエラー"), job["attempts"])
+            except Exception as e:
+                logger.exception("ジョブ %s の結果を記録できませんでした", job["id"])
+                try:
+                    self.queue.fail(job["id"], f"結果を記録できませんでした: {e}", job["attempts"])
+                except sqlite3.Error:
+                    # 記録できなかったジョブはリース切れ後に再実行される
+                    pass
+        return len(jobs)
+
+    def run(self):
+        # 予期しない例外でもスレッドを終了させず、次のバッチに進む（ジョブが待機中のまま残らないようにする）
+        while not self._stop_event.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("ジョブワーカーでエラーが発生しました")
+                processed = 0
+            if processed == 0:
+                self._stop_event.wait(self.poll_interval)
+        self.close()
+
+
+_queue_lock = threading.Lock()
+_job_queue: Optional[JobQueue] = None
+_workers: List[JobWorker] = []
+
+
+def get_job_queue() -> JobQueue:
+    """
+    プロセス全体で共有するジョブキューを取得（初回にワーカーを起動）
+
+    Returns:
+        共有の JobQueue
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _queue_lock:
+            if _job_queue is None:
+                queue = JobQueue(
+                    os.getenv("JOB_QUEUE_DB", "jobs.db"),
+                    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+                )
+                for _ in range(int(os.getenv("JOB_WORKERS", "2"))):
+                    worker = JobWorker(
+                        queue,
+                        batch_size=int(os.getenv("JOB_BATCH_SIZE", "20")),
+                        engine=os.getenv("JOB_ENGINE", ENGINE_THREADS)
+                    )
+                    worker.start()
+                    _workers.append(worker)
+                _job_queue = queue
+    return _job_queue
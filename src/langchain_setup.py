@@ -4,86 +4,339 @@ Gemini APIの初期化と会話状態の管理
 """
 
 import os
-import re
-from typing import Dict, Any, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-from src.models import ConversationState
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.circuit_breaker import open_circuits
+from src.dialogue import (
+    CORRECTION_PATTERN, apply_slots, clear_invalid_slots, extract_turn, filled_slots, make_turn, next_question,
+    next_slot
+)
+from src.extractor import ExtractionResult
+from src.grant_cache import role_covers
+from src.metrics import count, observe, timed, timer
+from src.models import AccountRequestDraft, BatchRow, ConversationState
+from src.prefetch import PrefetchKey, get_prefetcher, make_prefetch_key
+from src.prompts import (
+    ALREADY_GRANTED_MESSAGE, COMPLETE_RESPONSE, EXTRACTION_PROMPT, PERMISSION_JAPANESE,
+    REPLY_PROMPT, REQUEST_SUMMARY_OUTCOMES, SYSTEM_PROMPT,
+    get_confirmation_message, get_request_summary
+)
+from src.targets import get_target_registry
+
+if TYPE_CHECKING:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+
+class InvalidRequestError(ValueError):
+    """揃った会話状態が依頼のモデルの検証を通らない場合のエラー（メッセージは無効な項目を尋ね直す返答）"""
+
+
+_llm_lock = threading.Lock()
+_shared_llm: Optional["ChatGoogleGenerativeAI"] = None
+
+
+def get_shared_llm() -> "ChatGoogleGenerativeAI":
+    """
+    プロセス全体で共有する Gemini LLM を取得（初回呼び出し時に生成）
+
+    Returns:
+        共有の ChatGoogleGenerativeAI
+
+    Raises:
+        ValueError: GEMINI_API_KEY が設定されていない場合
+    """
+    global _shared_llm
+    if _shared_llm is None:
+        with _llm_lock:
+            if _shared_llm is None:
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise ValueError("GEMINI_API_KEY が設定されていません。")
+
+                # langchain_google_genai は読み込みが重いため、初回に必要になった時点でインポートする
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                _shared_llm = ChatGoogleGenerativeAI(
+                    model="gemini-2.0-flash-exp",
+                    google_api_key=api_key,
+                    temperature=0.7,
+                    convert_system_message_to_human=True
+                )
+    return _shared_llm
+
+
+def chunk_text(chunk) -> str:
+    """ストリーミングの断片からテキストを取り出す"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    # 断片が複数のパートに分かれている場合
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content
+    )
 
 
 class ChatbotManager:
     """チャットボットの状態管理クラス"""
 
-    def __init__(self):
-        self.llm = None
+    def __init__(self, llm=None):
+        # LLM は初回に必要になった時点で共有のものを使う（テストでは差し替え可能）
+        self._llm = llm
+        self._slot_filler = None
         self.state = ConversationState()
-        self.initialize_llm()
+        # 付与先レジストリ（ツールと付与先のキーワードは、レジストリが構築した1つの抽出器で読み取る）
+        self.targets = get_target_registry()
+        self.extractor = self.targets.extractor
+        # 既存のアクセス権を確認するインデックス（src.access_index.AccessIndex、任意）
+        self.access_index = None
+        # 直前の stream_response での process_user_input の結果
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def llm(self):
+        """使用する LLM（未指定の場合はプロセス共有の Gemini LLM）"""
+        if self._llm is None:
+            self._llm = get_shared_llm()
+        return self._llm
 
     def initialize_llm(self):
         """Gemini LLMを初期化"""
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY が設定されていません。")
-
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            google_api_key=api_key,
-            temperature=0.7,
-            convert_system_message_to_human=True
-        )
+        self._llm = get_shared_llm()
+        self._slot_filler = None
 
     def reset_conversation(self):
         """会話をリセット"""
         self.state = ConversationState()
 
+    @timed("extract_information")
     def extract_information(self, user_input: str) -> Dict[str, Any]:
         """
         ユーザー入力から情報を抽出
 
+        ルールによる抽出で判断できる場合はそれを使い、判断できない発話のみ LLM に渡す。
+
         Args:
             user_input: ユーザーの入力テキスト
 
         Returns:
             抽出された情報
         """
-        extracted = {}
+        start = time.perf_counter()
+        extracted, result = self.extract_with_rules(user_input)
+        confident = self.is_confident(extracted, result)
+        observe("extract_rules", time.perf_counter() - start)
+        # ルールだけで処理できた割合は path="rules" / 全体 で求める
+        count("extraction_turns_total", path="rules" if confident else "llm")
+        if confident:
+            return extracted
+
+        try:
+            llm_extracted = self.extract_with_llm(user_input)
+        except Exception:
+            # LLM が使えない場合はルールによる抽出結果のまま続ける
+            count("llm_errors_total", stage="extract")
+            return extracted
+
+        # ルールで抽出できた値を優先する
+        return {**llm_extracted, **extracted}
+
+    def is_confident(self, extracted: Dict[str, Any], result: ExtractionResult) -> bool:
+        """
+        ルールによる抽出結果で十分かチェック
+
+        背景を読み取れた場合、訂正の場合、または今尋ねている項目が一意に抽出できた場合は十分とみなす。
+
+        Args:
+            extracted: ルールによる抽出結果
+            result: 抽出器の全候補
 
-        # メールアドレスの抽出
-        if not self.state.email:
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            emails = re.findall(email_pattern, user_input)
-            if emails:
-                extracted['email'] = emails[0]
-
-        # ツールの抽出
-        if not self.state.tool:
-            user_lower = user_input.lower()
-            if 'trello' in user_lower or 'トレロ' in user_input:
-                extracted['tool'] = 'trello'
-            elif 'google drive' in user_lower or 'googledrive' in user_lower or \
-                 'グーグルドライブ' in user_input or 'ドライブ' in user_input:
-                extracted['tool'] = 'google_drive'
-
-        # 権限の抽出（Google Driveの場合）
-        if self.state.tool == 'google_drive' and not self.state.permission:
-            user_lower = user_input.lower()
-            if 'reader' in user_lower or '閲覧' in user_input or 'リーダー' in user_input:
-                extracted['permission'] = 'reader'
-            elif 'commenter' in user_lower or 'コメント' in user_input or 'コメンター' in user_input:
-                extracted['permission'] = 'commenter'
-            elif 'writer' in user_lower or '編集' in user_input or 'ライター' in user_input:
-                extracted['permission'] = 'writer'
-
-        # 背景の抽出（他の情報が揃っている場合）
-        if self.state.email and self.state.tool and not self.state.background:
-            if self.state.tool == 'trello' or (self.state.tool == 'google_drive' and self.state.permission):
-                # ユーザー入力全体を背景として扱う（255文字まで）
-                background = user_input.strip()[:255]
-                if len(background) > 0:
-                    extracted['background'] = background
+        Returns:
+            LLM を使わずに済む場合は True
+        """
+        if 'background' in extracted:
+            return True
+        # 訂正はルールで読み取れた値だけを上書きする
+        if extracted and CORRECTION_PATTERN.search(result.text):
+            return True
+        slot = next_slot(self.state)
+        if slot == 'permission':
+            return 'permission' in extracted and len(result.values('permission')) == 1
+        return slot is None or slot in extracted
+
+    def extract_with_llm(self, user_input: str) -> Dict[str, Any]:
+        """
+        LLM の構造化出力で情報を抽出
+
+        Args:
+            user_input: ユーザーの入力テキスト
 
+        Returns:
+            抽出された情報（未入力の項目のみ）
+        """
+        if self._slot_filler is None:
+            self._slot_filler = self.llm.with_structured_output(AccountRequestDraft)
+
+        with timer("llm_extract"):
+            draft = self._slot_filler.invoke(EXTRACTION_PROMPT.format(
+                question=self.get_next_question() or "",
+                user_input=user_input
+            ))
+
+        extracted = {}
+        if draft.email and not self.state.email:
+            extracted['email'] = draft.email
+        if draft.tool and not self.state.tool:
+            extracted['tool'] = draft.tool
+        tool = self.state.tool or extracted.get('tool')
+        if draft.permission and not self.state.permission and tool == 'google_drive':
+            extracted['permission'] = draft.permission
         return extracted
 
+    def stream_reply(self, user_input: str, question: str) -> Iterator[str]:
+        """
+        LLM で応答を生成し、トークンが届くたびに返す
+
+        LLM が使えない場合は question をそのまま返す。
+
+        Args:
+            user_input: ユーザーの入力テキスト
+            question: 次に尋ねる質問
+
+        Yields:
+            応答の断片
+        """
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        messages = [
+            SystemMessage(content=SYSTEM_PROMPT),
+            HumanMessage(content=REPLY_PROMPT.format(question=question, user_input=user_input))
+        ]
+
+        start = time.perf_counter()
+        streamed = False
+        try:
+            for chunk in self.llm.stream(messages):
+                text = chunk_text(chunk)
+                if not text:
+                    continue
+                if not streamed:
+                    observe("llm_first_token", time.perf_counter() - start)
+                    streamed = True
+                yield text
+            observe("llm_reply", time.perf_counter() - start)
+        except Exception:
+            count("llm_errors_total", stage="reply")
+            # 途中で失敗した場合も、次の質問は必ず伝える
+            yield ("\n\n" if streamed else "") + question
+
+    def stream_response(self, user_input: str) -> Iterator[str]:
+        """
+        ユーザー入力を処理し、ボットの応答を断片ごとに返す
+
+        抽出した情報の確認はすぐに返し、LLM による応答はトークンが届くたびに返す。
+        全ての情報が揃った場合は COMPLETE_RESPONSE を返す。
+
+        Args:
+            user_input: ユーザーの入力
+
+        Yields:
+            ボットの応答の断片
+        """
+        result = self.last_result = self.process_user_input(user_input)
+
+        # エラーがある場合
+        if result['status'] == 'error':
+            # 値を尋ね直す（訂正に失敗した場合など、全て揃っている場合は質問を付けない）
+            question = self.get_next_question()
+            yield "\n\n".join([*result['errors'].values(), *([question] if question else [])])
+            return
+
+        # 既にアクセス権を持っている場合
+        if result['status'] == 'already_granted':
+            yield ALREADY_GRANTED_MESSAGE.format(
+                email=result['email'],
+                tool_name=self.targets.display_name(result['tool'], result.get('target')),
+                role=PERMISSION_JAPANESE.get(result['role'], result['role'])
+            )
+            return
+
+        # 情報が全て揃った場合
+        if result['status'] == 'complete':
+            yield COMPLETE_RESPONSE
+            return
+
+        # 抽出された情報を確認して次の質問を返す
+        extracted = result.get('extracted', {})
+        if extracted:
+            target_names = {target.alias: target.name for target in self.targets.targets}
+            yield get_confirmation_message(extracted, target_names, result.get('corrected')) + result['next_question']
+            return
+
+        # 何も読み取れなかった場合は LLM の応答をストリーミング
+        yield from self.stream_reply(user_input, result['next_question'])
+
+    def extract_with_rules(self, user_input: str) -> Tuple[Dict[str, Any], ExtractionResult]:
+        """
+        抽出器（キーワード・メールアドレス）で、メッセージから読み取れる全てのスロットを抽出
+
+        埋まっていないスロットに加え、訂正の表現がある場合は埋まっているスロットも上書きの対象にする
+        （src.dialogue のスロットの表を参照）。
+
+        Args:
+            user_input: ユーザーの入力テキスト
+
+        Returns:
+            (抽出された情報, 否定された候補を除いた抽出器の全候補)
+        """
+        turn = make_turn(self, user_input)
+        return extract_turn(self, turn), turn.result
+
+    def extract_selections(self, result: ExtractionResult) -> List[Tuple[str, Optional[str]]]:
+        """
+        ツールと付与先の候補を出現順に (ツール, 付与先の別名) にまとめる
+
+        ツール名だけの候補は既定の付与先（None）とし、同じ組み合わせは1つにまとめる。
+
+        Args:
+            result: 抽出器の全候補
+
+        Returns:
+            (ツール, 付与先の別名) のリスト
+        """
+        selections: List[Tuple[str, Optional[str]]] = []
+        for candidate in result.candidates:
+            if candidate.slot == 'target':
+                target = self.targets.get(candidate.value)
+                selection = (target.tool, target.alias) if target is not None else None
+            elif candidate.slot == 'tool':
+                selection = (candidate.value, None)
+            else:
+                continue
+            if selection is not None and selection not in selections:
+                selections.append(selection)
+        return selections
+
+    def allowed_roles(self) -> List[str]:
+        """依頼に含まれる全ての Google Drive の付与先で選択できる権限"""
+        state = self.state
+        additional_targets = state.additional_targets + [None] * (len(state.additional_tools) - len(state.additional_targets))
+        roles: Optional[List[str]] = None
+        for tool, alias in [(state.tool, state.target), *zip(state.additional_tools, additional_targets)]:
+            if tool != 'google_drive':
+                continue
+            try:
+                target_roles = self.targets.resolve(tool, alias).roles
+            except ValueError:
+                continue
+            roles = [role for role in (roles if roles is not None else target_roles) if role in target_roles]
+        return roles if roles is not None else ['reader', 'commenter', 'writer']
+
+    @timed("update_state")
     def update_state(self, extracted_info: Dict[str, Any]) -> Dict[str, str]:
         """
         状態を更新し、バリデーションを実行
@@ -94,58 +347,150 @@ class ChatbotManager:
         Returns:
             バリデーションエラー
         """
-        errors = {}
-
-        # メールアドレスの更新
-        if 'email' in extracted_info:
-            try:
-                # 簡易的なメール検証
-                email = extracted_info['email']
-                if '@' in email and '.' in email.split('@')[1]:
-                    self.state.email = email
-                else:
-                    errors['email'] = '正しいメールアドレスの形式で入力してください。'
-            except Exception as e:
-                errors['email'] = '正しいメールアドレスの形式で入力してください。'
-
-        # ツールの更新
-        if 'tool' in extracted_info:
-            self.state.tool = extracted_info['tool']
-
-        # 権限の更新
-        if 'permission' in extracted_info:
-            self.state.permission = extracted_info['permission']
-
-        # 背景の更新
-        if 'background' in extracted_info:
-            background = extracted_info['background']
-            if len(background) > 255:
-                errors['background'] = f'背景は255文字以内で入力してください。現在の文字数: {len(background)}文字'
-            elif len(background.strip()) == 0:
-                errors['background'] = '背景を入力してください。'
-            else:
-                self.state.background = background
-
-        return errors
+        return apply_slots(self, extracted_info)
 
+    @timed("get_next_question")
     def get_next_question(self) -> Optional[str]:
         """
-        次に尋ねるべき質問を取得
+        次に尋ねるべき質問を取得（スロットの表で、必要でまだ埋まっていない最初のスロット）
 
         Returns:
             次の質問、または None（全ての情報が揃っている場合）
         """
-        from src.prompts import QUESTIONS
+        return next_question(self)
+
+    def load_batch_rows(self, rows: List[BatchRow]) -> Dict[str, Any]:
+        """
+        CSVなどから読み込んだ一括依頼の行を会話状態に設定
 
-        if not self.state.email:
-            return QUESTIONS['email']
-        elif not self.state.tool:
-            return QUESTIONS['tool']
-        elif self.state.tool == 'google_drive' and not self.state.permission:
-            return QUESTIONS['permission']
-        elif not self.state.background:
-            return QUESTIONS['background']
-        return None
+        Args:
+            rows: 一括依頼の行
+
+        Returns:
+            process_user_input と同じ形式の処理結果
+        """
+        self.state = ConversationState(
+            email=rows[0].email,
+            tool=rows[0].tool,
+            target=rows[0].target,
+            batch_rows=rows
+        )
+        return {
+            'status': 'continue',
+            'next_question': self.get_next_question(),
+            'extracted': {'batch_rows': rows}
+        }
+
+    def prefetch_key(self) -> Optional[PrefetchKey]:
+        """先読みの対象（メールアドレスとツールが決まった1件の依頼）のキー、対象がない場合は None"""
+        if self.state.is_batch() or not self.state.email or not self.state.tool:
+            return None
+        return make_prefetch_key(self.state.email, self.state.tool, self.state.target)
+
+    def update_prefetch(self, previous_key: Optional[PrefetchKey]):
+        """
+        会話状態に合わせて先読みを開始・取り消す
+
+        Args:
+            previous_key: 状態を更新する前の先読みのキー
+        """
+        prefetcher = get_prefetcher()
+        if prefetcher is None:
+            return
+        key = self.prefetch_key()
+        if previous_key is not None and previous_key != key:
+            prefetcher.cancel(*previous_key)
+        if key is not None:
+            prefetcher.start(*key)
+
+    def find_existing_access(self) -> Optional[str]:
+        """
+        依頼対象のユーザーが既に十分なアクセス権を持っているかチェック
+
+        アクセス権インデックスで確認する（インデックスのない付与先は判断しない）。
+
+        Returns:
+            既存の権限、アクセス権がない・判断できない場合は None
+        """
+        if self.state.is_batch():
+            return None
+        if not self.state.email or not self.state.tool:
+            return None
+        if self.state.needs_permission() and not self.state.permission:
+            return None
+
+        # アクセス権インデックスは既定の付与先のみを保持する
+        if self.access_index is None or not self.targets.is_default(self.state.tool, self.state.target):
+            return None
+        role = self.access_index.lookup(self.state.email, self.state.tool)
+
+        requested_role = self.state.permission if self.state.tool == 'google_drive' else 'member'
+        if role is None or not role_covers(role, requested_role):
+            return None
+        return role
+
+    def enqueue_request(self, queue) -> List[str]:
+        """
+        揃った会話状態をジョブキューに登録
+
+        Args:
+            queue: ジョブキュー（src.job_queue.JobQueue）
+
+        Returns:
+            依頼1件ごとのジョブID
+
+        Raises:
+            InvalidRequestError: 依頼のモデルの検証を通らない場合（無効な項目のスロットは消して尋ね直す）
+        """
+        try:
+            requests = self.state.to_account_requests()
+        except ValidationError as e:
+            cleared = clear_invalid_slots(self, e)
+            if not cleared:
+                # 会話で尋ね直せない項目（一括依頼の行など）の場合は最初からやり直す
+                self.reset_conversation()
+            fields = ", ".join(cleared or sorted({str(detail['loc'][0]) for detail in e.errors() if detail['loc']}))
+            raise InvalidRequestError(f"{fields} の値が正しくありません。\n\n{self.get_next_question()}") from e
+        return [queue.enqueue(request) for request in requests]
+
+    def unavailable_tools(self) -> List[str]:
+        """
+        依頼のツールのうち、上流 API が応答せずサーキットブレーカーが開いているものを取得
+
+        Returns:
+            ツール名のリスト（ジョブは保留され、復旧後に自動で実行される）
+        """
+        return open_circuits([request.tool for request in self.state.to_account_requests()])
+
+    def summarize_request(self, job_ids: List[str]) -> str:
+        """
+        ジョブに登録した依頼をチャット履歴用の1行に要約
+
+        Args:
+            job_ids: 登録したジョブID
+
+        Returns:
+            依頼の要約
+        """
+        requests = self.state.to_account_requests()
+        outcome = REQUEST_SUMMARY_OUTCOMES['accepted'].format(
+            job_ids=", ".join(job_id[:8] for job_id in job_ids)
+        )
+        return get_request_summary(
+            requests[0].email, requests[0].tool, outcome, requests[0].permission, count=len(requests)
+        )
+
+    def last_request_summary(self) -> Optional[str]:
+        """
+        直前のターンで依頼が完了した（発行不要だった）場合、その要約を返す
+
+        Returns:
+            依頼の要約、依頼が続いている場合は None
+        """
+        result = self.last_result
+        if result is None or result['status'] != 'already_granted':
+            return None
+        return get_request_summary(result['email'], result['tool'], REQUEST_SUMMARY_OUTCOMES['already_granted'])
 
     def process_user_input(self, user_input: str) -> Dict[str, Any]:
         """
@@ -160,8 +505,11 @@ class ChatbotManager:
         # 情報の抽出
         extracted = self.extract_information(user_input)
 
-        # 状態の更新
+        # 状態の更新（メールアドレス・ツールが決まったら、残りの質問の間に発行を先読みする）
+        previous_key = self.prefetch_key()
+        corrected = [slot for slot in filled_slots(self.state) if slot in extracted]
         errors = self.update_state(extracted)
+        self.update_prefetch(previous_key)
 
         # エラーがある場合
         if errors:
@@ -171,6 +519,19 @@ class ChatbotManager:
                 'extracted': extracted
             }
 
+        # 既にアクセス権を持っている場合は、背景を尋ねずに知らせる
+        existing_role = self.find_existing_access()
+        if existing_role is not None:
+            result = {
+                'status': 'already_granted',
+                'email': self.state.email,
+                'tool': self.state.tool,
+                'target': self.state.target,
+                'role': existing_role
+            }
+            self.reset_conversation()
+            return result
+
         # 次の質問を取得
         next_question = self.get_next_question()
 
@@ -185,5 +546,6 @@ class ChatbotManager:
         return {
             'status': 'continue',
             'next_question': next_question,
-            'extracted': extracted
+            'extracted': extracted,
+            'corrected': corrected
         }
@@ -0,0 +1,313 @@
+"""
+メトリクス
+処理段階ごとのレイテンシのヒストグラムとエラー件数を集計し、Prometheus テキスト形式で出力
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# ヒストグラムのバケット上限（秒）: 10マイクロ秒から約84秒まで2倍ずつ
+BUCKETS = tuple(0.00001 * 2 ** i for i in range(24))
+
+_enabled = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def set_enabled(enabled: bool):
+    """計測の有効・無効を切り替え"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    """計測が有効かどうか"""
+    return _enabled
+
+
+class Histogram:
+    """固定バケットのレイテンシヒストグラム"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        """1件の計測値を記録"""
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def percentile(self, q: float) -> float:
+        """
+        バケット内を線形補間してパーセンタイルを推定
+
+        Args:
+            q: 0〜1 の分位点
+
+        Returns:
+            推定値（秒）
+        """
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return 0.0
+
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return BUCKETS[-1]
+
+
+class MetricsRegistry:
+    """段階ごとのヒストグラムとラベル付きカウンタの集まり"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+
+    def histogram(self, stage: str) -> Histogram:
+        """段階のヒストグラムを取得（なければ作成）"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage: str, seconds: float):
+        """段階の処理時間を記録"""
+        self.histogram(stage).observe(seconds)
+
+    def increment(self, name: str, **labels: str):
+        """ラベル付きカウンタを1増やす"""
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def counter(self, name: str, **labels: str) -> int:
+        """ラベル付きカウンタの現在の値を取得"""
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            return self.counters.get(key, 0)
+
+    def summary(self) -> List[Dict[str, float]]:
+        """
+        段階ごとの件数と p50/p95/p99（ミリ秒）を取得
+
+        Returns:
+            段階ごとの集計結果
+        """
+        rows = []
+        for stage, histogram in sorted(self.histograms.items()):
+            rows.append({
+                "stage": stage,
+                "count": histogram.count,
+                "mean_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+                "p50_ms": histogram.percentile(0.50) * 1000,
+                "p95_ms": histogram.percentile(0.95) * 1000,
+                "p99_ms": histogram.percentile(0.99) * 1000,
+            })
+        return rows
+
+    def render_prometheus(self) -> str:
+        """Prometheus テキスト形式で出力"""
+        lines = [
+            "# HELP chatbot_stage_seconds Latency of each processing stage.",
+            "# TYPE chatbot_stage_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.histograms.items()):
+            with histogram._lock:
+                counts, total, total_seconds = list(histogram.counts), histogram.count, histogram.sum
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'chatbot_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'chatbot_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'chatbot_stage_seconds_sum{{stage="{stage}"}} {total_seconds:.6f}')
+            lines.append(f'chatbot_stage_seconds_count{{stage="{stage}"}} {total}')
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+        names = sorted({name for (name, _), _ in counters})
+        for name in names:
+            lines.append(f"# TYPE chatbot_{name} counter")
+            for (counter_name, labels), value in counters:
+                if counter_name != name:
+                    continue
+                label_text = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+                lines.append(f"chatbot_{name}{{{label_text}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# プロセス全体のメトリクス
+registry = MetricsRegistry()
+
+
+class _NullTimer:
+    """計測が無効な場合に使う何もしないコンテキストマネージャ"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_null_timer = _NullTimer()
+
+
+@contextmanager
+def _stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(stage, time.perf_counter() - start)
+
+
+def timer(stage: str):
+    """
+    処理時間を計測するコンテキストマネージャ
+
+    Args:
+        stage: 段階名
+    """
+    if not _enabled:
+        return _null_timer
+    return _stage_timer(stage)
+
+
+def timed(stage: str):
+    """
+    関数の処理時間を計測するデコレータ
+
+    Args:
+        stage: 段階名
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def observe(stage: str, seconds: float):
+    """
+    計測済みの処理時間を記録（計測が無効な場合は何もしない）
+
+    Args:
+        stage: 段階名
+        seconds: 処理時間（秒）
+    """
+    if _enabled:
+        registry.observe(stage, seconds)
+
+
+def count(name: str, **labels) -> None:
+    """
+    ラベル付きカウンタを1増やす（計測が無効な場合は何もしない）
+
+    Args:
+        name: カウンタ名（Prometheus では chatbot_ を付けて出力する）
+        **labels: ラベル
+    """
+    if _enabled:
+        registry.increment(name, **labels)
+
+
+def count_api_error(api: str, status) -> None:
+    """
+    API エラーをステータスコードごとに数える
+
+    Args:
+        api: API名（trello, google_drive）
+        status: ステータスコード（応答がない場合は "network"）
+    """
+    if _enabled:
+        registry.increment("api_errors_total", api=api, status=status)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics を返すハンドラ"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FileExporter(threading.Thread):
+    """一定間隔でメトリクスをファイルに書き出すスレッド"""
+
+    def __init__(self, path: str, interval: float):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(registry.render_prometheus())
+            os.replace(temp_path, self.path)
+
+
+_exporter_lock = threading.Lock()
+_exporters_started = False
+
+
+def start_exporters() -> Optional[int]:
+    """
+    環境変数に従ってエクスポーターを起動（プロセスごとに1回）
+
+    METRICS_PORT が設定されていれば /metrics を提供する HTTP サーバーを、
+    METRICS_FILE が設定されていれば定期的なファイル出力を開始する。
+
+    Returns:
+        HTTP サーバーのポート番号（起動しない場合は None）
+    """
+    global _exporters_started
+    with _exporter_lock:
+        if _exporters_started or not _enabled:
+            return None
+        _exporters_started = True
+
+    port = None
+    if os.getenv("METRICS_PORT"):
+        server = ThreadingHTTPServer(("0.0.0.0", int(os.getenv("METRICS_PORT"))), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+    if os.getenv("METRICS_FILE"):
+        _FileExporter(os.getenv("METRICS_FILE"), float(os.getenv("METRICS_FILE_INTERVAL", "15"))).start()
+    return port
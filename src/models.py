@@ -3,7 +3,7 @@ Pydanticモデル定義
 アカウント発行依頼に必要なデータ構造を定義
 """
 
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, EmailStr, Field, field_validator
 
 
@@ -19,6 +19,9 @@ class AccountRequest(BaseModel):
         description="アカウントが必要な背景（最大255文字）",
         max_length=255
     )
+    target: Optional[str] = Field(
+        None, description="付与先の別名（src.targets を参照、省略時はツールの既定の付与先）"
+    )
 
     @field_validator("background")
     @classmethod
@@ -41,6 +44,55 @@ class AccountRequest(BaseModel):
         return v
 
 
+class AccountRequestDraft(BaseModel):
+    """LLMが1回の発話から読み取ったアカウント発行依頼（AccountRequestの各項目を省略可能にしたもの）"""
+
+    email: Optional[str] = Field(None, description="ユーザーのメールアドレス（発話に含まれる場合のみ）")
+    tool: Optional[Literal["trello", "google_drive"]] = Field(None, description="必要なツール")
+    permission: Optional[Literal["reader", "commenter", "writer"]] = Field(
+        None, description="Google Drive権限（reader: 閲覧, commenter: コメント, writer: 編集）"
+    )
+
+
+class BatchRow(BaseModel):
+    """一括依頼の1行分（背景は依頼全体で共有）"""
+
+    email: EmailStr = Field(description="ユーザーのメールアドレス")
+    tool: Literal["trello", "google_drive"] = Field(description="必要なツール")
+    permission: Optional[Literal["reader", "commenter", "writer"]] = Field(
+        None, description="Google Drive権限（未指定の場合は共有の権限を使用）"
+    )
+    target: Optional[str] = Field(None, description="付与先の別名（省略時はツールの既定の付与先）")
+
+
+class DesiredAccess(BaseModel):
+    """あるべきアクセス権の1行分（src.reconcile で付与先の現在のアクセス権と突き合わせる）"""
+
+    email: EmailStr = Field(description="ユーザーのメールアドレス")
+    tool: Literal["trello", "google_drive"] = Field(description="ツール")
+    permission: Optional[Literal["reader", "commenter", "writer"]] = Field(
+        None, description="Google Drive権限（Google Driveのみ必須）"
+    )
+    target: Optional[str] = Field(None, description="付与先の別名（省略時はツールの既定の付与先）")
+    username: Optional[str] = Field(
+        None, description="Trelloのユーザー名（メンバー一覧がメールアドレスを返さない場合の照合用）"
+    )
+
+
+class ProvisioningTarget(BaseModel):
+    """付与先（Trelloボード・Google Driveファイル）の設定1件分"""
+
+    alias: str = Field(description="付与先の別名（依頼・CSV・設定で付与先を指定する名前）")
+    tool: Literal["trello", "google_drive"] = Field(description="付与先のツール")
+    id: str = Field(description="ボードIDまたはファイルID")
+    name: Optional[str] = Field(None, description="表示名（省略時は別名）")
+    roles: List[str] = Field(default_factory=list, description="付与できる権限（省略時はツールの全権限）")
+    keywords: List[str] = Field(default_factory=list, description="発話から付与先を読み取るための言い回し")
+    default: bool = Field(False, description="ツールだけが指定された場合に使う付与先か")
+    # TRELLO_BOARD_ID / GOOGLE_DRIVE_FILE_ID から作った付与先か
+    from_env: bool = Field(False, exclude=True)
+
+
 class ConversationState(BaseModel):
     """会話の状態を管理するモデル"""
 
@@ -48,12 +100,30 @@ class ConversationState(BaseModel):
     tool: Optional[Literal["trello", "google_drive"]] = None
     permission: Optional[Literal["reader", "commenter", "writer"]] = None
     background: Optional[str] = None
+    # 付与先の別名（None の場合はツールの既定の付与先）
+    target: Optional[str] = None
+    # 一括依頼: メッセージ内の2件目以降のメールアドレス・ツール（additional_targets は additional_tools と同じ順の付与先）
+    additional_emails: List[EmailStr] = Field(default_factory=list)
+    additional_tools: List[Literal["trello", "google_drive"]] = Field(default_factory=list)
+    additional_targets: List[Optional[str]] = Field(default_factory=list)
+    # 一括依頼: CSVから読み込んだ行
+    batch_rows: List[BatchRow] = Field(default_factory=list)
+
+    def is_batch(self) -> bool:
+        """複数件の依頼かどうか"""
+        return bool(self.batch_rows or self.additional_emails or self.additional_tools)
+
+    def needs_permission(self) -> bool:
+        """共有の権限指定が必要かチェック"""
+        if self.batch_rows:
+            return any(row.tool == "google_drive" and not row.permission for row in self.batch_rows)
+        return self.tool == "google_drive" or "google_drive" in self.additional_tools
 
     def is_complete(self) -> bool:
         """必要な情報が全て揃っているかチェック"""
         if not self.email or not self.tool or not self.background:
             return False
-        if self.tool == "google_drive" and not self.permission:
+        if self.needs_permission() and not self.permission:
             return False
         return True
 
@@ -63,5 +133,57 @@ class ConversationState(BaseModel):
             email=self.email,
             tool=self.tool,
             permission=self.permission,
-            background=self.background
+            background=self.background,
+            target=self.target
         )
+
+    def to_account_requests(self) -> List[AccountRequest]:
+        """
+        一括依頼を行ごとのAccountRequestに展開
+
+        CSVの行があればそれを使い、なければ全メールアドレスと全ツールの組み合わせを作る。
+        """
+        if self.batch_rows:
+            return [
+                AccountRequest(
+                    email=row.email,
+                    tool=row.tool,
+                    permission=(row.permission or self.permission) if row.tool == "google_drive" else None,
+                    background=self.background,
+                    target=row.target
+                )
+                for row in self.batch_rows
+            ]
+
+        additional_targets = self.additional_targets + [None] * (len(self.additional_tools) - len(self.additional_targets))
+        return [
+            AccountRequest(
+                email=email,
+                tool=tool,
+                permission=self.permission if tool == "google_drive" else None,
+                background=self.background,
+                target=target
+            )
+            for email in [self.email, *self.additional_emails]
+            for tool, target in [(self.tool, self.target), *zip(self.additional_tools, additional_targets)]
+        ]
+
+
+class ChatMessage(BaseModel):
+    """チャット履歴の1件"""
+
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class ChatSession(BaseModel):
+    """セッションストアに保存する会話1件分（会話状態・履歴・実行中のジョブ）"""
+
+    state: ConversationState = Field(default_factory=ConversationState)
+    # 要約されていない直近のチャット履歴
+    messages: List[ChatMessage] = Field(default_factory=list)
+    # 完了した依頼の要約と、メッセージが残っている依頼の終了位置（src.chat_history.ChatHistory を参照）
+    summaries: List[str] = Field(default_factory=list)
+    closed_ends: List[int] = Field(default_factory=list)
+    # 依頼1件ごとに登録したジョブIDのリスト
+    pending_jobs: List[List[str]] = Field(default_factory=list)
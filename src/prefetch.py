@@ -0,0 +1,170 @@
+"""
+発行の先読み
+最後の質問（背景）への回答を待つ間に、発行の準備をバックグラウンドで済ませる
+
+質問の順序は固定のため、メールアドレスとツール（付与先）は背景より1ターン前に決まる。
+その時点で付与先（ボード・ファイル）の共有クライアントの生成、OAuth トークンの更新と
+付与先への疎通確認（ID だけを取得する GET）を始め、依頼が揃った時点の発行を書き込み1回だけにする。
+既にアクセス権があるかは src.access_index のインデックスで確認するため、先読みではメンバー・権限一覧を読まない。
+メールアドレスやツールが変わった場合は、古い依頼の先読みを取り消す。
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from src.api_clients import get_drive_client, get_trello_client
+from src.circuit_breaker import open_circuits
+from src.metrics import observe
+from src.targets import get_target_registry
+
+# 先読みのキー（小文字のメールアドレス, ツール名, 付与先の別名）
+PrefetchKey = Tuple[str, str, Optional[str]]
+
+
+def make_prefetch_key(email: str, tool: str, target: Optional[str] = None) -> PrefetchKey:
+    """先読みのキーを生成"""
+    return email.lower(), tool, target
+
+
+class PrefetchTask:
+    """1件の依頼の先読み"""
+
+    def __init__(self, key: PrefetchKey):
+        self.key = key
+        self.started_at = time.time()
+        self.future: Optional[Future] = None
+        self._cancelled = threading.Event()
+        self.error: Optional[str] = None
+
+    def cancel(self):
+        """先読みを取り消す（実行前なら実行せず、実行中なら次の手順に進まない）"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def done(self) -> bool:
+        """先読みが終わったか"""
+        return self.future is not None and self.future.done()
+
+
+class Prefetcher:
+    """依頼ごとの先読みを上限付きのスレッドプールで実行"""
+
+    def __init__(self, max_workers: int = 4, ttl_seconds: float = 600.0):
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._tasks: Dict[PrefetchKey, PrefetchTask] = {}
+
+    def start(self, email: str, tool: str, target: Optional[str] = None) -> PrefetchTask:
+        """
+        依頼の先読みを開始（同じ依頼の先読みが既にあればそれを返す）
+
+        Args:
+            email: メールアドレス
+            tool: ツール名
+            target: 付与先の別名（省略時はツールの既定の付与先）
+
+        Returns:
+            先読み
+        """
+        key = make_prefetch_key(email, tool, target)
+        with self._lock:
+            self._expire()
+            task = self._tasks.get(key)
+            if task is not None:
+                return task
+            task = self._tasks[key] = PrefetchTask(key)
+            task.future = self._executor.submit(self._run, task)
+        return task
+
+    def cancel(self, email: str, tool: str, target: Optional[str] = None):
+        """依頼の先読みを取り消す"""
+        with self._lock:
+            task = self._tasks.pop(make_prefetch_key(email, tool, target), None)
+        if task is not None:
+            task.cancel()
+
+    def get(self, email: str, tool: str, target: Optional[str] = None) -> Optional[PrefetchTask]:
+        """依頼の先読みを取得（開始していない場合は None）"""
+        with self._lock:
+            return self._tasks.get(make_prefetch_key(email, tool, target))
+
+    def _expire(self):
+        """ttl_seconds を過ぎた先読みを破棄（ロック取得済みで呼び出す）"""
+        deadline = time.time() - self.ttl_seconds
+        for key in [key for key, task in self._tasks.items() if task.started_at < deadline]:
+            del self._tasks[key]
+
+    def _run(self, task: PrefetchTask):
+        start = time.perf_counter()
+        try:
+            prefetch_grant(task)
+        except Exception as e:
+            task.error = str(e)
+        observe("prefetch", time.perf_counter() - start)
+
+
+def prefetch_grant(task: PrefetchTask):
+    """
+    依頼の発行を準備
+
+    付与先の共有クライアントを生成し（Google Drive はトークンも更新）、付与先に ID だけを取得する GET を送って
+    接続を確立しておく。
+    会話ごとにメンバー・権限一覧を読まないよう、既存のアクセス権の確認はアクセス権インデックスに任せる
+    （Trello のメンバー一覧はメールアドレスを返さないため、一覧からは判定できない）。
+
+    Args:
+        task: 先読み（取り消された場合は次の手順に進まない）
+    """
+    _, tool, target = task.key
+    spec = get_target_registry().resolve(tool, target)
+    # 上流が応答していない間は先読みしない（復旧後に発行時に確認する）
+    if open_circuits([tool]):
+        return
+
+    if tool == "trello":
+        client = get_trello_client(spec.id)
+        if task.cancelled:
+            return
+        client.check_board()
+    else:
+        client = get_drive_client(spec.id)
+        if task.cancelled:
+            return
+        client.check_file()
+
+
+_prefetcher_lock = threading.Lock()
+_prefetcher: Optional[Prefetcher] = None
+
+
+def get_prefetcher() -> Optional[Prefetcher]:
+    """
+    プロセス全体で共有する先読みを取得
+
+    Returns:
+        共有の Prefetcher、PREFETCH_ENABLED=0 の場合は None
+    """
+    global _prefetcher
+    if os.getenv("PREFETCH_ENABLED", "1") == "0":
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher(max_workers=int(os.getenv("PREFETCH_WORKERS", "4")))
+    return _prefetcher
+
+
+def reset_prefetcher():
+    """共有の先読みを破棄（設定変更時やテスト用）"""
+    global _prefetcher
+    with _prefetcher_lock:
+        _prefetcher = None
@@ -27,6 +27,27 @@ SYSTEM_PROMPT = """あなたはアカウント発行を支援する親切なチ
 - Trelloを選択した場合は、権限の質問をスキップする
 """
 
+# スロット抽出プロンプト（ルールで判断できない発話のみLLMに渡す）
+EXTRACTION_PROMPT = """アカウント発行依頼のチャットで、ユーザーの発話から依頼内容を読み取ってください。
+
+現在の質問: {question}
+ユーザーの発話: {user_input}
+
+- 発話に明示されている、または明確に読み取れる項目のみ埋めてください
+- メールアドレスは発話に含まれている場合のみ設定してください（人名から推測しない）
+- 「共有」「ファイル」「ドキュメント」などGoogle Driveを指す表現は google_drive としてください
+- 読み取れない項目は空のままにしてください
+"""
+
+# 応答生成プロンプト（発話から依頼内容を読み取れなかった場合）
+REPLY_PROMPT = """ユーザーの発話からは依頼内容を読み取れませんでした。
+
+現在の質問: {question}
+ユーザーの発話: {user_input}
+
+発話に短く丁寧に応答したうえで、現在の質問に答えてもらえるよう自然に促してください。
+"""
+
 # 挨拶メッセージ
 GREETING_MESSAGE = """こんにちは！ アカウント発行依頼チャットボットです。
 
@@ -85,6 +106,57 @@ COMPLETION_MESSAGES = {
 必要であれば、再度メールアドレスから教えてください。"""
 }
 
+# 一括依頼の完了メッセージ
+BATCH_COMPLETION_MESSAGE = """一括アカウント発行が完了しました！（成功 {success_count}件 / 失敗 {failure_count}件）
+
+【発行結果】
+| メールアドレス | ツール | 権限 | 結果 |
+|---|---|---|---|
+{rows}
+
+- 背景: {background}
+
+他にアカウント発行が必要な方はいらっしゃいますか？
+必要であれば、再度メールアドレスから教えてください。"""
+
+# 既にアクセス権がある場合のメッセージ
+ALREADY_GRANTED_MESSAGE = """{email} は既に {tool_name} へのアクセス権（{role}）を持っているため、発行は不要です。
+
+他にアカウント発行が必要な方はいらっしゃいますか？
+必要であれば、再度メールアドレスから教えてください。"""
+
+# ジョブ受付メッセージ
+JOB_ACCEPTED_MESSAGE = """依頼を受け付けました。（受付番号: {job_ids}）
+アカウント発行はバックグラウンドで実行され、完了するとこの画面でお知らせします。"""
+
+# 上流 API が応答していない（サーキットブレーカーが開いている）場合に受付メッセージに添える案内
+DEFERRED_NOTICE = "現在 {tool_names} が応答していないため、復旧後に自動で発行します。"
+
+# チャット履歴で古い依頼をまとめる際の要約
+REQUEST_SUMMARY_OUTCOMES = {
+    "accepted": "受付済み（受付番号: {job_ids}）",
+    "already_granted": "発行不要（既にアクセス権あり）",
+}
+
+# 情報が全て揃った場合の応答（この応答の後にジョブを登録する）
+COMPLETE_RESPONSE = "情報が全て揃いました。アカウント発行を実行します..."
+
+# 一括依頼の読み込みメッセージ
+BATCH_LOADED_MESSAGE = "CSVから{count}件の依頼を読み込みました。"
+
+# ツールの表示名
+TOOL_NAMES = {
+    "trello": "Trello",
+    "google_drive": "Google Drive"
+}
+
+# 入力内容の確認で使う権限の表記
+PERMISSION_CONFIRMATION_NAMES = {
+    "reader": "閲覧のみ",
+    "commenter": "コメント可",
+    "writer": "編集可"
+}
+
 # 権限の日本語表記
 PERMISSION_JAPANESE = {
     "reader": "閲覧",
@@ -93,6 +165,70 @@ PERMISSION_JAPANESE = {
 }
 
 
+def get_tool_question(names: list) -> str:
+    """
+    ツール（付与先）の質問を生成
+
+    Args:
+        names: 選択できる付与先の表示名
+
+    Returns:
+        質問
+    """
+    return "どのツールが必要ですか？ 以下から選択してください：\n" + "\n".join(f"- {name}" for name in names)
+
+
+def get_permission_question(roles: list) -> str:
+    """
+    Google Driveの権限の質問を生成
+
+    Args:
+        roles: 付与先で選択できる権限
+
+    Returns:
+        質問
+    """
+    return "Google Driveの権限を選択してください：\n" + "\n".join(
+        f"- {role}（{PERMISSION_CONFIRMATION_NAMES.get(role, role)}）" for role in roles
+    )
+
+
+def get_confirmation_message(extracted: dict, target_names: dict = None, corrected: list = None) -> str:
+    """
+    抽出した情報の確認メッセージを生成（抽出がない場合は空文字）
+
+    Args:
+        extracted: 抽出した情報
+        target_names: 付与先の別名 → 表示名（付与先が読み取れた場合にツール名の代わりに表示）
+        corrected: 訂正で上書きしたスロット名
+    """
+    confirmation = ""
+    target_names = target_names or {}
+    corrected = corrected or []
+
+    def confirm(slot: str, label: str, value: str) -> str:
+        if slot in corrected:
+            return f"{label}を {value} に訂正しました。\n\n"
+        return f"{label}: {value} を確認しました。\n\n"
+
+    if 'email' in extracted:
+        emails = [extracted['email'], *extracted.get('additional_emails', [])]
+        confirmation += confirm('email', "メールアドレス", ', '.join(emails))
+    if 'tool' in extracted:
+        tools = [extracted['tool'], *extracted.get('additional_tools', [])]
+        targets = [extracted.get('target'), *extracted.get('additional_targets', [])]
+        targets += [None] * (len(tools) - len(targets))
+        tool_name = ", ".join(target_names.get(target) or TOOL_NAMES[tool] for tool, target in zip(tools, targets))
+        confirmation += confirm('tool', "ツール", tool_name)
+    if 'permission' in extracted:
+        permission_name = PERMISSION_CONFIRMATION_NAMES.get(extracted['permission'], extracted['permission'])
+        confirmation += confirm('permission', "権限", permission_name)
+    if 'background' in extracted:
+        confirmation += confirm('background', "背景", extracted['background'])
+
+    return confirmation
+
+
 def get_completion_message(tool: str, email: str, background: str, permission: str = None) -> str:
     """完了メッセージを生成"""
     if tool == "trello":
@@ -107,3 +243,64 @@ def get_completion_message(tool: str, email: str, background: str, permission: s
             permission_ja=PERMISSION_JAPANESE.get(permission, permission),
             background=background
         )
+
+
+def get_batch_completion_message(results: list, background: str) -> str:
+    """一括依頼の完了メッセージを生成"""
+    rows = []
+    for result in results:
+        permission = result.get("permission")
+        status = "成功" if result["success"] else f"失敗: {result.get('error', '不明なエラー')}"
+        rows.append("| {email} | {tool} | {permission} | {status} |".format(
+            email=result["email"],
+            tool=TOOL_NAMES.get(result["tool"], result["tool"]),
+            permission=PERMISSION_JAPANESE.get(permission, "-") if permission else "-",
+            status=status.replace("\n", " ").replace("|", "/")
+        ))
+
+    success_count = sum(1 for result in results if result["success"])
+    return BATCH_COMPLETION_MESSAGE.format(
+        success_count=success_count,
+        failure_count=len(results) - success_count,
+        rows="\n".join(rows),
+        background=background
+    )
+
+
+def get_request_summary(email: str, tool: str, outcome: str, permission: str = None, count: int = 1) -> str:
+    """
+    チャット履歴に残す依頼の要約を生成
+
+    Args:
+        email: メールアドレス（一括依頼の場合は1件目）
+        tool: ツール名
+        outcome: 結果（REQUEST_SUMMARY_OUTCOMES を整形したもの）
+        permission: 権限（Google Driveの場合のみ）
+        count: 依頼の件数
+
+    Returns:
+        1行の要約
+    """
+    target = TOOL_NAMES.get(tool, tool)
+    if permission and tool == "google_drive":
+        target += f"（{PERMISSION_JAPANESE.get(permission, permission)}）"
+    subject = f"{email} ほか{count - 1}件" if count > 1 else email
+    return f"{subject} / {target}: {outcome}"
+
+
+def get_job_accepted_message(job_ids: list, unavailable_tools: list = None) -> str:
+    """
+    ジョブ受付メッセージを生成
+
+    Args:
+        job_ids: 登録したジョブID
+        unavailable_tools: 応答していない（復旧後に発行する）ツール名
+
+    Returns:
+        受付メッセージ
+    """
+    message = JOB_ACCEPTED_MESSAGE.format(job_ids=", ".join(job_id[:8] for job_id in job_ids))
+    if unavailable_tools:
+        tool_names = ", ".join(TOOL_NAMES.get(tool, tool) for tool in unavailable_tools)
+        message += "\n" + DEFERRED_NOTICE.format(tool_names=tool_names)
+    return message
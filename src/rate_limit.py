@@ -0,0 +1,307 @@
+"""
+レート制限
+Trello / Google Drive の呼び出し回数を、全ワーカープロセスで共有するトークンバケットで制限する
+
+バケットは API と認証情報（Trello は API キー、Google Drive はサービスアカウント）ごとに SQLite に保持する。
+既定ではプロセス内のメモリに置き、RATE_LIMIT_DB でファイルを指定すると同じホストの全プロセスで1つの上限を共有する。
+上限に達した呼び出しは失敗させずに空きを待つ。
+応答の Retry-After と Trello の x-rate-limit-* ヘッダーを見て、バケットの残量と待機時間をサーバーに合わせる。
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from src.http_session import parse_rate_limit_delay
+from src.metrics import observe
+
+# API ごとの既定のバケット（毎秒の補充量/最大量）
+# Trello はトークンあたり 10 秒に 100 回、Google Drive の権限の作成は1ユーザーあたり毎秒数回の書き込みが上限
+DEFAULT_BUCKETS = {
+    "trello": "9/10",
+    "google_drive": "3/10",
+}
+
+# 上限に達したことを示すステータスコード（Google Drive は 403 rateLimitExceeded も使う）
+RATE_LIMIT_STATUS_CODES = (429,)
+DRIVE_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class BucketConfig(NamedTuple):
+    """トークンバケットの設定"""
+
+    rate: float
+    burst: float
+
+    @classmethod
+    def parse(cls, value: str) -> "BucketConfig":
+        """「毎秒の補充量/最大量」の形式を読み込む"""
+        rate, _, burst = value.partition("/")
+        rate = float(rate)
+        return cls(rate, float(burst) if burst else max(1.0, rate))
+
+
+class RateLimitTimeout(Exception):
+    """待機時間の上限までに空きができなかった場合のエラー"""
+
+
+class RateLimiter:
+    """SQLite に保持したトークンバケット（db_path を指定するとプロセス間で共有する）"""
+
+    def __init__(self, db_path: Optional[str] = None, buckets: Optional[Dict[str, str]] = None,
+                 max_wait: float = 60.0):
+        self.db_path = db_path
+        # "api" または "api:認証情報" → 設定。認証情報ごとの設定がなければ API の設定を使う
+        self.buckets = {key: BucketConfig.parse(value) for key, value in {**DEFAULT_BUCKETS, **(buckets or {})}.items()}
+        self.max_wait = max_wait
+        self._local = threading.local()
+        # インメモリの場合は全スレッドで1つのコネクションを共有し、操作をロックで直列化する
+        self._memory_conn: Optional[sqlite3.Connection] = None
+        self._memory_lock: Optional[threading.Lock] = None
+        if not db_path:
+            self._memory_conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+            self._memory_lock = threading.Lock()
+        self._connect().executescript(SCHEMA)
+
+    def _guard(self):
+        """インメモリのバケットへの操作を直列化するコンテキスト（ファイルの場合は SQLite のロックに任せる）"""
+        return self._memory_lock if self._memory_lock is not None else contextlib.nullcontext()
+
+    def _connect(self) -> sqlite3.Connection:
+        """現在のスレッド用のコネクションを取得"""
+        if self._memory_conn is not None:
+            return self._memory_conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def config(self, api: str, credential: str) -> BucketConfig:
+        """バケットの設定を取得"""
+        return self.buckets.get(f"{api}:{credential}") or self.buckets.get(api) or BucketConfig(1.0, 1.0)
+
+    def try_acquire(self, api: str, credential: str, cost: float = 1.0) -> float:
+        """
+        空きがあればトークンを消費する
+
+        最大量を超える cost（Google Drive のバッチなど）は、バケットが満杯なら消費して残量を負にする。
+
+        Args:
+            api: API 名
+            credential: 認証情報の識別子
+            cost: 消費するトークン数
+
+        Returns:
+            消費できた場合は 0、できなかった場合は次に試すまでの秒数
+        """
+        config = self.config(api, credential)
+        key = f"{api}:{credential}"
+        conn = self._connect()
+
+        with self._guard():
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated_at, blocked_until FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, blocked_until = (config.burst, 0.0) if row is None else (
+                    min(config.burst, row[0] + (now - row[1]) * config.rate), row[2]
+                )
+                needed = min(cost, config.burst)
+                if blocked_until > now:
+                    wait = blocked_until - now
+                elif tokens >= needed:
+                    tokens -= cost
+                    wait = 0.0
+                else:
+                    wait = (needed - tokens) / config.rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, blocked_until)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self, api: str, credential: str, cost: float = 1.0):
+        """
+        トークンを消費できるまで待機
+
+        Raises:
+            RateLimitTimeout: max_wait 秒待っても空きができない場合
+        """
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(api, credential, cost)
+            if wait == 0:
+                break
+            if time.monotonic() - start + wait > self.max_wait:
+                raise RateLimitTimeout(f"{api} のレート制限の空きを {self.max_wait:.0f} 秒待っても確保できませんでした。")
+            time.sleep(wait)
+        observe(f"rate_limit_wait_{api}", time.monotonic() - start)
+
+    async def acquire_async(self, api: str, credential: str, cost: float = 1.0):
+        """acquire の非同期版（待機中にイベントループを止めない）"""
+        start = time.monotonic()
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, api, credential, cost)
+            if wait == 0:
+                break
+            if time.monotonic() - start + wait > self.max_wait:
+                raise RateLimitTimeout(f"{api} のレート制限の空きを {self.max_wait:.0f} 秒待っても確保できませんでした。")
+            await asyncio.sleep(wait)
+        observe(f"rate_limit_wait_{api}", time.monotonic() - start)
+
+    def block(self, api: str, credential: str, seconds: float):
+        """
+        バケットを空にし、seconds 秒後まで全プロセスの呼び出しを止める
+
+        Args:
+            api: API 名
+            credential: 認証情報の識別子
+            seconds: 止める秒数
+        """
+        key = f"{api}:{credential}"
+        now = time.time()
+        with self._guard():
+            self._connect().execute(
+                "INSERT INTO buckets (key, tokens, updated_at, blocked_until) VALUES (?, 0, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET tokens = MIN(tokens, 0), updated_at = excluded.updated_at,"
+                " blocked_until = MAX(blocked_until, excluded.blocked_until)",
+                (key, now, now + seconds)
+            )
+
+    def limit_remaining(self, api: str, credential: str, remaining: float):
+        """サーバーが返した残り回数より多く残っている場合、バケットの残量をそれに合わせる"""
+        key = f"{api}:{credential}"
+        with self._guard():
+            self._connect().execute(
+                "UPDATE buckets SET tokens = MIN(tokens, ?) WHERE key = ?", (remaining, key)
+            )
+
+    def observe_response(self, api: str, credential: str, status: int, headers: Mapping[str, str],
+                         attempt: int = 0, limited: Optional[bool] = None) -> Optional[float]:
+        """
+        応答のヘッダーをバケットに反映
+
+        Args:
+            api: API 名
+            credential: 認証情報の識別子
+            status: ステータスコード
+            headers: 応答ヘッダー
+            attempt: 同じ呼び出しでレート制限を受けた回数（ヘッダーで待機時間が分からない場合のバックオフに使う）
+            limited: レート制限を受けたか（省略時はステータスコードで判断）
+
+        Returns:
+            レート制限を受けた場合は、次に試すまでの秒数。受けていない場合は None
+        """
+        headers = {name.lower(): value for name, value in headers.items()}
+        remaining = headers.get("x-rate-limit-api-token-remaining")
+        if remaining is not None:
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                remaining = None
+        if remaining is not None:
+            self.limit_remaining(api, credential, remaining)
+
+        if limited is None:
+            limited = status in RATE_LIMIT_STATUS_CODES
+        if not limited and remaining != 0:
+            return None
+
+        delay = parse_rate_limit_delay(429, {
+            "Retry-After": headers.get("retry-after"),
+            "x-rate-limit-api-token-interval-ms": headers.get("x-rate-limit-api-token-interval-ms"),
+        })
+        if delay is None:
+            delay = min(32.0, 2 ** attempt) if limited else 0.0
+        if delay:
+            self.block(api, credential, delay)
+        return delay if limited else None
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """バケットごとの残量と、止めている残り秒数を取得"""
+        now = time.time()
+        with self._guard():
+            rows = self._connect().execute("SELECT key, tokens, blocked_until FROM buckets ORDER BY key").fetchall()
+        return {
+            key: {"tokens": round(tokens, 3), "blocked_seconds": round(max(0.0, blocked_until - now), 3)}
+            for key, tokens, blocked_until in rows
+        }
+
+
+def is_drive_rate_limit(status: int, content: bytes) -> bool:
+    """
+    Google Drive のエラーがレート制限によるものかチェック
+
+    Google Drive は 429 のほか、理由が rateLimitExceeded / userRateLimitExceeded の 403 を返す。
+    """
+    if status in RATE_LIMIT_STATUS_CODES:
+        return True
+    if status != 403 or not content:
+        return False
+    try:
+        errors = json.loads(content).get("error", {}).get("errors", [])
+    except (ValueError, AttributeError):
+        return False
+    return any(error.get("reason") in DRIVE_RATE_LIMIT_REASONS for error in errors)
+
+
+_limiter_lock = threading.Lock()
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """
+    プロセス全体で共有するレート制限を取得
+
+    Returns:
+        共有の RateLimiter、RATE_LIMIT_ENABLED=0 の場合は None
+    """
+    global _limiter
+    if os.getenv("RATE_LIMIT_ENABLED", "1") == "0":
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                buckets = {
+                    api: os.getenv(f"RATE_LIMIT_{api.upper()}", default)
+                    for api, default in DEFAULT_BUCKETS.items()
+                }
+                # 認証情報ごとの設定: {"trello:<APIキー>": "5/5", "google_drive:<サービスアカウント>": "1/5"}
+                buckets.update(json.loads(os.getenv("RATE_LIMIT_BUCKETS") or "{}"))
+                # RATE_LIMIT_DB を指定した場合のみファイルに保持し、全ワーカープロセスで共有する
+                _limiter = RateLimiter(
+                    os.getenv("RATE_LIMIT_DB") or None,
+                    buckets=buckets,
+                    max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))
+                )
+    return _limiter
+
+
+def reset_rate_limiter():
+    """共有のレート制限を破棄（設定変更時やテスト用）"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
@@ -0,0 +1,466 @@
+"""
+あるべきアクセス権への突き合わせ
+あるべきアクセス権のファイル（メールアドレス → ツール・付与先・権限）に、付与先の現在のアクセス権を合わせる
+
+付与先ごとに現在のメンバー・権限を一括で取得し、集合演算で追加・変更・削除の最小の差分を求め、差分だけを書き込む。
+Google Drive は DRIVE_BATCH_SIZE 件ずつのバッチリクエスト、Trello は書き込みのバッチ API がないため
+上限付きの並行呼び出しで書き込み、いずれもレート制限・サーキットブレーカーをチャットからの発行と共有する。
+既定は dry-run（差分の表示のみ）で、--apply を付けた場合だけ書き込む。
+
+ファイルに含まれる付与先だけを対象とし、次のアクセス権は変更しない。
+- Google Drive: オーナーなど reader/commenter/writer 以外の権限、サービスアカウント自身、ユーザー以外の権限
+- Trello: ボードの管理者、API トークンの所有者、メールアドレスが分からずユーザー名も一致しないメンバー
+
+Trello のメンバー一覧は通常メールアドレスを返さないため、メンバーとの照合には username 列が必要になる。
+username 列のない行は、既にメンバーでも追加（招待）として扱われるため、その行に警告を表示する。
+
+実行方法:
+    python -m src.reconcile access.csv
+    python -m src.reconcile access.jsonl --apply
+    python -m src.reconcile access.csv --apply --keep-unlisted
+    python -m src.reconcile access.csv --output jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from src.api_clients import (
+    DRIVE_BATCH_SIZE,
+    forget_grant,
+    get_drive_client,
+    get_trello_client,
+    record_grant,
+    resolve_request_target,
+)
+from src.audit_log import record_outcome
+from src.batch import resolve_tool
+from src.bulk_import import detect_format, iter_records
+from src.models import DesiredAccess, ProvisioningTarget
+
+# 突き合わせで変更する Google Drive の権限（オーナーなどそれ以外の権限は変更しない）
+MANAGED_DRIVE_ROLES = ("reader", "commenter", "writer")
+
+# 変更の種類
+ACTION_ADD = "add"
+ACTION_UPDATE = "update"
+ACTION_REMOVE = "remove"
+
+# 付与先のキー（ツール名, ボードIDまたはファイルID）
+TargetKey = Tuple[str, str]
+
+
+class Change(NamedTuple):
+    """1件のアクセス権の変更"""
+
+    action: str
+    email: str
+    # 変更後の権限（削除の場合は None。Trello は "member"）
+    role: Optional[str]
+    # 変更前の権限（追加の場合は None）
+    current_role: Optional[str] = None
+    # Trello のメンバーID、Google Drive の権限ID（追加の場合は None）
+    principal_id: Optional[str] = None
+
+
+class TargetPlan:
+    """1つの付与先の差分"""
+
+    def __init__(self, spec: ProvisioningTarget, desired: Dict[str, DesiredAccess]):
+        self.spec = spec
+        self.desired = desired
+        self.changes: List[Change] = []
+        self.unchanged = 0
+        # 変更しない現在のアクセス権（メールアドレスまたはユーザー名, 理由）
+        self.skipped: List[Tuple[str, str]] = []
+        # 差分が正しくない可能性がある行（メールアドレス, 理由）
+        self.warnings: List[Tuple[str, str]] = []
+        # --apply の結果と、変更ごとの書き込みの秒数（changes と同じ順序）
+        self.results: List[Dict[str, Any]] = []
+        self.latencies: List[float] = []
+        # 現在のアクセス権を取得できなかった場合のエラー
+        self.error: Optional[str] = None
+        self.fetch_seconds = 0.0
+        self.apply_seconds = 0.0
+
+    @property
+    def target(self) -> Optional[str]:
+        """記録に使う付与先の別名（環境変数から作った既定の付与先は None）"""
+        return None if self.spec.from_env else self.spec.alias
+
+    def count(self, action: str) -> int:
+        """変更の種類ごとの件数"""
+        return sum(1 for change in self.changes if change.action == action)
+
+
+def load_desired_state(path: str, file_format: Optional[str] = None) -> Tuple[Dict[TargetKey, TargetPlan], List[str]]:
+    """
+    あるべきアクセス権のファイルを読み込み、付与先ごとにまとめる
+
+    一括取り込みと同じ JSON Lines / CSV（email, tool 列。任意で permission, target, username 列）を読む。
+    1行でも読めない行があると、その行のユーザーを削除してしまうため、呼び出し元は突き合わせを中止すること。
+
+    Args:
+        path: ファイルのパス
+        file_format: jsonl または csv（省略時は拡張子から判定）
+
+    Returns:
+        (付与先のキー → 差分（あるべきアクセス権のみ設定済み）, 行ごとのエラーメッセージ)
+
+    Raises:
+        ValueError: CSV に email 列と tool 列がない場合
+    """
+    plans: Dict[TargetKey, TargetPlan] = {}
+    lines: Dict[Tuple[TargetKey, str], int] = {}
+    errors: List[str] = []
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for line_number, record in iter_records(f, file_format or detect_format(path)):
+            if not any(value not in (None, "") for value in record.values()):
+                continue
+            if "_error" in record:
+                errors.append(f"{line_number}行目: {record['_error']}")
+                continue
+            resolved = resolve_tool(str(record.get("tool") or ""))
+            if resolved is None:
+                errors.append(f"{line_number}行目: TrelloまたはGoogle Driveのいずれかを指定してください。")
+                continue
+            try:
+                entry = DesiredAccess(
+                    email=str(record.get("email") or "").strip(),
+                    tool=resolved[0],
+                    permission=str(record.get("permission") or "").strip().lower() or None,
+                    target=str(record.get("target") or "").strip() or resolved[1],
+                    username=str(record.get("username") or "").strip() or None
+                )
+                spec = resolve_request_target(entry.tool, entry.permission, entry.target)
+            except ValidationError as e:
+                fields = ", ".join(str(error["loc"][0]) for error in e.errors())
+                errors.append(f"{line_number}行目: {fields} の値が正しくありません。")
+                continue
+            except ValueError as e:
+                errors.append(f"{line_number}行目: {e}")
+                continue
+
+            key = (spec.tool, spec.id)
+            plan = plans.setdefault(key, TargetPlan(spec, {}))
+            email = entry.email.lower()
+            previous = plan.desired.get(email)
+            if previous is not None and previous.permission != entry.permission:
+                errors.append(
+                    f"{line_number}行目: {email} の権限が {lines[(key, email)]}行目（{previous.permission}）と異なります。"
+                )
+                continue
+            plan.desired[email] = entry
+            lines[(key, email)] = line_number
+    return plans, errors
+
+
+def plan_trello(plan: TargetPlan, prune: bool = True):
+    """
+    Trello ボードの現在のメンバーと突き合わせ、追加・削除の差分を求める
+
+    メンバー一覧がメールアドレスを返すメンバーはメールアドレスで、返さないメンバーは username 列で照合する。
+    メールアドレスで照合できず、あるべきアクセス権のユーザー名にも一致しないメンバーは削除しない。
+
+    Args:
+        plan: 差分（changes などを設定する）
+        prune: ファイルにないメンバーを削除するか
+    """
+    client = get_trello_client(plan.spec.id)
+    members = client.get_board_members()
+    protected_ids = set(client.get_board_admin_ids()) if prune else set()
+
+    by_email = {member["email"].lower(): member for member in members if member.get("email")}
+    by_username = {member["username"].lower(): member for member in members if member.get("username")}
+    desired = set(plan.desired)
+    current = set(by_email)
+    # メールアドレスが分からなくても、ユーザー名が一致するメンバーは付与済みとみなす
+    by_name = {
+        email for email in desired - current
+        if (plan.desired[email].username or "").lower() in by_username
+    }
+    matched_ids = {by_email[email]["id"] for email in desired & current} | {
+        by_username[plan.desired[email].username.lower()]["id"] for email in by_name
+    }
+
+    plan.unchanged = len(desired & current) + len(by_name)
+    plan.changes = [Change(ACTION_ADD, email, "member") for email in sorted(desired - current - by_name)]
+    # メールアドレスが分からず、ユーザー名でも照合できないメンバー
+    unknown = [
+        member for member in members
+        if not member.get("email") and member["id"] not in matched_ids and member["id"] not in protected_ids
+    ]
+    if unknown:
+        for change in plan.changes:
+            if not plan.desired[change.email].username:
+                plan.warnings.append((
+                    change.email,
+                    f"username 列がないため、メールアドレス不明のメンバー（{len(unknown)}人）と照合できません。"
+                    "既にメンバーの場合も追加（招待）します"
+                ))
+    if not prune:
+        return
+    for email in sorted(current - desired):
+        member = by_email[email]
+        if member["id"] in protected_ids:
+            plan.skipped.append((email, "管理者"))
+        else:
+            plan.changes.append(Change(ACTION_REMOVE, email, None, "member", member["id"]))
+    for member in unknown:
+        plan.skipped.append((
+            member.get("username") or member["id"],
+            "メールアドレス不明のため削除できません。username 列で照合します"
+        ))
+
+
+def plan_drive(plan: TargetPlan, prune: bool = True):
+    """
+    Google Drive ファイルの現在の権限と突き合わせ、追加・変更・削除の差分を求める
+
+    Args:
+        plan: 差分（changes などを設定する）
+        prune: ファイルにないユーザーの権限を削除するか
+    """
+    client = get_drive_client(plan.spec.id)
+    current = {
+        permission["emailAddress"].lower(): permission
+        for permission in client.list_permissions()
+        if permission.get("type") == "user" and permission.get("emailAddress")
+    }
+    protected = {email for email, permission in current.items() if permission["role"] not in MANAGED_DRIVE_ROLES}
+    protected.add(client.credential_id.lower())
+    desired = set(plan.desired)
+    managed = set(current) - protected
+
+    updates = {email for email in desired & managed if current[email]["role"] != plan.desired[email].permission}
+    plan.unchanged = len(desired & managed) - len(updates)
+    plan.changes = [
+        Change(ACTION_ADD, email, plan.desired[email].permission) for email in sorted(desired - set(current))
+    ] + [
+        Change(ACTION_UPDATE, email, plan.desired[email].permission, current[email]["role"], current[email]["id"])
+        for email in sorted(updates)
+    ]
+    plan.skipped = [(email, current[email]["role"]) for email in sorted(desired & protected & set(current))]
+    if prune:
+        plan.changes += [
+            Change(ACTION_REMOVE, email, None, current[email]["role"], current[email]["id"])
+            for email in sorted(managed - desired)
+        ]
+
+
+def apply_trello(plan: TargetPlan, workers: int) -> List[Tuple[Dict[str, Any], float]]:
+    """Trello の差分を上限付きの並行呼び出しで書き込み、変更ごとの (結果, 呼び出しの秒数) を返す"""
+    client = get_trello_client(plan.spec.id)
+
+    def run(change: Change) -> Tuple[Dict[str, Any], float]:
+        start = time.perf_counter()
+        try:
+            if change.action == ACTION_ADD:
+                result = client.add_member_to_board(change.email)
+            else:
+                result = client.remove_member_from_board(change.principal_id)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        return result, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, plan.changes))
+
+
+def apply_drive(plan: TargetPlan) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Google Drive の差分を変更の種類ごとに DRIVE_BATCH_SIZE 件ずつのバッチリクエストで書き込む
+
+    Returns:
+        変更ごとの (結果, 変更を含むバッチリクエストの秒数)
+    """
+    client = get_drive_client(plan.spec.id)
+    results: List[Tuple[Dict[str, Any], float]] = [None] * len(plan.changes)
+    for action in (ACTION_ADD, ACTION_UPDATE, ACTION_REMOVE):
+        indexes = [i for i, change in enumerate(plan.changes) if change.action == action]
+        for start in range(0, len(indexes), DRIVE_BATCH_SIZE):
+            chunk = indexes[start:start + DRIVE_BATCH_SIZE]
+            changes = [plan.changes[i] for i in chunk]
+            batch_start = time.perf_counter()
+            try:
+                if action == ACTION_ADD:
+                    chunk_results = client.add_permissions_batch([(change.email, change.role) for change in changes])
+                elif action == ACTION_UPDATE:
+                    chunk_results = client.update_permissions_batch(
+                        [(change.principal_id, change.role) for change in changes]
+                    )
+                else:
+                    chunk_results = client.remove_permissions_batch([change.principal_id for change in changes])
+            except Exception as e:
+                chunk_results = [{"success": False, "error": str(e)}] * len(chunk)
+            seconds = time.perf_counter() - batch_start
+            for index, result in zip(chunk, chunk_results):
+                results[index] = (result, seconds)
+    return results
+
+
+def apply_plan(plan: TargetPlan, workers: int, background: str):
+    """
+    差分を書き込み、付与済みキャッシュ・アクセス権インデックス・監査ログに反映
+
+    Args:
+        plan: 差分（results を設定する）
+        workers: Trello の同時実行数の上限
+        background: 監査ログに記録する背景
+    """
+    start = time.perf_counter()
+    outcomes = apply_trello(plan, workers) if plan.spec.tool == "trello" else apply_drive(plan)
+    plan.apply_seconds = time.perf_counter() - start
+    plan.results = [result for result, _ in outcomes]
+    plan.latencies = [seconds for _, seconds in outcomes]
+
+    tool = plan.spec.tool
+    for change, result, seconds in zip(plan.changes, plan.results, plan.latencies):
+        if result["success"]:
+            # 削除・引き下げでは、付与済みの記録が残っていると発行時に付与済みと判定されるため先に消す
+            if change.action != ACTION_ADD:
+                forget_grant(change.email, tool, plan.target)
+            if change.action != ACTION_REMOVE:
+                permission = change.role if tool == "google_drive" else None
+                record_grant(change.email, tool, permission, result.get("data"), plan.target)
+        record_outcome(
+            change.email, tool, background, change.role or change.current_role, result, seconds,
+            plan.target, None if change.action == ACTION_ADD else change.action
+        )
+
+
+def reconcile(plans: Dict[TargetKey, TargetPlan], apply: bool = False, prune: bool = True, workers: int = 8,
+              background: str = "あるべきアクセス権との突き合わせ") -> List[TargetPlan]:
+    """
+    付与先ごとに現在のアクセス権を取得して差分を求め、apply の場合は差分を書き込む
+
+    付与先どうしは並行して処理する。
+
+    Args:
+        plans: load_desired_state で読み込んだ付与先ごとの差分
+        apply: 差分を書き込むか（False の場合は dry-run）
+        prune: ファイルにないユーザーのアクセス権を削除するか
+        workers: 同時に処理する付与先の数と、Trello の同時実行数の上限
+        background: 監査ログに記録する背景
+
+    Returns:
+        付与先ごとの差分（apply の場合は結果を含む）
+    """
+    def run(plan: TargetPlan) -> TargetPlan:
+        start = time.perf_counter()
+        try:
+            if plan.spec.tool == "trello":
+                plan_trello(plan, prune)
+            else:
+                plan_drive(plan, prune)
+        except Exception as e:
+            plan.error = str(e)
+            return plan
+        finally:
+            plan.fetch_seconds = time.perf_counter() - start
+        if apply and plan.changes:
+            apply_plan(plan, workers, background)
+        return plan
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(plans)))) as executor:
+        return list(executor.map(run, plans.values()))
+
+
+def format_report(plans: List[TargetPlan], applied: bool) -> str:
+    """差分（と書き込みの結果）を表示用に整形"""
+    symbols = {ACTION_ADD: "+", ACTION_UPDATE: "~", ACTION_REMOVE: "-"}
+    lines = []
+    for plan in plans:
+        header = f"{plan.spec.tool} {plan.spec.name} ({plan.spec.id})"
+        if plan.error is not None:
+            lines.append(f"{header}: 現在のアクセス権を取得できませんでした: {plan.error}")
+            continue
+        lines.append(
+            f"{header}: +{plan.count(ACTION_ADD)} ~{plan.count(ACTION_UPDATE)} -{plan.count(ACTION_REMOVE)} "
+            f"={plan.unchanged} skipped={len(plan.skipped)} warnings={len(plan.warnings)} fetch={plan.fetch_seconds:.2f}s"
+            + (f" apply={plan.apply_seconds:.2f}s" if applied else "")
+        )
+        for index, change in enumerate(plan.changes):
+            role = change.role or change.current_role
+            if change.action == ACTION_UPDATE:
+                role = f"{change.current_role} -> {change.role}"
+            line = f"  {symbols[change.action]} {change.email:<40} {role}"
+            if applied and index < len(plan.results) and not plan.results[index]["success"]:
+                line += f"  [NG] {plan.results[index].get('error')}"
+            lines.append(line)
+        for name, reason in plan.skipped:
+            lines.append(f"  ! {name:<40} 変更しません（{reason}）")
+        for email, reason in plan.warnings:
+            lines.append(f"  ? {email:<40} {reason}")
+
+    changes = sum(len(plan.changes) for plan in plans)
+    failed = sum(1 for plan in plans for result in plan.results if not result["success"])
+    if applied:
+        lines.append(f"{changes} changes applied, {failed} failed")
+    else:
+        lines.append(f"{changes} changes (dry-run: --apply で書き込みます)")
+    return "\n".join(lines)
+
+
+def iter_report_records(plans: List[TargetPlan], applied: bool):
+    """差分（と書き込みの結果）を1変更1レコードで取り出し、最後に変更しないアクセス権を取り出す（--output jsonl）"""
+    for plan in plans:
+        if plan.error is not None:
+            yield {"tool": plan.spec.tool, "target": plan.spec.alias, "error": plan.error}
+            continue
+        warnings = dict(plan.warnings)
+        for index, change in enumerate(plan.changes):
+            record = {"tool": plan.spec.tool, "target": plan.spec.alias, **change._asdict()}
+            if change.email in warnings:
+                record["warning"] = warnings[change.email]
+            if applied:
+                record["success"] = plan.results[index]["success"]
+                record["error"] = plan.results[index].get("error")
+                record["latency_ms"] = round(plan.latencies[index] * 1000, 3)
+            yield record
+        for name, reason in plan.skipped:
+            yield {"tool": plan.spec.tool, "target": plan.spec.alias, "skipped": name, "reason": reason}
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description="あるべきアクセス権への突き合わせ",
+        epilog="Trello のメンバー一覧は通常メールアドレスを返さないため、Trello の行には username 列を指定してください。"
+               "照合できないメンバーは削除せず（!）、username 列のない行は既にメンバーでも追加する旨を警告します（?）。"
+    )
+    parser.add_argument("input", help="あるべきアクセス権のファイル（email, tool 列。任意で permission, target, username 列）")
+    parser.add_argument("--format", dest="file_format", choices=["jsonl", "csv"], help="ファイルの形式（省略時は拡張子から判定）")
+    parser.add_argument("--apply", action="store_true", help="差分を書き込む（省略時は dry-run）")
+    parser.add_argument("--keep-unlisted", action="store_true", help="ファイルにないユーザーのアクセス権を削除しない")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_MAX_WORKERS", "8")), help="同時実行数の上限")
+    parser.add_argument("--background", default="あるべきアクセス権との突き合わせ", help="監査ログに記録する背景")
+    parser.add_argument("--output", choices=["table", "jsonl"], default="table", help="差分の表示形式")
+    args = parser.parse_args()
+
+    try:
+        plans, errors = load_desired_state(args.input, args.file_format)
+    except ValueError as e:
+        parser.exit(2, f"{e}\n")
+    if errors:
+        parser.exit(2, "\n".join(errors) + "\n読めない行があるため突き合わせを中止しました。\n")
+
+    results = reconcile(plans, args.apply, not args.keep_unlisted, args.workers, args.background)
+    if args.output == "jsonl":
+        for record in iter_report_records(results, args.apply):
+            print(json.dumps(record, ensure_ascii=False))
+    else:
+        print(format_report(results, args.apply))
+    if any(plan.error for plan in results) or any(not result["success"] for plan in results for result in plan.results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+セッションのシリアライズ
+ChatSession（会話状態・履歴・実行中のジョブ）をバージョン付きのコンパクトなバイナリに変換
+
+レイアウト（バージョン 3）:
+    version: u8
+    state:
+        flags: u8（email / background / target の有無）
+        tool, permission: u8（列挙値の番号）
+        email, background, target: str
+        additional_emails: varint 件数 + str
+        additional_tools: varint 件数 + u8
+        additional_targets: varint 件数 + str
+        batch_rows: varint 件数 + (email: str, tool: u8, permission: u8, target: str)
+    messages: varint 件数 + (role: u8, content: str)
+    pending_jobs: varint 件数 + (varint 件数 + job_id: 16バイト)
+    summaries: varint 件数 + str
+    closed_ends: varint 件数 + varint
+
+str は varint のバイト数 + UTF-8。列挙値は 0 を「未設定」とし、additional_targets と
+batch_rows の target は空文字を「既定の付与先」とする。
+バージョン 1 は summaries / closed_ends を、バージョン 2 以前は付与先（target）を持たない（読み込みのみ対応）。
+"""
+
+import uuid
+from typing import List, Optional
+
+from src.models import BatchRow, ChatMessage, ChatSession, ConversationState
+
+VERSION = 3
+# 読み込みに対応するバージョン
+SUPPORTED_VERSIONS = (1, 2, 3)
+
+TOOLS = (None, "trello", "google_drive")
+PERMISSIONS = (None, "reader", "commenter", "writer")
+ROLES = ("user", "assistant")
+
+_TOOL_CODES = {tool: code for code, tool in enumerate(TOOLS)}
+_PERMISSION_CODES = {permission: code for code, permission in enumerate(PERMISSIONS)}
+_ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+_HAS_EMAIL = 0x01
+_HAS_BACKGROUND = 0x02
+_HAS_TARGET = 0x04
+
+
+class SessionDecodeError(ValueError):
+    """保存されたセッションを読み込めない場合のエラー"""
+
+
+def _write_varint(out: bytearray, value: int):
+    """符号なし整数を可変長（7ビットずつ）で書き込む"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_str(out: bytearray, value: str):
+    """文字列をバイト数 + UTF-8 で書き込む"""
+    data = value.encode("utf-8")
+    _write_varint(out, len(data))
+    out += data
+
+
+class _Reader:
+    """バイト列を先頭から順に読み込む"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def u8(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def varint(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def raw(self, size: int) -> bytes:
+        end = self.pos + size
+        if end > len(self.data):
+            raise IndexError("データが途中で終わっています。")
+        value = self.data[self.pos:end]
+        self.pos = end
+        return value
+
+    def text(self) -> str:
+        return self.raw(self.varint()).decode("utf-8")
+
+
+def encode_session(session: ChatSession) -> bytes:
+    """
+    セッションをバイナリに変換
+
+    Args:
+        session: 保存するセッション
+
+    Returns:
+        バージョン付きのバイナリ
+    """
+    state = session.state
+    out = bytearray((VERSION,))
+
+    flags = 0
+    if state.email:
+        flags |= _HAS_EMAIL
+    if state.background is not None:
+        flags |= _HAS_BACKGROUND
+    if state.target is not None:
+        flags |= _HAS_TARGET
+    out.append(flags)
+    out.append(_TOOL_CODES[state.tool])
+    out.append(_PERMISSION_CODES[state.permission])
+    if state.email:
+        _write_str(out, state.email)
+    if state.background is not None:
+        _write_str(out, state.background)
+    if state.target is not None:
+        _write_str(out, state.target)
+
+    _write_varint(out, len(state.additional_emails))
+    for email in state.additional_emails:
+        _write_str(out, email)
+    _write_varint(out, len(state.additional_tools))
+    out += bytes(_TOOL_CODES[tool] for tool in state.additional_tools)
+    _write_varint(out, len(state.additional_targets))
+    for target in state.additional_targets:
+        _write_str(out, target or "")
+    _write_varint(out, len(state.batch_rows))
+    for row in state.batch_rows:
+        _write_str(out, row.email)
+        out.append(_TOOL_CODES[row.tool])
+        out.append(_PERMISSION_CODES[row.permission])
+        _write_str(out, row.target or "")
+
+    _write_varint(out, len(session.messages))
+    for message in session.messages:
+        out.append(_ROLE_CODES[message.role])
+        _write_str(out, message.content)
+
+    _write_varint(out, len(session.pending_jobs))
+    for job_ids in session.pending_jobs:
+        _write_varint(out, len(job_ids))
+        for job_id in job_ids:
+            out += uuid.UUID(hex=job_id).bytes
+
+    _write_varint(out, len(session.summaries))
+    for summary in session.summaries:
+        _write_str(out, summary)
+    _write_varint(out, len(session.closed_ends))
+    for closed_end in session.closed_ends:
+        _write_varint(out, closed_end)
+
+    return bytes(out)
+
+
+def decode_session(data: bytes) -> ChatSession:
+    """
+    バイナリからセッションを復元
+
+    保存時に検証済みのため、モデルのバリデーションは省略する。
+
+    Args:
+        data: encode_session で変換したバイナリ
+
+    Returns:
+        復元したセッション
+
+    Raises:
+        SessionDecodeError: 未対応のバージョン、または壊れたデータの場合
+    """
+    if not data or data[0] not in SUPPORTED_VERSIONS:
+        raise SessionDecodeError(f"未対応のセッション形式です: version={data[0] if data else None}")
+
+    version = data[0]
+    reader = _Reader(data)
+    reader.pos = 1
+    try:
+        flags = reader.u8()
+        tool = TOOLS[reader.u8()]
+        permission = PERMISSIONS[reader.u8()]
+        email = reader.text() if flags & _HAS_EMAIL else None
+        background = reader.text() if flags & _HAS_BACKGROUND else None
+        target = reader.text() if flags & _HAS_TARGET else None
+
+        additional_emails = [reader.text() for _ in range(reader.varint())]
+        additional_tools = [TOOLS[code] for code in reader.raw(reader.varint())]
+        additional_targets: List[Optional[str]] = []
+        if version >= 3:
+            additional_targets = [reader.text() or None for _ in range(reader.varint())]
+        batch_rows = [
+            BatchRow.model_construct(
+                email=reader.text(),
+                tool=TOOLS[reader.u8()],
+                permission=PERMISSIONS[reader.u8()],
+                target=(reader.text() or None) if version >= 3 else None
+            )
+            for _ in range(reader.varint())
+        ]
+
+        messages = [
+            ChatMessage.model_construct(role=ROLES[reader.u8()], content=reader.text())
+            for _ in range(reader.varint())
+        ]
+
+        pending_jobs: List[List[str]] = [
+            [uuid.UUID(bytes=reader.raw(16)).hex for _ in range(reader.varint())]
+            for _ in range(reader.varint())
+        ]
+
+        summaries: List[str] = []
+        closed_ends: List[int] = []
+        if version >= 2:
+            summaries = [reader.text() for _ in range(reader.varint())]
+            closed_ends = [reader.varint() for _ in range(reader.varint())]
+    except (IndexError, UnicodeDecodeError) as e:
+        raise SessionDecodeError(f"セッションのデータが壊れています: {e}") from e
+
+    state = ConversationState.model_construct(
+        email=email,
+        tool=tool,
+        permission=permission,
+        background=background,
+        target=target,
+        additional_emails=additional_emails,
+        additional_tools=additional_tools,
+        additional_targets=additional_targets,
+        batch_rows=batch_rows
+    )
+    return ChatSession.model_construct(
+        state=state,
+        messages=messages,
+        pending_jobs=pending_jobs,
+        summaries=summaries,
+        closed_ends=closed_ends
+    )
+
@@ -0,0 +1,388 @@
+"""
+セッションストア
+会話状態をプロセスの外に保存し、複数のワーカープロセスから同じセッションを扱えるようにする
+
+セッションは src.session_codec のバイナリ形式で保存し、最後の保存から ttl 秒で期限切れになる。
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from src.models import ChatSession
+from src.session_codec import decode_session, encode_session
+
+# 期限切れのセッションを削除する間隔（秒）
+PURGE_INTERVAL = 60.0
+# セッションのロックが空くのを確認する間隔（秒）
+LOCK_POLL_INTERVAL = 0.02
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+CREATE TABLE IF NOT EXISTS session_locks (
+    id TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SessionLockTimeout(Exception):
+    """同じセッションの別の処理が終わらず、ロックを取得できなかった場合のエラー"""
+
+
+class SessionStore:
+    """セッションストアのインターフェース"""
+
+    def __init__(self, ttl: float, lock_ttl: float = 60.0):
+        # 最後の保存からセッションを保持する秒数
+        self.ttl = ttl
+        # ロックを持ったプロセスが解放せずに終了した場合に、ロックを無効とみなすまでの秒数
+        self.lock_ttl = lock_ttl
+
+    @contextmanager
+    def lock(self, session_id: str, timeout: float = 30.0) -> Iterator[None]:
+        """
+        セッションの読み込みから保存までを、全プロセスで1つずつに限るロック
+
+        同じセッションへの同時のメッセージが、互いの保存を上書きしないようにする。
+
+        Args:
+            session_id: セッションID
+            timeout: ロックが空くのを待つ最大秒数
+
+        Raises:
+            SessionLockTimeout: timeout 秒待ってもロックを取得できない場合
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self.acquire_lock(session_id, token):
+            if time.monotonic() >= deadline:
+                raise SessionLockTimeout(f"セッション {session_id} は別の処理の途中です。")
+            time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            self.release_lock(session_id, token)
+
+    def acquire_lock(self, session_id: str, token: str) -> bool:
+        """ロックが空いている（または期限切れの）場合に token で取得し、取得できたかを返す"""
+        raise NotImplementedError
+
+    def release_lock(self, session_id: str, token: str):
+        """token で取得したロックを解放（別の token のロックは解放しない）"""
+        raise NotImplementedError
+
+    def load(self, session_id: str) -> Optional[ChatSession]:
+        """
+        セッションを読み込む
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            保存されたセッション、存在しない・期限切れの場合は None
+        """
+        data = self.load_bytes(session_id)
+        return decode_session(data) if data is not None else None
+
+    def save(self, session_id: str, session: ChatSession):
+        """
+        セッションを保存（既にある場合は上書きし、期限を延長）
+
+        Args:
+            session_id: セッションID
+            session: 保存するセッション
+        """
+        self.save_bytes(session_id, encode_session(session))
+
+    def load_bytes(self, session_id: str) -> Optional[bytes]:
+        """シリアライズ済みのセッションを読み込む"""
+        raise NotImplementedError
+
+    def save_bytes(self, session_id: str, data: bytes):
+        """シリアライズ済みのセッションを保存"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        """
+        セッションを削除
+
+        Args:
+            session_id: セッションID
+        """
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """プロセス内のメモリに保存するセッションストア（単一プロセス・開発用）"""
+
+    def __init__(self, ttl: float = 86400.0, lock_ttl: float = 60.0):
+        super().__init__(ttl, lock_ttl)
+        self._lock = threading.Lock()
+        # セッションID -> (期限, シリアライズ済みのセッション)
+        self._sessions: Dict[str, Tuple[float, bytes]] = {}
+        # セッションID -> (ロックの token, 期限)
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._last_purge = time.monotonic()
+
+    def load_bytes(self, session_id: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._sessions[session_id]
+                return None
+            return entry[1]
+
+    def save_bytes(self, session_id: str, data: bytes):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (now + self.ttl, data)
+            if now - self._last_purge >= PURGE_INTERVAL:
+                self._last_purge = now
+                for expired in [key for key, (expires_at, _) in self._sessions.items() if expires_at <= now]:
+                    del self._sessions[expired]
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def acquire_lock(self, session_id: str, token: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            held = self._locks.get(session_id)
+            if held is not None and held[1] > now:
+                return False
+            self._locks[session_id] = (token, now + self.lock_ttl)
+            return True
+
+    def release_lock(self, session_id: str, token: str):
+        with self._lock:
+            if self._locks.get(session_id, (None,))[0] == token:
+                del self._locks[session_id]
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite（WALモード）に保存するセッションストア（同じホストの複数プロセスで共有）"""
+
+    def __init__(self, db_path: str, ttl: float = 86400.0, lock_ttl: float = 60.0):
+        super().__init__(ttl, lock_ttl)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """現在のスレッド用のコネクションを取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load_bytes(self, session_id: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires_at > ?", (session_id, time.time())
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def save_bytes(self, session_id: str, data: bytes):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+            (session_id, data, now + self.ttl)
+        )
+        if now - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def delete(self, session_id: str):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def acquire_lock(self, session_id: str, token: str) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT INTO session_locks (id, token, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at "
+            "WHERE session_locks.expires_at <= ?",
+            (session_id, token, now + self.lock_ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lock(self, session_id: str, token: str):
+        self._connect().execute("DELETE FROM session_locks WHERE id = ? AND token = ?", (session_id, token))
+
+
+class RedisError(Exception):
+    """Redis がエラーを返した場合のエラー"""
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis プロトコル（RESP）で保存するセッションストア（複数ホストで共有）
+
+    GET / SET（EX・PX で期限、NX でロックを指定）/ DEL のみを使うため、Redis 互換のサーバーであれば利用できる。
+    """
+
+    def __init__(self, url: str, ttl: float = 86400.0, key_prefix: str = "chatbot:session:", timeout: float = 5.0,
+                 lock_ttl: float = 60.0):
+        super().__init__(ttl, lock_ttl)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        """現在のスレッド用のコネクションを取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._command("AUTH", self.password)
+            if self.db:
+                self._command("SELECT", str(self.db))
+        return conn
+
+    def _close(self):
+        """現在のスレッドのコネクションを閉じる"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn[1].close()
+            conn[0].close()
+
+    def _command(self, *args) -> Any:
+        """
+        コマンドを送信して応答を返す
+
+        接続が切れていた場合は1度だけ再接続する。
+        """
+        payload = bytearray(b"*%d\r\n" % len(args))
+        for arg in args:
+            value = arg if isinstance(arg, bytes) else arg.encode("utf-8")
+            payload += b"$%d\r\n%s\r\n" % (len(value), value)
+
+        for attempt in range(2):
+            try:
+                sock, reader = self._connect()
+                sock.sendall(payload)
+                return self._read_reply(reader)
+            except (OSError, EOFError):
+                self._close()
+                if attempt:
+                    raise
+
+    def _read_reply(self, reader) -> Any:
+        """RESP の応答を1つ読み込む"""
+        line = reader.readline()
+        if not line:
+            raise EOFError("Redis との接続が切れました。")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(body.decode("utf-8"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._read_reply(reader) for _ in range(size)]
+        raise RedisError(f"不明な応答です: {line!r}")
+
+    def load_bytes(self, session_id: str) -> Optional[bytes]:
+        return self._command("GET", self.key_prefix + session_id)
+
+    def save_bytes(self, session_id: str, data: bytes):
+        self._command("SET", self.key_prefix + session_id, data, "EX", str(max(1, int(self.ttl))))
+
+    def delete(self, session_id: str):
+        self._command("DEL", self.key_prefix + session_id)
+
+    def acquire_lock(self, session_id: str, token: str) -> bool:
+        reply = self._command(
+            "SET", f"{self.key_prefix}lock:{session_id}", token, "NX", "PX", str(max(1, int(self.lock_ttl * 1000)))
+        )
+        return reply == "OK"
+
+    def release_lock(self, session_id: str, token: str):
+        # 期限切れで別の処理が取得し直したロックは解放しない（GET と DEL の間に期限が切れた場合を除く）
+        key = f"{self.key_prefix}lock:{session_id}"
+        if self._command("GET", key) == token.encode("utf-8"):
+            self._command("DEL", key)
+
+
+_store_lock = threading.Lock()
+_session_store: Optional[SessionStore] = None
+
+
+def create_session_store(backend: str) -> SessionStore:
+    """
+    名前を指定してセッションストアを生成
+
+    Args:
+        backend: "memory"、"sqlite" または "redis"
+
+    Returns:
+        セッションストア
+
+    Raises:
+        ValueError: 未対応のバックエンドの場合
+    """
+    ttl = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+    lock_ttl = float(os.getenv("SESSION_LOCK_TTL_SECONDS", "60"))
+    if backend == "memory":
+        return MemorySessionStore(ttl, lock_ttl)
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_STORE_DB", "sessions.db"), ttl, lock_ttl)
+    if backend == "redis":
+        return RedisSessionStore(
+            os.getenv("SESSION_STORE_URL", "redis://127.0.0.1:6379/0"), ttl, lock_ttl=lock_ttl
+        )
+    raise ValueError(f"未対応のセッションストアです: {backend}")
+
+
+def get_session_store() -> SessionStore:
+    """
+    プロセス全体で共有するセッションストアを取得（SESSION_STORE_BACKEND で選択、既定は sqlite）
+
+    memory はプロセスごとに別のセッションになるため、ワーカープロセスが1つの場合（開発用）に限る。
+
+    Returns:
+        共有の SessionStore
+    """
+    global _session_store
+    if _session_store is None:
+        with _store_lock:
+            if _session_store is None:
+                _session_store = create_session_store(os.getenv("SESSION_STORE_BACKEND", "sqlite"))
+    return _session_store
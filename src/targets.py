@@ -0,0 +1,189 @@
+"""
+付与先レジストリ
+設定ファイルに登録した Trello ボード・Google Drive ファイル（付与先）を別名で引けるようにする
+
+設定ファイル（TARGETS_FILE、既定値 targets.json）の形式:
+
+    {
+      "targets": [
+        {"alias": "dev-board", "tool": "trello", "id": "<ボードID>", "name": "開発ボード",
+         "keywords": ["開発ボード", "dev board"], "default": true},
+        {"alias": "sales-docs", "tool": "google_drive", "id": "<ファイルID>", "name": "営業資料",
+         "roles": ["reader", "commenter"], "keywords": ["営業資料"]}
+      ]
+    }
+
+設定ファイルに付与先がないツールは、従来どおり TRELLO_BOARD_ID / GOOGLE_DRIVE_FILE_ID を付与先とする。
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from src.extractor import DEFAULT_KEYWORDS, SlotExtractor, normalize_text
+from src.models import ProvisioningTarget
+
+# ツールごとの既定の付与先（環境変数から作る）
+ENV_TARGETS = {
+    "trello": ("TRELLO_BOARD_ID", "Trello"),
+    "google_drive": ("GOOGLE_DRIVE_FILE_ID", "Google Drive"),
+}
+
+# ツールごとに付与できる権限（付与先で roles を省略した場合）
+DEFAULT_ROLES = {
+    "trello": ["member"],
+    "google_drive": ["reader", "commenter", "writer"],
+}
+
+
+class TargetRegistry:
+    """別名・キーワードから付与先を引くレジストリ"""
+
+    def __init__(self, targets: List[ProvisioningTarget]):
+        self.targets = targets
+        self._by_alias: Dict[str, ProvisioningTarget] = {}
+        self._defaults: Dict[str, ProvisioningTarget] = {}
+        # 正規化したキーワード → 別名
+        self._index: Dict[str, str] = {}
+
+        for target in targets:
+            if target.alias in self._by_alias:
+                raise ValueError(f"付与先の別名が重複しています: {target.alias}")
+            self._by_alias[target.alias] = target
+            current = self._defaults.get(target.tool)
+            if current is None or (target.default and not current.default):
+                self._defaults[target.tool] = target
+            for keyword in (target.alias, target.name, *target.keywords):
+                if keyword:
+                    self._index.setdefault(normalize_text(keyword).lower().strip(), target.alias)
+
+        # メッセージからの抽出は、ツールのキーワードと付与先のキーワードを1つの抽出器にまとめて1回で走査する
+        keywords = dict(DEFAULT_KEYWORDS)
+        keywords["target"] = {
+            target.alias: [(keyword, 1.0) for keyword in (target.alias, target.name, *target.keywords) if keyword]
+            for target in targets
+            if not target.from_env
+        }
+        self.extractor = SlotExtractor(keywords)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "TargetRegistry":
+        """
+        設定ファイルと環境変数から付与先を読み込む
+
+        Args:
+            path: 設定ファイル（省略時は TARGETS_FILE 環境変数、既定値 targets.json）
+
+        Returns:
+            付与先レジストリ
+        """
+        path = path or os.getenv("TARGETS_FILE", "targets.json")
+        targets: List[ProvisioningTarget] = []
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                config = json.load(f)
+            targets = [ProvisioningTarget.model_validate(entry) for entry in config.get("targets", [])]
+
+        configured_tools = {target.tool for target in targets}
+        for tool, (env_name, name) in ENV_TARGETS.items():
+            target_id = os.getenv(env_name)
+            if tool not in configured_tools and target_id:
+                targets.append(ProvisioningTarget(alias=tool, tool=tool, id=target_id, name=name, from_env=True))
+
+        for target in targets:
+            if not target.roles:
+                target.roles = list(DEFAULT_ROLES[target.tool])
+            if not target.name:
+                target.name = target.alias
+        return cls(targets)
+
+    def get(self, alias: str) -> Optional[ProvisioningTarget]:
+        """別名から付与先を取得"""
+        return self._by_alias.get(alias)
+
+    def default_for(self, tool: str) -> Optional[ProvisioningTarget]:
+        """ツールの既定の付与先を取得（default 指定、なければ最初に登録したもの）"""
+        return self._defaults.get(tool)
+
+    def for_tool(self, tool: str) -> List[ProvisioningTarget]:
+        """ツールの付与先を登録順に取得"""
+        return [target for target in self.targets if target.tool == tool]
+
+    def lookup(self, text: str) -> Optional[ProvisioningTarget]:
+        """
+        別名・表示名・キーワードに完全一致する付与先を取得（CSV の tool 列など）
+
+        Args:
+            text: 別名などの文字列（全角・半角、大文字・小文字は区別しない）
+
+        Returns:
+            付与先、一致しない場合は None
+        """
+        alias = self._index.get(normalize_text(text).lower().strip())
+        return self._by_alias.get(alias) if alias else None
+
+    def resolve(self, tool: str, alias: Optional[str] = None) -> ProvisioningTarget:
+        """
+        依頼の付与先を決定
+
+        Args:
+            tool: ツール名
+            alias: 付与先の別名（省略時はツールの既定の付与先）
+
+        Returns:
+            付与先
+
+        Raises:
+            ValueError: 付与先が登録されていない、またはツールが一致しない場合
+        """
+        if alias is None:
+            target = self.default_for(tool)
+            if target is None:
+                raise ValueError(f"{ENV_TARGETS.get(tool, (None, tool))[1]} の付与先が設定されていません。")
+            return target
+
+        target = self._by_alias.get(alias)
+        if target is None:
+            raise ValueError(f"未登録の付与先: {alias}")
+        if target.tool != tool:
+            raise ValueError(f"付与先 {alias} は {tool} の付与先ではありません。")
+        return target
+
+    def is_default(self, tool: str, alias: Optional[str]) -> bool:
+        """依頼の付与先がツールの既定の付与先か（アクセス権インデックスは既定の付与先のみを対象とする）"""
+        default = self.default_for(tool)
+        return alias is None or (default is not None and default.alias == alias)
+
+    def display_name(self, tool: str, alias: Optional[str] = None) -> str:
+        """付与先の表示名（付与先が決まらない場合はツール名）"""
+        try:
+            return self.resolve(tool, alias).name
+        except ValueError:
+            return ENV_TARGETS.get(tool, (None, tool))[1]
+
+
+_registry_lock = threading.Lock()
+_registry: Optional[TargetRegistry] = None
+
+
+def get_target_registry() -> TargetRegistry:
+    """
+    プロセス全体で共有する付与先レジストリを取得（初回に設定ファイルを読み込む）
+
+    Returns:
+        共有の TargetRegistry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TargetRegistry.load()
+    return _registry
+
+
+def reset_target_registry():
+    """共有レジストリを破棄（設定ファイルの変更時やテスト用）"""
+    global _registry
+    with _registry_lock:
+        _registry = None
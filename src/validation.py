@@ -0,0 +1,188 @@
+"""
+アカウント発行依頼の一括バリデーション
+大量の行を AccountRequest に変換する際に、1行ずつモデルを生成する代わりに列ごとにまとめて検証する
+
+1行ずつ AccountRequest(...) を生成すると、行ごとに EmailStr（email-validator）と Python の field_validator が走り、
+特にメールアドレスのドメイン部の検証（IDNA）が CPU 時間の大半を占める。ここでは次のように検証する。
+
+- 型・Literal・文字数の上限は、列ごとにキャッシュした TypeAdapter で全行まとめて pydantic-core で検証
+- メールアドレスは値ごとに正規化結果をメモ化し、ASCII のドット区切りの形式はドメイン部の検証結果を使い回す
+- 背景の空白のみのチェックと、Google Drive の権限の必須チェックは列ごとに行う
+
+検証を通った行は model_construct で再検証せずにモデルにする。結果は AccountRequest(...) と同じだが、
+Google Drive の権限は（キーを省略した場合も）常に必須とする。
+"""
+
+import re
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Set, Union
+
+from pydantic import TypeAdapter, ValidationError
+from pydantic.networks import validate_email
+from pydantic_core import PydanticCustomError
+
+from src.models import AccountRequest
+
+# 検証する列（AccountRequest のフィールドの順。エラーメッセージもこの順に並べる）
+FIELDS = ("email", "tool", "permission", "background", "target")
+REQUIRED_FIELDS = ("email", "tool", "background")
+
+# メモ化するメールアドレス・ドメインの件数
+EMAIL_CACHE_SIZE = 1 << 17
+DOMAIN_CACHE_SIZE = 1 << 12
+
+# ドメイン部の検証結果を使い回せる、ASCII のドット区切りのメールアドレス（それ以外は email-validator で検証する）
+SIMPLE_EMAIL = re.compile(
+    r"([A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*)@([A-Za-z0-9.-]+)"
+)
+# email-validator のローカル部・全体の文字数の上限
+MAX_LOCAL_LENGTH = 64
+MAX_EMAIL_LENGTH = 254
+
+
+class _Missing:
+    """必須の列に値がないことを表す（どの型の検証にも通らない）"""
+
+
+MISSING = _Missing()
+
+
+class BulkValidationResult(NamedTuple):
+    """一括バリデーションの結果"""
+
+    # 検証を通った依頼（入力の順）
+    requests: List[AccountRequest]
+    # requests の各依頼の、入力での位置
+    indexes: List[int]
+    # 入力での位置 → エラーメッセージ
+    errors: Dict[int, str]
+
+
+@lru_cache(maxsize=None)
+def column_adapter(field: str) -> TypeAdapter:
+    """
+    列の値のリストを検証する TypeAdapter を取得（AccountRequest のフィールドの型と制約から作り、キャッシュする）
+
+    メールアドレスは文字列かどうかだけを検証する（形式は normalize_email で検証する）。
+    """
+    if field == "email":
+        return TypeAdapter(List[str])
+    info = AccountRequest.model_fields[field]
+    annotation = Annotated[(info.annotation, *info.metadata)] if info.metadata else info.annotation
+    return TypeAdapter(List[annotation])
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def normalize_domain(domain: str) -> Optional[str]:
+    """メールアドレスのドメイン部を EmailStr と同じく正規化（無効な場合は None）"""
+    try:
+        return validate_email(f"a@{domain}")[1].rsplit("@", 1)[1]
+    except PydanticCustomError:
+        return None
+
+
+@lru_cache(maxsize=EMAIL_CACHE_SIZE)
+def normalize_email(value: str) -> Optional[str]:
+    """
+    メールアドレスを EmailStr と同じく正規化
+
+    Args:
+        value: メールアドレス
+
+    Returns:
+        正規化したメールアドレス、無効な場合は None
+    """
+    match = SIMPLE_EMAIL.fullmatch(value)
+    if match is not None and len(match.group(1)) <= MAX_LOCAL_LENGTH:
+        domain = normalize_domain(match.group(2))
+        if domain is None:
+            return None
+        email = f"{match.group(1)}@{domain}"
+        return email if len(email) <= MAX_EMAIL_LENGTH else None
+    try:
+        return validate_email(value)[1]
+    except PydanticCustomError:
+        return None
+
+
+def to_columns(rows: Union[Sequence[Mapping[str, Any]], Mapping[str, Sequence[Any]]]) -> Dict[str, List[Any]]:
+    """
+    行のリスト、または列名 → 値のリストを、検証する列ごとの値のリストに変換
+
+    省略された必須の列の値は MISSING、任意の列の値は None にする。
+
+    Raises:
+        ValueError: 列ごとの値のリストの長さが揃っていない場合
+    """
+    if isinstance(rows, Mapping):
+        size = max((len(values) for values in rows.values()), default=0)
+        columns = {
+            field: list(rows[field]) if field in rows else [MISSING if field in REQUIRED_FIELDS else None] * size
+            for field in FIELDS
+        }
+        if any(len(values) != size for values in columns.values()):
+            raise ValueError("列ごとの値の数が揃っていません。")
+        return columns
+    return {
+        field: [row.get(field, MISSING if field in REQUIRED_FIELDS else None) for row in rows]
+        for field in FIELDS
+    }
+
+
+def validate_account_requests(
+    rows: Union[Sequence[Mapping[str, Any]], Mapping[str, Sequence[Any]]]
+) -> BulkValidationResult:
+    """
+    複数の行をまとめて AccountRequest に変換
+
+    Args:
+        rows: 行（email, tool, permission, background, target）のリスト、または列名 → 値のリスト
+
+    Returns:
+        検証を通った依頼と、行ごとのエラーメッセージ
+
+    Raises:
+        ValueError: 列ごとの値のリストの長さが揃っていない場合
+    """
+    columns = to_columns(rows)
+    size = len(columns["email"])
+    invalid: Dict[str, Set[int]] = {field: set() for field in FIELDS}
+
+    # 型・Literal・文字数の上限（全行まとめて検証し、エラーのあった位置だけを集める）
+    for field in FIELDS:
+        try:
+            column_adapter(field).validate_python(columns[field])
+        except ValidationError as e:
+            invalid[field].update(error["loc"][0] for error in e.errors())
+
+    emails = columns["email"]
+    for index in range(size):
+        if index not in invalid["email"]:
+            email = normalize_email(emails[index])
+            if email is None:
+                invalid["email"].add(index)
+            else:
+                emails[index] = email
+
+    # AccountRequest の field_validator に相当する列ごとのチェック
+    invalid["background"].update(
+        index for index, background in enumerate(columns["background"])
+        if index not in invalid["background"] and not background.strip()
+    )
+    invalid["permission"].update(
+        index for index, (tool, permission) in enumerate(zip(columns["tool"], columns["permission"]))
+        if tool == "google_drive" and not permission
+        and index not in invalid["tool"] and index not in invalid["permission"]
+    )
+
+    errors: Dict[int, str] = {}
+    for index in sorted(set().union(*invalid.values())):
+        fields = ", ".join(field for field in FIELDS if index in invalid[field])
+        errors[index] = f"{fields} の値が正しくありません。"
+
+    indexes = [index for index in range(size) if index not in errors]
+    requests = [
+        AccountRequest.model_construct(**{field: columns[field][index] for field in FIELDS})
+        for index in indexes
+    ]
+    return BulkValidationResult(requests, indexes, errors)
@@ -0,0 +1,54 @@
+"""
+テスト共通の設定
+
+API クライアントは benchmarks.stub_servers の代替サーバーに接続し、プロセス全体で共有するクライアント・
+付与済みキャッシュ・サーキットブレーカーはテストごとに作り直す。
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_servers import StubAPIServer  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_environment(tmp_path, monkeypatch):
+    """環境変数と共有オブジェクトをテストごとに初期化（監査ログ・レート制限・先読みは無効にする）"""
+    import src.grant_cache
+    from src.api_clients import reset_clients
+    from src.circuit_breaker import reset_circuit_breakers
+
+    saved = dict(os.environ)
+    os.environ.update({
+        "TARGETS_FILE": str(tmp_path / "targets.json"),
+        "AUDIT_ENABLED": "0",
+        "RATE_LIMIT_ENABLED": "0",
+        "PREFETCH_ENABLED": "0",
+        "HTTP_MAX_RETRIES": "0",
+    })
+    monkeypatch.setattr(src.grant_cache, "_grant_cache", None)
+    reset_clients()
+    reset_circuit_breakers()
+    yield
+    os.environ.clear()
+    os.environ.update(saved)
+    reset_clients()
+    reset_circuit_breakers()
+
+
+@pytest.fixture
+def stub_server(tmp_path):
+    """Trello / Google Drive の代替サーバーを起動し、API クライアントの接続先にする"""
+    from src.api_clients import reset_clients
+
+    server = StubAPIServer()
+    server.start()
+    server.configure_environment(str(tmp_path))
+    reset_clients()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,110 @@
+"""src.access_index のテスト（API クライアントは呼び出しを記録する代替クラスに置き換える）"""
+
+import logging
+
+import pytest
+
+from src.access_index import AccessIndex, AccessIndexRefresher
+from src.metrics import registry
+
+
+class FakeTrelloClient:
+    def __init__(self):
+        self.action_calls = []
+        self.fail = False
+
+    def get_membership_actions(self, since=None, limit=None):
+        self.action_calls.append({"since": since, "limit": limit})
+        if self.fail:
+            raise Exception("Trello APIエラー: 500")
+        return [{"type": "addMemberToBoard", "date": "2024-04-01T00:00:00.000Z", "member": {"id": "m1"}}]
+
+    def get_board_members(self):
+        return [{"id": "m1", "username": "alice", "email": "alice@example.com"}]
+
+
+class FakeDriveClient:
+    def __init__(self):
+        self.permissions = [{"type": "user", "emailAddress": "bob@example.com", "role": "reader"}]
+        self.fail_list = False
+
+    def get_start_page_token(self):
+        return "token-1"
+
+    def file_changed_since(self, page_token):
+        return True, f"{page_token}+"
+
+    def list_permissions(self):
+        if self.fail_list:
+            raise Exception("Google Drive APIエラー: 503")
+        return self.permissions
+
+
+def test_cold_load_fetches_only_latest_trello_action():
+    trello = FakeTrelloClient()
+    index = AccessIndex(trello_client=trello)
+
+    index.load()
+
+    assert trello.action_calls == [{"since": None, "limit": 1}]
+    assert index.lookup("alice@example.com", "trello") == "member"
+
+    index.refresh()
+    assert trello.action_calls[-1] == {"since": "2024-04-01T00:00:00.000Z", "limit": None}
+
+
+def test_drive_page_token_advances_only_after_reload():
+    drive = FakeDriveClient()
+    index = AccessIndex(drive_client=drive)
+    index.load()
+    assert index._drive_page_token == "token-1"
+
+    drive.fail_list = True
+    with pytest.raises(Exception):
+        index.refresh()
+    # 読み直しに失敗した変更は、次回の更新で同じページトークンから確認し直す
+    assert index._drive_page_token == "token-1"
+
+    drive.fail_list = False
+    drive.permissions = [{"type": "user", "emailAddress": "bob@example.com", "role": "writer"}]
+    index.refresh()
+    assert index._drive_page_token == "token-1+"
+    assert index.lookup("bob@example.com", "google_drive") == "writer"
+
+
+def test_trello_failure_does_not_skip_drive():
+    trello = FakeTrelloClient()
+    drive = FakeDriveClient()
+    index = AccessIndex(trello_client=trello, drive_client=drive)
+    trello.fail = True
+
+    errors = index.refresh_tools()
+
+    assert list(errors) == ["trello"]
+    # Trello の読み込みに失敗しても Google Drive は読み込み、Trello は次回に読み込み直す
+    assert index.lookup("bob@example.com", "google_drive") == "reader"
+    assert not index.loaded
+
+    # 逆に Google Drive が失敗しても Trello は読み込む（refresh は他のツールを更新してから送出する）
+    trello.fail = False
+    drive.fail_list = True
+    with pytest.raises(Exception):
+        index.refresh()
+    assert index.lookup("alice@example.com", "trello") == "member"
+    assert index.loaded
+
+
+def test_refresher_logs_and_counts_errors_per_tool(caplog):
+    trello = FakeTrelloClient()
+    trello.fail = True
+    index = AccessIndex(trello_client=trello, drive_client=FakeDriveClient())
+    before = registry.counter("access_index_refresh_errors_total", tool="trello")
+    refresher = AccessIndexRefresher(index, interval=60)
+    refresher.stop()
+
+    with caplog.at_level(logging.ERROR, logger="src.access_index"):
+        refresher.run()
+
+    assert registry.counter("access_index_refresh_errors_total", tool="trello") == before + 1
+    assert "trello" in caplog.text and "Trello APIエラー: 500" in caplog.text
+    assert index.lookup("bob@example.com", "google_drive") == "reader"
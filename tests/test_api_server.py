@@ -0,0 +1,149 @@
+"""src.api_server のエンドポイントのテスト（入力の検証、/provision の応答、ロックの待ち時間切れ）"""
+
+import logging
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from starlette.testclient import TestClient
+
+import src.api_server
+import src.langchain_setup
+import src.session_store
+from src.models import ChatSession
+from src.session_store import MemorySessionStore
+
+
+class ImpatientStore(MemorySessionStore):
+    """ロックを待たずに諦めるセッションストア（ロックの待ち時間切れを確かめるため）"""
+
+    def lock(self, session_id, timeout=30.0):
+        return super().lock(session_id, timeout=0.05)
+
+
+class FakeQueue:
+    def __init__(self, error=None):
+        self.error = error
+        self.requests = []
+
+    def enqueue(self, request):
+        if self.error is not None:
+            raise self.error
+        self.requests.append(request)
+        return uuid.UUID(int=len(self.requests)).hex
+
+
+class EchoLLM:
+    def stream(self, messages):
+        yield SimpleNamespace(content="承知しました。")
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = ImpatientStore()
+    monkeypatch.setattr(src.session_store, "_session_store", store)
+    monkeypatch.setattr(src.langchain_setup, "get_shared_llm", EchoLLM)
+    monkeypatch.setattr(src.api_server, "get_access_index", lambda: None)
+    return store
+
+
+@pytest.fixture
+def client(store):
+    return TestClient(src.api_server.app)
+
+
+def complete_session() -> ChatSession:
+    session = ChatSession()
+    session.state.email = "foo@example.com"
+    session.state.tool = "trello"
+    session.state.background = "新しいプロジェクトの参加"
+    return session
+
+
+@pytest.mark.parametrize("kwargs, error", [
+    ({"content": b"not json"}, "リクエストボディは JSON で指定してください。"),
+    ({"json": ["message"]}, "message を指定してください。"),
+    ({"json": {}}, "message を指定してください。"),
+    ({"json": {"message": "   "}}, "message を指定してください。"),
+    ({"json": {"message": 1}}, "message を指定してください。"),
+])
+def test_message_body_is_validated(client, kwargs, error):
+    response = client.post("/sessions/s1/messages", **kwargs)
+
+    assert response.status_code == 400
+    assert response.json() == {"error": error}
+
+
+def test_message_updates_session(client, store):
+    response = client.post("/sessions/s1/messages", json={"message": "foo@example.com です"})
+
+    assert response.status_code == 200
+    assert response.json()["state"]["email"] == "foo@example.com"
+    assert store.load("s1").state.email == "foo@example.com"
+
+
+def test_provision_unknown_session_is_404(client, monkeypatch):
+    monkeypatch.setattr(src.api_server, "get_job_queue", FakeQueue)
+
+    response = client.post("/sessions/missing/provision")
+
+    assert response.status_code == 404
+
+
+def test_provision_incomplete_session_is_409(client, store, monkeypatch):
+    queue = FakeQueue()
+    monkeypatch.setattr(src.api_server, "get_job_queue", lambda: queue)
+    session = ChatSession()
+    session.state.email = "foo@example.com"
+    store.save("s1", session)
+
+    response = client.post("/sessions/s1/provision")
+
+    assert response.status_code == 409
+    assert response.json() == {"error": "依頼に必要な情報が揃っていません。"}
+    assert queue.requests == []
+
+
+@pytest.mark.parametrize("path, kwargs", [
+    ("/sessions/s1/messages", {"json": {"message": "Trelloをお願いします"}}),
+    ("/sessions/s1/provision", {}),
+])
+def test_locked_session_is_409(client, store, path, kwargs):
+    store.save("s1", complete_session())
+    assert store.acquire_lock("s1", "other-request")
+
+    response = client.post(path, **kwargs)
+
+    assert response.status_code == 409
+    assert response.json() == {"error": src.api_server.SESSION_BUSY_MESSAGE}
+
+
+def test_provision_enqueues_and_returns_job_ids(client, store, monkeypatch):
+    queue = FakeQueue()
+    monkeypatch.setattr(src.api_server, "get_job_queue", lambda: queue)
+    store.save("s1", complete_session())
+
+    response = client.post("/sessions/s1/provision")
+
+    assert response.status_code == 202
+    job_id = uuid.UUID(int=1).hex
+    assert response.json()["job_ids"] == [job_id]
+    assert [request.email for request in queue.requests] == ["foo@example.com"]
+    # 次の依頼を受け付けられるよう会話状態はリセットし、ジョブIDをセッションに残す
+    session = store.load("s1")
+    assert session.state.email is None
+    assert session.pending_jobs == [[job_id]]
+
+
+def test_provision_failure_hides_details(client, store, monkeypatch, caplog):
+    queue = FakeQueue(error=RuntimeError("database is locked: /var/lib/jobs.db"))
+    monkeypatch.setattr(src.api_server, "get_job_queue", lambda: queue)
+    store.save("s1", complete_session())
+
+    with caplog.at_level(logging.ERROR, logger="src.api_server"):
+        response = client.post("/sessions/s1/provision")
+
+    assert response.status_code == 502
+    assert response.json() == {"error": src.api_server.PROVISION_FAILED_MESSAGE}
+    assert "jobs.db" not in response.text
+    assert "database is locked" in caplog.text
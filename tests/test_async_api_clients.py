@@ -0,0 +1,87 @@
+"""src.async_api_clients と、ジョブワーカーの async 実行方式のテスト（代替サーバーに対して実行する）"""
+
+import asyncio
+import time
+
+from src.async_api_clients import ProvisioningScheduler, close_async_http_client, execute_account_request_async
+from src.job_queue import ENGINE_ASYNC, STATUS_SUCCEEDED, JobQueue, JobWorker
+from src.models import AccountRequest
+
+
+def trello_requests(count: int):
+    return [AccountRequest(email=f"user{i}@example.com", tool="trello", background="テスト") for i in range(count)]
+
+
+async def run_scheduler(scheduler_limits, requests):
+    try:
+        return await ProvisioningScheduler(scheduler_limits).run(requests)
+    finally:
+        await close_async_http_client()
+
+
+def test_execute_account_request_async_grants_and_caches(stub_server):
+    async def run():
+        try:
+            first = await execute_account_request_async("new@example.com", "trello", "テスト")
+            second = await execute_account_request_async("new@example.com", "trello", "テスト")
+            return first, second
+        finally:
+            await close_async_http_client()
+
+    first, second = asyncio.run(run())
+
+    assert first["success"] and not first["result"].get("cached")
+    assert second["success"] and second["result"]["cached"]
+    assert stub_server.counts["trello"] == 1
+
+
+def test_scheduler_limits_concurrency_per_tool(stub_server):
+    stub_server.latency = 0.1
+
+    start = time.perf_counter()
+    limited = asyncio.run(run_scheduler({"trello": 1}, trello_requests(4)))
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concurrent = asyncio.run(run_scheduler({"trello": 4}, trello_requests(8)[4:]))
+    parallel = time.perf_counter() - start
+
+    assert all(result["success"] for result in limited + concurrent)
+    assert serial >= 0.4
+    assert parallel < serial / 2
+
+
+def test_scheduler_reports_failures_in_order(stub_server):
+    stub_server.error_rate = 1.0
+
+    results = asyncio.run(run_scheduler(None, trello_requests(2)))
+
+    assert [result["success"] for result in results] == [False, False]
+    assert all("Trello" in result["error"] for result in results)
+
+
+def test_job_worker_async_engine(tmp_path, stub_server):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_ids = [queue.enqueue(request) for request in trello_requests(3)]
+    worker = JobWorker(queue, engine=ENGINE_ASYNC)
+    try:
+        assert worker.run_once() == 3
+    finally:
+        worker.close()
+
+    assert [queue.get(job_id)["status"] for job_id in job_ids] == [STATUS_SUCCEEDED] * 3
+    assert stub_server.counts["trello"] == 3
+
+
+def test_execute_account_request_async_drive(stub_server):
+    async def run():
+        try:
+            return await execute_account_request_async("new@example.com", "google_drive", "テスト", "writer")
+        finally:
+            await close_async_http_client()
+
+    result = asyncio.run(run())
+
+    assert result["success"], result
+    assert result["permission"] == "writer"
+    assert stub_server.counts["drive"] >= 1
@@ -0,0 +1,86 @@
+"""src.audit_log の書き込みの失敗からの回復とバッファの上限のテスト"""
+
+import time
+
+import pytest
+
+from src.audit_log import AuditLog
+
+
+def make_entry(index: int) -> dict:
+    return {"ts": time.time(), "email": f"user{index}@example.com", "tool": "trello", "success": True}
+
+
+def wait_until(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def audit_log(tmp_path):
+    log = AuditLog(str(tmp_path / "audit"), flush_interval=0.01)
+    yield log
+    log.close()
+
+
+def test_writer_retries_after_write_failure(audit_log, monkeypatch):
+    original = audit_log._open_next_file
+    failures = []
+
+    def failing_open():
+        if len(failures) < 2:
+            failures.append(1)
+            raise OSError("disk full")
+        original()
+
+    monkeypatch.setattr(audit_log, "_open_next_file", failing_open)
+    for index in range(3):
+        audit_log.record(make_entry(index))
+
+    wait_until(lambda: audit_log.stats()["buffered"] == 0 and len(failures) == 2)
+    audit_log.flush()
+
+    assert audit_log._writer.is_alive()
+    assert audit_log.write_errors == 2
+    assert audit_log.last_error == "disk full"
+    assert sorted(record["email"] for record in audit_log.query()) == [f"user{i}@example.com" for i in range(3)]
+
+
+def test_buffer_is_bounded_while_writes_fail(tmp_path, monkeypatch):
+    audit_log = AuditLog(str(tmp_path / "audit"), flush_interval=60, max_buffer=5)
+    original = audit_log._open_next_file
+    broken = [True]
+
+    def failing_open():
+        if broken[0]:
+            raise OSError("read-only")
+        original()
+
+    monkeypatch.setattr(audit_log, "_open_next_file", failing_open)
+
+    for index in range(8):
+        audit_log.record(make_entry(index))
+    with pytest.raises(OSError):
+        audit_log.flush()
+    audit_log.record(make_entry(8))
+
+    stats = audit_log.stats()
+    assert stats["buffered"] == 5
+    assert stats["dropped"] == 4
+    # 先に記録した分が残り、失敗の後も順序を保つ
+    assert [entry["email"] for entry in audit_log._buffer] == [f"user{i}@example.com" for i in range(5)]
+
+    broken[0] = False
+    audit_log.close()
+    assert len(audit_log.query()) == 5
+
+
+def test_unserializable_entry_is_dropped_without_blocking_others(audit_log):
+    audit_log.record({"ts": time.time(), "tool": "trello", "success": True})
+    audit_log.record(make_entry(1))
+    audit_log.flush()
+
+    assert audit_log.dropped == 1
+    assert [record["email"] for record in audit_log.query()] == ["user1@example.com"]
@@ -0,0 +1,44 @@
+"""src.batch の一括依頼CSVの読み込みのテスト"""
+
+from src.batch import EXTRA_COLUMNS_ERROR, parse_batch_csv
+
+
+def test_valid_rows_are_parsed():
+    rows, errors = parse_batch_csv(
+        "﻿Email,Tool,Permission\n"
+        "a@example.com,Trello,\n"
+        "b@example.com,Google Drive,Reader\n"
+        ",,\n"
+    )
+
+    assert errors == []
+    assert [(row.email, row.tool, row.permission) for row in rows] == [
+        ("a@example.com", "trello", None),
+        ("b@example.com", "google_drive", "reader"),
+    ]
+
+
+def test_bad_email_and_unknown_tool_are_row_errors():
+    rows, errors = parse_batch_csv(
+        "email,tool\n"
+        "not-an-email,trello\n"
+        "c@example.com,slack\n"
+        "d@example.com,trello\n"
+    )
+
+    assert [row.email for row in rows] == ["d@example.com"]
+    assert errors == [
+        "2行目: email の値が正しくありません。",
+        "3行目: TrelloまたはGoogle Driveのいずれかを指定してください。",
+    ]
+
+
+def test_row_with_extra_columns_is_a_row_error():
+    rows, errors = parse_batch_csv("email,tool\na@example.com,trello\nb@example.com,trello,extra\n")
+
+    assert [row.email for row in rows] == ["a@example.com"]
+    assert errors == [f"3行目: {EXTRA_COLUMNS_ERROR}"]
+
+
+def test_missing_columns_are_reported():
+    assert parse_batch_csv("email\na@example.com\n") == ([], ["CSVには email 列と tool 列が必要です。"])
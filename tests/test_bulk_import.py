@@ -0,0 +1,81 @@
+"""src.bulk_import のテスト（行ごとの失敗の記録と、中断後のチェックポイントからの再開）"""
+
+import json
+
+import pytest
+
+import src.bulk_import
+from src.batch import EXTRA_COLUMNS_ERROR
+from src.bulk_import import run_import
+
+
+class FakeExecutor:
+    """発行した依頼を記録し、指定した行で1度だけ中断する execute_account_request"""
+
+    def __init__(self, interrupt_email=None):
+        self.interrupt_email = interrupt_email
+        self.submitted = []
+
+    def __call__(self, email, tool, background, permission=None, target=None):
+        if email == self.interrupt_email:
+            self.interrupt_email = None
+            raise KeyboardInterrupt
+        self.submitted.append(email)
+        return {"success": True, "tool": tool, "email": email, "result": {"success": True}}
+
+
+def read_results(path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_overlong_csv_row_fails_without_aborting(tmp_path, monkeypatch):
+    executor = FakeExecutor()
+    monkeypatch.setattr(src.bulk_import, "execute_account_request", executor)
+    source = tmp_path / "requests.csv"
+    source.write_text(
+        "email,tool,background\n"
+        "a@example.com,trello,テスト\n"
+        "b@example.com,trello,テスト,extra\n"
+        "c@example.com,trello,テスト\n",
+        encoding="utf-8"
+    )
+    output = tmp_path / "results.jsonl"
+
+    summary = run_import(str(source), str(output), str(tmp_path / "checkpoint"), workers=1)
+
+    results = read_results(output)
+    assert [result["line"] for result in results] == [2, 3, 4]
+    assert results[1]["success"] is False and results[1]["error"] == EXTRA_COLUMNS_ERROR
+    assert executor.submitted == ["a@example.com", "c@example.com"]
+    assert (summary["succeeded"], summary["invalid"]) == (2, 1)
+
+
+def test_resume_skips_rows_that_already_finished(tmp_path, monkeypatch):
+    emails = [f"user{i}@example.com" for i in range(10)]
+    source = tmp_path / "requests.jsonl"
+    source.write_text(
+        "".join(json.dumps({"email": email, "tool": "trello", "background": "テスト"}) + "\n" for email in emails),
+        encoding="utf-8"
+    )
+    output = tmp_path / "results.jsonl"
+    checkpoint = tmp_path / "checkpoint"
+    first = FakeExecutor(interrupt_email="user4@example.com")
+    monkeypatch.setattr(src.bulk_import, "execute_account_request", first)
+
+    with pytest.raises(KeyboardInterrupt):
+        run_import(str(source), str(output), str(checkpoint), workers=1, checkpoint_every=1)
+
+    finished = [result["email"] for result in read_results(output)]
+    assert finished == emails[:4]
+
+    second = FakeExecutor()
+    monkeypatch.setattr(src.bulk_import, "execute_account_request", second)
+    summary = run_import(str(source), str(output), str(checkpoint), workers=1, checkpoint_every=1)
+
+    # 書き出し済みの行は再発行せず、結果ファイルには全行が1回ずつ残る
+    assert not set(second.submitted) & set(finished)
+    assert second.submitted == emails[4:]
+    assert [result["email"] for result in read_results(output)] == emails
+    assert summary["started_line"] == 4
+    assert (summary["rows"], summary["succeeded"]) == (10, 10)
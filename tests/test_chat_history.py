@@ -0,0 +1,100 @@
+"""src.chat_history のチャット履歴のテスト（表示範囲での要約、依頼の区切り、表示のページング）"""
+
+from src.chat_history import ChatHistory
+from src.models import ChatSession
+
+
+def converse(history: ChatHistory, turns: int, prefix: str = "m"):
+    for index in range(turns):
+        history.append("user" if index % 2 == 0 else "assistant", f"{prefix}{index}")
+
+
+def contents(history: ChatHistory) -> list:
+    return [message["content"] for message in history]
+
+
+def test_closed_request_is_compacted_once_outside_window():
+    history = ChatHistory(window=4)
+    converse(history, 2, "a")
+    history.close_request("依頼A")
+    converse(history, 3, "b")
+
+    # 依頼Aの後のメッセージが window 件に満たない間は、依頼Aのメッセージも残す
+    assert contents(history) == ["a0", "a1", "b0", "b1", "b2"]
+    assert history.compacted_summaries() == []
+
+    history.append("assistant", "b3")
+
+    assert contents(history) == ["b0", "b1", "b2", "b3"]
+    assert history.compacted_summaries() == ["依頼A"]
+    assert history.closed_ends == []
+    assert len(history) == 5
+
+
+def test_open_request_is_never_compacted():
+    history = ChatHistory(window=2)
+    converse(history, 10)
+
+    assert len(contents(history)) == 10
+    assert history.summaries == []
+
+
+def test_close_request_twice_at_same_position_is_ignored():
+    history = ChatHistory(window=10)
+    converse(history, 2)
+    history.close_request("依頼A")
+    history.close_request("依頼A（再送）")
+
+    assert history.summaries == ["依頼A"]
+    assert history.closed_ends == [2]
+
+
+def test_max_bytes_drops_oldest_summaries_first():
+    history = ChatHistory(window=2, max_bytes=40)
+    for name in "ABC":
+        converse(history, 2, name.lower())
+        history.close_request(f"依頼{name}")
+
+    # 要約は1件10バイト、メッセージは1件2バイト
+    assert history.size <= 40
+    assert history.compacted_summaries() == ["依頼A", "依頼B"]
+
+    history.max_bytes = 20
+    history.append("user", "xx")
+
+    assert history.size <= 20
+    assert "依頼A" not in history.summaries
+    assert contents(history)[-1] == "xx"
+
+
+def test_visible_pages_messages_then_summaries():
+    history = ChatHistory(window=2)
+    for name in "ABC":
+        converse(history, 2, name.lower())
+        history.close_request(f"依頼{name}")
+    converse(history, 1, "d")
+
+    assert history.compacted_summaries() == ["依頼A", "依頼B"]
+    assert contents(history) == ["c0", "c1", "d0"]
+
+    assert history.visible(2) == ([], [{"role": "assistant", "content": "c1"}, {"role": "user", "content": "d0"}], True)
+    summaries, messages, has_more = history.visible(4)
+    assert (summaries, len(messages), has_more) == (["依頼B"], 3, True)
+    summaries, messages, has_more = history.visible(10)
+    assert (summaries, len(messages), has_more) == (["依頼A", "依頼B"], 3, False)
+
+
+def test_session_round_trip():
+    history = ChatHistory(window=2)
+    converse(history, 2, "a")
+    history.close_request("依頼A")
+    converse(history, 2, "b")
+    session = ChatSession()
+    history.save_to(session)
+
+    restored = ChatHistory.from_session(session, window=2)
+
+    assert contents(restored) == contents(history)
+    assert restored.summaries == history.summaries
+    assert restored.closed_ends == history.closed_ends
+    assert restored.size == history.size
@@ -0,0 +1,67 @@
+"""src.circuit_breaker のテスト（Trello の代替サーバーに障害を注入し、ジョブの保留と復旧後の再実行を確認する）"""
+
+import os
+import time
+
+import pytest
+
+from src.circuit_breaker import get_circuit_breaker, reset_circuit_breakers
+from src.job_queue import STATUS_DEFERRED, STATUS_FAILED, STATUS_QUEUED, STATUS_SUCCEEDED, JobQueue, JobWorker
+from src.models import AccountRequest
+
+JOBS = 8
+FAILURE_THRESHOLD = 3
+
+
+@pytest.fixture
+def breaker_environment():
+    os.environ.update({
+        "CIRCUIT_BREAKER_ENABLED": "1",
+        "CIRCUIT_FAILURE_THRESHOLD": str(FAILURE_THRESHOLD),
+        "CIRCUIT_RECOVERY_SECONDS": "0.5",
+    })
+    reset_circuit_breakers()
+
+
+def statuses(queue: JobQueue, job_ids) -> list:
+    return [queue.get(job_id)["status"] for job_id in job_ids]
+
+
+def test_open_breaker_defers_jobs_until_upstream_recovers(tmp_path, stub_server, breaker_environment):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=5)
+    job_ids = [
+        queue.enqueue(AccountRequest(email=f"user{i}@example.com", tool="trello", background="テスト"))
+        for i in range(JOBS)
+    ]
+    stub_server.error_rate = 1.0
+
+    # 1件ずつ実行し、ブレーカーが開いた後の呼び出しを数えられるようにする
+    worker = JobWorker(queue, batch_size=1, poll_interval=0.01)
+    assert sum(worker.run_once() for _ in range(JOBS)) == JOBS
+
+    # しきい値の回数だけ失敗した後は上流を呼ばず、ブレーカーを開いたジョブと残りのジョブは試行回数に数えずに保留する
+    breaker = get_circuit_breaker("trello")
+    assert breaker.is_open()
+    assert stub_server.counts["requests"] == FAILURE_THRESHOLD
+    current = statuses(queue, job_ids)
+    assert current.count(STATUS_QUEUED) == FAILURE_THRESHOLD - 1
+    assert current.count(STATUS_DEFERRED) == JOBS - FAILURE_THRESHOLD + 1
+    for job_id in job_ids:
+        job = queue.get(job_id)
+        if job["status"] == STATUS_DEFERRED:
+            assert job["attempts"] == 0
+
+    # 復旧後は保留・再試行待ちのジョブがすべて成功する
+    stub_server.error_rate = 0.0
+    worker.start()
+    try:
+        deadline = time.monotonic() + 15
+        while set(statuses(queue, job_ids)) != {STATUS_SUCCEEDED} and time.monotonic() < deadline:
+            assert STATUS_FAILED not in statuses(queue, job_ids)
+            time.sleep(0.05)
+    finally:
+        worker.stop()
+        worker.join()
+
+    assert statuses(queue, job_ids) == [STATUS_SUCCEEDED] * JOBS
+    assert not breaker.is_open()
@@ -0,0 +1,113 @@
+"""src.dialogue のメールアドレスの検証・訂正と、依頼の検証に失敗した場合の尋ね直しのテスト"""
+
+import pytest
+
+from src.langchain_setup import ChatbotManager, InvalidRequestError
+from src.prompts import ERROR_MESSAGES, QUESTIONS
+
+
+@pytest.fixture
+def manager():
+    # ルールで読み取れる入力だけを使うため、LLM は呼ばれない
+    return ChatbotManager(llm=object())
+
+
+@pytest.mark.parametrize("email", ["foo..bar@example.com", "foo@-example.com", ".foo@example.com"])
+def test_invalid_email_is_rejected_and_asked_again(manager, email):
+    reply = "".join(manager.stream_response(f"{email} です"))
+
+    assert manager.state.email is None
+    assert ERROR_MESSAGES['invalid_email'] in reply
+    assert QUESTIONS['email'] in reply
+
+
+def test_email_is_normalized_like_the_request_model(manager):
+    list(manager.stream_response("Foo@Example.COM です"))
+
+    assert manager.state.email == "Foo@example.com"
+
+
+def test_invalid_additional_email_rejects_the_whole_turn(manager):
+    list(manager.stream_response("a@example.com と b..c@example.com です"))
+
+    assert manager.state.email is None
+    assert manager.state.additional_emails == []
+
+
+def test_email_correction_drops_previous_additional_emails(manager):
+    list(manager.stream_response("a@example.com と b@example.com です"))
+    assert manager.state.additional_emails == ["b@example.com"]
+
+    list(manager.stream_response("メールは c@example.com に訂正"))
+
+    assert manager.state.email == "c@example.com"
+    assert manager.state.additional_emails == []
+    assert not manager.state.is_batch()
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.requests = []
+
+    def enqueue(self, request):
+        self.requests.append(request)
+        return f"job-{len(self.requests)}"
+
+
+def test_invalid_state_is_asked_again_instead_of_enqueued(manager):
+    # 保存された古い会話状態など、スロットの検証を通らずに入った値
+    manager.state.email = "not-an-email"
+    manager.state.tool = "trello"
+    manager.state.background = "テスト"
+    queue = RecordingQueue()
+
+    with pytest.raises(InvalidRequestError) as error:
+        manager.enqueue_request(queue)
+
+    assert queue.requests == []
+    assert str(error.value).startswith("email の値が正しくありません。")
+    assert QUESTIONS['email'] in str(error.value)
+    assert manager.state.email is None
+    assert manager.state.tool == "trello"
+    assert manager.state.background == "テスト"
+
+
+def answer_until_background(manager):
+    for text in ["foo@example.com です", "Trelloをお願いします"]:
+        list(manager.stream_response(text))
+    assert manager.get_next_question() == QUESTIONS['background']
+
+
+@pytest.mark.parametrize("background", [
+    "バグ修正の対応です",
+    "仕様変更の作業",
+    "間違い探しのレビュー",
+    "Working on the changelog",
+    "Actually just onboarding",
+])
+def test_background_answer_with_correction_words_is_accepted(manager, background):
+    answer_until_background(manager)
+
+    reply = "".join(manager.stream_response(background))
+
+    assert manager.state.background == background
+    assert manager.state.is_complete()
+    assert QUESTIONS['background'] not in reply
+
+
+def test_correction_of_filled_slot_while_asking_background(manager):
+    answer_until_background(manager)
+
+    list(manager.stream_response("メールは bar@example.com に訂正"))
+
+    assert manager.state.email == "bar@example.com"
+    assert manager.state.background is None
+
+
+def test_explicit_background_correction_replaces_it(manager):
+    answer_until_background(manager)
+    list(manager.stream_response("バグ修正の対応です"))
+
+    list(manager.stream_response("背景は新機能の開発に訂正"))
+
+    assert manager.state.background == "新機能の開発"
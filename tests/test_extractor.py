@@ -0,0 +1,53 @@
+"""src.extractor のテスト"""
+
+import pytest
+
+from src.extractor import SlotExtractor, default_extractor
+
+
+@pytest.mark.parametrize("text, tool", [
+    ("Trelloに招待してください", "trello"),
+    ("driveに追加して", "google_drive"),
+    ("Google Driveの閲覧権限で", "google_drive"),
+    ("ＧＯＯＧＬＥ ＤＲＩＶＥ で編集", "google_drive"),
+    ("gdrive, please", "google_drive"),
+    ("グーグルドライブ", "google_drive"),
+])
+def test_extracts_tool(text, tool):
+    assert default_extractor.extract(text).values("tool") == [tool]
+
+
+@pytest.mark.parametrize("text", [
+    "data-driven なプロジェクトです",
+    "overdrive の資料を見たい",
+    "drivers の登録をお願いします",
+    "trellos",
+    "readers のための説明です",
+])
+def test_ascii_keywords_need_word_boundaries(text):
+    result = default_extractor.extract(text)
+    assert result.values("tool") == []
+    assert result.best("permission") is None
+
+
+def test_email_and_keywords_in_one_message():
+    result = default_extractor.extract("foo@example.com にDriveの閲覧権限を")
+
+    assert result.values("email") == ["foo@example.com"]
+    assert result.values("tool") == ["google_drive"]
+    assert result.best("permission") == "reader"
+
+
+def test_keyword_inside_email_is_not_a_candidate():
+    result = default_extractor.extract("reader.trello@example.com")
+
+    assert result.values("email") == ["reader.trello@example.com"]
+    assert result.values("tool") == []
+
+
+def test_added_keyword_respects_boundaries():
+    extractor = SlotExtractor()
+    extractor.add_keyword("tool", "trello", "board")
+
+    assert extractor.extract("boardに追加").values("tool") == ["trello"]
+    assert extractor.extract("dashboard").values("tool") == []
@@ -0,0 +1,69 @@
+"""src.grant_cache の付与済みキャッシュのテスト（TTL、LRU、SQLiteへの永続化、削除）"""
+
+import time
+
+from src.grant_cache import GrantCache, role_covers
+
+
+def test_entry_expires_after_ttl():
+    cache = GrantCache(ttl_seconds=0.05)
+    cache.record("Foo@example.com", "google_drive", "file-1", "writer")
+
+    assert cache.lookup("foo@example.com", "google_drive", "file-1") == "writer"
+    time.sleep(0.1)
+    assert cache.lookup("foo@example.com", "google_drive", "file-1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = GrantCache(max_entries=2)
+    cache.record("a@example.com", "trello", "board", "member")
+    cache.record("b@example.com", "trello", "board", "member")
+    # a を参照して最近使ったものにし、次の記録で b を追い出させる
+    assert cache.lookup("a@example.com", "trello", "board") == "member"
+    cache.record("c@example.com", "trello", "board", "member")
+
+    assert cache.lookup("b@example.com", "trello", "board") is None
+    assert cache.lookup("a@example.com", "trello", "board") == "member"
+    assert cache.lookup("c@example.com", "trello", "board") == "member"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "grants.db")
+    cache = GrantCache(db_path=db_path)
+    cache.record("foo@example.com", "google_drive", "file-1", "commenter")
+
+    restarted = GrantCache(db_path=db_path)
+    assert restarted.lookup("foo@example.com", "google_drive", "file-1") == "commenter"
+    assert restarted.stats() == {"hits": 1, "misses": 0, "evictions": 0, "entries": 1}
+
+    # 期限切れの記録は再起動後も返さない
+    expired = GrantCache(ttl_seconds=-1, db_path=db_path)
+    expired.record("bar@example.com", "google_drive", "file-1", "reader")
+    assert GrantCache(db_path=db_path).lookup("bar@example.com", "google_drive", "file-1") is None
+
+
+def test_forget_removes_memory_and_sqlite_entries(tmp_path):
+    db_path = str(tmp_path / "grants.db")
+    cache = GrantCache(db_path=db_path)
+    cache.record("foo@example.com", "trello", "board", "member")
+    cache.record("foo@example.com", "trello", "other-board", "member")
+
+    cache.forget("FOO@example.com", "trello", "board")
+
+    assert cache.lookup("foo@example.com", "trello", "board") is None
+    assert GrantCache(db_path=db_path).lookup("foo@example.com", "trello", "board") is None
+    # 別の付与先の記録は残る
+    assert cache.lookup("foo@example.com", "trello", "other-board") == "member"
+
+
+def test_role_is_overwritten_and_compared_at_lookup():
+    cache = GrantCache()
+    cache.record("foo@example.com", "google_drive", "file-1", "reader")
+    cache.record("foo@example.com", "google_drive", "file-1", "writer")
+
+    granted = cache.lookup("foo@example.com", "google_drive", "file-1")
+    assert granted == "writer"
+    assert role_covers(granted, "commenter")
+    assert not role_covers(granted, "organizer")
@@ -0,0 +1,26 @@
+"""起動時のインポート時間の回帰テスト（benchmarks.check_import_time と同じ予算で判定する）"""
+
+from benchmarks.check_import_time import (
+    DEFERRED_MODULES,
+    IMPORT_TIME_BUDGET_MS,
+    SESSION_BUDGET_US,
+    measure_imports,
+    measure_session_creation,
+)
+
+
+def test_heavy_dependencies_are_not_imported_at_startup():
+    _, modules, _ = measure_imports()
+
+    assert sorted(name for name in DEFERRED_MODULES if name in modules) == []
+
+
+def test_import_time_within_budget():
+    # 計測のばらつきを避けるため、3回のうち最も速い結果で判定する
+    total_ms = min(measure_imports()[0] for _ in range(3))
+
+    assert total_ms <= IMPORT_TIME_BUDGET_MS
+
+
+def test_session_creation_within_budget():
+    assert measure_session_creation() <= SESSION_BUDGET_US
@@ -0,0 +1,161 @@
+"""src.job_queue のテスト（Trello の代替サーバーに対して実行する）"""
+
+import threading
+import time
+
+import pytest
+
+import src.job_queue
+from src.job_queue import (
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    STATUS_SUCCEEDED,
+    JobQueue,
+    JobWorker,
+)
+from src.models import AccountRequest
+
+
+def trello_request(email: str = "new@example.com", background: str = "テスト") -> AccountRequest:
+    return AccountRequest(email=email, tool="trello", background=background)
+
+
+def drive_request(permission: str, email: str = "new@example.com") -> AccountRequest:
+    return AccountRequest(email=email, tool="google_drive", permission=permission, background="テスト")
+
+
+def wait_for_status(queue: JobQueue, job_id: str, statuses, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} stayed {queue.get(job_id)['status']}")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"), max_attempts=2)
+
+
+def test_enqueue_merges_pending_job_and_updates_payload(queue):
+    job_id = queue.enqueue(drive_request("reader"))
+
+    assert queue.enqueue(drive_request("writer")) == job_id
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_QUEUED
+    assert job["request"].permission == "writer"
+
+
+def test_enqueue_after_success_creates_new_job(queue, stub_server):
+    worker = JobWorker(queue, poll_interval=0.01)
+    first = queue.enqueue(trello_request())
+    assert worker.run_once() == 1
+    assert queue.get(first)["status"] == STATUS_SUCCEEDED
+
+    second = queue.enqueue(trello_request(background="再付与"))
+
+    assert second != first
+    assert queue.get(second)["status"] == STATUS_QUEUED
+    assert queue.get(second)["request"].background == "再付与"
+    # 以前のジョブの結果はジョブIDで引き続き取得できる
+    assert queue.get(first)["status"] == STATUS_SUCCEEDED
+
+
+def test_worker_runs_jobs_against_stub(queue, stub_server):
+    job_ids = [queue.enqueue(trello_request(f"user{i}@example.com")) for i in range(5)]
+    worker = JobWorker(queue, batch_size=10, poll_interval=0.01)
+    worker.start()
+    try:
+        jobs = [wait_for_status(queue, job_id, (STATUS_SUCCEEDED, STATUS_FAILED)) for job_id in job_ids]
+    finally:
+        worker.stop()
+        worker.join()
+
+    assert [job["status"] for job in jobs] == [STATUS_SUCCEEDED] * 5
+    assert stub_server.counts["trello"] >= 5
+
+
+def test_worker_retries_then_fails_on_upstream_errors(queue, stub_server, monkeypatch):
+    stub_server.error_rate = 1.0
+    monkeypatch.setenv("CIRCUIT_BREAKER_ENABLED", "0")
+    job_id = queue.enqueue(trello_request())
+    worker = JobWorker(queue, poll_interval=0.01)
+
+    assert worker.run_once() == 1
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_QUEUED
+    assert job["error"]
+
+    queue._connect().execute("UPDATE jobs SET available_at = 0")
+    assert worker.run_once() == 1
+    assert queue.get(job_id)["status"] == STATUS_FAILED
+
+
+def test_worker_survives_unexpected_exceptions(queue, monkeypatch):
+    def broken(requests):
+        raise KeyError("id")
+
+    monkeypatch.setattr(src.job_queue, "execute_batch_account_requests", broken)
+    job_id = queue.enqueue(trello_request())
+    worker = JobWorker(queue, poll_interval=0.01)
+    worker.start()
+    try:
+        job = wait_for_status(queue, job_id, (STATUS_FAILED,))
+        assert "id" in job["error"]
+        # 例外の後もワーカーは次のジョブを実行する
+        monkeypatch.setattr(
+            src.job_queue, "execute_batch_account_requests", lambda requests: [{"success": True}] * len(requests)
+        )
+        next_job = queue.enqueue(trello_request("next@example.com"))
+        wait_for_status(queue, next_job, (STATUS_SUCCEEDED,))
+        assert worker.is_alive()
+    finally:
+        worker.stop()
+        worker.join()
+
+
+def test_failed_result_recording_marks_job_failed(queue, monkeypatch):
+    monkeypatch.setattr(
+        src.job_queue, "execute_batch_account_requests", lambda requests: [{"success": True}] * len(requests)
+    )
+
+    def broken_complete(job_id, result):
+        raise TypeError("not serializable")
+
+    monkeypatch.setattr(queue, "complete", broken_complete)
+    job_id = queue.enqueue(trello_request())
+
+    assert JobWorker(queue).run_once() == 1
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_QUEUED
+    assert "not serializable" in job["error"]
+
+
+def test_heartbeat_keeps_long_running_job_leased(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=0.3)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(requests):
+        started.set()
+        release.wait(5)
+        return [{"success": True}] * len(requests)
+
+    monkeypatch.setattr(src.job_queue, "execute_batch_account_requests", slow)
+    job_id = queue.enqueue(trello_request())
+    worker = JobWorker(queue, heartbeat_interval=0.05)
+    runner = threading.Thread(target=worker.run_once)
+    runner.start()
+    try:
+        assert started.wait(5)
+        time.sleep(0.6)
+        # リースを延長し続けているため、別のワーカーが再取得しない
+        assert queue.dequeue_batch(10) == []
+        assert queue.get(job_id)["status"] == STATUS_RUNNING
+    finally:
+        release.set()
+        runner.join()
+    assert queue.get(job_id)["status"] == STATUS_SUCCEEDED
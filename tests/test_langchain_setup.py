@@ -0,0 +1,113 @@
+"""src.langchain_setup のスロット抽出と応答生成のテスト（LLM は応答を決めた代替クラスに置き換える）"""
+
+from types import SimpleNamespace
+
+from src.langchain_setup import ChatbotManager
+from src.metrics import registry
+from src.models import AccountRequestDraft
+
+
+class FakeLLM:
+    """構造化出力と応答のストリーミングを決めた通りに返す LLM"""
+
+    def __init__(self, drafts=(), chunks=(), fail_extract=False, fail_stream_after=None):
+        self.drafts = list(drafts)
+        self.chunks = list(chunks)
+        self.fail_extract = fail_extract
+        self.fail_stream_after = fail_stream_after
+        self.prompts = []
+        self.streamed_messages = []
+
+    def with_structured_output(self, schema):
+        assert schema is AccountRequestDraft
+        return SimpleNamespace(invoke=self.invoke)
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail_extract:
+            raise RuntimeError("LLM unavailable")
+        return self.drafts.pop(0)
+
+    def stream(self, messages):
+        self.streamed_messages.append(messages)
+        for index, text in enumerate(self.chunks):
+            if self.fail_stream_after is not None and index >= self.fail_stream_after:
+                raise RuntimeError("stream interrupted")
+            yield SimpleNamespace(content=text)
+
+
+def stage_count(stage: str) -> int:
+    histogram = registry.histograms.get(stage)
+    return histogram.count if histogram is not None else 0
+
+
+def test_rules_fast_path_skips_llm():
+    llm = FakeLLM()
+    manager = ChatbotManager(llm=llm)
+    before = registry.counter("extraction_turns_total", path="rules")
+
+    reply = "".join(manager.stream_response("foo@example.com にTrelloをお願いします"))
+
+    assert llm.prompts == []
+    assert manager.state.email == "foo@example.com"
+    assert manager.state.tool == "trello"
+    assert "foo@example.com" in reply
+    assert registry.counter("extraction_turns_total", path="rules") == before + 1
+
+
+def test_ambiguous_turn_uses_structured_output():
+    llm = FakeLLM(drafts=[AccountRequestDraft(tool="google_drive", permission="reader")])
+    manager = ChatbotManager(llm=llm)
+    manager.state.email = "foo@example.com"
+    before = registry.counter("extraction_turns_total", path="llm")
+
+    list(manager.stream_response("共有フォルダの資料を見られるようにしてほしい"))
+
+    assert len(llm.prompts) == 1
+    assert manager.state.tool == "google_drive"
+    assert manager.state.permission == "reader"
+    assert registry.counter("extraction_turns_total", path="llm") == before + 1
+
+
+def test_rule_values_take_precedence_over_llm():
+    llm = FakeLLM(drafts=[AccountRequestDraft(email="other@example.com", tool="trello")])
+    manager = ChatbotManager(llm=llm)
+
+    extracted = manager.extract_information("同僚の foo@example.com をよろしく")
+
+    assert extracted["email"] == "foo@example.com"
+
+
+def test_llm_extraction_failure_falls_back_to_rules():
+    llm = FakeLLM(fail_extract=True)
+    manager = ChatbotManager(llm=llm)
+    manager.state.email = "foo@example.com"
+    before = registry.counter("llm_errors_total", stage="extract")
+
+    extracted = manager.extract_information("よろしくお願いします")
+
+    assert extracted == {}
+    assert registry.counter("llm_errors_total", stage="extract") == before + 1
+
+
+def test_reply_streams_tokens_and_records_first_token():
+    llm = FakeLLM(drafts=[AccountRequestDraft()], chunks=["こんにちは。", "", "メールアドレスを教えてください。"])
+    manager = ChatbotManager(llm=llm)
+    before = stage_count("llm_first_token")
+
+    chunks = list(manager.stream_response("こんにちは"))
+
+    assert chunks == ["こんにちは。", "メールアドレスを教えてください。"]
+    assert stage_count("llm_first_token") == before + 1
+
+
+def test_reply_failure_still_asks_next_question():
+    llm = FakeLLM(drafts=[AccountRequestDraft()], chunks=["こんにちは。", "続き"], fail_stream_after=1)
+    manager = ChatbotManager(llm=llm)
+    before = registry.counter("llm_errors_total", stage="reply")
+
+    chunks = list(manager.stream_response("こんにちは"))
+
+    assert chunks[0] == "こんにちは。"
+    assert chunks[1].startswith("\n\n") and manager.get_next_question() in chunks[1]
+    assert registry.counter("llm_errors_total", stage="reply") == before + 1
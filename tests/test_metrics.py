@@ -0,0 +1,59 @@
+"""src.metrics のヒストグラムのバケット分けと Prometheus 形式の出力のテスト"""
+
+from src.metrics import BUCKETS, Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_use_upper_bounds():
+    histogram = Histogram()
+    histogram.observe(BUCKETS[0] / 2)
+    histogram.observe(BUCKETS[3])
+    histogram.observe(BUCKETS[3] * 1.01)
+    histogram.observe(BUCKETS[-1] * 10)
+
+    # 上限ちょうどの値はそのバケット、上限を超えた値は次のバケット、最後の上限を超えた値は +Inf に入る
+    assert histogram.counts[0] == 1
+    assert histogram.counts[3] == 1
+    assert histogram.counts[4] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 4
+    assert histogram.sum == BUCKETS[0] / 2 + BUCKETS[3] * 2.01 + BUCKETS[-1] * 10
+
+
+def test_percentile_interpolates_within_bucket():
+    histogram = Histogram()
+    assert histogram.percentile(0.5) == 0.0
+
+    for _ in range(4):
+        histogram.observe(BUCKETS[10] * 0.9)
+
+    lower, upper = BUCKETS[9], BUCKETS[10]
+    assert histogram.percentile(0.5) == lower + (upper - lower) * 0.5
+    assert histogram.percentile(1.0) == upper
+
+
+def test_render_prometheus_histogram_and_counters():
+    registry = MetricsRegistry()
+    registry.observe("grant", BUCKETS[1])
+    registry.observe("grant", BUCKETS[2])
+    registry.observe("grant", BUCKETS[-1] * 2)
+    registry.increment("api_errors_total", api="trello", status="429")
+    registry.increment("api_errors_total", api="trello", status="429")
+    registry.increment("api_errors_total", api="google_drive", status="503")
+
+    lines = registry.render_prometheus().splitlines()
+
+    assert "# TYPE chatbot_stage_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith('chatbot_stage_seconds_bucket{stage="grant"')]
+    assert len(buckets) == len(BUCKETS) + 1
+    # バケットは累積で、+Inf は全件
+    assert buckets[0].endswith(" 0")
+    assert buckets[1] == f'chatbot_stage_seconds_bucket{{stage="grant",le="{BUCKETS[1]:.6g}"}} 1'
+    assert buckets[2].endswith(" 2")
+    assert buckets[-2].endswith(" 2")
+    assert buckets[-1] == 'chatbot_stage_seconds_bucket{stage="grant",le="+Inf"} 3'
+    assert 'chatbot_stage_seconds_count{stage="grant"} 3' in lines
+
+    assert lines.count("# TYPE chatbot_api_errors_total counter") == 1
+    assert 'chatbot_api_errors_total{api="google_drive",status="503"} 1' in lines
+    assert 'chatbot_api_errors_total{api="trello",status="429"} 2' in lines
+    assert registry.counter("api_errors_total", status="429", api="trello") == 2
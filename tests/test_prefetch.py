@@ -0,0 +1,45 @@
+"""src.prefetch のテスト（先読みは共有クライアントの準備と疎通確認だけを行い、メンバー・権限一覧を読まない）"""
+
+import pytest
+
+from src.langchain_setup import ChatbotManager
+from src.prefetch import Prefetcher
+
+
+@pytest.mark.parametrize("tool", ["trello", "google_drive"])
+def test_prefetch_warms_client_without_listing(stub_server, tool):
+    prefetcher = Prefetcher(max_workers=1)
+    task = prefetcher.start("foo@example.com", tool)
+    task.future.result(timeout=10)
+
+    assert task.error is None
+    assert stub_server.counts["probes"] == 1
+    assert stub_server.counts["reads"] == 0
+    assert stub_server.counts["trello"] + stub_server.counts["drive"] == 0
+
+
+class FakeIndex:
+    def __init__(self, roles):
+        self.roles = roles
+        self.lookups = []
+
+    def lookup(self, email, tool):
+        self.lookups.append((email, tool))
+        return self.roles.get((email, tool))
+
+
+def test_existing_access_comes_from_access_index():
+    manager = ChatbotManager(llm=object())
+    manager.state.email = "foo@example.com"
+    manager.state.tool = "google_drive"
+    manager.state.permission = "reader"
+    manager.access_index = FakeIndex({("foo@example.com", "google_drive"): "writer"})
+
+    assert manager.find_existing_access() == "writer"
+
+    manager.state.permission = "writer"
+    manager.access_index = FakeIndex({("foo@example.com", "google_drive"): "commenter"})
+    assert manager.find_existing_access() is None
+
+    manager.access_index = None
+    assert manager.find_existing_access() is None
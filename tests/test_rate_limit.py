@@ -0,0 +1,73 @@
+"""src.rate_limit のトークンバケットのテスト（補充と、ファイルに保持したバケットのプロセス間の共有）"""
+
+import multiprocessing
+import time
+
+import pytest
+
+from src.rate_limit import RateLimiter, RateLimitTimeout, get_rate_limiter, reset_rate_limiter
+
+
+def test_tokens_refill_over_time():
+    limiter = RateLimiter(buckets={"trello": "20/2"})
+
+    assert limiter.try_acquire("trello", "key") == 0
+    assert limiter.try_acquire("trello", "key") == 0
+    wait = limiter.try_acquire("trello", "key")
+    assert 0 < wait <= 0.05
+
+    time.sleep(wait + 0.01)
+    assert limiter.try_acquire("trello", "key") == 0
+    # 補充は最大量で頭打ちになる
+    time.sleep(0.3)
+    assert limiter.snapshot()["trello:key"]["tokens"] <= 2
+
+
+def test_buckets_are_separate_per_credential():
+    limiter = RateLimiter(buckets={"trello": "0.01/1"})
+
+    assert limiter.try_acquire("trello", "a") == 0
+    assert limiter.try_acquire("trello", "a") > 0
+    assert limiter.try_acquire("trello", "b") == 0
+
+
+def test_acquire_gives_up_after_max_wait():
+    limiter = RateLimiter(buckets={"trello": "0.01/1"}, max_wait=0.1)
+    limiter.acquire("trello", "key")
+
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire("trello", "key")
+
+
+def take_tokens(db_path: str, attempts: int, results):
+    limiter = RateLimiter(db_path, buckets={"trello": "0.001/5"})
+    results.put(sum(limiter.try_acquire("trello", "key") == 0 for _ in range(attempts)))
+
+
+def test_file_bucket_is_shared_across_processes(tmp_path):
+    db_path = str(tmp_path / "ratelimit.db")
+    RateLimiter(db_path)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=take_tokens, args=(db_path, 5, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+
+    # 4 プロセスで合わせても最大量の 5 回だけ通る
+    assert sum(results.get(timeout=5) for _ in processes) == 5
+
+
+def test_default_limiter_does_not_create_a_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("RATE_LIMIT_ENABLED", "1")
+    monkeypatch.delenv("RATE_LIMIT_DB", raising=False)
+    reset_rate_limiter()
+    try:
+        limiter = get_rate_limiter()
+        assert limiter.db_path is None
+        assert limiter.try_acquire("trello", "key") == 0
+        assert list(tmp_path.iterdir()) == []
+    finally:
+        reset_rate_limiter()
@@ -0,0 +1,140 @@
+"""src.reconcile のテスト（Trello のメールアドレス不明のメンバーの扱いと、変更ごとのレイテンシの記録）"""
+
+import time
+
+import pytest
+
+import src.reconcile
+from src.models import DesiredAccess, ProvisioningTarget
+from src.reconcile import (
+    ACTION_ADD, ACTION_REMOVE, Change, TargetPlan, apply_plan, format_report, iter_report_records, plan_trello
+)
+
+
+class FakeTrelloClient:
+    """メンバー一覧と、メールアドレスごとに応答の遅延を決めたメンバーの追加"""
+
+    def __init__(self, members=(), admin_ids=(), delays=None):
+        self.members = list(members)
+        self.admin_ids = list(admin_ids)
+        self.delays = delays or {}
+
+    def get_board_members(self):
+        return self.members
+
+    def get_board_admin_ids(self):
+        return self.admin_ids
+
+    def add_member_to_board(self, email):
+        time.sleep(self.delays.get(email, 0.0))
+        return {"success": True, "data": {"members": []}}
+
+    def remove_member_from_board(self, member_id):
+        return {"success": True}
+
+
+class FakeDriveClient:
+    def __init__(self, delay):
+        self.delay = delay
+        self.batches = []
+
+    def add_permissions_batch(self, grants):
+        self.batches.append(grants)
+        time.sleep(self.delay)
+        return [{"success": True, "data": {"id": email}} for email, _ in grants]
+
+
+def trello_plan(*entries) -> TargetPlan:
+    spec = ProvisioningTarget(alias="board", tool="trello", id="board-1")
+    return TargetPlan(spec, {entry.email: entry for entry in entries})
+
+
+def desired(email, username=None, tool="trello", permission=None):
+    return DesiredAccess(email=email, tool=tool, username=username, permission=permission)
+
+
+@pytest.fixture
+def outcomes(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(src.reconcile, "record_grant", lambda *args, **kwargs: None)
+    monkeypatch.setattr(src.reconcile, "forget_grant", lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        src.reconcile, "record_outcome",
+        lambda email, tool, background, permission, result, seconds, *args: recorded.append((email, seconds))
+    )
+    return recorded
+
+
+def test_trello_members_without_email_are_reported(monkeypatch):
+    client = FakeTrelloClient(members=[
+        {"id": "m1", "username": "alice", "email": "alice@example.com"},
+        {"id": "m2", "username": "bob"},
+        {"id": "m3", "username": "carol"},
+        {"id": "admin", "username": "owner"},
+    ], admin_ids=["admin"])
+    monkeypatch.setattr(src.reconcile, "get_trello_client", lambda board_id: client)
+    plan = trello_plan(
+        desired("alice@example.com"),
+        desired("bob@example.com", username="bob"),
+        desired("dave@example.com"),
+    )
+
+    plan_trello(plan)
+
+    # bob はユーザー名で照合し、carol はメールアドレスもユーザー名も分からないため削除しない
+    assert plan.unchanged == 2
+    assert plan.changes == [Change(ACTION_ADD, "dave@example.com", "member")]
+    assert [name for name, _ in plan.skipped] == ["carol"]
+    # username 列のない追加は、carol と同じ人かもしれないため警告する
+    assert [email for email, _ in plan.warnings] == ["dave@example.com"]
+
+    report = format_report([plan], applied=False)
+    assert "! carol" in report
+    assert "? dave@example.com" in report
+    records = list(iter_report_records([plan], applied=False))
+    assert "warning" in records[0]
+    assert records[-1]["skipped"] == "carol"
+
+
+def test_no_warning_when_every_member_is_matched(monkeypatch):
+    client = FakeTrelloClient(members=[{"id": "m2", "username": "bob"}])
+    monkeypatch.setattr(src.reconcile, "get_trello_client", lambda board_id: client)
+    plan = trello_plan(desired("bob@example.com", username="bob"), desired("dave@example.com"))
+
+    plan_trello(plan)
+
+    assert plan.warnings == []
+    assert plan.skipped == []
+
+
+def test_trello_latency_is_recorded_per_change(monkeypatch, outcomes):
+    client = FakeTrelloClient(delays={"slow@example.com": 0.2})
+    monkeypatch.setattr(src.reconcile, "get_trello_client", lambda board_id: client)
+    plan = trello_plan(desired("fast@example.com"), desired("slow@example.com"))
+    plan.changes = [Change(ACTION_ADD, "fast@example.com", "member"), Change(ACTION_ADD, "slow@example.com", "member"),
+                    Change(ACTION_REMOVE, "old@example.com", None, "member", "m9")]
+
+    apply_plan(plan, workers=4, background="テスト")
+
+    seconds = dict(outcomes)
+    assert seconds["slow@example.com"] >= 0.2
+    assert seconds["fast@example.com"] < 0.1
+    assert plan.latencies == [seconds[change.email] for change in plan.changes]
+    assert max(plan.latencies) <= plan.apply_seconds
+
+
+def test_drive_latency_is_the_batch_duration(monkeypatch, outcomes):
+    client = FakeDriveClient(delay=0.05)
+    monkeypatch.setattr(src.reconcile, "get_drive_client", lambda file_id: client)
+    monkeypatch.setattr(src.reconcile, "DRIVE_BATCH_SIZE", 2)
+    spec = ProvisioningTarget(alias="file", tool="google_drive", id="file-1")
+    plan = TargetPlan(spec, {})
+    plan.changes = [Change(ACTION_ADD, f"user{i}@example.com", "reader") for i in range(3)]
+
+    apply_plan(plan, workers=1, background="テスト")
+
+    assert len(client.batches) == 2
+    # 同じバッチの変更は同じ秒数、全体の秒数より短い
+    assert plan.latencies[0] == plan.latencies[1]
+    assert plan.latencies[2] != plan.latencies[0]
+    assert all(0.05 <= seconds < plan.apply_seconds for seconds in plan.latencies)
@@ -0,0 +1,95 @@
+"""src.session_codec のセッションのシリアライズのテスト（往復の変換と、バージョンの違うデータ）"""
+
+import uuid
+
+import pytest
+
+from src.models import BatchRow, ChatMessage, ChatSession, ConversationState
+from src.session_codec import (
+    VERSION, SessionDecodeError, _write_str, _write_varint, decode_session, encode_session
+)
+
+
+def full_session() -> ChatSession:
+    return ChatSession(
+        state=ConversationState(
+            email="foo@example.com",
+            tool="google_drive",
+            permission="commenter",
+            background="新規プロジェクト「ブルーバード」への参加" * 10,
+            target="design",
+            additional_emails=["bar@example.com", "baz@example.com"],
+            additional_tools=["trello", "google_drive"],
+            additional_targets=[None, "design"],
+            batch_rows=[
+                BatchRow(email="a@example.com", tool="trello"),
+                BatchRow(email="b@example.com", tool="google_drive", permission="writer", target="design"),
+            ]
+        ),
+        messages=[
+            ChatMessage(role="user", content="foo@example.com です"),
+            ChatMessage(role="assistant", content="ありがとうございます。" * 50),
+        ],
+        summaries=["foo@example.com に Trello（ジョブ 1件）"],
+        closed_ends=[0, 130],
+        pending_jobs=[[uuid.uuid4().hex], [uuid.uuid4().hex, uuid.uuid4().hex]]
+    )
+
+
+@pytest.mark.parametrize("session", [ChatSession(), full_session()], ids=["empty", "full"])
+def test_round_trip_keeps_every_field(session):
+    data = encode_session(session)
+
+    assert data[0] == VERSION
+    assert decode_session(data).model_dump() == session.model_dump()
+
+
+def test_background_can_be_empty_string():
+    session = ChatSession(state=ConversationState(email="foo@example.com", tool="trello", background=""))
+
+    assert decode_session(encode_session(session)).state.background == ""
+
+
+@pytest.mark.parametrize("data", [b"", bytes((0,)), bytes((VERSION + 1,)) + encode_session(ChatSession())[1:]])
+def test_unsupported_version_is_rejected(data):
+    with pytest.raises(SessionDecodeError, match="未対応のセッション形式です"):
+        decode_session(data)
+
+
+def test_truncated_data_is_rejected():
+    data = encode_session(full_session())
+
+    with pytest.raises(SessionDecodeError, match="壊れています"):
+        decode_session(data[:len(data) // 2])
+
+
+def legacy_session(version: int) -> bytes:
+    """付与先（target）を持たない古いバージョンのデータ"""
+    data = bytearray((version, 0x01, 1, 0))
+    _write_str(data, "foo@example.com")
+    # additional_emails, additional_tools, batch_rows（バージョン 3 より前は additional_targets がない）
+    data += bytes((0, 0, 0))
+    _write_varint(data, 1)
+    data.append(0)
+    _write_str(data, "はい")
+    # pending_jobs
+    data.append(0)
+    if version >= 2:
+        _write_varint(data, 1)
+        _write_str(data, "foo@example.com に Trello")
+        _write_varint(data, 1)
+        _write_varint(data, 2)
+    return bytes(data)
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_older_versions_are_still_readable(version):
+    session = decode_session(legacy_session(version))
+
+    assert session.state.email == "foo@example.com"
+    assert session.state.tool == "trello"
+    assert session.state.target is None
+    assert session.state.additional_targets == []
+    assert [(message.role, message.content) for message in session.messages] == [("user", "はい")]
+    assert session.summaries == (["foo@example.com に Trello"] if version >= 2 else [])
+    assert session.closed_ends == ([2] if version >= 2 else [])
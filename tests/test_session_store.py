@@ -0,0 +1,138 @@
+"""src.session_store のセッションストアのテスト（保存と期限切れ、セッションごとのロック、API サーバーでの同時のメッセージの処理）"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import src.api_server
+import src.langchain_setup
+import src.session_store
+from benchmarks.stub_redis import StubRedisServer
+from src.models import ChatSession
+from src.session_store import (
+    MemorySessionStore, RedisSessionStore, SessionLockTimeout, SQLiteSessionStore
+)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_store(request, tmp_path):
+    if request.param == "memory":
+        yield lambda ttl: MemorySessionStore(ttl=ttl)
+    elif request.param == "sqlite":
+        yield lambda ttl: SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=ttl)
+    else:
+        server = StubRedisServer()
+        url = server.start()
+        yield lambda ttl: RedisSessionStore(url, ttl=ttl)
+        server.shutdown()
+        server.server_close()
+
+
+def test_save_load_and_delete(make_store):
+    store = make_store(60)
+    session = ChatSession()
+    session.state.email = "foo@example.com"
+
+    assert store.load("s1") is None
+    store.save("s1", session)
+    assert store.load("s1").state.email == "foo@example.com"
+
+    store.delete("s1")
+    assert store.load("s1") is None
+
+
+def test_session_expires_after_ttl(make_store):
+    # Redis の期限は秒単位のため、1秒未満は1秒に切り上げられる
+    store = make_store(0.05)
+    store.save("s1", ChatSession())
+    assert store.load("s1") is not None
+
+    time.sleep(1.1 if isinstance(store, RedisSessionStore) else 0.1)
+    assert store.load("s1") is None
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemorySessionStore(lock_ttl=0.3)
+    elif request.param == "sqlite":
+        yield SQLiteSessionStore(str(tmp_path / "sessions.db"), lock_ttl=0.3)
+    else:
+        server = StubRedisServer()
+        url = server.start()
+        yield RedisSessionStore(url, lock_ttl=0.3)
+        server.shutdown()
+        server.server_close()
+
+
+def test_lock_is_exclusive_per_session(store):
+    assert store.acquire_lock("s1", "a")
+    assert not store.acquire_lock("s1", "b")
+    # 別のセッションは独立してロックできる
+    assert store.acquire_lock("s2", "b")
+
+    # 別の token では解放されない
+    store.release_lock("s1", "b")
+    assert not store.acquire_lock("s1", "c")
+    store.release_lock("s1", "a")
+    assert store.acquire_lock("s1", "c")
+
+
+def test_expired_lock_can_be_taken_over(store):
+    assert store.acquire_lock("s1", "a")
+    time.sleep(0.4)
+    assert store.acquire_lock("s1", "b")
+    # 期限切れで取得し直されたロックは、元の処理が解放しても残る
+    store.release_lock("s1", "a")
+    assert not store.acquire_lock("s1", "c")
+
+
+def test_lock_times_out_while_held(store):
+    store.lock_ttl = 10.0
+    with store.lock("s1"):
+        with pytest.raises(SessionLockTimeout):
+            with store.lock("s1", timeout=0.1):
+                pass
+    with store.lock("s1", timeout=0.1):
+        pass
+
+
+def test_memory_store_is_refused_with_multiple_workers(monkeypatch):
+    monkeypatch.setattr(src.session_store, "_session_store", MemorySessionStore())
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with pytest.raises(RuntimeError):
+        src.api_server.check_session_store()
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    src.api_server.check_session_store()
+
+
+class SlowLLM:
+    """応答のストリーミングに時間がかかる LLM（同じセッションへのメッセージを重ねるため）"""
+
+    def stream(self, messages):
+        time.sleep(0.2)
+        yield SimpleNamespace(content="承知しました。")
+
+
+def test_concurrent_messages_keep_every_turn(monkeypatch, tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(src.session_store, "_session_store", store)
+    monkeypatch.setattr(src.langchain_setup, "get_shared_llm", SlowLLM)
+    monkeypatch.setattr(src.api_server, "get_access_index", lambda: None)
+
+    messages = ["foo@example.com です", "Trelloをお願いします"]
+    threads = [threading.Thread(target=src.api_server.handle_message, args=("s1", message)) for message in messages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    session = store.load("s1")
+    user_messages = [message.content for message in session.messages if message.role == "user"]
+    assert sorted(user_messages) == sorted(messages)
+    # 後から処理したメッセージも、先のメッセージで埋まったスロットを引き継ぐ
+    assert session.state.email == "foo@example.com"
+    assert session.state.tool == "trello"
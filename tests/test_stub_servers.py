@@ -0,0 +1,43 @@
+"""benchmarks の代替サーバーと結果の比較のテスト（発行は代替サーバーに対して実行する）"""
+
+from benchmarks.bench_e2e import compare
+from src.api_clients import execute_account_request
+
+
+def test_grants_reach_stub_server(stub_server):
+    trello = execute_account_request("foo@example.com", "trello", "テスト")
+    drive = execute_account_request("bar@example.com", "google_drive", "テスト", "reader")
+
+    assert trello["success"], trello
+    assert drive["success"], drive
+    assert (stub_server.counts["trello"], stub_server.counts["drive"]) == (1, 1)
+
+
+def test_injected_errors_fail_the_grant(stub_server):
+    stub_server.error_rate = 1.0
+
+    result = execute_account_request("foo@example.com", "trello", "テスト")
+
+    assert not result["success"]
+    assert stub_server.counts["errors"] >= 1
+    assert stub_server.counts["trello"] == 0
+
+
+def test_compare_reports_regressions_beyond_threshold(capsys):
+    baseline = {
+        "conversation.turns_per_sec": 1000.0,
+        "conversation.latency_ms.p99": 2.0,
+        "provisioning.grants_per_sec": 200.0,
+        "provisioning.requests": 100,
+    }
+    current = {
+        "conversation.turns_per_sec": 850.0,
+        "conversation.latency_ms.p99": 2.1,
+        "provisioning.grants_per_sec": 260.0,
+        "provisioning.requests": 500,
+    }
+
+    # 大きいほど良い指標は減少を、それ以外は増加を悪化とみなす（件数は比較しない）
+    assert compare(current, baseline, threshold=0.10) == ["conversation.turns_per_sec"]
+    assert "REGRESSION" in capsys.readouterr().out
+    assert compare(current, baseline, threshold=0.20) == []
@@ -0,0 +1,57 @@
+"""src.targets の付与先レジストリと、api_clients.get_target_id の付与先の解決のテスト"""
+
+import json
+import os
+
+import pytest
+
+from src.api_clients import execute_account_request, get_target_id, reset_clients
+from src.targets import get_target_registry
+
+
+@pytest.fixture
+def targets(monkeypatch):
+    monkeypatch.setenv("TRELLO_BOARD_ID", "env-board")
+    monkeypatch.delenv("GOOGLE_DRIVE_FILE_ID", raising=False)
+    with open(os.environ["TARGETS_FILE"], "w", encoding="utf-8") as f:
+        json.dump({"targets": [
+            {"alias": "sales-docs", "tool": "google_drive", "id": "file-sales", "name": "営業資料",
+             "roles": ["reader"], "keywords": ["営業資料"]},
+            {"alias": "dev-docs", "tool": "google_drive", "id": "file-dev", "name": "開発資料", "default": True},
+        ]}, f)
+    reset_clients()
+    yield get_target_registry()
+    reset_clients()
+
+
+def test_target_ids_resolve_from_file_and_environment(targets):
+    assert get_target_id("google_drive") == "file-dev"
+    assert get_target_id("google_drive", "sales-docs") == "file-sales"
+    # 設定ファイルに付与先がないツールは環境変数の付与先を使う
+    assert get_target_id("trello") == "env-board"
+    assert targets.lookup("営業資料").alias == "sales-docs"
+    assert targets.get("sales-docs").roles == ["reader"]
+
+
+def test_unknown_target_raises_with_its_alias(targets):
+    with pytest.raises(ValueError, match="marketing-board"):
+        get_target_id("trello", "marketing-board")
+
+
+def test_target_of_another_tool_raises(targets):
+    with pytest.raises(ValueError, match="sales-docs"):
+        get_target_id("trello", "sales-docs")
+
+
+def test_unset_default_target_is_empty(targets, monkeypatch):
+    monkeypatch.delenv("TRELLO_BOARD_ID")
+    reset_clients()
+
+    assert get_target_id("trello") == ""
+
+
+def test_request_for_unknown_target_fails_without_raising(targets):
+    result = execute_account_request("foo@example.com", "trello", "テスト", target="marketing-board")
+
+    assert result["success"] is False
+    assert "marketing-board" in result["error"]
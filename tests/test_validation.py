@@ -0,0 +1,96 @@
+"""src.validation の列ごとの一括バリデーションと AccountRequest の結果が一致することのテスト"""
+
+import pytest
+from pydantic import ValidationError
+
+from src.models import AccountRequest
+from src.validation import FIELDS, validate_account_requests
+
+VALID_ROWS = [
+    {"email": "foo@example.com", "tool": "trello", "background": "テスト"},
+    {"email": "Foo.Bar+tag@EXAMPLE.COM", "tool": "trello", "background": "大文字のドメイン"},
+    {"email": "bar@example.com", "tool": "google_drive", "permission": "commenter", "background": "資料の確認"},
+    {"email": "baz@example.com", "tool": "google_drive", "permission": "writer", "background": "b" * 255,
+     "target": "sales-docs"},
+    {"email": "user@bücher.example", "tool": "trello", "background": "国際化ドメイン"},
+    {"email": "qux@example.com", "tool": "trello", "permission": "reader", "background": " 前後の空白 "},
+]
+
+INVALID_ROWS = [
+    {"email": "not-an-email", "tool": "trello", "background": "テスト"},
+    {"email": "foo@", "tool": "trello", "background": "テスト"},
+    {"email": "a" * 65 + "@example.com", "tool": "trello", "background": "テスト"},
+    {"email": '"john doe"@example.com', "tool": "trello", "background": "テスト"},
+    {"email": 123, "tool": "trello", "background": "テスト"},
+    {"email": "foo@example.com", "tool": "slack", "background": "テスト"},
+    {"email": "foo@example.com", "tool": "google_drive", "permission": "owner", "background": "テスト"},
+    {"email": "foo@example.com", "tool": "google_drive", "permission": None, "background": "テスト"},
+    {"email": "foo@example.com", "tool": "google_drive", "permission": "", "background": "テスト"},
+    {"email": "foo@example.com", "tool": "trello", "background": "   "},
+    {"email": "foo@example.com", "tool": "trello", "background": "b" * 256},
+    {"email": "foo@example.com", "tool": "trello", "background": None},
+    {"email": "foo@example.com", "tool": "trello"},
+    {"tool": "trello", "background": "テスト"},
+    {"email": "foo@example.com", "tool": "trello", "background": "テスト", "target": 1},
+    {"email": "bad", "tool": "slack", "permission": "owner", "background": ""},
+]
+
+
+def reference(row: dict):
+    """1行ずつ AccountRequest を生成した結果（依頼、またはエラーのメッセージ）"""
+    try:
+        return AccountRequest(**row), None
+    except ValidationError as e:
+        invalid = {str(error["loc"][0]) for error in e.errors() if error["loc"]}
+        return None, f"{', '.join(field for field in FIELDS if field in invalid)} の値が正しくありません。"
+
+
+@pytest.mark.parametrize("row", VALID_ROWS + INVALID_ROWS)
+def test_single_row_matches_account_request(row):
+    expected_request, expected_error = reference(row)
+
+    result = validate_account_requests([row])
+
+    if expected_request is not None:
+        assert result.errors == {}
+        assert [request.model_dump() for request in result.requests] == [expected_request.model_dump()]
+    else:
+        assert result.requests == []
+        assert result.errors == {0: expected_error}
+
+
+def test_mixed_rows_and_column_input_match_account_request():
+    rows = [row for pair in zip(VALID_ROWS, INVALID_ROWS) for row in pair] + INVALID_ROWS[len(VALID_ROWS):]
+    expected = [reference(row) for row in rows]
+
+    result = validate_account_requests(rows)
+
+    assert result.indexes == [index for index, (request, _) in enumerate(expected) if request is not None]
+    assert [request.model_dump() for request in result.requests] == [
+        request.model_dump() for request, _ in expected if request is not None
+    ]
+    assert result.errors == {index: error for index, (_, error) in enumerate(expected) if error is not None}
+
+    # 列名 → 値のリストでも同じ結果になる
+    columns = {field: [row.get(field) for row in VALID_ROWS] for field in FIELDS}
+    by_columns = validate_account_requests(columns)
+    assert [request.model_dump() for request in by_columns.requests] == [
+        AccountRequest(**row).model_dump() for row in VALID_ROWS
+    ]
+
+
+def test_drive_permission_is_required_even_when_omitted():
+    row = {"email": "foo@example.com", "tool": "google_drive", "background": "テスト"}
+    # AccountRequest は省略されたキーの既定値を検証しないため通ってしまう
+    assert AccountRequest(**row).permission is None
+
+    result = validate_account_requests([row])
+
+    assert result.requests == []
+    assert result.errors == {0: "permission の値が正しくありません。"}
+    assert validate_account_requests({field: [value] for field, value in row.items()}).errors == result.errors
+
+
+def test_column_lengths_must_match():
+    with pytest.raises(ValueError):
+        validate_account_requests({"email": ["foo@example.com"], "tool": ["trello", "trello"], "background": ["a"]})